@@ -35,7 +35,7 @@ except ImportError:
     _PLOTLY_OK = False
 import pytz, requests, concurrent.futures
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 
 # ─────────────────────────────────────────────────────────
 # 1. PAGE CONFIG — siempre primero
@@ -44,6 +44,96 @@ st.set_page_config(page_title="Torneo Fefe Wolf 2026", layout="wide", page_icon=
 st.markdown('<meta name="viewport" content="width=device-width,initial-scale=1,maximum-scale=1">',
             unsafe_allow_html=True)
 
+# ─────────────────────────────────────────────────────────
+# 1b. ASSETS — variantes WebP redimensionadas, generadas una vez por proceso
+# ─────────────────────────────────────────────────────────
+# Las fotos del repo pesan ~1MB cada una y se inyectaban en base64 en cada
+# render (login, muro, CSS). Al arrancar se generan static/<nombre>-<ancho>.webp
+# (solo si faltan o el original es más nuevo) y la UI las referencia por URL con
+# srcset. .streamlit/config.toml trae [server] enableStaticServing = true, así se
+# sirven como archivos cacheables en app/static/…; si un deploy lo apaga, se
+# inyecta solo la variante más chica que alcance. Sin Pillow se usa el original.
+_ASSET_DIR     = "static"
+_ASSET_ANCHOS  = (160, 480, 960, 1600)
+_ASSET_FUENTES = ("FORMULEROS.jpg", "ui/FORMULEROS.jpg", "IMAGENFEFE.jfif",
+                  "IMAGENCUPULA.jfif", "IMAGENCALENDARIO.jfif", "IMAGENMURO.jfif")
+
+@st.cache_resource(show_spinner=False)
+def _assets():
+    """{ruta_original: {ancho: ruta_webp}} con las variantes disponibles."""
+    out = {}
+    try: from PIL import Image
+    except Exception: return out
+    try: os.makedirs(_ASSET_DIR, exist_ok=True)
+    except Exception: return out
+    for _src in _ASSET_FUENTES:
+        if not os.path.exists(_src): continue
+        _stem = os.path.splitext(_src.replace("/", "_"))[0]
+        try:
+            _mt = os.path.getmtime(_src)
+            with Image.open(_src) as _im:
+                _anchos = [w for w in _ASSET_ANCHOS if w < _im.width] or [_im.width]
+                if _im.width < _ASSET_ANCHOS[-1] and _im.width not in _anchos:
+                    _anchos.append(_im.width)
+                _vars = {}
+                _rgb  = None
+                for _w in _anchos:
+                    _dst = os.path.join(_ASSET_DIR, f"{_stem}-{_w}.webp")
+                    if not os.path.exists(_dst) or os.path.getmtime(_dst) < _mt:
+                        if _rgb is None: _rgb = _im.convert("RGB")
+                        _h = max(1, round(_rgb.height * _w / _rgb.width))
+                        _rgb.resize((_w, _h), Image.LANCZOS).save(_dst, "WEBP", quality=78, method=4)
+                    _vars[_w] = _dst
+            if _vars: out[_src] = _vars
+        except Exception: pass
+    return out
+
+def _static_on():
+    try: return bool(st.get_option("server.enableStaticServing"))
+    except Exception: return False
+
+@st.cache_data(show_spinner=False)
+def _asset_data_uri(path, mtime=None):
+    _mime = {"webp":"image/webp","png":"image/png"}.get(path.rsplit(".",1)[-1].lower(), "image/jpeg")
+    with open(path,"rb") as f: return f"data:{_mime};base64," + base64.b64encode(f.read()).decode()
+
+def _asset_elegir(src, ancho):
+    _v = _assets().get(src) or {}
+    if not _v: return None, 0
+    _w = min((w for w in _v if w >= ancho), default=max(_v))
+    return _v[_w], _w
+
+def asset_path(src, ancho=960):
+    """Ruta local de la variante más chica que cubra `ancho` (o el original)."""
+    _p, _ = _asset_elegir(src, ancho)
+    return _p or src
+
+def asset_url(src, ancho=960):
+    """URL servible (app/static/… o data URI) de la variante para `ancho`; '' si no existe."""
+    _p = asset_path(src, ancho)
+    if not os.path.exists(_p): return ""
+    if _static_on() and _p != src: return f"app/static/{os.path.basename(_p)}"
+    try: return _asset_data_uri(_p, os.path.getmtime(_p))
+    except Exception: return ""
+
+def asset_srcset(src):
+    """srcset con todas las variantes — solo con static serving (inline sería N veces el peso)."""
+    _v = _assets().get(src) or {}
+    if not _v or not _static_on(): return ""
+    return ", ".join(f"app/static/{os.path.basename(p)} {w}w" for w, p in sorted(_v.items()))
+
+def asset_img(src, ancho=960, sizes="100vw", style=""):
+    """<img> con src/srcset/sizes para una imagen del repo; '' si no existe."""
+    _url = asset_url(src, ancho)
+    if not _url: return ""
+    _ss = asset_srcset(src)
+    _ss = f' srcset="{_ss}" sizes="{sizes}"' if _ss else ""
+    return f'<img src="{_url}"{_ss} decoding="async" style="{style}">'
+
+def asset_primero(*srcs):
+    """Primera imagen de la lista que exista en disco."""
+    return next((s for s in srcs if os.path.exists(s)), "")
+
 # ─────────────────────────────────────────────────────────
 # 2. CSS — cacheado, se inyecta ANTES de cualquier import lento
 # ─────────────────────────────────────────────────────────
@@ -52,10 +142,7 @@ def _css():
     css_path = os.path.join("ui","styles.css")
     if not os.path.exists(css_path): return ""
     with open(css_path,"r",encoding="utf-8") as f: css = f.read()
-    img = os.path.join("ui","FORMULEROS.jpg")
-    bg  = ""
-    if os.path.exists(img):
-        with open(img,"rb") as f2: bg = "data:image/jpeg;base64,"+base64.b64encode(f2.read()).decode()
+    bg  = asset_url("ui/FORMULEROS.jpg", 1600)
     return css.replace("__LOGIN_BG__", bg)
 
 def load_css():
@@ -314,9 +401,167 @@ button[data-baseweb="tab"][aria-selected="true"] p { color: #D4AF37 !important;
 [data-testid="stMetricLabel"] { color: rgba(169,178,214,.6) !important; }
 """, unsafe_allow_html=True)
 
+# ─────────────────────────────────────────────────────────
+# 2b. PERFILADOR — opt-in con ?perf=1 (solo admins), por rerun y por pantalla
+# ─────────────────────────────────────────────────────────
+# Con el perfilador apagado cada punto instrumentado cuesta un getattr sobre un
+# threading.local. Encendido, main() abre un registro por rerun en el hilo del
+# script: _mod_*, _safe_call, lecturas de Sheets, pantalla_* y los agregados
+# pesados anotan spans anidados (ruta → ms, llamadas). Al terminar el rerun se
+# muestra el resumen tipo flame y el total alimenta ventanas por pantalla para
+# p50/p95 en memoria del proceso; perf_export() lo deja en JSON para comparar
+# entre deploys.
+import time as _t_pf, functools as _ft_pf
+
+_PERF_ADMINS   = {"Checo Perez"}
+_PERF_VENTANA  = 200   # reruns por pantalla / muestras por span para p50/p95
+_PERF_HISTORIA = 20    # últimos perfiles completos que se exportan
+
+@st.cache_resource(show_spinner=False)
+def _perf_store():
+    import threading
+    from collections import deque
+    return {"lock": threading.Lock(), "local": threading.local(), "pantallas": {},
+            "spans": {}, "historia": deque(maxlen=_PERF_HISTORIA), "inicio": _t_pf.time()}
+
+_PERF_LOCAL = _perf_store()["local"]
+
+class _PerfSpan:
+    __slots__ = ("rec", "nombre", "t0")
+
+    def __init__(self, rec, nombre):
+        self.rec, self.nombre = rec, nombre
+
+    def __enter__(self):
+        _pila = self.rec["pila"]; _pila.append(self.nombre)
+        self.rec["spans"].setdefault(tuple(_pila), [0.0, 0])   # orden = primer inicio
+        self.t0 = _t_pf.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _dt = (_t_pf.perf_counter() - self.t0) * 1000.0
+        _pila = self.rec["pila"]
+        _agg = self.rec["spans"][tuple(_pila)]
+        _agg[0] += _dt; _agg[1] += 1
+        _pila.pop()
+        return False
+
+class _PerfNulo:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_PERF_NULO = _PerfNulo()
+
+def perf_span(tipo, nombre=""):
+    """Context manager que anota un span en el rerun actual (no-op si está apagado)."""
+    rec = getattr(_PERF_LOCAL, "rec", None)
+    if rec is None: return _PERF_NULO
+    return _PerfSpan(rec, f"{tipo}:{nombre}" if nombre else tipo)
+
+def perfilar(tipo):
+    """Decorador: cada llamada a la función es un span `tipo:nombre`."""
+    def _deco(fn):
+        _nombre = f"{tipo}:{fn.__name__}"
+        @_ft_pf.wraps(fn)
+        def _w(*a, **kw):
+            rec = getattr(_PERF_LOCAL, "rec", None)
+            if rec is None: return fn(*a, **kw)
+            with _PerfSpan(rec, _nombre): return fn(*a, **kw)
+        return _w
+    return _deco
+
+def perf_inicio():
+    """Al empezar main(): ?perf=1 / ?perf=0 prende o apaga para la sesión (solo admins)."""
+    try:
+        _q = st.query_params.get("perf")
+        if _q is not None: st.session_state["perf_on"] = _q not in ("", "0", "off")
+    except Exception: pass
+    _u = (st.session_state.get("perfil") or {}).get("usuario", "")
+    _on = bool(st.session_state.get("perf_on")) and _u in _PERF_ADMINS
+    _PERF_LOCAL.rec = {"t0": _t_pf.perf_counter(), "pila": [], "spans": {}} if _on else None
+    return _on
+
+def _perf_pct(xs, q):
+    if not xs: return 0.0
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(q * len(xs)))], 1)
+
+def perf_fin(pantalla):
+    """Cierra el rerun: guarda totales por pantalla/span y devuelve el perfil (o None)."""
+    from collections import deque
+    rec = getattr(_PERF_LOCAL, "rec", None)
+    if rec is None: return None
+    _PERF_LOCAL.rec = None
+    _total = (_t_pf.perf_counter() - rec["t0"]) * 1000.0
+    _spans = [{"ruta": " › ".join(k), "nivel": len(k) - 1, "ms": round(v[0], 1), "n": v[1]}
+              for k, v in rec["spans"].items()]
+    perfil = {"ts": _t_pf.time(), "pantalla": pantalla, "total_ms": round(_total, 1), "spans": _spans}
+    store = _perf_store()
+    with store["lock"]:
+        store["pantallas"].setdefault(pantalla, deque(maxlen=_PERF_VENTANA)).append(_total)
+        _por_nombre = {}
+        for k, v in rec["spans"].items():
+            _por_nombre[k[-1]] = _por_nombre.get(k[-1], 0.0) + v[0]
+        for nombre, ms in _por_nombre.items():
+            store["spans"].setdefault(nombre, deque(maxlen=_PERF_VENTANA)).append(ms)
+        store["historia"].append(perfil)
+    return perfil
+
+def perf_stats():
+    """{pantallas: {p: n/p50/p95/max}, spans: {nombre: n/p50/p95}} de la ventana en memoria."""
+    store = _perf_store()
+    with store["lock"]:
+        _p = {k: list(v) for k, v in store["pantallas"].items()}
+        _s = {k: list(v) for k, v in store["spans"].items()}
+    return {"pantallas": {k: {"n": len(v), "p50_ms": _perf_pct(v, .5), "p95_ms": _perf_pct(v, .95),
+                              "max_ms": round(max(v), 1)} for k, v in _p.items()},
+            "spans": {k: {"n": len(v), "p50_ms": _perf_pct(v, .5), "p95_ms": _perf_pct(v, .95)}
+                      for k, v in sorted(_s.items(), key=lambda kv: -sum(kv[1]))}}
+
+def perf_export():
+    """Todo lo medido en este proceso, listo para json.dumps."""
+    import platform
+    store = _perf_store()
+    with store["lock"]: _hist = list(store["historia"])
+    try: _ver = datetime.fromtimestamp(os.path.getmtime(__file__)).isoformat(timespec="seconds")
+    except Exception: _ver = ""
+    return {"generado": datetime.now().isoformat(timespec="seconds"), "host": platform.node(),
+            "pid": os.getpid(), "app_mtime": _ver,
+            "proceso_desde": datetime.fromtimestamp(store["inicio"]).isoformat(timespec="seconds"),
+            **perf_stats(), "historia": _hist}
+
+def perf_hud(perfil):
+    """Resumen del rerun (flame por ruta) + p50/p95 por pantalla + export JSON."""
+    import json
+    if not perfil: return
+    _tot = perfil["total_ms"] or 1.0
+    _filas = []
+    for sp in perfil["spans"][:80]:
+        _w = max(0.5, min(100.0, sp["ms"] * 100.0 / _tot))
+        _nom = _html.escape(sp["ruta"].rsplit(" › ", 1)[-1])
+        _filas.append(
+            f'<div style="display:flex;align-items:center;gap:8px;font-size:11px;'
+            f'padding-left:{sp["nivel"] * 14}px;">'
+            f'<div style="flex:0 0 38%;white-space:nowrap;overflow:hidden;text-overflow:ellipsis;'
+            f'color:rgba(232,236,255,.8);">{_nom}{" ×" + str(sp["n"]) if sp["n"] > 1 else ""}</div>'
+            f'<div style="flex:1;background:rgba(255,255,255,.04);border-radius:3px;">'
+            f'<div style="width:{_w:.1f}%;height:9px;border-radius:3px;'
+            f'background:linear-gradient(90deg,#f97316,#D4AF37);"></div></div>'
+            f'<div style="flex:0 0 70px;text-align:right;color:#ffdd7a;">{sp["ms"]:.1f} ms</div></div>')
+    with st.expander(f"⏱️ Perfil del rerun — {perfil['pantalla']} · {perfil['total_ms']:.0f} ms", expanded=False):
+        st.markdown("".join(_filas) or "Sin spans.", unsafe_allow_html=True)
+        _ps = perf_stats()
+        if _ps["pantallas"]:
+            st.dataframe(pd.DataFrame.from_dict(_ps["pantallas"], orient="index"), use_container_width=True)
+        st.download_button("⬇️ Exportar JSON", json.dumps(perf_export(), ensure_ascii=False, indent=1),
+                           file_name=f"perf-{datetime.now():%Y%m%d-%H%M%S}.json",
+                           mime="application/json", key="perf_export")
+
 # ─────────────────────────────────────────────────────────
 # 3. LAZY MODULE LOADERS
 # ─────────────────────────────────────────────────────────
+@perfilar("mod")
 @st.cache_resource(show_spinner=False)
 def _mod_auth():
     try:
@@ -333,6 +578,7 @@ def _mod_auth():
     except Exception as e:
         return {"_error": str(e)}
 
+@perfilar("mod")
 @st.cache_resource(show_spinner=False)
 def _mod_db():
     try:
@@ -367,6 +613,7 @@ def _mod_db():
     except Exception as e:
         return {"_error": str(e)}
 
+@perfilar("mod")
 @st.cache_resource(show_spinner=False)
 def _mod_admin():
     try:
@@ -375,6 +622,7 @@ def _mod_admin():
     except Exception as e:
         return {"_error": str(e)}
 
+@perfilar("mod")
 @st.cache_resource(show_spinner=False)
 def _mod_core():
     try:
@@ -387,6 +635,7 @@ def _mod_core():
     except Exception as e:
         return {"_error": str(e)}
 
+@perfilar("mod")
 @st.cache_resource(show_spinner=False)
 def _mod_mesa():
     try:
@@ -411,9 +660,16 @@ def _mod_mesa():
     def news_can_publish(u):
         return str(u).strip() in {"Checo Perez", "Lando Norris"}
 
-    def _ndb():
-        import sqlite3 as _sq
-        c = _sq.connect("mesa_chica.db", check_same_thread=False)
+    # Una sola conexión SQLite por proceso (WAL, serializada con un lock): el
+    # esquema y los índices se crean al abrirla, no en cada consulta.
+    import threading as _th_n
+    from contextlib import contextmanager as _cm_n
+    _NDB = {"c": None, "lock": _th_n.RLock(), "aperturas": 0, "consultas": 0}
+
+    def _ndb_abrir():
+        c = sqlite3.connect("mesa_chica.db", check_same_thread=False, timeout=10)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
         c.execute("CREATE TABLE IF NOT EXISTS paddock_noticias (id INTEGER PRIMARY KEY AUTOINCREMENT, "
                   "autor TEXT, titulo TEXT, imagen_url TEXT, cuerpo TEXT, ts TEXT, "
                   "deleted INTEGER NOT NULL DEFAULT 0, deleted_ts TEXT, deleted_by TEXT)")
@@ -423,53 +679,83 @@ def _mod_mesa():
         c.execute("CREATE TABLE IF NOT EXISTS paddock_noticias_comentarios "
                   "(id INTEGER PRIMARY KEY AUTOINCREMENT, noticia_id INTEGER, "
                   "autor TEXT, texto TEXT, ts TEXT, deleted INTEGER NOT NULL DEFAULT 0)")
-        c.commit(); return c
+        c.execute("CREATE INDEX IF NOT EXISTS ix_pn_deleted ON paddock_noticias (deleted, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS ix_pnr_usuario ON paddock_noticias_reacciones (usuario, noticia_id)")
+        c.execute("CREATE INDEX IF NOT EXISTS ix_pnc_noticia ON paddock_noticias_comentarios (noticia_id, deleted, id)")
+        c.commit()
+        _NDB["aperturas"] += 1
+        return c
+
+    @_cm_n
+    def _ndb():
+        """Conexión compartida; commit al salir del bloque, rollback si falla."""
+        with _NDB["lock"]:
+            if _NDB["c"] is None: _NDB["c"] = _ndb_abrir()
+            c = _NDB["c"]; _NDB["consultas"] += 1
+            try:
+                yield c
+                c.commit()
+            except sqlite3.DatabaseError:
+                try: c.close()
+                except Exception: pass
+                _NDB["c"] = None        # conexión rota → reabrir en la próxima
+                raise
+            except Exception:
+                c.rollback(); raise
+
+    def _ids_sql(ids):
+        ids = [int(i) for i in ids]
+        return ids, ",".join("?" * len(ids))
+
+    def news_db_stats():
+        return {"aperturas": _NDB["aperturas"], "consultas": _NDB["consultas"]}
 
     def news_toggle_reaccion(noticia_id, usuario, emoji):
         """Devuelve True si quedó con reacción, False si se quitó."""
         try:
-            c = _ndb()
-            existing = c.execute(
-                "SELECT 1 FROM paddock_noticias_reacciones WHERE noticia_id=? AND usuario=? AND emoji=?",
-                (int(noticia_id), str(usuario), str(emoji))).fetchone()
-            if existing:
-                c.execute("DELETE FROM paddock_noticias_reacciones WHERE noticia_id=? AND usuario=? AND emoji=?",
-                          (int(noticia_id), str(usuario), str(emoji)))
-                c.commit(); c.close(); return False
-            else:
+            with _ndb() as c:
+                cur = c.execute("DELETE FROM paddock_noticias_reacciones WHERE noticia_id=? AND usuario=? AND emoji=?",
+                                (int(noticia_id), str(usuario), str(emoji)))
+                if cur.rowcount: return False
                 c.execute("INSERT INTO paddock_noticias_reacciones (noticia_id,usuario,emoji,ts) VALUES (?,?,?,?)",
                           (int(noticia_id), str(usuario), str(emoji), _news_ts()))
-                c.commit(); c.close(); return True
+                return True
         except Exception: return False
 
+    def news_reacciones_batch(ids, usuario=None):
+        """Para una página de noticias: ({id: {emoji: count}}, {id: set(emojis de usuario)})."""
+        cnt = {}; mine = {}
+        try:
+            ids, ph = _ids_sql(ids)
+            if not ids: return cnt, mine
+            with _ndb() as c:
+                for nid, em, n in c.execute(
+                        f"SELECT noticia_id, emoji, COUNT(*) FROM paddock_noticias_reacciones "
+                        f"WHERE noticia_id IN ({ph}) GROUP BY noticia_id, emoji", ids):
+                    cnt.setdefault(nid, {})[em] = n
+                if usuario is not None:
+                    for nid, em in c.execute(
+                            f"SELECT noticia_id, emoji FROM paddock_noticias_reacciones "
+                            f"WHERE usuario=? AND noticia_id IN ({ph})", [str(usuario)] + ids):
+                        mine.setdefault(nid, set()).add(em)
+        except Exception: pass
+        return cnt, mine
+
     def news_get_reacciones(noticia_id):
         """Retorna dict {emoji: count}"""
-        try:
-            c = _ndb()
-            rows = c.execute(
-                "SELECT emoji, COUNT(*) as cnt FROM paddock_noticias_reacciones "
-                "WHERE noticia_id=? GROUP BY emoji", (int(noticia_id),)).fetchall()
-            c.close(); return {r[0]: r[1] for r in rows}
-        except Exception: return {}
+        return news_reacciones_batch([noticia_id])[0].get(int(noticia_id), {})
 
     def news_user_reacciones(noticia_id, usuario):
         """Retorna set de emojis que el usuario puso"""
-        try:
-            c = _ndb()
-            rows = c.execute(
-                "SELECT emoji FROM paddock_noticias_reacciones WHERE noticia_id=? AND usuario=?",
-                (int(noticia_id), str(usuario))).fetchall()
-            c.close(); return {r[0] for r in rows}
-        except Exception: return set()
+        return news_reacciones_batch([noticia_id], usuario)[1].get(int(noticia_id), set())
 
     def news_add_comentario(noticia_id, autor, texto):
         _ts_c = _news_ts()
         # Write to SQLite
         try:
-            c = _ndb()
-            c.execute("INSERT INTO paddock_noticias_comentarios (noticia_id,autor,texto,ts,deleted) VALUES (?,?,?,?,0)",
-                      (int(noticia_id), str(autor), str(texto).strip(), _ts_c))
-            c.commit(); c.close()
+            with _ndb() as c:
+                c.execute("INSERT INTO paddock_noticias_comentarios (noticia_id,autor,texto,ts,deleted) VALUES (?,?,?,?,0)",
+                          (int(noticia_id), str(autor), str(texto).strip(), _ts_c))
         except Exception: pass
         # Persist to GSheets (Comentarios tab)
         try:
@@ -481,62 +767,64 @@ def _mod_mesa():
                     _ws_c = _ss_c.add_worksheet("Comentarios", rows=2000, cols=6)
                     _ws_c.update("A1", [["id","noticia_id","autor","texto","ts","deleted"]])
             if _ws_c:
-                _all_c = _ws_c.get_all_values()
-                if not _all_c:
-                    _ws_c.append_row(["id","noticia_id","autor","texto","ts","deleted"])
-                    _all_c = [["id","noticia_id","autor","texto","ts","deleted"]]
-                _nid_c = len(_all_c)
-                _ws_c.append_row([_nid_c, int(noticia_id), str(autor), str(texto).strip(), _ts_c, 0])
+                hoja_append_con_id("Comentarios", ["id","noticia_id","autor","texto","ts","deleted"],
+                                   [int(noticia_id), str(autor), str(texto).strip(), _ts_c, 0], ws=_ws_c)
         except Exception: pass
 
-    def news_get_comentarios(noticia_id):
-        # Try SQLite first
-        try:
-            c = _ndb()
-            rows = c.execute(
-                "SELECT id,autor,texto,ts FROM paddock_noticias_comentarios "
-                "WHERE noticia_id=? AND deleted=0 ORDER BY id ASC", (int(noticia_id),)).fetchall()
-            c.close()
-            if rows: return rows
-        except Exception: pass
-        # Fallback: GSheets (sobrevive reinicios de Streamlit Cloud)
+    def _comentarios_sheets(ids):
+        """Fallback GSheets (sobrevive reinicios de Streamlit Cloud): una pasada para todos los ids."""
+        _out = {}
+        _vals_gc = hoja_valores("Comentarios")
+        if not _vals_gc or len(_vals_gc) < 2: return _out
+        _want = {str(i) for i in ids}
+        _hdr_gc = [h.lower().strip() for h in _vals_gc[0]]
+        def _ci(name, d):
+            return _hdr_gc.index(name) if name in _hdr_gc else d
+        _i_id  = _ci("id",0); _i_nid = _ci("noticia_id",1)
+        _i_aut = _ci("autor",2); _i_txt = _ci("texto",3)
+        _i_ts  = _ci("ts",4); _i_del = _ci("deleted",5)
+        for _r in _vals_gc[1:]:
+            try:
+                _nid_v = str(_r[_i_nid]) if _i_nid < len(_r) else ""
+                if _nid_v not in _want: continue
+                _del_v = str(_r[_i_del]) if _i_del < len(_r) else "0"
+                if _del_v in ("1","True","true"): continue
+                try: _id_v = int(_r[_i_id]) if _i_id < len(_r) else 0
+                except Exception: _id_v = 0
+                _out.setdefault(int(_nid_v), []).append((
+                    _id_v,
+                    str(_r[_i_aut]) if _i_aut < len(_r) else "",
+                    str(_r[_i_txt]) if _i_txt < len(_r) else "",
+                    str(_r[_i_ts]) if _i_ts < len(_r) else ""))
+            except Exception: continue
+        return _out
+
+    def news_comentarios_batch(ids):
+        """{id: [(com_id, autor, texto, ts), ...]} para una página de noticias."""
+        _out = {}
         try:
-            from core.database import conectar_google_sheets as _cgs_gc
-            _ws_gc = _cgs_gc("Comentarios")
-            if _ws_gc:
-                _vals_gc = _ws_gc.get_all_values()
-                if _vals_gc and len(_vals_gc) > 1:
-                    _hdr_gc = [h.lower().strip() for h in _vals_gc[0]]
-                    def _ci(name, d):
-                        return _hdr_gc.index(name) if name in _hdr_gc else d
-                    _i_id  = _ci("id",0); _i_nid = _ci("noticia_id",1)
-                    _i_aut = _ci("autor",2); _i_txt = _ci("texto",3)
-                    _i_ts  = _ci("ts",4); _i_del = _ci("deleted",5)
-                    _out = []
-                    for _r in _vals_gc[1:]:
-                        try:
-                            _nid_v = str(_r[_i_nid]) if _i_nid < len(_r) else ""
-                            if _nid_v != str(noticia_id): continue
-                            _del_v = str(_r[_i_del]) if (_i_del is not None and _i_del < len(_r)) else "0"
-                            if _del_v in ("1","True","true"): continue
-                            _id_v = 0
-                            try: _id_v = int(_r[_i_id]) if _i_id < len(_r) else 0
-                            except Exception: _id_v = 0
-                            _out.append((
-                                _id_v,
-                                str(_r[_i_aut]) if _i_aut < len(_r) else "",
-                                str(_r[_i_txt]) if _i_txt < len(_r) else "",
-                                str(_r[_i_ts]) if _i_ts < len(_r) else ""))
-                        except Exception: continue
-                    return _out
+            ids, ph = _ids_sql(ids)
+            if not ids: return _out
+            with _ndb() as c:
+                for cid, nid, aut, txt, ts in c.execute(
+                        f"SELECT id,noticia_id,autor,texto,ts FROM paddock_noticias_comentarios "
+                        f"WHERE noticia_id IN ({ph}) AND deleted=0 ORDER BY noticia_id, id", ids):
+                    _out.setdefault(nid, []).append((cid, aut, txt, ts))
         except Exception: pass
-        return []
+        _faltan = [i for i in ids if i not in _out]
+        if _faltan:
+            try: _out.update(_comentarios_sheets(_faltan))
+            except Exception: pass
+        return _out
+
+    def news_get_comentarios(noticia_id):
+        try: return news_comentarios_batch([noticia_id]).get(int(noticia_id), [])
+        except Exception: return []
 
     def news_delete_comentario(com_id):
         try:
-            c = _ndb()
-            c.execute("UPDATE paddock_noticias_comentarios SET deleted=1 WHERE id=?", (int(com_id),))
-            c.commit(); c.close()
+            with _ndb() as c:
+                c.execute("UPDATE paddock_noticias_comentarios SET deleted=1 WHERE id=?", (int(com_id),))
         except Exception: pass
 
     def news_add(autor, titulo, cuerpo="", imagen_url=""):
@@ -545,10 +833,9 @@ def _mod_mesa():
         _ts_n = _news_ts()
         # Always write to SQLite (supports base64 images)
         try:
-            c = _ndb()
-            c.execute("INSERT INTO paddock_noticias (autor,titulo,imagen_url,cuerpo,ts,deleted) VALUES (?,?,?,?,?,0)",
-                      (str(autor), str(titulo), str(imagen_url or ""), str(cuerpo or ""), _ts_n))
-            c.commit(); c.close()
+            with _ndb() as c:
+                c.execute("INSERT INTO paddock_noticias (autor,titulo,imagen_url,cuerpo,ts,deleted) VALUES (?,?,?,?,?,0)",
+                          (str(autor), str(titulo), str(imagen_url or ""), str(cuerpo or ""), _ts_n))
         except Exception: pass
         # Write to Google Sheets (sin base64 — usa URL directo o vacío)
         try:
@@ -564,10 +851,8 @@ def _mod_mesa():
                         _ws_n.update("A1", [["id","autor","titulo","imagen_url","cuerpo","ts","deleted","deleted_by"]])
                 except Exception: pass
             if _ws_n:
-                _all_n = _ws_n.get_all_values()
-                _next_id = len(_all_n)
-                _ws_n.append_row([_next_id, str(autor), str(titulo), _img_for_sheets,
-                                   str(cuerpo or ""), _ts_n, 0, ""])
+                hoja_append_con_id("Noticias", ["id","autor","titulo","imagen_url","cuerpo","ts","deleted","deleted_by"],
+                                   [str(autor), str(titulo), _img_for_sheets, str(cuerpo or ""), _ts_n, 0, ""], ws=_ws_n)
         except Exception: pass
 
     def news_list(limit=50):
@@ -576,19 +861,16 @@ def _mod_mesa():
         _sqlite_rows = {}
         # Leer SQLite para tener las imágenes base64 (aunque se borren en reinicios)
         try:
-            c = _ndb()
-            _sq = c.execute("SELECT id,autor,titulo,imagen_url,cuerpo,ts FROM paddock_noticias "
-                            "WHERE deleted=0 ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
-            c.close()
+            with _ndb() as c:
+                _sq = c.execute("SELECT id,autor,titulo,imagen_url,cuerpo,ts FROM paddock_noticias "
+                                "WHERE deleted=0 ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
             for _sr in _sq:
                 _sqlite_rows[int(_sr[0])] = _sr
         except Exception: pass
         # Leer Sheets (fuente principal)
         try:
-            from core.database import conectar_google_sheets as _cgs_n2
-            _ws_n2 = _cgs_n2("Noticias")
-            if _ws_n2:
-                _rows_n2 = _ws_n2.get_all_records()
+            if hoja_valores("Noticias") is not None:
+                _rows_n2 = hoja_registros("Noticias")
                 _out = []
                 for _r in reversed(_rows_n2):
                     if str(_r.get("deleted","0")) in ("1","True","true"): continue
@@ -610,39 +892,28 @@ def _mod_mesa():
 
     def news_delete(nid, deleted_by=""):
         try:
-            from core.database import conectar_google_sheets as _cgs_nd
-            _ws_nd = _cgs_nd("Noticias")
-            if _ws_nd:
-                _recs = _ws_nd.get_all_records()
-                for _i, _r in enumerate(_recs, start=2):
-                    if str(_r.get("id","")) == str(nid):
-                        _ws_nd.update_cell(_i, 7, 1)
-                        _ws_nd.update_cell(_i, 8, str(deleted_by))
-                        return
+            _i = hoja_fila("Noticias", nid)
+            if _i:
+                hoja_update("Noticias", f"G{_i}:H{_i}", [[1, str(deleted_by)]])
+                return
         except Exception: pass
         try:
-            c = _ndb()
-            c.execute("UPDATE paddock_noticias SET deleted=1,deleted_ts=?,deleted_by=? WHERE id=?",
-                      (_news_ts(), str(deleted_by), int(nid)))
-            c.commit(); c.close()
+            with _ndb() as c:
+                c.execute("UPDATE paddock_noticias SET deleted=1,deleted_ts=?,deleted_by=? WHERE id=?",
+                          (_news_ts(), str(deleted_by), int(nid)))
         except Exception: pass
 
     def news_update(nid, titulo, cuerpo, imagen_url):
         try:
-            from core.database import conectar_google_sheets as _cgs_nu
-            _ws_nu = _cgs_nu("Noticias")
-            if _ws_nu:
-                _recs = _ws_nu.get_all_records()
-                for _i, _r in enumerate(_recs, start=2):
-                    if str(_r.get("id","")) == str(nid):
-                        _ws_nu.update(f"C{_i}:E{_i}", [[str(titulo or ""), str(imagen_url or ""), str(cuerpo or "")]])
-                        return
+            _i = hoja_fila("Noticias", nid)
+            if _i:
+                hoja_update("Noticias", f"C{_i}:E{_i}", [[str(titulo or ""), str(imagen_url or ""), str(cuerpo or "")]])
+                return
         except Exception: pass
         try:
-            c = _ndb()
-            c.execute("UPDATE paddock_noticias SET titulo=?,cuerpo=?,imagen_url=? WHERE id=?",
-                      (str(titulo or ""), str(cuerpo or ""), str(imagen_url or ""), int(nid)))
-            c.commit(); c.close()
+            with _ndb() as c:
+                c.execute("UPDATE paddock_noticias SET titulo=?,cuerpo=?,imagen_url=? WHERE id=?",
+                          (str(titulo or ""), str(cuerpo or ""), str(imagen_url or ""), int(nid)))
         except Exception: pass
 
     return dict(mc_is_mod=mc_is_mod, mc_badge_for=mc_badge_for,
@@ -663,28 +934,1200 @@ def _mod_mesa():
                 news_user_reacciones=news_user_reacciones,
                 news_add_comentario=news_add_comentario,
                 news_get_comentarios=news_get_comentarios,
-                news_delete_comentario=news_delete_comentario)
+                news_delete_comentario=news_delete_comentario,
+                news_reacciones_batch=news_reacciones_batch,
+                news_comentarios_batch=news_comentarios_batch,
+                news_db_stats=news_db_stats)
 
 def _auth(fn, *a, default=(False,"Módulo no disponible"), timeout=10, **kw):
     m = _mod_auth()
     if "_error" in m or fn not in m: return default
-    return _safe_call(m[fn], *a, timeout_sec=timeout, default=default, **kw)
+    return _safe_call(m[fn], *a, timeout_sec=timeout, default=default, backend="auth", **kw)
 
 def _db(fn, *a, default=None, timeout=8, **kw):
     m = _mod_db()
     if "_error" in m or fn not in m: return default
-    return _safe_call(m[fn], *a, timeout_sec=timeout, default=default, **kw)
+    return _safe_call(m[fn], *a, timeout_sec=timeout, default=default, backend="db", **kw)
 
 def _core(fn, *a, default=None, timeout=4, **kw):
     m = _mod_core()
     if "_error" in m or fn not in m: return default
-    return _safe_call(m[fn], *a, timeout_sec=timeout, default=default, **kw)
+    return _safe_call(m[fn], *a, timeout_sec=timeout, default=default, backend="core", **kw)
+
+# ── Ejecutor compartido + circuit breaker ────────────────────────────
+# Un solo pool por proceso: si una llamada a Sheets se cuelga, el timeout
+# libera al script de Streamlit (no hay shutdown(wait=True)) y el hilo
+# colgado sigue en el pool hasta que la API responda.
+_EXEC_WORKERS       = 16
+_BREAKER_THRESHOLD  = 3      # timeouts consecutivos para abrir el breaker
+_BREAKER_COOLDOWN   = 30.0   # segundos fallando rápido antes de reintentar
+_BACKEND_BY_MODULE  = {"core.database":"db", "core.mesa_chica_db":"db",
+                       "core.auth":"auth", "core.admin_tools":"admin"}
+
+@st.cache_resource(show_spinner=False)
+def _executor():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=_EXEC_WORKERS,
+                                                 thread_name_prefix="fw-io")
+
+@st.cache_resource(show_spinner=False)
+def _call_stats():
+    """Contadores por backend compartidos entre sesiones."""
+    import threading
+    return {"lock": threading.Lock(), "backends": {}}
+
+def _backend_of(fn):
+    _m = getattr(fn, "__module__", "") or ""
+    if _m in _BACKEND_BY_MODULE: return _BACKEND_BY_MODULE[_m]
+    return "core" if _m.startswith("core.") else "app"
+
+def _backend_entry(stats, backend):
+    from collections import deque
+    b = stats["backends"].get(backend)
+    if b is None:
+        b = stats["backends"][backend] = {
+            "calls":0, "ok":0, "timeouts":0, "errors":0, "short_circuited":0,
+            "consec_timeouts":0, "open_until":0.0, "total_ms":0.0, "max_ms":0.0,
+            "lat_ms":deque(maxlen=200)}
+    return b
+
+def _safe_call(fn, *a, timeout_sec=8, default=None, backend=None, **kw):
+    backend = backend or _backend_of(fn)
+    with perf_span("safe_call", f"{backend}.{getattr(fn, '__name__', '?')}"):
+        return _safe_call_impl(fn, a, kw, timeout_sec, default, backend)
+
+def _safe_call_impl(fn, a, kw, timeout_sec, default, backend):
+    import time as _t_sc
+    stats = _call_stats()
+    with stats["lock"]:
+        b = _backend_entry(stats, backend)
+        b["calls"] += 1
+        if b["open_until"] > _t_sc.monotonic():
+            b["short_circuited"] += 1
+            return default
+    t0 = _t_sc.monotonic()
+    try:
+        fut = _executor().submit(fn, *a, **kw)
+    except Exception:
+        return default
+    outcome = "ok"
+    try:
+        res = fut.result(timeout=timeout_sec)
+    except concurrent.futures.TimeoutError:
+        fut.cancel()  # solo surte efecto si todavía estaba en cola
+        outcome = "timeout"; res = default
+    except Exception:
+        outcome = "error"; res = default
+    dt_ms = (_t_sc.monotonic() - t0) * 1000.0
+    with stats["lock"]:
+        b = _backend_entry(stats, backend)
+        b["total_ms"] += dt_ms; b["max_ms"] = max(b["max_ms"], dt_ms)
+        b["lat_ms"].append(dt_ms)
+        if outcome == "timeout":
+            b["timeouts"] += 1; b["consec_timeouts"] += 1
+            if b["consec_timeouts"] >= _BREAKER_THRESHOLD:
+                b["open_until"] = _t_sc.monotonic() + _BREAKER_COOLDOWN
+        else:
+            b["ok" if outcome == "ok" else "errors"] += 1
+            b["consec_timeouts"] = 0; b["open_until"] = 0.0
+    return res
+
+def safe_call_stats():
+    """Snapshot de latencias/timeouts por backend (para el panel admin)."""
+    import time as _t_ss
+    stats = _call_stats(); out = {}
+    with stats["lock"]:
+        for name, b in stats["backends"].items():
+            lat = sorted(b["lat_ms"])
+            _pct = lambda q: round(lat[min(len(lat)-1, int(q*len(lat)))], 1) if lat else 0.0
+            done = b["ok"] + b["errors"] + b["timeouts"]
+            out[name] = {"calls":b["calls"], "ok":b["ok"], "timeouts":b["timeouts"],
+                         "errors":b["errors"], "short_circuited":b["short_circuited"],
+                         "avg_ms":round(b["total_ms"]/done, 1) if done else 0.0,
+                         "p50_ms":_pct(.50), "p95_ms":_pct(.95), "max_ms":round(b["max_ms"],1),
+                         "breaker":"open" if b["open_until"] > _t_ss.monotonic() else "closed"}
+    return out
+
+# ─────────────────────────────────────────────────────────
+# 3b. SNAPSHOT LOCAL DEL WORKBOOK — lecturas locales, escrituras write-through
+# ─────────────────────────────────────────────────────────
+# Cada pestaña vive en memoria (compartida entre sesiones) con un hash y un
+# número de versión. Las lecturas salen de la copia local; las pestañas
+# vencidas se refrescan todas juntas en UN values_batch_get, y la versión solo
+# sube si el contenido cambió (así los cachés que dependen de ella no se
+# recalculan de gusto). hoja_append / hoja_update_* escriben en Sheets y
+# aplican el mismo cambio a la copia local.
+_SNAP_TTL = {"sheet1":30, "Oficial":300, "Desafios":120, "MesaChica":20,
+             "Noticias":60, "Comentarios":60, "Sessions":120, "Audit":60}
+_SNAP_TTL_DEFAULT = 60
+
+@st.cache_resource(show_spinner=False)
+def _snapshot_store():
+    import threading
+    return {"lock": threading.RLock(), "tabs": {}, "api_reads": 0, "hits": 0}
+
+def hoja_ws(name):
+    """Worksheet de gspread (None si no existe o no hay conexión)."""
+    try:
+        from core.database import conectar_google_sheets
+        return conectar_google_sheets(name)
+    except Exception:
+        return None
+
+def _snap_pad(values):
+    w = max((len(r) for r in values), default=0)
+    return [[str(c) for c in r] + [""]*(w-len(r)) for r in values]
+
+def _snap_fetch(names):
+    """Descarga varias pestañas con una sola llamada (fallback: una por pestaña)."""
+    got = {}
+    try:
+        from core.database import _GS_CACHE
+        ss = _GS_CACHE.get("ss")
+        if ss is None:
+            hoja_ws(names[0]); ss = _GS_CACHE.get("ss")
+        if ss is not None and hasattr(ss, "values_batch_get"):
+            resp = ss.values_batch_get([f"'{n}'" for n in names])
+            for n, vr in zip(names, resp.get("valueRanges", [])):
+                got[n] = _snap_pad(vr.get("values", []))
+    except Exception:
+        got = {}  # una pestaña inexistente tira abajo el batch entero
+    for n in names:
+        if n in got: continue
+        ws = hoja_ws(n)
+        if ws is not None:
+            try: got[n] = _snap_pad(ws.get_all_values())
+            except Exception: pass
+    return got
+
+def hoja_sync(names, force=False):
+    """Refresca las pestañas vencidas de `names`. Devuelve {pestaña: versión}."""
+    import time as _t_sn, hashlib as _hl_sn
+    store = _snapshot_store(); now = _t_sn.monotonic()
+    with store["lock"]:
+        stale = [n for n in names if force or n not in store["tabs"]
+                 or now - store["tabs"][n]["ts"] > _SNAP_TTL.get(n, _SNAP_TTL_DEFAULT)]
+        if not stale: store["hits"] += 1
+    if stale:
+        with perf_span("sheets", ",".join(stale)):
+            got = _safe_call(_snap_fetch, stale, timeout_sec=15, default={}, backend="db") or {}
+        with store["lock"]:
+            store["api_reads"] += 1
+            for n, values in got.items():
+                h = _hl_sn.blake2b(repr(values).encode("utf-8"), digest_size=16).hexdigest()
+                prev = store["tabs"].get(n)
+                if prev and prev["hash"] == h:
+                    prev["ts"] = now
+                else:
+                    store["tabs"][n] = {"values": values, "hash": h, "ts": now,
+                                        "version": (prev["version"] + 1) if prev else 1}
+    with store["lock"]:
+        return {n: store["tabs"][n]["version"] for n in names if n in store["tabs"]}
+
+def hoja_version(name):
+    """Versión del contenido local de una pestaña (0 = nunca se pudo leer)."""
+    return hoja_sync([name]).get(name, 0)
+
+def hoja_valores(name, max_age=None):
+    """Equivalente a ws.get_all_values() servido desde la copia local.
+
+    None si la pestaña no se pudo leer nunca. No mutar la lista devuelta."""
+    store = _snapshot_store()
+    if max_age is not None:
+        import time as _t_hv
+        ent = store["tabs"].get(name)
+        hoja_sync([name], force=(ent is None or _t_hv.monotonic() - ent["ts"] > max_age))
+    else:
+        hoja_sync([name])
+    ent = store["tabs"].get(name)
+    return ent["values"] if ent else None
+
+def _snap_num(v):
+    if v == "": return v
+    try: return int(v)
+    except ValueError: pass
+    try: return float(v)
+    except ValueError: return v
+
+def hoja_registros(name):
+    """Equivalente a ws.get_all_records() desde la copia local ([] si no hay datos)."""
+    vals = hoja_valores(name) or []
+    if len(vals) < 2: return []
+    hdr = vals[0]
+    return [{h: _snap_num(r[i]) if i < len(r) else "" for i, h in enumerate(hdr)} for r in vals[1:]]
+
+def _snap_apply(name, fn):
+    store = _snapshot_store()
+    with store["lock"]:
+        ent = store["tabs"].get(name)
+        if ent is None: return
+        try:
+            fn(ent["values"]); ent["version"] += 1; ent["hash"] = ""
+        except Exception:
+            store["tabs"].pop(name, None)  # copia inconsistente → releer la próxima vez
+
+def _snap_set(values, r, c, v):
+    while len(values) < r: values.append([""] * (len(values[0]) if values else 0))
+    row = values[r-1]
+    if len(row) < c: row.extend([""] * (c - len(row)))
+    row[c-1] = str(v)
+
+def hoja_append(name, row, ws=None, **kw):
+    """append_row write-through: Sheets + copia local."""
+    ws = ws or hoja_ws(name)
+    if ws is None: return False
+    ws.append_row(row, **kw)
+    _snap_apply(name, lambda vals: vals.append([str(c) for c in row]))
+    return True
+
+def hoja_append_rows(name, rows, ws=None, **kw):
+    """append_rows write-through (una sola llamada a la API para varias filas)."""
+    ws = ws or hoja_ws(name)
+    if ws is None: return False
+    ws.append_rows(rows, **kw)
+    _snap_apply(name, lambda vals: vals.extend([str(c) for c in r] for r in rows))
+    return True
+
+# Altas con id propio (Noticias, Comentarios, MesaChica): el siguiente id sale de un
+# contador por pestaña y proceso, sembrado con el máximo id de la hoja (una lectura
+# fresca la primera vez; después, el máximo se re-toma solo si la copia local trae
+# filas de otro proceso). Reservar y escribir pasa bajo el mismo lock, así dos
+# sesiones nunca sacan el mismo id, y la fila (con el encabezado si la pestaña está
+# vacía) va en UNA sola llamada a la API.
+@st.cache_resource(show_spinner=False)
+def _ids_store():
+    import threading
+    return {"lock": threading.RLock(), "tabs": {}, "altas": 0, "siembras": 0}
+
+def _ids_max(values):
+    """Mayor id numérico de la columna 'id' (0 si no hay filas)."""
+    if not values or len(values) < 2: return 0
+    hdr = [str(h).lower().strip() for h in values[0]]
+    i = hdr.index("id") if "id" in hdr else 0
+    top = 0
+    for r in values[1:]:
+        try: top = max(top, int(float(r[i])))
+        except (ValueError, IndexError): pass
+    return top
+
+def hoja_append_con_id(name, hdr, fila, ws=None, **kw):
+    """Agrega [id] + fila a `name` con un id nuevo y lo devuelve (None si no hay hoja).
+
+    `hdr` se escribe en la misma llamada si la pestaña está vacía. Si la lectura que siembra
+    el contador falla no se escribe nada (None): sin el máximo real se repetirían ids."""
+    import time as _t_ai
+    ws = ws or hoja_ws(name)
+    if ws is None: return None
+    store = _ids_store(); snap = _snapshot_store()
+    with store["lock"]:
+        ent = store["tabs"].setdefault(name, {"ultimo": 0, "version": None})
+        sembrar = ent["version"] is None; _t0 = _t_ai.monotonic()
+        vals = hoja_valores(name, max_age=0 if sembrar else None)
+        if vals is None: return None
+        if sembrar and snap["tabs"].get(name, {}).get("ts", 0) < _t0: return None   # quedó la copia vieja
+        ver = snap["tabs"].get(name, {}).get("version")
+        if ver != ent["version"]:
+            ent["ultimo"] = max(ent["ultimo"], _ids_max(vals)); store["siembras"] += 1
+        nid = ent["ultimo"] + 1
+        hoja_append_rows(name, ([list(hdr)] if not vals else []) + [[nid] + list(fila)], ws=ws, **kw)
+        ent["ultimo"] = nid; store["altas"] += 1
+        ent["version"] = snap["tabs"].get(name, {}).get("version")
+        return nid
+
+# Índice clave → número de fila por pestaña y columna, para updates puntuales sin
+# recorrer la hoja. Como las filas solo se agregan (los borrados son lógicos), el
+# índice crece por la cola a medida que la copia local suma filas (altas propias
+# incluidas). Cada acierto se confirma contra la copia local; si la clave no está o
+# no coincide, se relee la pestaña y se rearma el índice una vez.
+@st.cache_resource(show_spinner=False)
+def _filas_store():
+    import threading
+    return {"lock": threading.RLock(), "tabs": {}, "aciertos": 0, "reparaciones": 0}
+
+def _fila_clave(v):
+    return str(v).strip().lower()
+
+def _filas_col(values, col):
+    if isinstance(col, int): return col
+    hdr = [_fila_clave(h) for h in values[0]] if values else []
+    return hdr.index(_fila_clave(col)) if _fila_clave(col) in hdr else 0
+
+def hoja_fila(name, clave, col="id"):
+    """Fila de Sheets (1 = encabezado) donde `col` (nombre o índice) vale `clave`; None si no está.
+
+    Si hay repetidas gana la primera, como en el recorrido fila por fila."""
+    k = _fila_clave(clave)
+    store = _filas_store()
+    with store["lock"]:
+        for fresca in (False, True):
+            vals = hoja_valores(name, max_age=0 if fresca else None) or []
+            i = _filas_col(vals, col)
+            ent = store["tabs"].get((name, col))
+            if ent is None or ent["hasta"] > len(vals):
+                ent = store["tabs"][(name, col)] = {"filas": {}, "hasta": 1}
+            for n in range(ent["hasta"], len(vals)):
+                if i < len(vals[n]): ent["filas"].setdefault(_fila_clave(vals[n][i]), n + 1)
+            ent["hasta"] = len(vals)
+            fila = ent["filas"].get(k)
+            if fila and i < len(vals[fila-1]) and _fila_clave(vals[fila-1][i]) == k:
+                store["aciertos"] += 1
+                return fila
+            if fresca: return None
+            store["reparaciones"] += 1
+            store["tabs"].pop((name, col), None)
+
+def hoja_update_cell(name, r, c, value, ws=None):
+    ws = ws or hoja_ws(name)
+    if ws is None: return False
+    ws.update_cell(r, c, value)
+    _snap_apply(name, lambda vals: _snap_set(vals, r, c, value))
+    return True
+
+def hoja_update(name, a1, rows, ws=None):
+    """ws.update('C5:E5', [[...]]) write-through (la celda inicial manda)."""
+    import re as _re_hu
+    ws = ws or hoja_ws(name)
+    if ws is None: return False
+    ws.update(a1, rows)
+    m = _re_hu.match(r"([A-Za-z]+)(\d+)", a1)
+    if not m:
+        hoja_invalidar(name); return True
+    c0 = 0
+    for ch in m.group(1).upper(): c0 = c0*26 + (ord(ch) - 64)
+    r0 = int(m.group(2))
+    def _apply(vals):
+        for i, rr in enumerate(rows):
+            for j, v in enumerate(rr): _snap_set(vals, r0+i, c0+j, v)
+    _snap_apply(name, _apply)
+    return True
+
+def hoja_invalidar(name=None):
+    """Fuerza relectura de una pestaña (o de todas) en el próximo acceso."""
+    store = _snapshot_store()
+    with store["lock"]:
+        if name is None: store["tabs"].clear()
+        else: store["tabs"].pop(name, None)
+
+def hoja_stats():
+    store = _snapshot_store(); ids = _ids_store()
+    with store["lock"]:
+        return {"api_reads": store["api_reads"], "hits": store["hits"],
+                "altas": ids["altas"], "siembras": ids["siembras"],
+                "filas_aciertos": _filas_store()["aciertos"],
+                "filas_reparaciones": _filas_store()["reparaciones"],
+                "tabs": {n: {"filas": len(e["values"]), "version": e["version"]}
+                         for n, e in store["tabs"].items()}}
+
+# ─────────────────────────────────────────────────────────
+# 3c. PREDICCIONES EN BLOQUE — sheet1 se lee UNA vez para todos
+# ─────────────────────────────────────────────────────────
+_PRED_VACIA = (None, None, (None, None))
+
+def _gp_bare_key(g):
+    """'07. Gran Premio de Mónaco' / 'Mónaco' / 'GP Mónaco' / 'monaco' → 'mónaco'.
+
+    Los GPs del calendario salen de la tabla de identidades (sección 4e); el resto, recortado."""
+    info = gp_info(g)
+    if info: return info.clave
+    s = str(g or "").strip()
+    if ". " in s: s = s.split(". ",1)[-1]
+    s = s.replace("Gran Premio de ","").replace("Gran Premio del ","").replace("GP de ","").replace("GP ","")
+    return s.strip().lower()
+
+def _parse_sheet1(values):
+    """Filas crudas de sheet1 → {gp_key: {usuario_lower: (q, s, (r, c))}}.
+
+    Layout por etapa (a partir de la columna siguiente a 'etapa'):
+    QUALY P1..P5 + colapinto_q · SPRINT P1..P8 · CARRERA P1..P10 + colapinto_r + c1..c3.
+    Si un formulero reenvió una etapa, gana la última fila."""
+    out = {}
+    if not values or len(values) < 2: return out
+    hdr = [str(h).strip().lower() for h in values[0]]
+    def _fcol(names, dflt):
+        for nm in names:
+            if nm in hdr: return hdr.index(nm)
+        return dflt
+    ix_usr = _fcol(["usuario","user","nombre"], 1)
+    ix_gp  = _fcol(["gp","gran_premio","gran premio"], 2)
+    ix_et  = _fcol(["etapa","tipo"], 3)
+    ix_d   = ix_et + 1
+    def _sf(row, ix): return str(row[ix]).strip() if ix < len(row) else ""
+    _gk = {}
+    for row in values[1:]:
+        if len(row) <= ix_et: continue
+        usr = _sf(row, ix_usr).lower(); et = _sf(row, ix_et).upper()
+        if not usr or et not in ("QUALY","SPRINT","CARRERA"): continue
+        g = _sf(row, ix_gp)
+        if g not in _gk: _gk[g] = _gp_bare_key(g)
+        slot = out.setdefault(_gk[g], {}).setdefault(usr, [None, None, None, None])
+        if et == "QUALY":
+            d = {i: _sf(row, ix_d+i-1) for i in range(1,6)}
+            d["colapinto_q"] = _sf(row, ix_d+5)
+            slot[0] = d
+        elif et == "SPRINT":
+            slot[1] = {i: _sf(row, ix_d+i-1) for i in range(1,9)}
+        else:
+            d = {i: _sf(row, ix_d+i-1) for i in range(1,11)}
+            d["colapinto_r"] = _sf(row, ix_d+10)
+            slot[2] = d
+            slot[3] = {j: _sf(row, ix_d+10+j) for j in range(1,4)}
+    return {gk: {u: (s[0], s[1], (s[2], s[3])) for u, s in us.items()} for gk, us in out.items()}
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _predicciones_parseadas(version):
+    values = hoja_valores("sheet1")
+    if values is None: raise RuntimeError("sheet1 no disponible")
+    return _parse_sheet1(values)
+
+def _predicciones_sheet1():
+    """sheet1 completo parseado (todas las etapas de todos los GPs); se reparsea solo si cambió.
+
+    Falla → excepción (no se cachea)."""
+    return _predicciones_parseadas(hoja_version("sheet1"))
+
+def recuperar_predicciones_gp(gp, pilotos=None):
+    """{piloto: (q, s, (r, c))} de todos los formuleros de un GP con una sola lectura de sheet1.
+
+    Si la lectura en bloque falla, cae al camino viejo (una llamada por formulero)."""
+    pilotos = list(pilotos or PILOTOS_TORNEO)
+    try:
+        por_usr = _predicciones_sheet1().get(_gp_bare_key(gp), {})
+        return {p: por_usr.get(p.strip().lower(), _PRED_VACIA) for p in pilotos}
+    except Exception:
+        pass
+    m = _mod_db(); out = {}
+    for p in pilotos:
+        out[p] = (_safe_call(m["recuperar_predicciones_piloto"], p, gp, timeout_sec=8,
+                             default=_PRED_VACIA) if "_error" not in m else _PRED_VACIA)
+    return out
+
+# Oficial: la hoja se parsea UNA vez por contenido a {gp_key: oficial} y cada GP se
+# busca por su clave canónica (_gp_bare_key), sin recorrer filas ni comparar prefijos.
+# Lo que no está en la hoja puede pedirse a leer_resultados_oficiales (respaldo=True);
+# esa respuesta queda anotada hasta que la hoja cambie.
+@st.cache_resource(show_spinner=False)
+def _oficial_store():
+    import threading
+    return {"lock": threading.RLock(), "sello": None, "por_gp": {}, "respaldo": {},
+            "parseos": 0, "respaldos": 0}
+
+def _oficial_desde_registros(recs):
+    """Filas de la hoja Oficial (gp, etapa, pos, piloto) → {gp_key: {q1.., s1.., r1.., c1.., col_q, col_r}}."""
+    out = {}; _gk = {}
+    for r in recs or []:
+        g = r.get("gp", "")
+        if g not in _gk: _gk[g] = _gp_bare_key(g)
+        et = str(r.get("etapa", "")).strip().upper()
+        pos = r.get("pos", r.get("posicion", ""))
+        # el GP entra recién con una posición válida: uno sin ninguna no cuenta como
+        # "presente" y oficial_get_many(respaldo=True) lo sigue pidiendo al backend
+        if "COLAPINTO" in et:
+            if str(pos).strip(): out.setdefault(_gk[g], {})["col_q" if "Q" in et else "col_r"] = str(pos).strip()
+            continue
+        try: p = int(pos)
+        except (TypeError, ValueError): continue
+        if et in ETAPA_PFX: out.setdefault(_gk[g], {})[f"{ETAPA_PFX[et]}{p}"] = str(r.get("piloto", "")).strip()
+    return out
+
+def _oficial_indice():
+    hoja_sync(["Oficial"])
+    ent = _snapshot_store()["tabs"].get("Oficial")
+    sello = (ent["version"], ent["hash"], len(ent["values"])) if ent else None
+    store = _oficial_store()
+    with store["lock"]:
+        if store["sello"] != sello:
+            store["por_gp"] = _oficial_desde_registros(hoja_registros("Oficial")) if ent else {}
+            store.update(sello=sello, respaldo={}, parseos=store["parseos"] + 1)
+    return store
+
+def oficial_get_many(gps, respaldo=False):
+    """{gp: oficial} de varios GPs con una sola lectura de Oficial ({} si el GP no tiene resultados).
+
+    respaldo=True: los GPs que no están en la hoja se piden a leer_resultados_oficiales.
+    No mutar los dicts devueltos."""
+    store = _oficial_indice(); out = {}
+    with store["lock"]:
+        for g in gps:
+            k = _gp_bare_key(g)
+            if k in store["por_gp"]: out[g] = store["por_gp"][k]
+            elif k in store["respaldo"]: out[g] = store["respaldo"][k]   # {} cacheado también cuenta
+            else: out[g] = None
+    if respaldo and any(of is None for of in out.values()):
+        m = _mod_db()
+        for g in [g for g, of in out.items() if of is None and "_error" not in m]:
+            of = _safe_call(m["leer_resultados_oficiales"], g, timeout_sec=8, default=None)
+            if of is None: continue                 # timeout / error: se reintenta la próxima
+            with store["lock"]:
+                store["respaldo"][_gp_bare_key(g)] = of; store["respaldos"] += 1
+            out[g] = of
+    return {g: of or {} for g, of in out.items()}
+
+def oficial_get(gp, respaldo=False):
+    """Resultado oficial de un GP ({q1.., s1.., r1.., c1.., col_q, col_r}; {} si no hay)."""
+    return oficial_get_many([gp], respaldo=respaldo)[gp]
+
+def oficial_stats():
+    store = _oficial_store()
+    with store["lock"]:
+        return {"gps": len(store["por_gp"]), "parseos": store["parseos"],
+                "respaldos": store["respaldos"]}
+
+# ─────────────────────────────────────────────────────────
+# 3d. CACHÉS CON TAGS — invalidación por alcance, nunca global
+# ─────────────────────────────────────────────────────────
+# Cada función cacheada recibe un argumento `ver` = cache_version(tags...)
+# (sin guion bajo: Streamlit no hashea los parámetros que empiezan con "_").
+# invalidar("historial") sube el contador de ese tag y solo esas entradas
+# quedan viejas; lo que no cuelga de ese tag (CSS, imágenes, módulos _mod_*) no se toca.
+# Tags: "standings", "historial", "oficial", "desafios", "usuarios", "f1",
+# "predicciones" y "predicciones:<gp>" (invalidar el prefijo cubre todos los GPs).
+# La clave lleva además la liga del rerun (sección 4d): lo cacheado con `ver` queda
+# separado por liga; invalidar() sigue siendo por tag y alcanza a todas.
+_TAG_HOJAS = {"predicciones": ("sheet1",), "oficial": ("Oficial",),
+              "desafios": ("Desafios",)}
+
+@st.cache_resource(show_spinner=False)
+def _cache_tags():
+    import threading
+    return {"lock": threading.Lock(), "gen": {}}
+
+def _tags_gen(tags):
+    reg = _cache_tags()
+    with reg["lock"]:
+        return tuple(reg["gen"].get(k, 0) for t in tags
+                     for k in ((t.split(":",1)[0], t) if ":" in t else (t,)))
+
+def cache_version(*tags):
+    """Clave de versión para los tags dados (incluye el prefijo de 'tag:sub') en la liga del rerun."""
+    return _tags_gen(tags) + (LIGA["id"],)
+
+def invalidar(*tags):
+    """Descarta solo lo cacheado bajo esos tags (y la copia local de sus hojas)."""
+    reg = _cache_tags()
+    with reg["lock"]:
+        for t in tags: reg["gen"][t] = reg["gen"].get(t, 0) + 1
+    for t in tags:
+        for hoja in _TAG_HOJAS.get(t.split(":",1)[0], ()):
+            hoja_invalidar(hoja)
+
+# ─────────────────────────────────────────────────────────
+# 3e. RESUMEN DE TEMPORADA — agregados materializados para todas las pantallas
+# ─────────────────────────────────────────────────────────
+# Tabla, Historial, H2H, Perfil, Formuleros, Espectador y logros leen de acá en vez
+# de releer leer_historial_df y rehacer los mismos groupby. El resumen lleva como
+# sello cache_version("historial"): invalidar("historial") (al computar un GP) lo
+# vuelve viejo y la próxima lectura lo reconstruye recalculando solo los GPs cuyas
+# filas cambiaron. Hay un resumen por liga, armado solo con las filas de esa liga
+# (historial_liga: una lectura de Supabase compartida, partida por liga).
+_RESUMEN_TTL = 120
+
+@st.cache_resource(show_spinner=False)
+def _resumen_stores():
+    return {}
+
+def _resumen_store(liga):
+    """Store del resumen de una liga (uno por liga y por proceso)."""
+    reg = _resumen_stores()
+    if liga not in reg:
+        import threading
+        reg.setdefault(liga, {"lock": threading.RLock(), "ver": None, "ts": 0.0, "resumen": None,
+                              "por_gp": {}, "rebuilds": 0, "gps_recalc": 0})
+    return reg[liga]
+
+@st.cache_resource(show_spinner=False)
+def _historial_store():
+    import threading
+    return {"lock": threading.RLock(), "ver": None, "ts": 0.0, "ligas": None, "leyendo": False, "lecturas": 0}
+
+def _por_liga(df):
+    """historial / detalle crudo → {liga: filas}. Columna `liga` si el backend la trae; si no, por plantel
+    (la liga por defecto se queda con todo lo que no sea exclusivo de otra liga).
+
+    Ojo con el reparto por plantel: un nombre que juega en dos ligas se identifica solo por el
+    nombre, así que sus filas de ambas ligas aparecen juntas en cada una."""
+    if df is None or getattr(df, "empty", True): return {}
+    cols = {str(c).lower().strip(): c for c in df.columns}
+    if "liga" in cols:
+        clave = df[cols["liga"]].astype(str).str.strip().str.lower().replace("", LIGA_DEFAULT)
+        return {l: f for l, f in df.groupby(clave, sort=False)}
+    otras = {lid: {p.lower() for p in l["pilotos"]} for lid, l in LIGAS.items() if lid != LIGA_DEFAULT}
+    if not otras or "piloto" not in cols: return {LIGA_DEFAULT: df}
+    pil = df[cols["piloto"]].astype(str).str.strip().str.lower()
+    out = {lid: df[pil.isin(s)] for lid, s in otras.items()}
+    ajenos = set().union(*otras.values()) - {p.lower() for p in LIGAS[LIGA_DEFAULT]["pilotos"]}
+    out[LIGA_DEFAULT] = df[~pil.isin(ajenos)]
+    return out
+
+def historial_liga():
+    """(historial, detalle) crudos de la liga del rerun; (None, None) si el backend nunca respondió.
+
+    Supabase se lee una vez para todas las ligas y se parte una vez por versión. Las lecturas
+    van fuera del lock y de a una por proceso (mientras tanto se sirve lo anterior); si solo
+    falla el detalle se conserva el último bueno."""
+    import time as _t_hl
+    ver = _tags_gen(("historial",))
+    store = _historial_store()
+    with store["lock"]:
+        vigente = (store["ligas"] is not None and store["ver"] == ver
+                   and _t_hl.time() - store["ts"] < _RESUMEN_TTL)
+        if vigente or (store["ligas"] is not None and store["leyendo"]):
+            return store["ligas"].get(LIGA["id"], (None, None))
+        store["leyendo"] = True
+    try:
+        m = _mod_db()
+        raw = det_raw = None
+        if "_error" not in m:
+            raw     = _safe_call(m["leer_historial_df"], timeout_sec=15, default=None)
+            det_raw = _safe_call(m["leer_historial_detalle_df"], timeout_sec=15, default=None)
+        h, d = _por_liga(raw), _por_liga(det_raw)
+        with store["lock"]:
+            prev = store["ligas"]
+            if raw is not None or prev is None:     # backend caído: seguir con lo último bueno
+                store["ligas"] = {lid: (None if raw is None else h.get(lid, raw.iloc[0:0]),
+                                        (d.get(lid, det_raw.iloc[0:0]) if det_raw is not None
+                                         else (prev or {}).get(lid, (None, None))[1]))
+                                  for lid in LIGAS}
+                store["lecturas"] += 1
+            store.update(ver=ver, ts=_t_hl.time())
+            return store["ligas"].get(LIGA["id"], (None, None))
+    finally:
+        with store["lock"]: store["leyendo"] = False
+
+def _rs_limpio(df, cols):
+    """historial / detalle crudo → solo `cols`, en minúscula y con tipos limpios."""
+    if df is None or getattr(df, "empty", True): return pd.DataFrame(columns=cols)
+    d = df.copy(); d.columns = [str(c).lower().strip() for c in d.columns]
+    if not set(cols).issubset(d.columns): return pd.DataFrame(columns=cols)
+    d = d[cols].copy()
+    for c in cols:
+        d[c] = (pd.to_numeric(d[c], errors="coerce").fillna(0).astype(int) if c == "puntos"
+                else d[c].astype(str).str.strip())
+    if "etapa" in d.columns: d["etapa"] = d["etapa"].str.upper()
+    return d
+
+def _rs_gp(h_g, d_g):
+    """Agregados de UN GP: puntos por piloto, ganador y sanciones DNS."""
+    pts = h_g.groupby("piloto", sort=False)["puntos"].sum()
+    top = pts.sort_values(ascending=False, kind="stable")
+    ganador = str(top.index[0]) if len(top) >= 2 and top.iloc[0] > 0 else ""
+    return {"filas": pts.rename("puntos").reset_index(),
+            "valido": bool((pts != 0).any()),
+            "ganador": ganador,
+            "dns": d_g[d_g["etapa"] == "DNS"]["piloto"].value_counts().to_dict()}
+
+@perfilar("calc")
+def resumen_temporada():
+    """Resumen materializado de la temporada (ver docstring de la sección).
+
+    Claves: raw, hist (gp, piloto, puntos por GP válido, en orden de calendario), det,
+    gps, pivot (gp × piloto), acum, totales, ganados, ganadores, dns_det, n_gps, ver."""
+    import time as _t_rs
+    ver = cache_version("historial")
+    store = _resumen_store(LIGA["id"])
+    with store["lock"]:
+        if (store["resumen"] is not None and store["ver"] == ver
+                and _t_rs.time() - store["ts"] < _RESUMEN_TTL):
+            return store["resumen"]
+        prev_por = store["por_gp"]
+    # Lectura y agregados fuera del lock: una sesión esperando a Supabase no frena a
+    # las que ya pueden servirse del resumen en memoria. El lock solo cubre el swap.
+    t0 = _t_rs.time()
+    raw, det_raw = historial_liga()
+    if raw is None:
+        with store["lock"]:
+            if store["resumen"] is not None:
+                store["ts"] = _t_rs.time()      # backend caído: seguir con lo último bueno
+                return store["resumen"]
+    hist = _rs_limpio(raw, ["gp", "piloto", "puntos"])
+    det  = _rs_limpio(det_raw, ["gp", "piloto", "etapa", "puntos"])
+
+    # Incremental: cada GP se re-agrega solo si cambió su firma
+    por_gp = {}; recalc = 0
+    det_por = {g: d for g, d in det.groupby("gp", sort=False)}
+    _vacio = det.iloc[0:0]
+    for g, h_g in hist.groupby("gp", sort=False):
+        d_g = det_por.get(g, _vacio)
+        firma = (int(pd.util.hash_pandas_object(h_g, index=False).sum()),
+                 int(pd.util.hash_pandas_object(d_g, index=False).sum()))
+        prev = prev_por.get(g)
+        if prev is not None and prev["firma"] == firma:
+            por_gp[g] = prev; continue
+        por_gp[g] = dict(_rs_gp(h_g, d_g), firma=firma); recalc += 1
+
+    _ord = {g: i for i, g in enumerate(GPS_OFICIALES)}
+    gps = sorted((g for g, a in por_gp.items() if a["valido"]), key=lambda g: (_ord.get(g, 99), g))
+    if not gps: gps = sorted(por_gp, key=lambda g: (_ord.get(g, 99), g))
+    hist_v = (pd.concat([por_gp[g]["filas"].assign(gp=g) for g in gps], ignore_index=True)[["gp", "piloto", "puntos"]]
+              if gps else pd.DataFrame(columns=["gp", "piloto", "puntos"]))
+    pivot = (hist_v.pivot_table(index="gp", columns="piloto", values="puntos", fill_value=0, aggfunc="sum")
+             .reindex([g for g in gps if g in _ord]) if not hist_v.empty else pd.DataFrame())
+    ganadores = {g: por_gp[g]["ganador"] for g in gps if por_gp[g]["ganador"]}
+    ganados = {p: 0 for p in PILOTOS_TORNEO}
+    for w in ganadores.values(): ganados[w] = ganados.get(w, 0) + 1
+    dns_det = {}
+    for g in por_gp:
+        for p, n in por_gp[g]["dns"].items(): dns_det[p] = dns_det.get(p, 0) + n
+
+    resumen = {"ver": ver, "raw": raw if raw is not None else pd.DataFrame(),
+               "hist": hist_v, "det": det, "gps": gps, "n_gps": len(gps),
+               "pivot": pivot, "acum": pivot.cumsum(),
+               "totales": hist_v.groupby("piloto")["puntos"].sum().to_dict() if not hist_v.empty else {},
+               "ganados": ganados, "ganadores": ganadores, "dns_det": dns_det}
+    with store["lock"]:
+        if store["resumen"] is not None and store["ver"] == ver and store["ts"] >= t0:
+            return store["resumen"]             # otra sesión terminó antes con lo mismo
+        store.update(ver=ver, ts=_t_rs.time(), resumen=resumen, por_gp=por_gp,
+                     rebuilds=store["rebuilds"] + 1, gps_recalc=store["gps_recalc"] + recalc)
+    return resumen
+
+def resumen_stats():
+    """Contadores del resumen materializado (para el Log del admin)."""
+    st_ = _resumen_store(LIGA["id"])
+    with st_["lock"]:
+        return {"version": str(st_["ver"]), "rebuilds": st_["rebuilds"],
+                "gps_recalculados": st_["gps_recalc"], "gps_en_memoria": len(st_["por_gp"])}
+
+# ─────────────────────────────────────────────────────────
+# 3f. DESAFÍOS — repositorio indexado
+# ─────────────────────────────────────────────────────────
+# La pestaña Desafios se parsea una vez por versión (snapshot local + tag
+# "desafios") a registros tipados, con índices por participante, por pareja y
+# por (gp, estado); las estadísticas de cada formulero se arman en la misma
+# pasada. Perfil, logros y H2H consultan índices en vez de recorrer la hoja.
+_DES_COLS = ("id", "retador", "rival", "gp", "estado", "pts_retador", "pts_rival",
+             "ganador", "ts_creado", "ts_resuelto")
+
+@st.cache_resource(show_spinner=False)
+def _desafios_store():
+    import threading
+    return {"lock": threading.RLock(), "ver": None, "idx": None, "builds": 0}
+
+def _des_parse(vals):
+    """Valores crudos de la hoja → lista de dicts tipados (estado en mayúscula, pts int)."""
+    if not vals or len(vals) < 2: return []
+    hdr = [h.strip().lower() for h in vals[0]]
+    pos = {c: hdr.index(c) if c in hdr else None for c in _DES_COLS}
+    if pos["retador"] is None or pos["rival"] is None: return []
+    out = []
+    for r in vals[1:]:
+        if not any(str(c).strip() for c in r): continue
+        d = {c: (str(r[i]).strip() if i is not None and i < len(r) else "") for c, i in pos.items()}
+        d["estado"] = d["estado"].upper()
+        for c in ("pts_retador", "pts_rival"):
+            try: d[c] = int(float(d[c])) if d[c] else 0
+            except ValueError: d[c] = 0
+        out.append(d)
+    return out
+
+def _des_indexar(recs):
+    por_pil = defaultdict(list); por_par = defaultdict(list); por_gp = defaultdict(list)
+    stats = defaultdict(lambda: {"wins": 0, "played": 0, "rejected": 0, "losses": 0, "_res": []})
+    for d in recs:
+        ret, riv, gan = d["retador"], d["rival"], d["ganador"]
+        por_pil[ret].append(d)
+        if riv != ret: por_pil[riv].append(d)
+        por_par[frozenset((ret, riv))].append(d)
+        por_gp[d["gp"], d["estado"]].append(d)
+        if d["estado"] == "RESUELTO":
+            empate = gan in ("EMPATE", "")
+            for u in {ret, riv}:
+                s = stats[u]; s["played"] += 1
+                if gan == u: s["wins"] += 1
+                elif not empate: s["losses"] += 1
+                if not empate: s["_res"].append((d["ts_resuelto"] or d["ts_creado"], gan == u))
+        elif d["estado"] == "RECHAZADO":
+            stats[riv]["rejected"] += 1
+    for s in stats.values():
+        best = cur = 0
+        for _, gano in sorted(s.pop("_res"), key=lambda x: x[0]):
+            cur = cur + 1 if gano else 0; best = max(best, cur)
+        s["streak"] = best
+    return {"recs": recs, "pil": dict(por_pil), "par": dict(por_par), "gp": dict(por_gp),
+            "stats": dict(stats)}
+
+def _des_idx():
+    ver = (_tags_gen(("desafios",)), hoja_version("Desafios"))
+    store = _desafios_store()
+    with store["lock"]:
+        if store["idx"] is None or store["ver"] != ver:
+            store.update(idx=_des_indexar(_des_parse(hoja_valores("Desafios"))), ver=ver,
+                         builds=store["builds"] + 1)
+        return store["idx"]
+
+def _des_filtro(recs, estado):
+    return list(recs) if estado is None else [d for d in recs if d["estado"] == estado]
+
+def desafios_de(usuario, estado=None):
+    """Desafíos donde participa `usuario` (como retador o rival)."""
+    return _des_filtro(_des_idx()["pil"].get(str(usuario).strip(), ()), estado)
+
+def desafios_entre(a, b, estado=None):
+    """Desafíos entre dos formuleros, en cualquier sentido."""
+    return _des_filtro(_des_idx()["par"].get(frozenset((str(a).strip(), str(b).strip())), ()), estado)
+
+def desafios_por_gp(gp, estado=None):
+    """Desafíos de un GP (opcionalmente de un solo estado)."""
+    idx = _des_idx()["gp"]
+    if estado is not None: return list(idx.get((gp, estado), ()))
+    return [d for (g, _), ds in idx.items() if g == gp for d in ds]
+
+def desafio_stats(usuario):
+    """(victorias, jugados, rechazados, derrotas, mejor racha de victorias)."""
+    s = _des_idx()["stats"].get(str(usuario).strip())
+    if not s: return 0, 0, 0, 0, 0
+    return s["wins"], s["played"], s["rejected"], s["losses"], s["streak"]
+
+# ─────────────────────────────────────────────────────────
+# 3g. OUTBOX — notificaciones en segundo plano
+# ─────────────────────────────────────────────────────────
+# Emails y mensajes de Telegram no se mandan dentro del rerun: se encolan en
+# outbox.db (SQLite, WAL) y un hilo de fondo los despacha por tandas con UNA
+# sesión SMTP por tanda, reintentos con backoff y clave de idempotencia
+# (la misma clave nunca se encola dos veces). Sin clave cada encolado es un envío
+# nuevo; los envíos masivos del admin pasan outbox_clave(...) y el scheduler la
+# suya, así un doble click no duplica. El worker arranca desde main(). Para probar contra un SMTP local
+# (p. ej. `python -m aiosmtpd -n -l localhost:1025`) alcanza con definir en
+# secrets SMTP_HOST="localhost", SMTP_PORT=1025, SMTP_SSL=false.
+_OUTBOX_DB       = "outbox.db"
+_OUTBOX_TANDA    = 50
+_OUTBOX_MAX_INT  = 6
+_OUTBOX_ESPERA   = 5.0     # seg entre pasadas si nadie despierta al worker
+
+def _outbox_config():
+    """Credenciales y transporte (se copia desde el hilo de la app: el worker no lee secrets)."""
+    def _s(k, d=""):
+        try: return st.secrets.get(k, d)
+        except Exception: return d
+    _port = _s("SMTP_PORT", 0)
+    return {"gm_u": str(_s("GMAIL_USER")), "gm_p": str(_s("GMAIL_APP_PASSWORD")),
+            "smtp_host": str(_s("SMTP_HOST", "smtp.gmail.com")),
+            "smtp_port": int(_port) if str(_port).isdigit() else 0,
+            "smtp_ssl": str(_s("SMTP_SSL", "true")).lower() not in ("0", "false", "no"),
+            "sg_key": str(_s("SENDGRID_API_KEY")), "sg_from": str(_s("SENDGRID_FROM")),
+            "tg_token": str(_s("TELEGRAM_BOT_TOKEN")), "tg_chat": str(_s("TELEGRAM_CHAT_ID"))}
+
+@st.cache_resource(show_spinner=False)
+def _outbox_store():
+    import threading
+    c = sqlite3.connect(_OUTBOX_DB, check_same_thread=False, timeout=10)
+    c.execute("PRAGMA journal_mode=WAL")
+    c.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+              "clave TEXT NOT NULL UNIQUE, canal TEXT NOT NULL, dest TEXT, asunto TEXT, "
+              "texto TEXT, html TEXT, estado TEXT NOT NULL DEFAULT 'pendiente', "
+              "intentos INTEGER NOT NULL DEFAULT 0, proximo REAL NOT NULL DEFAULT 0, "
+              "error TEXT, creado TEXT, enviado TEXT)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_outbox_cola ON outbox (estado, proximo)")
+    c.commit()
+    return {"lock": threading.RLock(), "db": c, "cfg": {}, "despertar": threading.Event(),
+            "hilo": None, "tandas": 0, "sesiones_smtp": 0}
+
+def outbox_clave(*partes):
+    """Clave de idempotencia a partir de lo que identifica un envío (tipo, GP, destino, cuerpo…)."""
+    return hashlib.sha1("\x1f".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+
+def _outbox_encolar(canal, dest, asunto, texto, html=None, clave=None):
+    """Inserta en la cola. False si la clave ya estaba (idempotencia) o falló la escritura."""
+    if not clave:
+        import uuid as _uuid_ob
+        clave = f"u::{_uuid_ob.uuid4().hex}"
+    store = _outbox_store()
+    try:
+        with store["lock"]:
+            store["cfg"] = _outbox_config()
+            cur = store["db"].execute(
+                "INSERT OR IGNORE INTO outbox (clave,canal,dest,asunto,texto,html,creado) VALUES (?,?,?,?,?,?,?)",
+                (clave, canal, str(dest), str(asunto), str(texto), html,
+                 datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")))
+            store["db"].commit()
+        _outbox_worker()
+        store["despertar"].set()
+        return cur.rowcount == 1
+    except Exception as _oe:
+        print(f"Outbox error: {_oe}"); return False
+
+def encolar_email(dest, asunto, texto, html=None, clave=None):
+    """Email asíncrono (texto plano y/o HTML). Con `clave` (ver outbox_clave) no se reenvía; sin ella, siempre."""
+    if not dest: return False
+    return _outbox_encolar("email", dest, asunto, texto, html=html, clave=clave)
+
+def encolar_telegram(mensaje, clave=None):
+    """Mensaje asíncrono al grupo de Telegram."""
+    return _outbox_encolar("telegram", "", "", mensaje, clave=clave)
+
+def _outbox_mime(cfg, fila):
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    _, _, dest, asunto, texto, html = fila
+    if html and texto:
+        msg = MIMEMultipart("alternative")
+        msg.attach(MIMEText(texto, "plain", "utf-8")); msg.attach(MIMEText(html, "html", "utf-8"))
+    elif html:
+        msg = MIMEMultipart(); msg.attach(MIMEText(html, "html", "utf-8"))
+    else:
+        msg = MIMEText(texto or "", "plain", "utf-8")
+    msg["Subject"] = asunto; msg["From"] = f"Torneo Fefe Wolf <{cfg['gm_u']}>"; msg["To"] = dest
+    return msg
+
+def _smtp_abrir(cfg):
+    """Una sesión SMTP para toda la tanda: SSL 465 y fallback STARTTLS 587 (o el host/puerto de secrets)."""
+    import smtplib
+    intentos = ([(cfg["smtp_port"], cfg["smtp_ssl"])] if cfg["smtp_port"]
+                else [(465, True), (587, False)])
+    err = None
+    for port, ssl in intentos:
+        try:
+            if ssl: sv = smtplib.SMTP_SSL(cfg["smtp_host"], port, timeout=15)
+            else:
+                sv = smtplib.SMTP(cfg["smtp_host"], port, timeout=15); sv.ehlo()
+                if sv.has_extn("starttls"): sv.starttls(); sv.ehlo()
+            if cfg["gm_p"]: sv.login(cfg["gm_u"], cfg["gm_p"])
+            return sv
+        except Exception as e: err = e
+    raise err or RuntimeError("SMTP no disponible")
+
+def _sendgrid_post(cfg, fila):
+    _, _, dest, asunto, texto, html = fila
+    r = requests.post("https://api.sendgrid.com/v3/mail/send", timeout=8,
+                      json={"personalizations": [{"to": [{"email": dest}]}],
+                            "from": {"email": cfg["sg_from"], "name": "Torneo Fefe Wolf"},
+                            "subject": asunto,
+                            "content": [{"type": "text/html", "value": html} if html
+                                        else {"type": "text/plain", "value": texto}]},
+                      headers={"Authorization": f"Bearer {cfg['sg_key']}", "Content-Type": "application/json"})
+    if r.status_code >= 300: raise RuntimeError(f"SendGrid {r.status_code}")
+
+def _telegram_post(cfg, fila):
+    import urllib.request as _ur, json as _js
+    if not cfg["tg_token"] or not cfg["tg_chat"]: raise RuntimeError("Telegram sin configurar")
+    payload = _js.dumps({"chat_id": cfg["tg_chat"], "text": fila[4], "parse_mode": "Markdown"}).encode()
+    _ur.urlopen(_ur.Request(f"https://api.telegram.org/bot{cfg['tg_token']}/sendMessage",
+                            data=payload, headers={"Content-Type": "application/json"}), timeout=8)
+
+def outbox_procesar(cfg=None, smtp_abrir=None, ahora=None):
+    """Despacha UNA tanda de lo vencido. Devuelve {enviados, reintentos, fallidos}.
+
+    La usa el worker; también sirve para probar a mano (cfg / smtp_abrir inyectables)."""
+    import time as _t_ob
+    store = _outbox_store(); db = store["db"]
+    ahora = _t_ob.time() if ahora is None else ahora
+    with store["lock"]:
+        cfg = cfg or store["cfg"] or _outbox_config()
+        filas = db.execute("SELECT id,canal,dest,asunto,texto,html FROM outbox "
+                           "WHERE estado='pendiente' AND proximo<=? ORDER BY id LIMIT ?",
+                           (ahora, _OUTBOX_TANDA)).fetchall()
+    res = {"enviados": 0, "reintentos": 0, "fallidos": 0}
+    if not filas: return res
+    ok, mal = [], []
+
+    emails = [f for f in filas if f[1] == "email"]
+    if emails and cfg["gm_u"]:
+        sv = None
+        try:
+            sv = (smtp_abrir or _smtp_abrir)(cfg); store["sesiones_smtp"] += 1
+            for f in emails:
+                try:
+                    sv.sendmail(cfg["gm_u"], [f[2]], _outbox_mime(cfg, f).as_string()); ok.append(f[0])
+                except Exception as e: mal.append((f[0], str(e)))
+        except Exception as e:
+            hechos = set(ok) | {i for i, _ in mal}
+            mal += [(f[0], f"SMTP: {e}") for f in emails if f[0] not in hechos]
+        finally:
+            try: sv is not None and sv.quit()
+            except Exception: pass
+    elif emails:
+        for f in emails:
+            try:
+                if not (cfg["sg_key"] and cfg["sg_from"]): raise RuntimeError("Sin transporte de email")
+                _sendgrid_post(cfg, f); ok.append(f[0])
+            except Exception as e: mal.append((f[0], str(e)))
+    for f in filas:
+        if f[1] != "telegram": continue
+        try: _telegram_post(cfg, f); ok.append(f[0])
+        except Exception as e: mal.append((f[0], str(e)))
+
+    _ts = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
+    with store["lock"]:
+        db.executemany("UPDATE outbox SET estado='enviado', enviado=?, error=NULL, intentos=intentos+1 "
+                       "WHERE id=?", [(_ts, i) for i in ok])
+        for i, err in mal:
+            n = (db.execute("SELECT intentos FROM outbox WHERE id=?", (i,)).fetchone() or (0,))[0] + 1
+            if n >= _OUTBOX_MAX_INT:
+                db.execute("UPDATE outbox SET estado='fallido', intentos=?, error=? WHERE id=?", (n, err[:300], i))
+                res["fallidos"] += 1
+            else:
+                db.execute("UPDATE outbox SET intentos=?, proximo=?, error=? WHERE id=?",
+                           (n, ahora + min(30 * 2 ** n, 3600), err[:300], i))
+                res["reintentos"] += 1
+        db.commit(); store["tandas"] += 1
+    res["enviados"] = len(ok)
+    return res
 
-def _safe_call(fn, *a, timeout_sec=8, default=None, **kw):
-    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-        fut = ex.submit(fn, *a, **kw)
-        try:    return fut.result(timeout=timeout_sec)
-        except: return default
+@st.cache_resource(show_spinner=False)
+def _outbox_worker():
+    """Hilo de fondo (uno por proceso) que vacía la cola."""
+    import threading
+    store = _outbox_store()
+    def _loop():
+        while True:
+            store["despertar"].wait(_OUTBOX_ESPERA); store["despertar"].clear()
+            try:
+                while outbox_procesar()["enviados"] >= _OUTBOX_TANDA: pass
+            except Exception as e: print(f"Outbox worker: {e}")
+    th = threading.Thread(target=_loop, name="outbox", daemon=True); th.start()
+    store["hilo"] = th
+    return th
+
+def outbox_estado(claves=None, limite=30):
+    """Estado de entrega: por clave si se pasan, si no los últimos `limite` envíos."""
+    store = _outbox_store()
+    q = "SELECT clave,canal,dest,asunto,estado,intentos,error,creado,enviado FROM outbox"
+    with store["lock"]:
+        if claves:
+            claves = list(claves)
+            rows = store["db"].execute(f"{q} WHERE clave IN ({','.join('?'*len(claves))})", claves).fetchall()
+        else:
+            rows = store["db"].execute(f"{q} ORDER BY id DESC LIMIT ?", (limite,)).fetchall()
+    cols = ("clave", "canal", "dest", "asunto", "estado", "intentos", "error", "creado", "enviado")
+    return [dict(zip(cols, r)) for r in rows]
+
+def outbox_stats():
+    """Conteo por estado + tandas y sesiones SMTP abiertas (para el Log del admin)."""
+    store = _outbox_store()
+    with store["lock"]:
+        por = dict(store["db"].execute("SELECT estado, COUNT(*) FROM outbox GROUP BY estado").fetchall())
+        vivo = bool(store["hilo"] and store["hilo"].is_alive())
+        return {"pendiente": por.get("pendiente", 0), "enviado": por.get("enviado", 0),
+                "fallido": por.get("fallido", 0), "tandas": store["tandas"],
+                "sesiones_smtp": store["sesiones_smtp"], "worker": vivo}
+
+# ─────────────────────────────────────────────────────────
+# 3h. MESA DE FORMULEROS — feed indexado por id, lectura por cursor
+# ─────────────────────────────────────────────────────────
+# Los mensajes viven en un índice por proceso (ids ordenados + fila por id). Se llena
+# UNA vez (mc_list_messages; si SQLite está vacío, la pestaña MesaChica) y después solo
+# se trae la cabeza: mc_list_messages(limit=_MC_CABEZA) cada _MC_TTL segundos, y en el
+# acto después de publicar. La vista lee por cursor: mc_feed(since_id=) para lo nuevo y
+# mc_feed(before_id=) para "ver más"; el badge de no leídos usa mc_max_id().
+_MC_TTL = 10
+_MC_CABEZA = 20
+
+@st.cache_resource(show_spinner=False)
+def _mc_feed_store():
+    import threading
+    return {"lock": threading.RLock(), "ids": [], "filas": {}, "origen": None, "ts": 0.0,
+            "sincronizando": False, "cargas": 0, "syncs": 0}
+
+def _mc_filas_hoja():
+    """Mensajes vigentes de la pestaña MesaChica como (id, usuario, texto, ts)."""
+    vals = hoja_valores("MesaChica")
+    if not vals or len(vals) < 2: return []
+    hdr = [h.lower().strip() for h in vals[0]]
+    def _ix(name, default): return hdr.index(name) if name in hdr else default
+    i_id, i_usr, i_txt, i_ts, i_del = _ix("id", 0), _ix("usuario", 1), _ix("texto", 2), _ix("ts", 3), _ix("deleted", 4)
+    out = []
+    for r in vals[1:]:
+        def _c(i): return str(r[i]) if i < len(r) else ""
+        if _c(i_del) in ("1", "True", "true") or not _c(i_txt).strip(): continue
+        try: out.append((int(_c(i_id)), _c(i_usr), _c(i_txt), _c(i_ts)))
+        except ValueError: continue
+    return out
+
+def _mc_feed_merge(store, filas):
+    import bisect
+    for f in filas:
+        mid = int(f[0])
+        if mid not in store["filas"]: bisect.insort(store["ids"], mid)
+        store["filas"][mid] = tuple(f)
+
+def mc_feed_sync(forzar=False):
+    """Pone el índice al día: carga completa la primera vez, después solo la cabeza.
+
+    Las lecturas (SQLite con timeout, la hoja de respaldo) van fuera del lock y de a una
+    por proceso: mientras una sesión sincroniza, las demás leen el índice que hay. El lock
+    solo cubre el merge. forzar=True (después de publicar) no espera su turno."""
+    import time as _t_mf
+    store = _mc_feed_store()
+    with store["lock"]:
+        if store["origen"] and not forzar and (store["sincronizando"]
+                                               or _t_mf.monotonic() - store["ts"] < _MC_TTL):
+            return store
+        store["sincronizando"] = True
+        origen = store["origen"]
+    try:
+        m = _mod_mesa()
+        if "_error" in m: return store
+        if origen:
+            cabeza = _safe_call(m["mc_list_messages"], limit=_MC_CABEZA, timeout_sec=5, default=None)
+            if cabeza is not None:
+                with store["lock"]:
+                    store["syncs"] += 1
+                    ult = store["ids"][-1] if store["ids"] else 0
+                    nuevos = [f for f in cabeza if int(f[0]) > ult]
+                    if store["origen"] == "hoja" and cabeza:
+                        store["origen"] = None          # SQLite volvió a tener mensajes: manda SQLite
+                    elif len(nuevos) == len(cabeza) == _MC_CABEZA and store["ids"]:
+                        store["origen"] = None          # llegaron más que la cabeza: recargar entero
+                    else:
+                        _mc_feed_merge(store, nuevos)
+                        if store["origen"] == "sqlite" and cabeza:
+                            # lo que falta dentro del rango de la cabeza fue borrado (en otro proceso)
+                            en_cabeza = {int(f[0]) for f in cabeza}
+                            for mid in [i for i in store["ids"] if i >= min(en_cabeza) and i not in en_cabeza]:
+                                mc_feed_quitar(mid)
+                    origen = store["origen"]
+        if not origen:
+            filas = _safe_call(m["mc_list_messages"], limit=999, timeout_sec=8, default=None)
+            if filas is None: return store          # backend caído: seguir con lo que hay
+            origen = "sqlite" if filas else "hoja"
+            if not filas: filas = _mc_filas_hoja()
+            with store["lock"]:
+                store.update(ids=[], filas={}, origen=origen, cargas=store["cargas"] + 1)
+                _mc_feed_merge(store, filas)
+        with store["lock"]: store["ts"] = _t_mf.monotonic()
+        return store
+    finally:
+        with store["lock"]: store["sincronizando"] = False
+
+def mc_feed(since_id=None, before_id=None, limit=40):
+    """Mensajes (id, usuario, texto, ts, …), el más nuevo primero.
+
+    since_id: solo los de id mayor; before_id: solo los de id menor (página anterior).
+    limit=None trae todos los del rango; si no, los `limit` más nuevos del rango."""
+    import bisect
+    store = mc_feed_sync()
+    with store["lock"]:
+        ids = store["ids"]
+        hi = bisect.bisect_left(ids, before_id) if before_id is not None else len(ids)
+        lo = bisect.bisect_right(ids, since_id) if since_id is not None else 0
+        if limit is not None: lo = max(lo, hi - limit)
+        return [store["filas"][i] for i in reversed(ids[lo:hi])]
+
+def mc_feed_vigentes(filas):
+    """Las filas que siguen en el índice (descarta borradas), con su contenido al día."""
+    store = _mc_feed_store()
+    with store["lock"]:
+        return [store["filas"][f[0]] for f in filas if f[0] in store["filas"]]
+
+def mc_max_id():
+    """Id del último mensaje (0 si no hay)."""
+    store = mc_feed_sync()
+    with store["lock"]:
+        return store["ids"][-1] if store["ids"] else 0
+
+def mc_feed_quitar(mid):
+    """Saca un mensaje borrado del índice."""
+    import bisect
+    store = _mc_feed_store()
+    with store["lock"]:
+        if store["filas"].pop(int(mid), None) is not None:
+            i = bisect.bisect_left(store["ids"], int(mid))
+            if i < len(store["ids"]) and store["ids"][i] == int(mid): store["ids"].pop(i)
+
+def mc_feed_stats():
+    """Tamaño del índice, origen, cargas completas y syncs de cabeza (para el Log del admin)."""
+    store = _mc_feed_store()
+    with store["lock"]:
+        return {"mensajes": len(store["ids"]), "origen": store["origen"] or "—",
+                "cargas": store["cargas"], "syncs": store["syncs"]}
 
 # ─────────────────────────────────────────────────────────
 # 4. CONSTANTES
@@ -744,7 +2187,7 @@ DNS_BASE_HISTORICO = {
 DNS_GP_DESDE = "11. Gran Premio de Gran Bretaña"
 
 @st.cache_data(ttl=60, show_spinner=False)
-def _dns_counts_todos():
+def _dns_counts_todos(ver=None):
     """Cuenta sanciones DNS por piloto leyendo la columna DNS real de Supabase
     (tabla posiciones). Si esa columna todavía no existe (falta migración SQL),
     usa la base histórica manual como fallback."""
@@ -764,7 +2207,7 @@ def _dns_counts_todos():
 
 def _dns_count(usuario):
     """Cantidad total de sanciones DNS de un piloto/formulero."""
-    return _dns_counts_todos().get(usuario, 0)
+    return _dns_counts_todos(cache_version("standings")).get(usuario, 0)
 GRILLA_2026 = {
     "MCLAREN":      ["Oscar Piastri","Lando Norris"],
     "RED BULL":     ["Max Verstappen","Isack Hadjar"],
@@ -778,7 +2221,17 @@ GRILLA_2026 = {
     "ALPINE":       ["Pierre Gasly","Franco Colapinto"],
     "CADILLAC":     ["Checo Perez","Valteri Bottas"],
 }
-ESCALA_CARRERA_JUEGO = {1:25,2:18,3:15,4:12,5:10,6:8,7:6,8:4,9:2,10:1}
+# ── Escalas del juego — ÚNICA fuente (motor de puntaje, vistas, simulador) ──
+ESCALAS = {
+    "QUALY":         {1:15,2:10,3:7,4:5,5:3},
+    "SPRINT":        {1:8,2:7,3:6,4:5,5:4,6:3,7:2,8:1},
+    "CARRERA":       {1:25,2:18,3:15,4:12,5:10,6:8,7:6,8:4,9:2,10:1},
+    "CONSTRUCTORES": {1:10,2:5,3:2},
+}
+ETAPA_PFX       = {"QUALY":"q", "SPRINT":"s", "CARRERA":"r", "CONSTRUCTORES":"c"}
+BONUS_PLENO     = {"QUALY":5, "SPRINT":3, "CARRERA":5, "CONSTRUCTORES":3}
+BONUS_COLAPINTO = {"QUALY":10, "CARRERA":20}
+ESCALA_CARRERA_JUEGO = ESCALAS["CARRERA"]
 PILOTO_COLORS = {
     "Checo Perez":"#B026FF","Nicki Lauda":"#1E90FF","Lando Norris":"#FFA500","Fernando Alonso":"#FF4444",
     "Valteri Bottas":"#00CFFF","Yuki Tsunoda":"#A3E635",
@@ -915,6 +2368,676 @@ CALENDARIO_VISUAL = [
     {"Fecha":"04-06 Dic","Gran Premio":"GP Abu Dabi",           "Circuito":"Yas Marina",         "Formato":"Clásico"},
 ]
 
+# ─────────────────────────────────────────────────────────
+# 4a. IMÁGENES REMOTAS — proxy local con caché en disco
+# ─────────────────────────────────────────────────────────
+# Fotos, logos y mapas de circuito venían de media.formula1.com, gstatic y
+# Wikimedia en cada vista. Un hilo por proceso baja cada URL una sola vez, la
+# normaliza (WebP, ancho máximo por tipo) y la guarda en static/img/<hash>.webp
+# con un índice url→archivo que sobrevive reinicios. La UI recibe la URL local
+# (app/static/img/…, servida gracias a enableStaticServing en .streamlit/config.toml)
+# en cuanto está; mientras tanto, la remota. Si la fuente
+# desapareció (404/410 o no es imagen) se devuelve un avatar SVG con iniciales.
+_IMG_DIR       = os.path.join(_ASSET_DIR, "img")
+_IMG_INDICE    = os.path.join(_IMG_DIR, "index.json")
+_IMG_REINTENTO = 1800   # seg. antes de reintentar una URL que falló por red
+_IMG_REVISION  = 86400  # seg. antes de volver a probar una fuente caída
+_IMG_UA = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+           "Accept": "image/webp,image/png,image/svg+xml,image/*,*/*",
+           "Referer": "https://en.wikipedia.org/"}
+
+@st.cache_resource(show_spinner=False)
+def _img_store():
+    import threading, json
+    idx = {}
+    try:
+        with open(_IMG_INDICE, "r", encoding="utf-8") as f: idx = json.load(f)
+        idx = {u: e for u, e in idx.items()
+               if e.get("gone") or os.path.exists(os.path.join(_IMG_DIR, e.get("f","")))}
+    except Exception: pass
+    return {"lock": threading.RLock(), "cv": threading.Condition(), "idx": idx,
+            "pend": {}, "fallos": {}, "hilo": None,
+            "bajadas": 0, "bytes_remotos": 0, "bytes_locales": 0}
+
+def _img_guardar_indice(store):
+    import json
+    try:
+        os.makedirs(_IMG_DIR, exist_ok=True)
+        _tmp = _IMG_INDICE + ".tmp"
+        with store["lock"]: _data = json.dumps(store["idx"])
+        with open(_tmp, "w", encoding="utf-8") as f: f.write(_data)
+        os.replace(_tmp, _IMG_INDICE)
+    except Exception: pass
+
+def _img_normalizar(raw, ancho):
+    """(bytes, ext) — WebP con ancho máximo `ancho`; sin Pillow, los bytes tal cual."""
+    try:
+        from PIL import Image
+        import io
+        with Image.open(io.BytesIO(raw)) as im:
+            im.load()
+            im = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+            if im.width > ancho:
+                im = im.resize((ancho, max(1, round(im.height * ancho / im.width))), Image.LANCZOS)
+            out = io.BytesIO(); im.save(out, "WEBP", quality=80, method=4)
+            return out.getvalue(), "webp"
+    except ImportError:
+        return raw, None
+    except Exception:
+        return None, None
+
+def _img_bajar(url, ancho):
+    """Baja y guarda una URL. Devuelve la entrada del índice o None si hay que reintentar."""
+    try:
+        _r = requests.get(url, timeout=12, headers=_IMG_UA)
+    except Exception:
+        return None
+    if _r.status_code in (404, 410): return {"gone": True}
+    if _r.status_code != 200: return None
+    _ct = _r.headers.get("Content-Type", "").split(";")[0].strip()
+    if not _ct.startswith("image/") and not url.split("?")[0].lower().endswith((".png", ".webp", ".jpg")):
+        return {"gone": True}
+    _data, _ext = _img_normalizar(_r.content, ancho)
+    if _data is None: return {"gone": True}
+    if _ext is None:
+        _ext = {"image/svg+xml": "svg", "image/png": "png", "image/webp": "webp"}.get(_ct, "jpg")
+    _f = f"{hashlib.sha256(_data).hexdigest()[:16]}.{_ext}"
+    _p = os.path.join(_IMG_DIR, _f)
+    try:
+        os.makedirs(_IMG_DIR, exist_ok=True)
+        if not os.path.exists(_p):
+            with open(_p + ".tmp", "wb") as f: f.write(_data)
+            os.replace(_p + ".tmp", _p)
+    except Exception:
+        return None
+    return {"f": _f, "bytes": len(_data), "orig": len(_r.content)}
+
+def _img_procesar(store, url, ancho):
+    import time as _t_im
+    _e = _img_bajar(url, ancho)
+    with store["lock"]:
+        store["pend"].pop(url, None)
+        if _e is None:
+            store["fallos"][url] = _t_im.time()
+            return None
+        _e.setdefault("ts", _t_im.time())
+        store["idx"][url] = _e
+        store["bajadas"] += 1
+        store["bytes_remotos"] += _e.get("orig", 0); store["bytes_locales"] += _e.get("bytes", 0)
+    _img_guardar_indice(store)
+    return _e
+
+def _img_worker():
+    """Hilo único que drena las URLs pendientes."""
+    import threading
+    store = _img_store()
+    with store["lock"]:
+        if store["hilo"] and store["hilo"].is_alive(): return
+        def _loop():
+            while True:
+                with store["cv"]:
+                    while not store["pend"]: store["cv"].wait()
+                with store["lock"]:
+                    url, ancho = next(iter(store["pend"].items()))
+                try: _img_procesar(store, url, ancho)
+                except Exception as e:
+                    print(f"Proxy imágenes: {e}")
+                    with store["lock"]: store["pend"].pop(url, None)
+        store["hilo"] = threading.Thread(target=_loop, name="img-proxy", daemon=True)
+        store["hilo"].start()
+
+def _img_encolar(url, ancho):
+    import time as _t_im
+    store = _img_store()
+    with store["lock"]:
+        if url in store["idx"] or url in store["pend"]: return
+        if _t_im.time() - store["fallos"].get(url, 0) < _IMG_REINTENTO: return
+        store["pend"][url] = ancho
+    _img_worker()
+    with store["cv"]: store["cv"].notify()
+
+@st.cache_data(show_spinner=False)
+def _img_iniciales(nombre):
+    """Avatar SVG (data URI) con las iniciales y un color estable por nombre."""
+    _ini = "".join(w[0] for w in str(nombre).split()[:2]).upper() or "?"
+    _hue = int(hashlib.md5(str(nombre).encode()).hexdigest()[:4], 16) % 360
+    _svg = (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">'
+            f'<rect width="100" height="100" fill="hsl({_hue},45%,22%)"/>'
+            f'<text x="50" y="50" dy=".35em" text-anchor="middle" font-family="sans-serif" '
+            f'font-size="38" font-weight="900" fill="hsl({_hue},80%,75%)">{_html.escape(_ini)}</text></svg>')
+    return "data:image/svg+xml;base64," + base64.b64encode(_svg.encode()).decode()
+
+def img_url(url, nombre="", ancho=320, inline=False, esperar=False):
+    """URL a usar en <img> para una imagen remota: la local si ya está cacheada,
+    el avatar de iniciales si la fuente desapareció, si no la remota (y se encola).
+    inline=True devuelve data URI cuando no hay static serving (p.ej. Wikimedia,
+    que no admite hotlink); esperar=True baja en el momento si falta."""
+    import time as _t_im
+    if not url or not str(url).startswith("http"): return url or ""
+    store = _img_store()
+    with store["lock"]: _e = store["idx"].get(url)
+    if _e is None and esperar:
+        with store["lock"]: _reciente = _t_im.time() - store["fallos"].get(url, 0) < _IMG_REINTENTO
+        if not _reciente: _e = _img_procesar(store, url, ancho)
+    if _e is None:
+        _img_encolar(url, ancho)
+        return "" if inline else url
+    if _e.get("gone"):
+        if _t_im.time() - _e.get("ts", 0) > _IMG_REVISION:
+            with store["lock"]: store["idx"].pop(url, None)
+            _img_encolar(url, ancho)
+        return _img_iniciales(nombre or url.rsplit("/", 1)[-1])
+    if _static_on(): return f"app/static/img/{_e['f']}"
+    if not inline: return url
+    _p = os.path.join(_IMG_DIR, _e["f"])
+    try: return _asset_data_uri(_p, os.path.getmtime(_p))
+    except Exception: return ""
+
+class _ImgMap(dict):
+    """nombre → URL remota; al leer devuelve img_url(...) para servir desde el proxy."""
+    def __init__(self, data, ancho):
+        super().__init__(data); self.ancho = ancho
+    def __getitem__(self, k):
+        return img_url(dict.__getitem__(self, k), k, self.ancho)
+    def get(self, k, default=None):
+        return self[k] if k in self else default
+    def items(self):
+        return [(k, self[k]) for k in self]
+    def values(self):
+        return [self[k] for k in self]
+    def remotas(self):
+        return dict.items(self)
+
+TEAM_LOGOS_CDN   = _ImgMap(TEAM_LOGOS_CDN, 640)
+DRIVER_PHOTOS    = _ImgMap(DRIVER_PHOTOS, 720)
+DRIVER_HEADSHOTS = _ImgMap(DRIVER_HEADSHOTS, 272)
+
+@st.cache_resource(show_spinner=False)
+def img_precargar():
+    """Encola todas las imágenes conocidas (una vez por proceso)."""
+    for _m in (DRIVER_HEADSHOTS, DRIVER_PHOTOS, TEAM_LOGOS_CDN):
+        for _, _u in _m.remotas():
+            if _u and _u.startswith("http"): _img_encolar(_u, _m.ancho)
+
+def img_stats():
+    """Entradas cacheadas, caídas (avatar) y pendientes + ahorro de bytes."""
+    store = _img_store()
+    with store["lock"]:
+        _gone = sum(1 for e in store["idx"].values() if e.get("gone"))
+        return {"cacheadas": len(store["idx"]) - _gone, "caidas": _gone,
+                "pendientes": len(store["pend"]), "bajadas": store["bajadas"],
+                "kb_remotos": store["bytes_remotos"] // 1024,
+                "kb_locales": store["bytes_locales"] // 1024}
+
+# ─────────────────────────────────────────────────────────
+# 4b. MOTOR DE PUNTAJE — un GP entero, todos los formuleros, una pasada
+# ─────────────────────────────────────────────────────────
+_COLS_DETALLE = ["piloto", "etapa", "pos", "pred", "real", "ok", "pts"]
+
+def _nn_puntaje():
+    """normalizar_nombre de core.utils (fallback: strip + lower)."""
+    try:
+        from core.utils import normalizar_nombre as _nn_pj
+        return lambda x: _nn_pj(x) if x else ""
+    except Exception:
+        return lambda x: x.strip().lower()
+
+def _pos_txt(v):
+    """Posición de Colapinto como texto comparable ('P5', 5, 5.0 → '5')."""
+    v = str(v if v is not None else "").strip().upper().lstrip("P").strip()
+    return v[:-2] if v.endswith(".0") else v
+
+def _etapas_pred(pred):
+    """(q, s, (r, c)) → {etapa: dict}; constructores puede venir como c1..c3 dentro de carrera."""
+    q, s, (r, c) = pred or _PRED_VACIA
+    if not (isinstance(c, dict) and c) and isinstance(r, dict):
+        c = {i: r.get(f"c{i}") for i in (1, 2, 3)}
+    return {"QUALY": q, "SPRINT": s, "CARRERA": r, "CONSTRUCTORES": c}
+
+def puntuar_gp(preds, oficial, es_sprint=True):
+    """Puntúa un GP completo: preds {piloto: (q, s, (r, c))} contra oficial {q1.., s1.., r1.., c1.., col_q, col_r}.
+
+    Devuelve (resumen, detalle). resumen: índice piloto, columnas pts_/aciertos_/pleno_<ETAPA>,
+    colapinto_q, colapinto_r, total por etapa (QUALY, SPRINT, CARRERA, CONSTRUCTORES) y Total.
+    detalle: una fila por posición predicha + plenos y Colapinto (piloto, etapa, pos, pred, real, ok, pts)."""
+    import numpy as np
+    oficial = oficial or {}
+    _pil = list(preds); _n_pil = len(_pil)
+    _pil_arr = np.array(_pil, dtype=object)
+    _por = [_etapas_pred(preds[p]) for p in _pil]
+    def _ids(a):                                            # nombre → id (0 = vacío)
+        return np.fromiter(map(piloto_id, a.ravel()), dtype=np.int64, count=a.size).reshape(a.shape)
+
+    # Todo sobre arrays de numpy; los DataFrames se arman una sola vez al final
+    _cols = {}; _det = []                                   # _det: (filas, etapa, pos, pred, real, ok, pts)
+    _cero = np.zeros(_n_pil, dtype=np.int64)
+    for _et, _esc in ESCALAS.items():
+        _n = len(_esc); _pfx = ETAPA_PFX[_et]
+        if _et == "SPRINT" and not es_sprint:
+            for _c in ("pts_", "aciertos_", "pleno_"): _cols[f"{_c}{_et}"] = _cero
+            continue
+        _raw = np.array([[str((d[_et] or {}).get(i, (d[_et] or {}).get(str(i), "")) or "").strip()
+                          for i in range(1, _n + 1)] for d in _por], dtype=object).reshape(_n_pil, _n)
+        _of  = np.array([str(oficial.get(f"{_pfx}{i}", "") or "").strip() for i in range(1, _n + 1)], dtype=object)
+        _P, _O = _ids(_raw), _ids(_of)
+        _hit = (_P == _O) & (_P != 0) & (_O != 0)
+        _w = np.array([_esc[i] for i in range(1, _n + 1)], dtype=np.int64)
+        _pleno = _hit.all(axis=1)
+        _cols[f"pts_{_et}"]      = _hit.astype(np.int64) @ _w
+        _cols[f"aciertos_{_et}"] = _hit.sum(axis=1).astype(np.int64)
+        _cols[f"pleno_{_et}"]    = np.where(_pleno, BONUS_PLENO[_et], 0)
+        _pi, _pp = np.nonzero(_raw != "")
+        if _pi.size:
+            _det.append((_pi, _et, _pp + 1, _raw[_pi, _pp], _of[_pp], _hit[_pi, _pp],
+                         np.where(_hit[_pi, _pp], _w[_pp], 0)))
+        if _pleno.any():
+            _det.append((np.nonzero(_pleno)[0], f"PLENO {_et}", 0, "", "", True, BONUS_PLENO[_et]))
+
+    for _et, _campo, _key, _lbl in (("QUALY", "colapinto_q", "col_q", "COLAPINTO Q"),
+                                    ("CARRERA", "colapinto_r", "col_r", "COLAPINTO R")):
+        _cv = np.array([_pos_txt((d[_et] or {}).get(_campo)) for d in _por], dtype=object)
+        _cr = _pos_txt(oficial.get(_key))
+        _ok = (_cv != "") & (_cv == _cr) & (_cr != "")
+        _cols[_campo] = np.where(_ok, BONUS_COLAPINTO[_et], 0)
+        _hay = np.nonzero(_cv != "")[0]
+        if _hay.size:
+            _det.append((_hay, _lbl, 0, _cv[_hay], _cr, _ok[_hay], np.where(_ok[_hay], BONUS_COLAPINTO[_et], 0)))
+
+    for _et in ESCALAS:
+        _cols[_et] = _cols[f"pts_{_et}"] + _cols[f"pleno_{_et}"]
+    _cols["QUALY"]   = _cols["QUALY"] + _cols["colapinto_q"]
+    _cols["CARRERA"] = _cols["CARRERA"] + _cols["colapinto_r"]
+    _cols["Total"] = sum(_cols[_et] for _et in ESCALAS)
+    _res = pd.DataFrame({k: np.asarray(v, dtype=np.int64) for k, v in _cols.items()},
+                        index=pd.Index(_pil, name="piloto"))
+
+    if not _det: return _res, pd.DataFrame(columns=_COLS_DETALLE)
+    _fil = np.concatenate([p[0] for p in _det])
+    _col = [np.concatenate([np.broadcast_to(np.asarray(p[j], dtype=object if j in (1, 3, 4) else None), p[0].shape)
+                            for p in _det]) for j in range(1, 7)]
+    _o = np.argsort(_fil, kind="stable")                    # por formulero, en el orden de `preds`
+    _d = pd.DataFrame({"piloto": _pil_arr[_fil[_o]], "etapa": _col[0][_o], "pos": _col[1][_o].astype(np.int64),
+                       "pred": _col[2][_o], "real": _col[3][_o], "ok": _col[4][_o].astype(bool),
+                       "pts": _col[5][_o].astype(np.int64)})
+    return _res, _d
+
+def puntuar_gp_paridad(preds, oficial, es_sprint=True, res=None):
+    """Diferencias por formulero y etapa entre puntuar_gp y calcular_puntos de core (la regla de
+    referencia) para un GP: [{piloto, etapa, puntuar_gp, calcular_puntos}]; None si core no carga."""
+    mc = _mod_core()
+    if "_error" in mc: return None
+    cp = mc["calcular_puntos"]; oficial = oficial or {}
+    if res is None: res, _ = puntuar_gp(preds, oficial, es_sprint=es_sprint)
+    _of = {et: {i: oficial.get(f"{ETAPA_PFX[et]}{i}", "") for i in range(1, len(esc) + 1)}
+           for et, esc in ESCALAS.items()}
+    out = []
+    for p in preds:
+        d = {et: normalizar_keys_num(v or {}) for et, v in _etapas_pred(preds[p]).items()}
+        ref = {"QUALY": cp("QUALY", d["QUALY"], _of["QUALY"], d["QUALY"].get("colapinto_q"), oficial.get("col_q")),
+               "CARRERA": cp("CARRERA", d["CARRERA"], _of["CARRERA"], d["CARRERA"].get("colapinto_r"), oficial.get("col_r")),
+               "CONSTRUCTORES": cp("CONSTRUCTORES", d["CONSTRUCTORES"], _of["CONSTRUCTORES"]),
+               "SPRINT": cp("SPRINT", d["SPRINT"], _of["SPRINT"]) if es_sprint and d["SPRINT"] else 0}
+        for et, v in ref.items():
+            if int(res.at[p, et]) != int(v or 0):
+                out.append({"piloto": p, "etapa": et, "puntuar_gp": int(res.at[p, et]), "calcular_puntos": int(v or 0)})
+    return out
+
+
+# ─────────────────────────────────────────────────────────
+# 4c. REPLAY DE TEMPORADA — recomputa todo desde sheet1 + Oficial, solo lectura
+# ─────────────────────────────────────────────────────────
+def _detalle_normalizado(df):
+    """historial_detalle → columnas gp_key, piloto, etapa, puntos (tipos limpios)."""
+    if df is None or getattr(df, "empty", True): return pd.DataFrame(columns=["gp_key","piloto","etapa","puntos"])
+    d = df.copy(); d.columns = [str(c).lower().strip() for c in d.columns]
+    return pd.DataFrame({"gp_key": d["gp"].map({g: _gp_bare_key(g) for g in d["gp"].unique()}),
+                         "piloto": d["piloto"].astype(str).str.strip(),
+                         "etapa":  d["etapa"].astype(str).str.strip().str.upper(),
+                         "puntos": pd.to_numeric(d["puntos"], errors="coerce").fillna(0).astype(int)})
+
+def replay_temporada(gps=None):
+    """Recalcula la temporada desde las predicciones crudas y el oficial guardado y la compara contra
+    historial_detalle / tabla_posiciones. Determinista y de solo lectura: no escribe hojas ni toca los
+    locks GP_DONE::/HIST_DONE:: (ver _lock_liga). DNS y bonus (no derivables de sheet1) se toman tal cual de lo guardado.
+    diff_core: paridad de puntuar_gp contra calcular_puntos de core en los mismos GPs (None sin core)."""
+    import time as _t_rp
+    _t0 = _t_rp.perf_counter(); tm = {}
+    m = _mod_db()
+    if "_error" in m: return {"error": m["_error"]}
+    gps = [g for g in (gps or GPS_ACTIVOS) if g not in GPS_SUSPENDIDOS]
+
+    _t = _t_rp.perf_counter()
+    try:
+        oficiales = oficial_get_many(gps, respaldo=True)
+        det_raw = historial_liga()[1]
+        if det_raw is None or getattr(det_raw, "empty", True):    # lectura caída: no hay contra qué comparar
+            return {"error": "historial_detalle no disponible (la lectura falló o vino vacía)"}
+        det = _detalle_normalizado(det_raw)
+        tabla = _safe_call(m["leer_tabla_posiciones"], PILOTOS_TORNEO, timeout_sec=8, default=None)
+        _predicciones_sheet1()
+    except KeyError as e:                       # historial_detalle sin gp/piloto/etapa/puntos
+        return {"error": f"historial_detalle sin la columna {e}"}
+    except RuntimeError as e:                   # sheet1 no se pudo leer
+        return {"error": str(e)}
+    tm["lectura_ms"] = round((_t_rp.perf_counter() - _t) * 1000, 1)
+
+    _t = _t_rp.perf_counter(); por_gp = {}; partes = []; sin_oficial = []; paridad = []; _t_par = 0.0
+    for g in gps:
+        of = oficiales[g]
+        if not of: sin_oficial.append(g); continue
+        _tg = _t_rp.perf_counter()
+        preds = recuperar_predicciones_gp(g)
+        res, _ = puntuar_gp(preds, of, es_sprint=g in GPS_SPRINT)
+        por_gp[g] = round((_t_rp.perf_counter() - _tg) * 1000, 2)
+        _tp = _t_rp.perf_counter()
+        if paridad is not None:                 # puntuar_gp vs calcular_puntos de core, mismo GP y datos
+            _pg = puntuar_gp_paridad(preds, of, es_sprint=g in GPS_SPRINT, res=res)
+            paridad = None if _pg is None else paridad + [dict(r, gp=g) for r in _pg]
+        _t_par += _t_rp.perf_counter() - _tp
+        lg = res[[e for e in ESCALAS if e != "SPRINT" or g in GPS_SPRINT]].reset_index().melt(
+            id_vars="piloto", var_name="etapa", value_name="puntos")
+        lg.insert(0, "gp_key", _gp_bare_key(g)); lg.insert(0, "gp", g)
+        partes.append(lg)
+    rec = (pd.concat(partes, ignore_index=True) if partes
+           else pd.DataFrame(columns=["gp","gp_key","piloto","etapa","puntos"]))
+    tm["computo_ms"] = round((_t_rp.perf_counter() - _t - _t_par) * 1000, 1)
+    tm["paridad_ms"] = round(_t_par * 1000, 1)
+    diff_core = (None if paridad is None else
+                 pd.DataFrame(paridad, columns=["gp", "piloto", "etapa", "puntuar_gp", "calcular_puntos"]))
+
+    _t = _t_rp.perf_counter()
+    _claves = ["gp_key", "piloto", "etapa"]
+    guardado = det[det["etapa"].isin(list(ESCALAS))].groupby(_claves, as_index=False)["puntos"].sum()
+    guardado = guardado[guardado["gp_key"].isin(set(rec["gp_key"]))]
+    diff_det = rec.merge(guardado, on=_claves, how="outer", suffixes=("_replay", "_guardado"))
+    diff_det["gp"] = diff_det["gp"].fillna(diff_det["gp_key"])
+    diff_det[["puntos_replay", "puntos_guardado"]] = diff_det[["puntos_replay", "puntos_guardado"]].fillna(0).astype(int)
+    diff_det["delta"] = diff_det["puntos_replay"] - diff_det["puntos_guardado"]
+    diff_det = (diff_det[diff_det["delta"] != 0].drop(columns="gp_key")
+                .sort_values(["gp", "piloto", "etapa"]).reset_index(drop=True))
+
+    ajustes = (det[~det["etapa"].isin(list(ESCALAS)) & det["gp_key"].isin(set(rec["gp_key"]))]
+               .groupby("piloto")["puntos"].sum())
+    tot_replay = rec.groupby("piloto")["puntos"].sum().reindex(PILOTOS_TORNEO, fill_value=0)
+    tot_replay = tot_replay.add(ajustes.reindex(PILOTOS_TORNEO, fill_value=0)).astype(int)
+    tot_guard = pd.Series(0, index=PILOTOS_TORNEO)
+    if tabla is not None and not getattr(tabla, "empty", True) and {"Piloto", "Puntos"}.issubset(tabla.columns):
+        tot_guard = (pd.to_numeric(tabla.set_index(tabla["Piloto"].astype(str).str.strip())["Puntos"], errors="coerce")
+                     .reindex(PILOTOS_TORNEO).fillna(0).astype(int))
+    diff_tabla = pd.DataFrame({"piloto": PILOTOS_TORNEO, "puntos_replay": tot_replay.values,
+                               "puntos_guardado": tot_guard.values})
+    diff_tabla["delta"] = diff_tabla["puntos_replay"] - diff_tabla["puntos_guardado"]
+    tm["diff_ms"] = round((_t_rp.perf_counter() - _t) * 1000, 1)
+    tm["total_ms"] = round((_t_rp.perf_counter() - _t0) * 1000, 1)
+    tm["por_gp_ms"] = por_gp
+
+    return {"gps_recalculados": list(por_gp), "gps_sin_oficial": sin_oficial,
+            "recomputado": rec.drop(columns="gp_key"), "diff_detalle": diff_det,
+            "diff_tabla": diff_tabla, "diff_core": diff_core, "timing": tm}
+
+def replay_json(rep):
+    """Reporte de replay_temporada serializado (para descargar / comparar entre versiones del scoring)."""
+    import json as _json_rp
+    out = {k: (v.to_dict(orient="records") if isinstance(v, pd.DataFrame) else v) for k, v in rep.items()}
+    return _json_rp.dumps(out, ensure_ascii=False, indent=1, default=str)
+
+
+# ─────────────────────────────────────────────────────────
+# 4d. LIGAS — varios torneos en un mismo deploy
+# ─────────────────────────────────────────────────────────
+# La liga "fefe" es este torneo (constantes de la sección 4). Las demás se declaran en
+# secrets; solo `pilotos` es obligatorio, el resto se hereda de la liga base:
+#   [ligas.oficina]
+#   nombre   = "Liga Oficina"
+#   pilotos  = ["Ana", "Beto", "Caro"]
+#   colores  = {Ana = "#ff7043"}
+#   horarios / gps_sprint / gps_suspendidos
+# Escalas y bonus son los de la liga base en todas: el historial lo escribe el
+# calcular de core, que puntúa siempre con esas escalas. El Comisario ve y calcula
+# cualquier liga (selector del sidebar); el resto solo las ligas en las que juega.
+# Streamlit re-ejecuta el script en cada rerun, así que acá se resuelve la liga de la
+# sesión (?liga=, el selector del sidebar o la liga del formulero logueado) y se vuelven
+# a atar PILOTOS_TORNEO, PILOTO_COLORS, HORARIOS_CARRERA, GPS_*, ESCALAS y BONUS_*: el
+# resto del código sigue leyendo las mismas constantes. Los datos no se releen por liga:
+# sheet1 y Desafios se parsean una vez y se consultan por formulero, y el historial de
+# Supabase se lee una vez y se parte por liga (historial_liga). cache_version() suma la
+# liga a la clave y los stores de resumen y logros son uno por liga. Siguen siendo de una
+# sola liga: sheet1 y Desafios (por nombre de formulero: quien juega en dos ligas comparte
+# sus predicciones y desafíos) y los recordatorios, que salen con el calendario de la
+# liga por defecto a todos los emails de secrets.
+LIGA_DEFAULT = "fefe"
+_LIGA_ADMINS = {"Checo Perez"}       # los mismos que entran a pantalla_admin
+_LIGA_PALETA = ["#B026FF", "#1E90FF", "#FFA500", "#FF4444", "#00CFFF", "#A3E635",
+                "#F472B6", "#FACC15", "#34D399", "#FB7185", "#818CF8", "#2DD4BF"]
+
+@st.cache_resource(show_spinner=False)
+def _ligas_secrets():
+    """Ligas declaradas en secrets (se leen una vez por proceso)."""
+    try: return {str(k).strip().lower(): dict(v) for k, v in dict(st.secrets.get("ligas", {}) or {}).items()}
+    except Exception: return {}
+
+def _liga_desde_secrets(lid, cfg, base):
+    pilotos = [str(p).strip() for p in cfg.get("pilotos", []) if str(p).strip()]
+    colores = {str(k): str(v) for k, v in dict(cfg.get("colores", {}) or {}).items()}
+    liga = dict(base, id=lid, nombre=str(cfg.get("nombre", lid)), pilotos=pilotos,
+                colores={p: colores.get(p) or _LIGA_PALETA[i % len(_LIGA_PALETA)] for i, p in enumerate(pilotos)})
+    if "horarios" in cfg: liga["horarios"] = {str(k): str(v) for k, v in dict(cfg["horarios"]).items()}
+    for k in ("gps_sprint", "gps_suspendidos"):
+        if k in cfg: liga[k] = [str(g) for g in cfg[k]]
+    return liga
+
+LIGAS = {LIGA_DEFAULT: {"id": LIGA_DEFAULT, "nombre": "Torneo Fefe Wolf 2026",
+                        "pilotos": PILOTOS_TORNEO, "colores": PILOTO_COLORS, "horarios": HORARIOS_CARRERA,
+                        "gps_sprint": GPS_SPRINT, "gps_suspendidos": GPS_SUSPENDIDOS, "escalas": ESCALAS,
+                        "bonus_pleno": BONUS_PLENO, "bonus_colapinto": BONUS_COLAPINTO}}
+for _lid, _cfg in _ligas_secrets().items():
+    if _lid == LIGA_DEFAULT or not _cfg.get("pilotos"): continue
+    try: LIGAS[_lid] = _liga_desde_secrets(_lid, _cfg, LIGAS[LIGA_DEFAULT])
+    except Exception as _e_lg: print(f"Liga {_lid} mal configurada: {_e_lg}")
+
+def ligas_de(usuario):
+    """Ids de las ligas en las que juega `usuario`."""
+    u = str(usuario or "").strip().lower()
+    return [lid for lid, l in LIGAS.items() if any(p.lower() == u for p in l["pilotos"])] if u else []
+
+def _liga_sesion():
+    """Liga de este rerun: la pedida (?liga= o selector) si el formulero juega ahí, si no la suya."""
+    try:
+        _q = str(st.query_params.get("liga", "") or "").strip().lower()
+        if _q:
+            if _q in LIGAS: st.session_state["liga"] = _q
+            del st.query_params["liga"]
+        _usr = (st.session_state.get("perfil") or {}).get("usuario", "")
+        mias = ligas_de(_usr)
+        pedida = st.session_state.get("liga")
+        if pedida in LIGAS and (not mias or pedida in mias or _usr in _LIGA_ADMINS): return pedida
+        if mias: return mias[0]
+    except Exception: pass
+    return LIGA_DEFAULT
+
+def _liga_atar():
+    """Ata LIGA y las constantes por liga de este rerun. Corre al cargar el script y otra vez
+    después de sidebar_login_block: al restaurar la sesión desde el token el perfil recién
+    existe ahí, y hasta entonces _liga_sesion() solo puede dar la liga por defecto."""
+    global LIGA, PILOTOS_TORNEO, PILOTO_COLORS, HORARIOS_CARRERA, GPS_OFICIALES, GPS_SPRINT
+    global GPS_SUSPENDIDOS, GPS_ACTIVOS, ESCALAS, BONUS_PLENO, BONUS_COLAPINTO, ESCALA_CARRERA_JUEGO
+    LIGA = LIGAS[_liga_sesion()]
+    PILOTOS_TORNEO   = LIGA["pilotos"]
+    PILOTO_COLORS    = LIGA["colores"]
+    HORARIOS_CARRERA = LIGA["horarios"]
+    GPS_OFICIALES    = list(HORARIOS_CARRERA.keys())
+    GPS_SPRINT       = LIGA["gps_sprint"]
+    GPS_SUSPENDIDOS  = LIGA["gps_suspendidos"]
+    GPS_ACTIVOS      = [g for g in GPS_OFICIALES if g not in GPS_SUSPENDIDOS]
+    ESCALAS          = LIGA["escalas"]
+    BONUS_PLENO      = LIGA["bonus_pleno"]
+    BONUS_COLAPINTO  = LIGA["bonus_colapinto"]
+    ESCALA_CARRERA_JUEGO = ESCALAS["CARRERA"]
+
+_liga_atar()
+
+def liga_selector():
+    """Selector de liga en el sidebar (para quien juega en más de una, y el Comisario: todas)."""
+    _usr = (st.session_state.get("perfil") or {}).get("usuario", "")
+    mias = list(LIGAS) if _usr in _LIGA_ADMINS else ligas_de(_usr)
+    if len(mias) < 2: return
+    sel = st.sidebar.selectbox("🏆 Liga", mias, index=mias.index(LIGA["id"]) if LIGA["id"] in mias else 0,
+                               format_func=lambda l: LIGAS[l]["nombre"], key="liga_sel")
+    if sel != LIGA["id"]:
+        st.session_state["liga"] = sel; st.rerun()
+
+def _lock_liga(clave):
+    """Clave de un lock de admin (GP_DONE::<gp>, DNS_DONE::…) para la liga del rerun. La liga por
+    defecto usa la clave sin liga, así los locks anteriores a las ligas siguen valiendo."""
+    if LIGA["id"] == LIGA_DEFAULT: return clave
+    tipo, _, resto = clave.partition("::")
+    return f"{tipo}::{LIGA['id']}::{resto}"
+
+def _lock_liga_core(mdb, clave, fn):
+    """Corre `fn`, un paso de core que al terminar bien anota `clave` sin liga, y pasa ese lock a
+    la clave de la liga activa: una liga que calcula un GP no bloquea el botón de las demás."""
+    k = _lock_liga(clave)
+    if k == clave: return fn()
+    previo = _safe_call(mdb["lock_exists"], clave, timeout_sec=4, default=True)
+    res = fn()
+    if not previo and _safe_call(mdb["lock_exists"], clave, timeout_sec=4, default=False):
+        _safe_call(mdb["set_lock"], k, timeout_sec=4)
+        if "clear_lock" in mdb: _safe_call(mdb["clear_lock"], clave, timeout_sec=4)
+    return res
+
+def ligas_stats():
+    """Liga del rerun, ligas configuradas y particiones del historial (para el Log del admin)."""
+    hs = _historial_store()
+    with hs["lock"]:
+        filas = {lid: (0 if h is None else len(h)) for lid, (h, _) in (hs["ligas"] or {}).items()}
+        return {"liga": LIGA["id"], "ligas": len(LIGAS), "lecturas_historial": hs["lecturas"],
+                "filas_por_liga": filas}
+
+# ─────────────────────────────────────────────────────────
+# 4e. IDENTIDADES — GPs y pilotos de F1 como enteros internados
+# ─────────────────────────────────────────────────────────
+# Una tabla por proceso (se arma la primera vez que se usa) con todos los alias de cada
+# GP del calendario ('08. Gran Premio de Mónaco', 'Gran Premio de Mónaco', 'GP Mónaco',
+# 'monaco', …) → un id con su bandera, nombre corto y si es sprint, y cada piloto de la
+# grilla → id con equipo y color. Los nombres que llegan de las hojas se resuelven una
+# vez y quedan memorizados, así los loops comparan enteros en vez de rearmar strings.
+# Los pilotos se identifican por normalizar_nombre (la misma regla que el puntaje): dos
+# nombres tienen el mismo id si y solo si normalizan igual; los que no están en la
+# grilla reciben un id propio la primera vez que aparecen.
+GP_BANDERAS = {
+    "australia":"🇦🇺", "china":"🇨🇳", "japón":"🇯🇵", "baréin":"🇧🇭", "arabia saudita":"🇸🇦",
+    "miami":"🇺🇸", "canadá":"🇨🇦", "mónaco":"🇲🇨", "españa":"🇪🇸", "austria":"🇦🇹",
+    "gran bretaña":"🇬🇧", "bélgica":"🇧🇪", "hungría":"🇭🇺", "los países bajos":"🇳🇱",
+    "italia":"🇮🇹", "madrid":"🇪🇸", "azerbaiyán":"🇦🇿", "singapur":"🇸🇬",
+    "los estados unidos":"🇺🇸", "méxico":"🇲🇽", "brasil":"🇧🇷", "las vegas":"🇺🇸",
+    "qatar":"🇶🇦", "abu dabi":"🇦🇪",
+}
+_GP_ALIAS_EXTRA = {
+    "baréin": ["bahrein", "bahrain"], "arabia saudita": ["arabia"], "abu dabi": ["abu dhabi"],
+    "los países bajos": ["países bajos", "holanda"], "los estados unidos": ["estados unidos", "usa"],
+    "gran bretaña": ["gran bretana", "silverstone"],
+}
+
+Gp = namedtuple("Gp", "id nombre titulo corto lugar clave bandera sprint ronda")
+PilotoF1 = namedtuple("PilotoF1", "id nombre equipo color")
+
+def _id_fold(s):
+    """Minúsculas, sin tildes, sin numeración 'NN. ' ni 'Gran Premio de' / 'GP'."""
+    import re as _re_if, unicodedata as _ud_if
+    s = _ud_if.normalize("NFKD", str(s or "")).encode("ascii", "ignore").decode().lower().strip()
+    s = _re_if.sub(r"^\d+\.\s*", "", s)
+    s = _re_if.sub(r"^(gran premio|grand prix|gp)( del?)?\s+", "", s)
+    return " ".join(s.split())
+
+@st.cache_resource(show_spinner=False)
+def _identidades():
+    import threading
+    base = LIGAS[LIGA_DEFAULT]
+    cal = list(base["horarios"]) + [g for l in LIGAS.values() for g in l["horarios"] if g not in base["horarios"]]
+    t = {"lock": threading.Lock(), "gps": [None], "gp_alias": {}, "pilotos": [None],
+         "pil_norm": {}, "pil_alias": {"": 0}, "nn": _nn_puntaje()}
+    for ronda, g in enumerate(cal, 1):
+        titulo = g.split(". ", 1)[-1] if ". " in g else g
+        clave = titulo.replace("Gran Premio de ", "").replace("Gran Premio del ", "").strip().lower()
+        info = Gp(len(t["gps"]), g, titulo, titulo.replace("Gran Premio de ", "GP ").replace("Gran Premio del ", "GP "),
+                  titulo.replace("Gran Premio de ", "").replace("Gran Premio del ", "").strip(), clave,
+                  GP_BANDERAS.get(clave, "🏁"), g in base["gps_sprint"], ronda)
+        t["gps"].append(info)
+        for a in [g, titulo, info.corto, info.lugar, clave] + _GP_ALIAS_EXTRA.get(clave, []):
+            t["gp_alias"].setdefault(a, info.id); t["gp_alias"].setdefault(_id_fold(a), info.id)
+    for equipo, ds in GRILLA_2026.items():
+        for d in ds:
+            k = t["nn"](d)
+            if k in t["pil_norm"]: continue
+            t["pil_norm"][k] = len(t["pilotos"])
+            t["pilotos"].append(PilotoF1(len(t["pilotos"]), d, equipo, TEAM_COLORS.get(equipo, "#888")))
+            t["pil_alias"][d] = t["pil_norm"][k]
+    return t
+
+_IDENT = None     # la tabla atada a este rerun (evita pasar por cache_resource en cada llamada)
+
+def _ident():
+    global _IDENT
+    if _IDENT is None: _IDENT = _identidades()
+    return _IDENT
+
+def _gp_resolver(t, g):
+    i = t["gp_alias"].get(g)
+    if i is None and g:
+        i = t["gp_alias"].get(_id_fold(g))
+        if i is not None: t["gp_alias"][g] = i
+    return i
+
+def gp_id(g):
+    """Id del GP (alias de cualquier forma) o None si no es del calendario."""
+    return _gp_resolver(_ident(), g)
+
+def gp_info(g):
+    """Gp(id, nombre, titulo, corto, lugar, clave, bandera, sprint, ronda) o None."""
+    t = _ident(); i = _gp_resolver(t, g)
+    return t["gps"][i] if i else None
+
+def gp_titulo(g):
+    """'08. Gran Premio de Mónaco' → 'Gran Premio de Mónaco' (o el texto sin numeración)."""
+    info = gp_info(g)
+    if info: return info.titulo
+    s = str(g or "").strip()
+    return s.split(". ", 1)[-1] if ". " in s else s
+
+def gp_corto(g):
+    """'08. Gran Premio de Mónaco' → 'GP Mónaco'."""
+    info = gp_info(g)
+    return info.corto if info else gp_titulo(g).replace("Gran Premio de ", "GP ").replace("Gran Premio del ", "GP ")
+
+def gp_bandera(g):
+    info = gp_info(g)
+    return info.bandera if info else "🏁"
+
+def piloto_id(nombre):
+    """Id del piloto según normalizar_nombre (0 = vacío)."""
+    t = _ident()
+    i = t["pil_alias"].get(nombre)
+    if i is None:
+        k = t["nn"](str(nombre)) if nombre else ""
+        with t["lock"]:
+            i = t["pil_norm"].get(k) if k else 0
+            if i is None:
+                i = t["pil_norm"][k] = len(t["pilotos"])
+                t["pilotos"].append(PilotoF1(i, str(nombre).strip(), "", "#888"))
+            t["pil_alias"][nombre] = i
+    return i
+
+def piloto_info(nombre):
+    """PilotoF1(id, nombre, equipo, color); equipo "" si no está en la grilla."""
+    i = piloto_id(nombre)
+    return _ident()["pilotos"][i] if i else None
+
+def identidades_stats():
+    t = _identidades()
+    return {"gps": len(t["gps"]) - 1, "alias_gp": len(t["gp_alias"]),
+            "pilotos": len(t["pilotos"]) - 1, "alias_piloto": len(t["pil_alias"]) - 1}
+
+
 # ─────────────────────────────────────────────────────────
 # 5. AUTH TOKENS
 # ─────────────────────────────────────────────────────────
@@ -930,29 +3053,112 @@ def _b64ud(s):
     pad = "="*(-len(s)%4)
     return base64.urlsafe_b64decode((s+pad).encode())
 
-def auth_create_token(usuario, hours=168):
+def auth_create_token(usuario, hours=168, perfil=None):
     exp = int((datetime.utcnow()+timedelta(hours=hours)).timestamp())
-    payload = f"{usuario}|{exp}|{secrets.token_urlsafe(8)}".encode()
+    tid = secrets.token_urlsafe(8)
+    payload = f"{usuario}|{exp}|{tid}".encode()
     sig = hmac.new(_auth_secret().encode(), payload, hashlib.sha256).digest()
+    if perfil: _sesion_guardar(tid, usuario, exp, perfil)
     return f"{_b64u(payload)}.{_b64u(sig)}"
 
-def auth_user_from_token(token):
+def _token_datos(token):
+    """(usuario, exp, id) si la firma es válida y no venció; None si no."""
     try:
         if not token or "." not in token: return None
         p64,s64 = token.split(".",1)
         payload = _b64ud(p64); sig = _b64ud(s64)
         good = hmac.new(_auth_secret().encode(), payload, hashlib.sha256).digest()
         if not hmac.compare_digest(sig,good): return None
-        usuario,exp_str,_ = payload.decode().split("|",2)
+        usuario,exp_str,tid = payload.decode().split("|",2)
         if int(exp_str) < int(datetime.utcnow().timestamp()): return None
-        return usuario
+        return usuario, int(exp_str), tid
     except: return None
 
+def auth_user_from_token(token):
+    d = _token_datos(token)
+    return d[0] if d else None
+
+# Sesiones: el id de cada token (el nonce del payload) apunta a una entrada local con
+# el perfil ya validado. Restaurar desde ?t= es verificar la firma y buscar el id acá;
+# Sheets (get_user_row) solo se consulta si la sesión no está en este proceso, si el
+# perfil del formulero se invalidó o si pasaron _SESION_PERFIL_TTL segundos. Cerrar
+# sesión revoca ESE token: se anota en Sessions (REVOKE::<id>) para que ningún proceso
+# lo vuelva a aceptar, y las demás sesiones y perfiles cacheados no se tocan.
+_SESION_PERFIL_TTL = 3600
+
+@st.cache_resource(show_spinner=False)
+def _sesiones_store():
+    import threading
+    return {"lock": threading.RLock(), "activas": {}, "revocadas": {}, "rev_version": None,
+            "restauradas": 0, "lecturas_perfil": 0, "revocaciones": 0}
+
+def _sesion_guardar(tid, usuario, exp, perfil):
+    import time as _t_sg
+    store = _sesiones_store(); ahora = int(datetime.utcnow().timestamp())
+    with store["lock"]:
+        for k in [k for k, e in store["activas"].items() if e["exp"] < ahora]: del store["activas"][k]
+        store["activas"][tid] = {"usuario": usuario, "exp": exp, "perfil": dict(perfil),
+                                 "ver": cache_version("usuarios", f"perfil:{usuario}"),
+                                 "ts": _t_sg.monotonic()}
+
+def _sesion_revocada(store, tid):
+    """¿El token fue revocado? Relee los REVOKE:: de Sessions solo si la hoja cambió."""
+    ver = hoja_version("Sessions")
+    with store["lock"]:
+        if ver and ver != store["rev_version"]:
+            for r in hoja_valores("Sessions") or []:
+                if r and r[0].startswith("REVOKE::"):
+                    store["revocadas"].setdefault(r[0][len("REVOKE::"):].strip(), 0)
+            store["rev_version"] = ver
+        return tid in store["revocadas"]
+
+def sesion_perfil(token):
+    """Perfil de la sesión del token (None si la firma no vale, venció o fue revocada)."""
+    import time as _t_sp
+    d = _token_datos(token)
+    if not d: return None
+    usuario, exp, tid = d
+    store = _sesiones_store()
+    if _sesion_revocada(store, tid): return None
+    with store["lock"]:
+        e = store["activas"].get(tid)
+        if (e and e["ver"] == cache_version("usuarios", f"perfil:{usuario}")
+                and _t_sp.monotonic() - e["ts"] < _SESION_PERFIL_TTL):
+            store["restauradas"] += 1
+            return dict(e["perfil"])
+    perfil = _get_perfil(usuario)
+    with store["lock"]: store["lecturas_perfil"] += 1
+    if perfil: _sesion_guardar(tid, usuario, exp, perfil)
+    return perfil
+
+def sesion_revocar(token):
+    """Cierra una sesión: fuera del store local y anotada en Sessions para todos los procesos."""
+    d = _token_datos(token)
+    if not d: return
+    store = _sesiones_store()
+    with store["lock"]:
+        store["activas"].pop(d[2], None)
+        store["revocadas"][d[2]] = d[1]; store["revocaciones"] += 1
+    try:
+        hoja_append("Sessions", [f"REVOKE::{d[2]}", datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")],
+                    value_input_option="USER_ENTERED")
+    except Exception: pass
+
+def sesiones_stats():
+    store = _sesiones_store()
+    with store["lock"]:
+        return {"activas": len(store["activas"]), "revocadas": len(store["revocadas"]),
+                "restauradas": store["restauradas"], "lecturas_perfil": store["lecturas_perfil"],
+                "revocaciones": store["revocaciones"]}
+
 # ─────────────────────────────────────────────────────────
 # 6. PERFIL CACHEADO
 # ─────────────────────────────────────────────────────────
-@st.cache_data(ttl=300, show_spinner=False)
 def _get_perfil(usuario: str):
+    return _get_perfil_cached(usuario, cache_version("usuarios", f"perfil:{usuario}"))
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _get_perfil_cached(usuario: str, ver=None):
     m = _mod_auth()
     if "_error" in m or "get_user_row" not in m: return None
     def _do():
@@ -988,11 +3194,11 @@ def is_admin():
     return "admin" in rol or "comisario" in rol
 
 def logout():
+    _tok_out = qp_get("t")
     try: st.query_params.clear()
     except: pass
     for k in ("perfil","usuario","_tok_done"): st.session_state[k] = None if k!="_tok_done" else False
-    try: _get_perfil.clear()
-    except: pass
+    if _tok_out: sesion_revocar(_tok_out)
     components.html('<script>localStorage.removeItem("fw_token");</script>',height=0)
 
 def _driver_avatar_html(nombre, color="#a855f7", size=48):
@@ -1014,87 +3220,17 @@ def render_dark_table(df, prev_ranking=None):
     df2 = df.copy()
     if {"Piloto","Puntos"}.issubset(df2.columns):
         df2 = df2.sort_values("Puntos",ascending=False).reset_index(drop=True)
-
-    # Find leaders per category
-    max_pts = int(df2["Puntos"].max()) if "Puntos" in df2.columns else 0
-    max_q   = int(df2["Qualys"].max())  if "Qualys"   in df2.columns else 0
-    max_s   = int(df2["Sprints"].max()) if "Sprints"  in df2.columns else 0
-    max_r   = int(df2["Carreras"].max())if "Carreras" in df2.columns else 0
-
-    rows_html = ""
-    for i, row in df2.iterrows():
-        pil  = str(row.get("Piloto",""))
-        pts  = int(row.get("Puntos",0))
-        q    = int(row.get("Qualys",0))  if "Qualys"   in df2.columns else 0
-        sp   = int(row.get("Sprints",0)) if "Sprints"  in df2.columns else 0
-        ca   = int(row.get("Carreras",0))if "Carreras" in df2.columns else 0
-        clr  = PILOTO_COLORS.get(pil,"#a855f7")
-        medals = {0:"🥇",1:"🥈",2:"🥉"}
-        pos_ico = medals.get(i, f"<b style='color:rgba(169,178,214,.5);'>{i+1}</b>")
-
-        # Position change arrow
-        if prev_ranking and pil in prev_ranking:
-            prev = prev_ranking[pil]
-            if i < prev:   arrow = f'<span style="color:#4ade80;font-size:11px;">▲</span>'
-            elif i > prev: arrow = f'<span style="color:#ef4444;font-size:11px;">▼</span>'
-            else:           arrow = f'<span style="color:rgba(169,178,214,.3);font-size:11px;">—</span>'
-        else: arrow = ""
-
-        is_leader = (i == 0)
-        row_bg = f"background:linear-gradient(90deg,{clr}18,{clr}08,transparent)" if is_leader else ("rgba(255,255,255,.025)" if i%2==0 else "transparent")
-        row_border = f"border-left:3px solid {clr};" if is_leader else f"border-left:3px solid {clr}55;"
-
-        # Category badges
-        q_badge  = f' <span style="background:#D4AF3788;color:#1a1000;border-radius:6px;padding:0 4px;font-size:8px;font-weight:900;">👑Q</span>' if q == max_q and max_q > 0 else ""
-        s_badge  = f' <span style="background:#a855f788;color:#fff;border-radius:6px;padding:0 4px;font-size:8px;font-weight:900;">⚡S</span>' if sp == max_s and max_s > 0 else ""
-        r_badge  = f' <span style="background:#4ade8088;color:#051a05;border-radius:6px;padding:0 4px;font-size:8px;font-weight:900;">🏁R</span>' if ca == max_r and max_r > 0 else ""
-
-        pts_style = f"color:#ffdd7a;font-weight:900;font-size:{'16' if is_leader else '14'}px;"
-        rows_html += (
-            f'<tr style="{row_bg};{row_border}">'
-            f'<td style="text-align:center;width:36px;">{pos_ico}</td>'
-            f'<td style="padding-left:4px;">{arrow}</td>'
-            f'<td><span style="color:{clr};font-weight:800;">{pil}</span>{q_badge}{s_badge}{r_badge}</td>'
-            f'<td style="text-align:center;{pts_style}">{pts}</td>'
-        )
-        if "Qualys"   in df2.columns: rows_html += f'<td style="text-align:center;color:{"#D4AF37" if q==max_q and max_q>0 else "rgba(169,178,214,.6)"};font-weight:{"900" if q==max_q and max_q>0 else "400"};">{q}</td>'
-        if "Sprints"  in df2.columns: rows_html += f'<td style="text-align:center;color:{"#a855f7" if sp==max_s and max_s>0 else "rgba(169,178,214,.6)"};font-weight:{"900" if sp==max_s and max_s>0 else "400"};">{sp}</td>'
-        if "Carreras" in df2.columns: rows_html += f'<td style="text-align:center;color:{"#4ade80" if ca==max_r and max_r>0 else "rgba(169,178,214,.6)"};font-weight:{"900" if ca==max_r and max_r>0 else "400"};">{ca}</td>'
-        rows_html += "</tr>"
-
-    # Headers
-    headers = ["#","","Formulero","Pts"]
-    if "Qualys"   in df2.columns: headers.append("Qualys")
-    if "Sprints"  in df2.columns: headers.append("Sprints")
-    if "Carreras" in df2.columns: headers.append("Carreras")
-    head_html = "".join(f'<th style="font-size:9px;letter-spacing:.1em;color:rgba(212,175,55,.7);text-transform:uppercase;padding:8px 6px;">{h}</th>' for h in headers)
-
-    st.markdown(
-        f'<div class="fw-table-wrap">'
-        f'<table class="fw-table" style="width:100%;border-collapse:collapse;">'
-        f'<thead><tr style="border-bottom:1px solid rgba(212,175,55,.2);">{head_html}</tr></thead>'
-        f'<tbody>{rows_html}</tbody>'
-        f'</table></div>',
-        unsafe_allow_html=True
-    )
-    # Legend
-    st.markdown(
-        '<div style="font-size:9px;color:rgba(169,178,214,.4);margin-top:4px;">'
-        '👑Q = más qualys ganadas &nbsp;·&nbsp; ⚡S = más sprints ganados &nbsp;·&nbsp; 🏁R = más carreras ganadas'
-        '</div>', unsafe_allow_html=True
-    )
+    st.markdown(html_tabla_general(df2, prev_ranking), unsafe_allow_html=True)
 
 def normalizar_keys_num(d):
     if not isinstance(d,dict): return {}
     return {int(k) if (isinstance(k,str) and k.isdigit()) else k:v for k,v in d.items()}
 
 def calcular_constructores_auto(of_r, grilla, escala, top_n=3):
-    m = _mod_core()
-    nn = m.get("normalizar_nombre", lambda x:x.lower().strip()) if "_error" not in m else lambda x:x.lower().strip()
-    d2t = {nn(d):t for t,ds in grilla.items() for d in ds}
+    d2t = {piloto_id(d):t for t,ds in grilla.items() for d in ds}
     tp = defaultdict(int)
     for pos,pts in escala.items():
-        p = nn(of_r.get(pos,""))
+        p = piloto_id(of_r.get(pos,""))
         if p and p in d2t: tp[d2t[p]] += int(pts)
     ranking = sorted(tp.items(),key=lambda x:(-x[1],x[0]))
     return [t for t,_ in ranking[:top_n]], dict(tp)
@@ -1121,6 +3257,342 @@ def _mc_is_mod(u):
         except: pass
     return u in MESA_CHICA_MODS
 
+# Pestañas perezosas: st.tabs ejecuta el cuerpo de TODAS las pestañas en cada
+# rerun; lazy_tabs dibuja la misma tira de pestañas (radio horizontal con estilo
+# de tab) y solo deja correr la elegida.
+_LAZY_TABS_CSS = """<style>
+[class*="st-key-lt_"] div[role="radiogroup"]{gap:2px;flex-wrap:wrap;
+  border-bottom:1px solid rgba(212,175,55,.18);margin-bottom:10px;}
+[class*="st-key-lt_"] div[role="radiogroup"] label{margin:0;padding:7px 12px;cursor:pointer;
+  border-radius:10px 10px 0 0;border-bottom:2px solid transparent;}
+[class*="st-key-lt_"] div[role="radiogroup"] label > div:first-child{display:none;}
+[class*="st-key-lt_"] div[role="radiogroup"] label:has(input:checked){
+  border-bottom-color:#D4AF37;background:rgba(212,175,55,.08);}
+[class*="st-key-lt_"] div[role="radiogroup"] label:has(input:checked) p{color:#ffdd7a;font-weight:800;}
+</style>"""
+
+def lazy_tabs(labels, key, target=None):
+    """Como st.tabs, pero devuelve un bool por pestaña (`if tab:` en vez de `with tab:`).
+
+    La selección vive en session_state[key] y sobrevive a los reruns; `target`
+    (texto contenido en una etiqueta) fuerza la pestaña a mostrar."""
+    if target:
+        _hit = next((l for l in labels if target in l), None)
+        if _hit: st.session_state[key] = _hit
+    if st.session_state.get(key) not in labels:
+        # Streamlit borra la clave del widget al salir de la pantalla: restaurar la copia
+        _prev = st.session_state.get(f"_lt_{key}")
+        st.session_state[key] = _prev if _prev in labels else labels[0]
+    st.markdown(_LAZY_TABS_CSS, unsafe_allow_html=True)
+    try: _box = st.container(key=f"lt_{key}")
+    except TypeError: _box = st.container()
+    with _box:
+        sel = st.radio(key, labels, key=key, horizontal=True, label_visibility="collapsed")
+    st.session_state[f"_lt_{key}"] = sel
+    return [l == sel for l in labels]
+
+# ─────────────────────────────────────────────────────────
+# 7a. PLANTILLAS HTML — compiladas una vez, CSS compartido inyectado una vez
+# ─────────────────────────────────────────────────────────
+# Tabla general, podio, grilla de pilotos, alineación de predicciones y chat de
+# la Mesa armaban su HTML con += de f-strings con todo el estilo inline en cada
+# fila, y re-emitían su propio <style> en cada llamada. Cada fila es ahora una
+# Plantilla compilada al importar (texto minificado + format_map ligado), el
+# render de N filas es un solo join y el estilo vive en clases tp-*/fw-pod-*/
+# f1d-* que main() inyecta UNA vez por rerun. Inline queda solo lo que cambia
+# por fila (color del piloto/escudería). bench/bench_plantillas.py mide la
+# diferencia contra el armado anterior.
+class Plantilla:
+    """Plantilla HTML con campos {nombre}: se minifica y compila a una función
+    con un f-string (como hace jinja), así el render no parsea nada."""
+    __slots__ = ("src", "campos", "_fn")
+
+    def __init__(self, src):
+        import string
+        self.src = "".join(l.strip() for l in src.strip().splitlines())
+        _partes, _campos = [], []
+        for _lit, _campo, _, _ in string.Formatter().parse(self.src):
+            _partes.append(_lit.replace("{", "{{").replace("}", "}}"))
+            if _campo:
+                _partes.append("{" + _campo + "}")
+                if _campo not in _campos: _campos.append(_campo)
+        self.campos = tuple(_campos)
+        _ns = {}
+        exec(f"def _render({', '.join(_campos)}):\n    return f{''.join(_partes)!r}", _ns)
+        self._fn = _ns["_render"]
+
+    def __call__(self, **campos):
+        return self._fn(**campos)
+
+    def filas(self, filas):
+        """Render de muchas filas (iterable de dicts) en un único join."""
+        _fn = self._fn
+        return "".join([_fn(**f) for f in filas])
+
+_TPL_CSS = """<style>
+.tp-tbl{width:100%;border-collapse:collapse;}
+.tp-tbl thead tr{border-bottom:1px solid rgba(212,175,55,.2);}
+.tp-tbl th{font-size:9px;letter-spacing:.1em;color:rgba(212,175,55,.7);text-transform:uppercase;padding:8px 6px;}
+.tp-tbl td.pos{text-align:center;width:36px;}
+.tp-tbl td.ar{padding-left:4px;}
+.tp-tbl td.c{text-align:center;color:rgba(169,178,214,.6);font-weight:400;}
+.tp-tbl td.pts{text-align:center;color:#ffdd7a;font-weight:900;font-size:14px;}
+.tp-tbl tr.lider td.pts{font-size:16px;}
+.tp-tbl td.tq{color:#D4AF37;font-weight:900;}
+.tp-tbl td.ts{color:#a855f7;font-weight:900;}
+.tp-tbl td.tr{color:#4ade80;font-weight:900;}
+.tp-tbl .pil{font-weight:800;}
+.tp-tbl .pos-n{color:rgba(169,178,214,.5);}
+.tp-up,.tp-dn,.tp-eq{font-size:11px;}
+.tp-up{color:#4ade80;} .tp-dn{color:#ef4444;} .tp-eq{color:rgba(169,178,214,.3);}
+.tp-bdg{border-radius:6px;padding:0 4px;font-size:8px;font-weight:900;}
+.tp-bq{background:#D4AF3788;color:#1a1000;} .tp-bs{background:#a855f788;color:#fff;}
+.tp-br{background:#4ade8088;color:#051a05;}
+.tp-leyenda{font-size:9px;color:rgba(169,178,214,.4);margin-top:4px;}
+@keyframes podRise{from{opacity:0;transform:translateY(20px);}to{opacity:1;transform:translateY(0);}}
+@keyframes podShine{0%,100%{filter:drop-shadow(0 0 6px #D4AF3766);}50%{filter:drop-shadow(0 0 16px #D4AF37cc);}}
+.fw-podium{display:flex;align-items:flex-end;justify-content:center;gap:10px;padding:24px 8px 0;
+  margin-bottom:6px;animation:podRise .6s ease;max-width:560px;margin-left:auto;margin-right:auto;}
+.fw-pod-col{display:flex;flex-direction:column;align-items:center;flex:1;max-width:170px;}
+.fw-pod-name{font-weight:900;font-size:13px;letter-spacing:.02em;text-align:center;margin:8px 0 2px;
+  line-height:1.15;white-space:nowrap;overflow:hidden;text-overflow:ellipsis;max-width:100%;}
+.fw-pod-pts{font-size:26px;font-weight:900;line-height:1;}
+.fw-pod-lbl{font-size:9px;letter-spacing:.18em;color:rgba(232,236,255,.4);margin-top:1px;}
+.fw-pod-base{width:100%;border-radius:12px 12px 0 0;display:flex;align-items:flex-start;justify-content:center;
+  padding-top:10px;font-size:38px;font-weight:900;position:relative;box-shadow:inset 0 2px 12px rgba(255,255,255,.08);}
+.fw-pod-crown{font-size:28px;margin-bottom:2px;animation:podShine 2.5s ease-in-out infinite;}
+.fw-pod-av{border-radius:50%;overflow:hidden;margin:0 auto;display:flex;align-items:center;justify-content:center;font-weight:900;}
+.fw-pod-av img{width:100%;height:100%;object-fit:cover;object-position:center 12%;}
+@media (max-width:600px){
+  .fw-podium{gap:5px;padding:16px 2px 0;} .fw-pod-name{font-size:10px;} .fw-pod-pts{font-size:19px;}
+  .fw-pod-base{font-size:26px;} .fw-pod-crown{font-size:20px;}
+}
+.f1-drivers-grid{display:grid;grid-template-columns:repeat(auto-fill,minmax(150px,1fr));gap:14px;padding:8px 0 16px;}
+.f1d-card{background:linear-gradient(145deg,rgba(7,10,25,.97) 0%,rgba(14,18,42,.95) 100%);
+  border:1.5px solid var(--tc,#a855f7);border-radius:16px;overflow:hidden;position:relative;
+  transition:transform .25s ease,box-shadow .25s ease;box-shadow:0 4px 18px rgba(0,0,0,.5);}
+.f1d-card:hover{transform:translateY(-6px) scale(1.02);box-shadow:0 10px 32px rgba(0,0,0,.7),0 0 20px var(--tc,#a855f7)33;}
+.f1d-top-stripe{height:3px;background:var(--tc,#a855f7);width:100%;}
+.f1d-logo{position:absolute;top:10px;left:8px;height:18px;max-width:54px;object-fit:contain;
+  opacity:.85;filter:brightness(1.2);z-index:3;}
+.f1d-team-badge{position:absolute;top:10px;right:10px;font-size:8px;font-weight:900;color:var(--tc,#a855f7);
+  background:rgba(0,0,0,.6);border:1px solid var(--tc,#a855f7)55;border-radius:6px;padding:2px 6px;
+  letter-spacing:.1em;z-index:2;display:flex;align-items:center;gap:4px;}
+.f1d-photo-wrap{width:100%;aspect-ratio:1 / 1.05;overflow:hidden;
+  background:linear-gradient(180deg,rgba(0,0,0,.1),rgba(0,0,0,.5));position:relative;}
+.f1d-photo{width:100%;height:100%;object-fit:cover;object-position:center 18%;display:block;transition:transform .3s ease;}
+@media (max-width:768px){
+  .f1d-photo-wrap{aspect-ratio:1 / 1.05 !important;background:#08091e !important;}
+  .f1d-photo{object-fit:cover !important;object-position:center 18% !important;}
+}
+.f1d-card:hover .f1d-photo{transform:scale(1.04);}
+.f1d-fallback{width:100%;height:100%;display:none;align-items:center;justify-content:center;
+  font-size:36px;font-weight:900;background:rgba(0,0,0,.4);color:var(--tc);}
+.f1d-info{padding:10px 10px 12px;background:linear-gradient(0deg,rgba(0,0,0,.85),rgba(0,0,0,.4));}
+.f1d-flag{font-size:14px;margin-bottom:3px;}
+.f1d-firstname{font-size:9px;font-weight:500;color:rgba(232,236,255,.6);text-transform:uppercase;letter-spacing:.08em;line-height:1.2;}
+.f1d-lastname{font-size:13px;font-weight:900;color:var(--tc,#e8ecff);letter-spacing:.04em;line-height:1.2;margin-bottom:4px;}
+.f1d-team-name{font-size:8px;color:var(--tc,#a855f7);font-weight:700;letter-spacing:.12em;text-transform:uppercase;opacity:.8;}
+.tp-lu{display:flex;flex-direction:column;gap:4px;}
+.tp-lu-f{display:flex;align-items:center;gap:10px;padding:7px 12px;background:rgba(255,255,255,.03);
+  border:1px solid rgba(255,255,255,.07);border-left:3px solid var(--tc);border-radius:10px;min-height:56px;}
+.tp-lu-f.vacio{padding:8px 12px;background:rgba(255,255,255,.015);border:1px dashed rgba(255,255,255,.09);}
+.tp-lu-n{font-weight:900;font-size:15px;min-width:24px;text-align:center;}
+.tp-lu-av{width:42px;height:42px;border-radius:50%;overflow:hidden;border:2px solid var(--tc);flex-shrink:0;background:#080b1a;}
+.vacio .tp-lu-av{background:rgba(255,255,255,.04);border:1.5px dashed rgba(255,255,255,.15);}
+.tp-lu-av img{width:100%;height:100%;object-fit:cover;object-position:top 5%;display:block;}
+.tp-lu-ini{width:100%;height:100%;align-items:center;justify-content:center;font-weight:900;font-size:11px;color:var(--tc);}
+.tp-lu-txt{flex:1;min-width:0;overflow:hidden;}
+.tp-lu-eq{font-size:9px;font-weight:700;letter-spacing:.1em;color:var(--tc);text-transform:uppercase;opacity:.85;white-space:nowrap;overflow:hidden;}
+.tp-lu-1{font-size:11px;font-weight:400;color:rgba(169,178,214,.65);white-space:nowrap;overflow:hidden;text-overflow:ellipsis;}
+.tp-lu-2{font-size:13px;font-weight:900;color:#e8ecff;letter-spacing:.02em;white-space:nowrap;overflow:hidden;text-overflow:ellipsis;}
+.tp-lu-sin{color:rgba(169,178,214,.35);font-size:11px;font-style:italic;}
+.tp-mc{display:flex;align-items:flex-end;gap:6px;margin-bottom:2px;}
+.tp-mc.propio{justify-content:flex-end;}
+.tp-mc-lote{display:flex;flex-direction:column;gap:1rem;}
+.tp-mc-col{max-width:70%;}
+.tp-mc-b{border:1px solid var(--c33);border-radius:14px 14px 14px 3px;padding:8px 12px 5px;max-width:100%;
+  word-break:break-word;background:rgba(255,255,255,.03);}
+.propio .tp-mc-b{border-radius:14px 14px 3px 14px;background:linear-gradient(135deg,var(--c1a),rgba(8,12,30,.97));}
+.tp-mc-h{display:flex;align-items:center;gap:5px;margin-bottom:2px;}
+.tp-mc-u{font-size:10px;font-weight:900;color:var(--c);}
+.tp-mc-bd{background:var(--c22);color:var(--c);border-radius:20px;padding:1px 6px;font-size:8px;font-weight:800;}
+.tp-mc-t{font-size:8px;color:rgba(169,178,214,.3);margin-left:auto;}
+.tp-mc-x{font-size:13px;color:rgba(232,236,255,.9);}
+.tp-mc-av{width:30px;height:30px;border-radius:50%;flex-shrink:0;border:2px solid var(--c);}
+img.tp-mc-av{object-fit:cover;object-position:top;}
+div.tp-mc-av{background:var(--c22);border-width:1.5px;display:flex;align-items:center;justify-content:center;
+  font-weight:900;font-size:9px;color:var(--c);}
+</style>"""
+
+def inyectar_css_plantillas():
+    """Una vez por rerun (desde main): clases compartidas de las plantillas."""
+    st.markdown(_TPL_CSS, unsafe_allow_html=True)
+
+def _iniciales(nombre):
+    return "".join(w[0] for w in str(nombre).split()[:2]).upper()
+
+# ── Tabla general ──
+_TP_TABLA = Plantilla("""
+<div class="fw-table-wrap"><table class="fw-table tp-tbl">
+<thead><tr>{head}</tr></thead><tbody>{filas}</tbody></table></div>
+<div class="tp-leyenda">👑Q = más qualys ganadas &nbsp;·&nbsp; ⚡S = más sprints ganados &nbsp;·&nbsp; 🏁R = más carreras ganadas</div>
+""")
+_TP_TABLA_FILA = Plantilla("""
+<tr class="{cls}" style="border-left:3px solid {borde};{fondo}">
+<td class="pos">{pos}</td><td class="ar">{flecha}</td>
+<td><span class="pil" style="color:{clr}">{pil}</span>{badges}</td>
+<td class="pts">{pts}</td>{extra}</tr>
+""")
+_TP_TD = Plantilla('<td class="{cls}">{v}</td>')
+_TP_TABLA_MEDALLAS = {0: "🥇", 1: "🥈", 2: "🥉"}
+_TP_TABLA_FLECHAS  = {-1: '<span class="tp-up">▲</span>', 1: '<span class="tp-dn">▼</span>',
+                      0: '<span class="tp-eq">—</span>'}
+_TP_TABLA_EXTRAS   = (("Qualys", "tq", '<span class="tp-bdg tp-bq">👑Q</span>'),
+                      ("Sprints", "ts", '<span class="tp-bdg tp-bs">⚡S</span>'),
+                      ("Carreras", "tr", '<span class="tp-bdg tp-br">🏁R</span>'))
+
+def html_tabla_general(df, prev_ranking=None):
+    """HTML de la tabla general (ver render_dark_table)."""
+    _n = len(df)
+    _col = lambda c: [int(v) for v in df[c].tolist()] if c in df.columns else [0] * _n
+    _pils = [str(p) for p in df["Piloto"].tolist()] if "Piloto" in df.columns else [""] * _n
+    _ptos = _col("Puntos")
+    _extras = []
+    for c, cls, bdg in _TP_TABLA_EXTRAS:
+        if c in df.columns:
+            _v = _col(c)
+            _extras.append((_v, max(_v, default=0), cls, bdg))
+    _filas = []
+    for i, pil in enumerate(_pils):
+        clr = PILOTO_COLORS.get(pil, "#a855f7")
+        _lider = i == 0
+        _flecha = ""
+        if prev_ranking and pil in prev_ranking:
+            _flecha = _TP_TABLA_FLECHAS[(i > prev_ranking[pil]) - (i < prev_ranking[pil])]
+        _badges, _tds = "", ""
+        for _v, mx, cls, bdg in _extras:
+            if _v[i] == mx and mx > 0:
+                _badges += " " + bdg
+                _tds += _TP_TD(cls=f"c {cls}", v=_v[i])
+            else:
+                _tds += _TP_TD(cls="c", v=_v[i])
+        _filas.append(_TP_TABLA_FILA(
+            cls="lider" if _lider else "", clr=clr, pil=pil,
+            borde=clr if _lider else f"{clr}55",
+            fondo=f"background:linear-gradient(90deg,{clr}18,{clr}08,transparent)" if _lider else "",
+            pos=_TP_TABLA_MEDALLAS.get(i) or f'<b class="pos-n">{i+1}</b>',
+            flecha=_flecha, badges=_badges, pts=_ptos[i], extra=_tds))
+    _head = "".join(f"<th>{h}</th>" for h in ["#", "", "Formulero", "Pts"] + [c for c, *_ in _TP_TABLA_EXTRAS if c in df.columns])
+    return _TP_TABLA(head=_head, filas="".join(_filas))
+
+# ── Podio ──
+_TP_POD_AV = Plantilla("""
+<div class="fw-pod-av" style="width:{size}px;height:{size}px;border:{ring}px solid {clr};
+box-shadow:0 0 18px {clr}88;background:{clr}22;color:{clr};font-size:{fs}px;">{cont}</div>
+""")
+_TP_POD_IMG = Plantilla("""<img src="{foto}" onerror="this.parentElement.textContent='{ini}'">""")
+_TP_POD_COL = Plantilla("""
+<div class="fw-pod-col">{corona}{avatar}
+<div class="fw-pod-name" style="color:{clr};{nombre_css}">{pil}</div>
+<div class="fw-pod-pts" style="color:{pts_clr};{pts_css}">{pts}</div>
+<div class="fw-pod-lbl">PUNTOS</div>
+<div class="fw-pod-base" style="height:{alto}px;{base_css}">{n}</div></div>
+""")
+_TP_POD_LUGARES = {   # n: (tamaño, aro, alto base, estilo base, css nombre, color pts, css pts)
+    1: (84, 4, 130, "background:linear-gradient(180deg,rgba(212,175,55,.4),rgba(212,175,55,.1));"
+                    "color:#ffdd7a;border:1px solid rgba(212,175,55,.4);border-bottom:none;",
+        "font-size:15px;", "#ffdd7a", "font-size:30px;"),
+    2: (64, 3, 90, "background:linear-gradient(180deg,rgba(192,192,192,.32),rgba(192,192,192,.08));"
+                   "color:rgba(192,192,192,.85);", "", "#e8ecff", ""),
+    3: (58, 3, 68, "background:linear-gradient(180deg,rgba(205,127,50,.32),rgba(205,127,50,.08));"
+                   "color:rgba(205,127,50,.9);", "", "#e8ecff", ""),
+}
+
+def html_podio(top3):
+    """Podio 2-1-3. `top3` = [(piloto, puntos, color, foto), …] en orden 1°, 2°, 3°."""
+    _cols = []
+    for n in (2, 1, 3):
+        pil, pts, clr, foto = top3[n - 1]
+        size, ring, alto, base_css, nombre_css, pts_clr, pts_css = _TP_POD_LUGARES[n]
+        ini = _iniciales(pil)
+        _av = _TP_POD_AV(size=size, ring=ring, clr=clr, fs=int(size * 0.36),
+                         cont=_TP_POD_IMG(foto=foto, ini=ini) if foto else ini)
+        _cols.append(_TP_POD_COL(corona='<div class="fw-pod-crown">👑</div>' if n == 1 else "",
+                                 avatar=_av, clr=clr, nombre_css=nombre_css, pil=pil,
+                                 pts_clr=pts_clr, pts_css=pts_css, pts=pts, alto=alto,
+                                 base_css=base_css, n=n))
+    return '<div class="fw-podium">' + "".join(_cols) + "</div>"
+
+# ── Grilla de pilotos F1 ──
+_NACIONALIDADES = {
+    "Lando Norris": "🇬🇧", "Oscar Piastri": "🇦🇺", "Max Verstappen": "🇳🇱",
+    "Isack Hadjar": "🇫🇷", "Kimi Antonelli": "🇮🇹", "George Russell": "🇬🇧",
+    "Charles Leclerc": "🇲🇨", "Lewis Hamilton": "🇬🇧", "Alex Albon": "🇹🇭",
+    "Carlos Sainz": "🇪🇸", "Lance Stroll": "🇨🇦", "Fernando Alonso": "🇪🇸",
+    "Liam Lawson": "🇳🇿", "Arvid Lindblad": "🇸🇪", "Oliver Bearman": "🇬🇧",
+    "Esteban Ocon": "🇫🇷", "Nico Hulkenberg": "🇩🇪", "Gabriel Bortoleto": "🇧🇷",
+    "Pierre Gasly": "🇫🇷", "Franco Colapinto": "🇦🇷",
+    "Checo Perez": "🇲🇽", "Valteri Bottas": "🇫🇮",
+}
+_TP_F1D = Plantilla("""
+<div class="f1d-card fade-up" style="--tc:{color}">
+<div class="f1d-top-stripe"></div>
+<div class="f1d-team-badge"><span>{abbr}</span></div>
+<img src="{logo}" class="f1d-logo" onerror="this.style.display='none';" loading="lazy">
+<div class="f1d-photo-wrap"><img src="{foto}" class="f1d-photo" onerror="this.style.display='none';this.nextElementSibling.style.display='flex';" loading="lazy"><div class="f1d-fallback">{ini}</div></div>
+<div class="f1d-info"><div class="f1d-flag">{flag}</div>
+<div class="f1d-firstname">{nombre}</div><div class="f1d-lastname">{apellido}</div>
+<div class="f1d-team-name">{equipo}</div></div></div>
+""")
+
+def html_grilla_pilotos():
+    """Cards de los 22 pilotos de GRILLA_2026."""
+    _cards = []
+    for equipo, pilotos in GRILLA_2026.items():
+        color = TEAM_COLORS.get(equipo, "#A855F7")
+        abbr  = TEAM_LOGOS_SVG.get(equipo, equipo[:3])
+        logo  = TEAM_LOGOS_CDN.get(equipo, "")
+        for pil in pilotos:
+            _p = pil.split()
+            _cards.append({"color": color, "abbr": abbr, "logo": logo, "equipo": equipo,
+                           "foto": DRIVER_PHOTOS.get(pil, ""), "ini": _iniciales(pil),
+                           "flag": _NACIONALIDADES.get(pil, "🌍"),
+                           "nombre": " ".join(_p[:-1]), "apellido": _p[-1].upper()})
+    return '<div class="f1-drivers-grid">' + _TP_F1D.filas(_cards) + "</div>"
+
+# ── Alineación de predicciones ──
+_TP_LU_VACIO = Plantilla("""
+<div class="tp-lu-f vacio"><span class="tp-lu-n" style="color:{pc}">{i}</span>
+<div class="tp-lu-av"></div><span class="tp-lu-sin">Sin seleccionar</span></div>
+""")
+_TP_LU = Plantilla("""
+<div class="tp-lu-f" style="--tc:{tc}"><span class="tp-lu-n" style="color:{pc};font-size:{sz}">{i}</span>
+<div class="tp-lu-av">{img}<div class="tp-lu-ini" style="display:{ini_disp}">{ini}</div></div>
+<div class="tp-lu-txt"><div class="tp-lu-eq">{eq}</div><div class="tp-lu-1">{first}</div>
+<div class="tp-lu-2">{last}</div></div></div>
+""")
+_TP_LU_IMG = Plantilla("""<img src="{ph}" onerror="this.style.display='none';this.nextSibling.style.display='flex'">""")
+
+# ── Chat de la Mesa de Formuleros ──
+_TP_MC_IMG = Plantilla('<img class="tp-mc-av" src="{ph}">')
+_TP_MC_INI = Plantilla('<div class="tp-mc-av">{ini}</div>')
+_TP_MC_MSG = Plantilla("""
+<div class="tp-mc {lado}" style="--c:{c};--c1a:{c}1a;--c22:{c}22;--c33:{c}33">{antes}
+<div class="tp-mc-col"><div class="tp-mc-b"><div class="tp-mc-h">
+<span class="tp-mc-u">{nombre}</span><span class="tp-mc-bd">{badge}</span><span class="tp-mc-t">{ts}</span>
+</div><div class="tp-mc-x">{texto}</div></div></div>{despues}</div>
+""")
+
+def html_mc_mensaje(usuario_msg, texto_html, ts, propio):
+    """Burbuja de la Mesa (texto ya sanitizado)."""
+    clr = PILOTO_COLORS.get(usuario_msg, "#a855f7")
+    ph  = DRIVER_HEADSHOTS.get(usuario_msg, DRIVER_PHOTOS.get(usuario_msg, ""))
+    av  = _TP_MC_IMG(ph=ph) if ph else _TP_MC_INI(ini=_iniciales(usuario_msg))
+    return _TP_MC_MSG(lado="propio" if propio else "", c=clr, nombre=usuario_msg.split()[0],
+                      badge=_mc_badge(usuario_msg)[1], ts=ts, texto=texto_html,
+                      antes="" if propio else av, despues=av if propio else "")
+
 # ─────────────────────────────────────────────────────────
 # 7b. NUEVOS HELPERS VISUALES PARA PREDICCIONES (estilo VueltaRápida)
 # ─────────────────────────────────────────────────────────
@@ -1131,57 +3603,17 @@ def _make_lineup_preview(kp, count):
     for i in range(1, count + 1):
         nombre = st.session_state.get(f"{kp}_{i}", "")
         pc = POS_COL.get(i, "#6366f1")
-
         if not nombre:
-            rows.append(
-                f'<div style="display:flex;align-items:center;gap:10px;padding:8px 12px;'
-                f'background:rgba(255,255,255,.015);border:1px dashed rgba(255,255,255,.09);'
-                f'border-radius:10px;min-height:56px;">'
-                f'<span style="color:{pc};font-weight:900;font-size:15px;min-width:24px;'
-                f'text-align:center;">{i}</span>'
-                f'<div style="width:42px;height:42px;border-radius:50%;background:rgba(255,255,255,.04);'
-                f'border:1.5px dashed rgba(255,255,255,.15);flex-shrink:0;"></div>'
-                f'<span style="color:rgba(169,178,214,.35);font-size:11px;font-style:italic;">'
-                f'Sin seleccionar</span></div>'
-            )
-        else:
-            eq   = next((t for t, ds in GRILLA_2026.items() if nombre in ds), "")
-            tc   = TEAM_COLORS.get(eq, "#a855f7")
-            # ← Headshot (cara) para predicciones, fallback a full-body
-            ph   = DRIVER_HEADSHOTS.get(nombre, DRIVER_PHOTOS.get(nombre, ""))
-            ini  = "".join(w[0] for w in nombre.split()[:2]).upper()
-            last  = nombre.split()[-1].upper()
-            first = " ".join(nombre.split()[:-1])
-            sz = "18px" if i <= 3 else "15px"
-
-            img_html = (
-                f'<img src="{ph}" '
-                f'style="width:100%;height:100%;object-fit:cover;object-position:top 5%;display:block;" '
-                f'onerror="this.style.display=\'none\';this.nextSibling.style.display=\'flex\'">'
-            ) if ph else ""
-            fallback_html = (
-                f'<div style="display:{"none" if ph else "flex"};width:100%;height:100%;'
-                f'align-items:center;justify-content:center;font-weight:900;font-size:11px;color:{tc};">'
-                f'{ini}</div>'
-            )
-            rows.append(
-                f'<div style="display:flex;align-items:center;gap:10px;padding:7px 12px;'
-                f'background:rgba(255,255,255,.03);border:1px solid rgba(255,255,255,.07);'
-                f'border-left:3px solid {tc};border-radius:10px;min-height:56px;">'
-                f'<span style="color:{pc};font-weight:900;font-size:{sz};min-width:24px;text-align:center;">{i}</span>'
-                f'<div style="width:42px;height:42px;border-radius:50%;overflow:hidden;'
-                f'border:2px solid {tc};flex-shrink:0;background:#080b1a;">'
-                f'{img_html}{fallback_html}</div>'
-                f'<div style="flex:1;min-width:0;overflow:hidden;">'
-                f'<div style="font-size:9px;font-weight:700;letter-spacing:.1em;color:{tc};'
-                f'text-transform:uppercase;opacity:.85;white-space:nowrap;overflow:hidden;">{eq}</div>'
-                f'<div style="font-size:11px;font-weight:400;color:rgba(169,178,214,.65);'
-                f'white-space:nowrap;overflow:hidden;text-overflow:ellipsis;">{first}</div>'
-                f'<div style="font-size:13px;font-weight:900;color:#e8ecff;letter-spacing:.02em;'
-                f'white-space:nowrap;overflow:hidden;text-overflow:ellipsis;">{last}</div>'
-                f'</div></div>'
-            )
-    return '<div style="display:flex;flex-direction:column;gap:4px;">' + "".join(rows) + '</div>'
+            rows.append(_TP_LU_VACIO(pc=pc, i=i))
+            continue
+        eq = next((t for t, ds in GRILLA_2026.items() if nombre in ds), "")
+        # ← Headshot (cara) para predicciones, fallback a full-body
+        ph = DRIVER_HEADSHOTS.get(nombre, DRIVER_PHOTOS.get(nombre, ""))
+        rows.append(_TP_LU(tc=TEAM_COLORS.get(eq, "#a855f7"), pc=pc, i=i, sz="18px" if i <= 3 else "15px",
+                           img=_TP_LU_IMG(ph=ph) if ph else "", ini_disp="none" if ph else "flex",
+                           ini=_iniciales(nombre), eq=eq, first=" ".join(nombre.split()[:-1]),
+                           last=nombre.split()[-1].upper()))
+    return '<div class="tp-lu">' + "".join(rows) + '</div>'
 
 
 def _make_teams_preview(kp, count):
@@ -1398,10 +3830,9 @@ def sidebar_login_block():
     token = qp_get("t")
     if not is_logged_in() and token and not st.session_state["_tok_done"]:
         st.session_state["_tok_done"] = True
-        u = auth_user_from_token(token)
-        if u:
+        if _token_datos(token):
             with st.spinner("Restaurando sesión..."):
-                perfil = _get_perfil(u)
+                perfil = sesion_perfil(token)
             if perfil:
                 st.session_state["perfil"] = perfil
                 st.session_state["usuario"] = perfil["usuario"]
@@ -1412,7 +3843,7 @@ def sidebar_login_block():
 
     if is_logged_in() and not qp_get("t"):
         u2 = (st.session_state.get("perfil") or {}).get("usuario","")
-        if u2: qp_set("t", auth_create_token(u2))
+        if u2: qp_set("t", auth_create_token(u2, perfil=st.session_state["perfil"]))
 
     if not is_logged_in():
         st.markdown("""
@@ -1471,15 +3902,8 @@ def sidebar_login_block():
 
         # ── Inject fullscreen background for login page ─────────────
         try:
-            import base64 as _b64_login
-            _bg_candidates = ["FORMULEROS.jpg","IMAGENFEFE.jfif","ui/FORMULEROS.jpg","IMAGENCUPULA.jfif"]
-            _bg_data = ""
-            for _bgf in _bg_candidates:
-                if os.path.exists(_bgf):
-                    with open(_bgf,"rb") as _bgfile:
-                        _ext = "jpeg"
-                        _bg_data = f"data:image/jpeg;base64,"+_b64_login.b64encode(_bgfile.read()).decode()
-                    break
+            _bgf = asset_primero("FORMULEROS.jpg","IMAGENFEFE.jfif","ui/FORMULEROS.jpg","IMAGENCUPULA.jfif")
+            _bg_data = asset_url(_bgf, 1600) if _bgf else ""
             if _bg_data:
                 st.markdown(f"""<style>
                 [data-testid="stAppViewContainer"] > section {{
@@ -1495,25 +3919,16 @@ def sidebar_login_block():
 
         # Login banner — FORMULEROS.jpg (auto F1) como banner compacto
         try:
-            import os as _os_li, base64 as _b64_li
-            _banner_candidates = ["FORMULEROS.jpg","IMAGENFEFE.jfif","ui/FORMULEROS.jpg"]
-            _banner_loaded = False
-            for _bc in _banner_candidates:
-                if _os_li.path.exists(_bc):
-                    with open(_bc,"rb") as _fli:
-                        _ext = _bc.split(".")[-1].lower()
-                        _mime = "image/jpeg" if _ext in ("jpg","jfif","jpeg") else "image/png"
-                        _b64_li_data = _b64_li.b64encode(_fli.read()).decode()
-                    st.markdown(
-                        f'<div style="max-width:440px;margin:0 auto;border-radius:18px;overflow:hidden;'
-                        f'box-shadow:0 8px 30px rgba(0,0,0,.55);border:1px solid rgba(59,130,246,.3);'
-                        f'background:#070b1a;">' +
-                        f'<img src="data:{_mime};base64,{_b64_li_data}" ' +
-                        f'style="width:100%;height:auto;display:block;">' +
-                        f'</div>',
-                        unsafe_allow_html=True)
-                    _banner_loaded = True
-                    break
+            _bc = asset_primero("FORMULEROS.jpg","IMAGENFEFE.jfif","ui/FORMULEROS.jpg")
+            _banner_img = asset_img(_bc, 960, sizes="(max-width:480px) 100vw, 440px",
+                                    style="width:100%;height:auto;display:block;") if _bc else ""
+            _banner_loaded = bool(_banner_img)
+            if _banner_loaded:
+                st.markdown(
+                    f'<div style="max-width:440px;margin:0 auto;border-radius:18px;overflow:hidden;'
+                    f'box-shadow:0 8px 30px rgba(0,0,0,.55);border:1px solid rgba(59,130,246,.3);'
+                    f'background:#070b1a;">' + _banner_img + f'</div>',
+                    unsafe_allow_html=True)
             if not _banner_loaded:
                 st.markdown(
                     '<div style="text-align:center;font-size:52px;padding:16px 0;">🏆</div>',
@@ -1628,7 +4043,7 @@ def sidebar_login_block():
                         if ok:
                             st.session_state["perfil"]  = res
                             st.session_state["usuario"] = res["usuario"]
-                            qp_set("t", auth_create_token(res["usuario"]))
+                            qp_set("t", auth_create_token(res["usuario"], perfil=res))
                             st.rerun()
                         else:
                             st.error(f"⛔ {res}")
@@ -1682,7 +4097,7 @@ def sidebar_login_block():
                            ("⚫ Formulero","rgba(255,255,255,.08)","#a9b2d6")],
     }
     # Lauda photo for sidebar
-    _LAUDA_PHOTO_B64 = "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcSgd3Dq9OHc2zK46t1QQLXbN_49nouLYDYv1w&s"
+    _LAUDA_PHOTO_B64 = DRIVER_HEADSHOTS.get("Nicki Lauda", "")
     # ── Cargar foto desde perfil de Google Sheets al iniciar sesión ──
     if not st.session_state.get(f"custom_photo_{usr}",""):
         _foto_from_perfil = perfil.get("foto_url","")
@@ -1806,103 +4221,60 @@ def sidebar_login_block():
                     ok,msg=_safe_call(m["bootstrap_user"],"Checo Perez","Comisario | Administrador",bpw,bmc,copas=3,color="gold",timeout_sec=10,default=(False,"Timeout"))
                     st.success(msg) if ok else st.error(msg)
 
-def _notif_ya_enviada(clave):
-    """Chequea en la hoja Sessions si una notif ya se envió (evita duplicados entre sesiones)."""
+def _notif_enviadas():
+    """Claves de notifs ya enviadas según la hoja Sessions (None si la hoja no responde)."""
     try:
-        from core.database import conectar_google_sheets as _cgs_n
-        _ws = _cgs_n("Sessions")
-        if not _ws: return False
-        _vals = _ws.get_all_values()
-        for _r in _vals:
-            if _r and len(_r) >= 1 and _r[0].strip() == f"NOTIF::{clave}":
-                return True
-        return False
+        _vals = hoja_valores("Sessions")
+        if _vals is None: return None
+        return {_r[0].strip()[len("NOTIF::"):] for _r in _vals
+                if _r and _r[0].strip().startswith("NOTIF::")}
     except Exception:
-        return False
+        return None
 
 def _marcar_notif_enviada(clave):
     """Marca en la hoja Sessions que una notif se envió."""
     try:
-        from core.database import conectar_google_sheets as _cgs_n
-        _ws = _cgs_n("Sessions")
-        if not _ws: return
-        _ws.append_row([f"NOTIF::{clave}", datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")],
-                       value_input_option="USER_ENTERED")
+        hoja_append("Sessions", [f"NOTIF::{clave}", datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")],
+                    value_input_option="USER_ENTERED")
     except Exception:
         pass
 
-def _check_apertura_notificacion():
+def _eventos_calendario():
     """
-    Detecta si acaba de abrir el período de predicciones Y si faltan 2h para el cierre.
-    Envía email de aviso en ambos casos (una sola vez por sesión).
+    Avisos por GP del calendario: apertura del período de predicciones (ventana
+    de 12h) y alerta 2h antes del cierre. `{piloto}` se completa al disparar.
+    El scheduler es uno por proceso: usa el calendario de la liga por defecto.
     """
-    try:
-        import datetime as _dt
-        _tz_arg = None
+    import re as _re_n
+    evs = []
+    _liga_n = LIGAS[LIGA_DEFAULT]
+    for gp_n, gp_cierre_str in _liga_n["horarios"].items():
+        if gp_n in _liga_n["gps_suspendidos"]: continue
         try:
-            import pytz as _ptz; _tz_arg = _ptz.timezone("America/Argentina/Buenos_Aires")
-        except Exception: pass
-        ahora = _dt.datetime.now(_tz_arg) if _tz_arg else _dt.datetime.utcnow()
-
-        def _send_email_notif(asunto, cuerpo):
-            _gm_u = st.secrets.get("GMAIL_USER","")
-            _gm_p = st.secrets.get("GMAIL_APP_PASSWORD","")
-            _emails = st.secrets.get("emails",{})
-            if not _gm_u or not _gm_p or not _emails: return
-            import smtplib; from email.mime.text import MIMEText as _MT
-            for _pn, _em in _emails.items():
-                if not _em: continue
-                try:
-                    _mm = _MT(cuerpo.replace("{piloto}",_pn),"plain","utf-8")
-                    _mm["Subject"] = asunto; _mm["From"] = f"Torneo Fefe Wolf <{_gm_u}>"; _mm["To"] = _em
-                    with smtplib.SMTP_SSL("smtp.gmail.com",465) as _sv:
-                        _sv.login(_gm_u,_gm_p); _sv.sendmail(_gm_u,_em,_mm.as_string())
-                except Exception: pass
-
-        for gp_n, gp_cierre_str in HORARIOS_CARRERA.items():
-            if gp_n in GPS_SUSPENDIDOS: continue
-            try:
-                cierre_dt = _dt.datetime.fromisoformat(gp_cierre_str)
-                if _tz_arg: cierre_dt = _tz_arg.localize(cierre_dt)
-                apertura_dt = cierre_dt - _dt.timedelta(days=3)
-            except Exception: continue
-
-            import re as _re_n
-            _gp_short = _re_n.sub(r'^\d+\.\s*','',gp_n).strip()
-            _cierre_str = cierre_dt.strftime("%A %d/%m a las %H:%M hs")
-
-            # ── Notif apertura (ventana amplia: hasta 12h después de abrir) ──
-            diff_open = (ahora - apertura_dt).total_seconds() if ahora > apertura_dt else -1
-            if 0 <= diff_open <= 43200:  # hasta 12h después de la apertura
-                _notif_key = f"notif_apertura_{gp_n}"
-                # Persistir en la hoja para no remandar si ya se envió (entre sesiones)
-                _ya_enviado = _notif_ya_enviada(f"apertura_{gp_n}")
-                if not st.session_state.get(_notif_key, False) and not _ya_enviado:
-                    st.session_state[_notif_key] = True
-                    _msg = (f"🏎️ TORNEO FEFE WOLF 2026\n\n"
-                            f"🟢 ¡ABRIERON LAS PREDICCIONES!\n\n"
-                            f"🏁 {_gp_short.upper()}\n⏰ Cierre: {_cierre_str}\n\n"
-                            f"Hola {{piloto}}, ya podés cargar tus predicciones:\n"
-                            f"torneofefewolf2026.streamlit.app")
-                    _send_email_notif(f"🟢 ¡Abrieron predicciones! {_gp_short}", _msg)
-                    _marcar_notif_enviada(f"apertura_{gp_n}")
-
-            # ── Alerta 2h antes del cierre ────────────────────────────
-            diff_close = (cierre_dt - ahora).total_seconds() if cierre_dt > ahora else -1
-            if 0 <= diff_close <= 7200:  # faltan 2h o menos
-                _warn_key = f"notif_2h_{gp_n}"
-                if not st.session_state.get(_warn_key, False):
-                    st.session_state[_warn_key] = True
-                    _msg2 = (f"⚠️ TORNEO FEFE WOLF 2026\n\n"
-                             f"⏰ FALTAN 2 HORAS PARA EL CIERRE\n\n"
-                             f"🏁 {_gp_short.upper()}\n⏰ Cierre: {_cierre_str}\n\n"
-                             f"Hola {{piloto}}, si aún no enviaste tus predicciones ¡es ahora o nunca!\n"
-                             f"torneofefewolf2026.streamlit.app")
-                    _send_email_notif(f"⚠️ ¡Faltan 2h! Cierra {_gp_short}", _msg2)
-            break
-    except Exception: pass
-
-
+            cierre_dt = TZ.localize(datetime.fromisoformat(gp_cierre_str))
+            apertura_dt = cierre_dt - timedelta(days=3)
+        except Exception: continue
+        _gp_short = _re_n.sub(r'^\d+\.\s*','',gp_n).strip()
+        _cierre_str = cierre_dt.strftime("%A %d/%m a las %H:%M hs")
+        _t_open = apertura_dt.timestamp(); _t_close = cierre_dt.timestamp()
+        evs.append({"clave": f"apertura_{gp_n}", "desde": _t_open, "hasta": _t_open + 43200,
+                    "asunto": f"🟢 ¡Abrieron predicciones! {_gp_short}", "html": None,
+                    "cuerpo": (f"🏎️ TORNEO FEFE WOLF 2026\n\n"
+                               f"🟢 ¡ABRIERON LAS PREDICCIONES!\n\n"
+                               f"🏁 {_gp_short.upper()}\n⏰ Cierre: {_cierre_str}\n\n"
+                               f"Hola {{piloto}}, ya podés cargar tus predicciones:\n"
+                               f"torneofefewolf2026.streamlit.app")})
+        evs.append({"clave": f"cierre2h_{gp_n}", "desde": _t_close - 7200, "hasta": _t_close,
+                    "asunto": f"⚠️ ¡Faltan 2h! Cierra {_gp_short}", "html": None,
+                    "cuerpo": (f"⚠️ TORNEO FEFE WOLF 2026\n\n"
+                               f"⏰ FALTAN 2 HORAS PARA EL CIERRE\n\n"
+                               f"🏁 {_gp_short.upper()}\n⏰ Cierre: {_cierre_str}\n\n"
+                               f"Hola {{piloto}}, si aún no enviaste tus predicciones ¡es ahora o nunca!\n"
+                               f"torneofefewolf2026.streamlit.app")})
+    return evs
+
+
+@perfilar("pantalla")
 def pantalla_inicio():
     st.markdown("""
     <div class="hero">
@@ -2127,7 +4499,7 @@ def pantalla_inicio():
     st.markdown("<div class='section-title'>👑 EN MEMORIA DEL REY FEFE WOLF</div>", unsafe_allow_html=True)
     _,c2,_ = st.columns([1,2,1])
     with c2:
-        try: st.image("IMAGENFEFE.jfif", use_container_width=True)
+        try: st.image(asset_path("IMAGENFEFE.jfif", 960), use_container_width=True)
         except: st.info("Subí 'IMAGENFEFE.jfif' para mostrarla.")
     st.markdown("<div class='section-title'>🏎️ PILOTOS EN PARRILLA</div>", unsafe_allow_html=True)
     # CSS base de cards — sin colores hardcodeados, se inyectan inline por piloto
@@ -2232,11 +4604,12 @@ def pantalla_inicio():
                 st.session_state["fw_sidebar_idx"] = 4
                 st.rerun()
 
+@perfilar("pantalla")
 def pantalla_calendario():
     st.markdown('<div class="section-title">📅 CALENDARIO TEMPORADA 2026</div>', unsafe_allow_html=True)
     _,c2,_ = st.columns([1,2,1])
     with c2:
-        try: st.image("IMAGENCALENDARIO.jfif", use_container_width=True, caption="")
+        try: st.image(asset_path("IMAGENCALENDARIO.jfif", 1600), use_container_width=True, caption="")
         except: pass
     # Build table HTML
     _rows_c = ""
@@ -2266,6 +4639,7 @@ def pantalla_calendario():
         '</tr></thead><tbody style="color:#e8ecff;font-size:12px;">' +
         _rows_c + '</tbody></table></div>',
         unsafe_allow_html=True)
+@perfilar("pantalla")
 def pantalla_pilotos_y_escuderias():
     st.markdown('<div class="section-title">🏎️ PILOTOS Y EQUIPOS 2026</div>', unsafe_allow_html=True)
 
@@ -2472,6 +4846,7 @@ def pantalla_pilotos_y_escuderias():
                     </div>""", unsafe_allow_html=True)
 
 
+@perfilar("pantalla")
 def pantalla_reglamento():
     st.markdown("""
     <style>
@@ -2722,7 +5097,7 @@ def pantalla_reglamento():
             '</div>', unsafe_allow_html=True)
         try:
             _,_ic,_ = st.columns([1,2,1])
-            with _ic: st.image("IMAGENCUPULA.jfif", use_container_width=True)
+            with _ic: st.image(asset_path("IMAGENCUPULA.jfif", 960), use_container_width=True)
         except: pass
         st.markdown('<div style="height:12px"></div>', unsafe_allow_html=True)
         _rc1, _rc2 = st.columns(2)
@@ -2754,18 +5129,19 @@ def pantalla_reglamento():
             unsafe_allow_html=True)
 
 
+@perfilar("pantalla")
 def pantalla_tabla_posiciones():
     st.markdown('<div class="section-title">📊 TABLA GENERAL 2026</div>', unsafe_allow_html=True)
     if st.button("🔄 Actualizar tabla", key="btn_ref_tabla"):
-        st.cache_data.clear(); st.rerun()
+        invalidar("standings", "historial"); st.rerun()
 
     @st.cache_data(ttl=120, show_spinner="Cargando tabla…")
-    def _get():
+    def _get(ver):
         m = _mod_db()
         if "_error" in m: return None
         return _safe_call(m["leer_tabla_posiciones"], PILOTOS_TORNEO, timeout_sec=8, default=None)
 
-    df = _get()
+    df = _get(cache_version("standings"))
     if df is None or (hasattr(df,"empty") and df.empty):
         df = pd.DataFrame({"Piloto":PILOTOS_TORNEO,"Puntos":[0]*len(PILOTOS_TORNEO),
                            "Qualys":[0]*len(PILOTOS_TORNEO),"Sprints":[0]*len(PILOTOS_TORNEO),
@@ -2787,91 +5163,19 @@ def pantalla_tabla_posiciones():
         df = df.sort_values("Puntos",ascending=False).reset_index(drop=True)
     if len(df)>=3:
         p1,p2,p3 = df.iloc[0],df.iloc[1],df.iloc[2]
-        def _ini(n):
-            return "".join(w[0] for w in str(n).split()[:2]).upper()
         def _foto_pod(piloto):
             try:
                 # Preferir headshot (cara) para que no se corten en el círculo
                 _u = DRIVER_HEADSHOTS.get(piloto) or DRIVER_PHOTOS.get(piloto)
                 return _u or ""
             except Exception: return ""
-        _c1 = PILOTO_COLORS.get(p1["Piloto"],"#D4AF37")
-        _c2 = PILOTO_COLORS.get(p2["Piloto"],"#C0C0C0")
-        _c3 = PILOTO_COLORS.get(p3["Piloto"],"#CD7F32")
-        _pts1,_pts2,_pts3 = int(p1.get("Puntos",0)),int(p2.get("Puntos",0)),int(p3.get("Puntos",0))
-        _f1,_f2,_f3 = _foto_pod(p1["Piloto"]),_foto_pod(p2["Piloto"]),_foto_pod(p3["Piloto"])
-
-        def _avatar(foto,color,ini,size,ring):
-            if foto:
-                return (f'<div style="width:{size}px;height:{size}px;border-radius:50%;overflow:hidden;'
-                        f'border:{ring}px solid {color};box-shadow:0 0 18px {color}88;margin:0 auto;">'
-                        f'<img src="{foto}" style="width:100%;height:100%;object-fit:cover;object-position:center 12%;" '
-                        f'onerror="this.parentElement.innerHTML=\'<div style=&quot;width:100%;height:100%;display:flex;'
-                        f'align-items:center;justify-content:center;background:{color}22;color:{color};'
-                        f'font-weight:900;font-size:{int(size*0.36)}px;&quot;>{ini}</div>\'"></div>')
-            return (f'<div style="width:{size}px;height:{size}px;border-radius:50%;margin:0 auto;'
-                    f'border:{ring}px solid {color};box-shadow:0 0 18px {color}88;background:{color}22;'
-                    f'display:flex;align-items:center;justify-content:center;color:{color};'
-                    f'font-weight:900;font-size:{int(size*0.36)}px;">{ini}</div>')
-
-        _podium_html = f"""
-        <style>
-        @keyframes podRise{{from{{opacity:0;transform:translateY(20px);}}to{{opacity:1;transform:translateY(0);}}}}
-        @keyframes podShine{{0%,100%{{filter:drop-shadow(0 0 6px #D4AF3766);}}50%{{filter:drop-shadow(0 0 16px #D4AF37cc);}}}}
-        .fw-podium{{
-          display:flex;align-items:flex-end;justify-content:center;gap:10px;
-          padding:24px 8px 0;margin-bottom:6px;animation:podRise .6s ease;
-          max-width:560px;margin-left:auto;margin-right:auto;
-        }}
-        .fw-pod-col{{display:flex;flex-direction:column;align-items:center;flex:1;max-width:170px;}}
-        .fw-pod-name{{font-weight:900;font-size:13px;letter-spacing:.02em;text-align:center;
-          margin:8px 0 2px;line-height:1.15;white-space:nowrap;overflow:hidden;text-overflow:ellipsis;max-width:100%;}}
-        .fw-pod-pts{{font-size:26px;font-weight:900;line-height:1;}}
-        .fw-pod-lbl{{font-size:9px;letter-spacing:.18em;color:rgba(232,236,255,.4);margin-top:1px;}}
-        .fw-pod-base{{width:100%;border-radius:12px 12px 0 0;display:flex;align-items:flex-start;
-          justify-content:center;padding-top:10px;font-size:38px;font-weight:900;position:relative;
-          box-shadow:inset 0 2px 12px rgba(255,255,255,.08);}}
-        .fw-pod-crown{{font-size:28px;margin-bottom:2px;animation:podShine 2.5s ease-in-out infinite;}}
-        @media (max-width:600px){{
-          .fw-podium{{gap:5px;padding:16px 2px 0;}}
-          .fw-pod-name{{font-size:10px;}}
-          .fw-pod-pts{{font-size:19px;}}
-          .fw-pod-base{{font-size:26px;}}
-          .fw-pod-crown{{font-size:20px;}}
-        }}
-        </style>
-        <div class="fw-podium">
-          <!-- 2nd -->
-          <div class="fw-pod-col">
-            {_avatar(_f2,_c2,_ini(p2["Piloto"]),64,3)}
-            <div class="fw-pod-name" style="color:{_c2};">{p2["Piloto"]}</div>
-            <div class="fw-pod-pts" style="color:#e8ecff;">{_pts2}</div>
-            <div class="fw-pod-lbl">PUNTOS</div>
-            <div class="fw-pod-base" style="height:90px;background:linear-gradient(180deg,rgba(192,192,192,.32),rgba(192,192,192,.08));color:rgba(192,192,192,.85);">2</div>
-          </div>
-          <!-- 1st -->
-          <div class="fw-pod-col">
-            <div class="fw-pod-crown">👑</div>
-            {_avatar(_f1,_c1,_ini(p1["Piloto"]),84,4)}
-            <div class="fw-pod-name" style="color:{_c1};font-size:15px;">{p1["Piloto"]}</div>
-            <div class="fw-pod-pts" style="color:#ffdd7a;font-size:30px;">{_pts1}</div>
-            <div class="fw-pod-lbl">PUNTOS</div>
-            <div class="fw-pod-base" style="height:130px;background:linear-gradient(180deg,rgba(212,175,55,.4),rgba(212,175,55,.1));color:#ffdd7a;border:1px solid rgba(212,175,55,.4);border-bottom:none;">1</div>
-          </div>
-          <!-- 3rd -->
-          <div class="fw-pod-col">
-            {_avatar(_f3,_c3,_ini(p3["Piloto"]),58,3)}
-            <div class="fw-pod-name" style="color:{_c3};">{p3["Piloto"]}</div>
-            <div class="fw-pod-pts" style="color:#e8ecff;">{_pts3}</div>
-            <div class="fw-pod-lbl">PUNTOS</div>
-            <div class="fw-pod-base" style="height:68px;background:linear-gradient(180deg,rgba(205,127,50,.32),rgba(205,127,50,.08));color:rgba(205,127,50,.9);">3</div>
-          </div>
-        </div>
-        """
+        _podium_html = html_podio([
+            (p["Piloto"], int(p.get("Puntos",0)), PILOTO_COLORS.get(p["Piloto"], _def), _foto_pod(p["Piloto"]))
+            for p, _def in ((p1,"#D4AF37"), (p2,"#C0C0C0"), (p3,"#CD7F32"))])
         st.markdown(_podium_html, unsafe_allow_html=True)
         st.markdown("<div style='height:14px'></div>", unsafe_allow_html=True)
         _df_disp = df.copy()
-        _dns_map_disp = _dns_counts_todos()
+        _dns_map_disp = _dns_counts_todos(cache_version("standings"))
         _df_disp["DNS"] = _df_disp["Piloto"].map(_dns_map_disp).fillna(0).astype(int)
         render_dark_table(_df_disp)
 
@@ -2885,24 +5189,9 @@ def pantalla_tabla_posiciones():
             render_dark_table(_df_dns_tab)
 
         # ── GPs ganados reales ─────────────────────────────────────────
-        @st.cache_data(ttl=120, show_spinner=False)
-        def _get_hist_r():
-            mr = _mod_db()
-            if "_error" in mr: return pd.DataFrame()
-            return _safe_call(mr["leer_historial_df"], timeout_sec=8, default=pd.DataFrame())
-        dhr = _get_hist_r()
-        if dhr is not None and not (hasattr(dhr,"empty") and dhr.empty) and "piloto" in dhr.columns and "puntos" in dhr.columns:
-            dhr2 = dhr.copy(); dhr2["puntos"] = pd.to_numeric(dhr2["puntos"],errors="coerce").fillna(0)
-            # Calcular GP ganados reales
-            gps_ganados_pos = {p:0 for p in PILOTOS_TORNEO}
-            try:
-                _agg_p = dhr2.groupby(["gp","piloto"],as_index=False)["puntos"].sum()
-                for _gp, _grp in _agg_p.groupby("gp"):
-                    _gs = _grp.sort_values("puntos",ascending=False)
-                    if len(_gs)>=2 and float(_gs.iloc[0]["puntos"])>0:
-                        _winner = str(_gs.iloc[0]["piloto"]).strip()
-                        if _winner in gps_ganados_pos: gps_ganados_pos[_winner]+=1
-            except Exception: pass
+        _rs_tab = resumen_temporada()
+        if _rs_tab["n_gps"]:
+            gps_ganados_pos = {p: _rs_tab["ganados"].get(p, 0) for p in PILOTOS_TORNEO}
             if any(v>0 for v in gps_ganados_pos.values()):
                 st.markdown('<div style="margin-top:14px"></div>'
                             '<div style="font-size:10px;font-weight:700;letter-spacing:.14em;'
@@ -2943,11 +5232,8 @@ def pantalla_tabla_posiciones():
     if df is not None and not df.empty and "Puntos" in df.columns:
         # Count actual GPs by looking at historial
         try:
-            _mdb_liga = _mod_db()
-            if "_error" not in _mdb_liga:
-                _df_hist_liga = _safe_call(_mdb_liga["leer_historial_df"], timeout_sec=8, default=pd.DataFrame())
-                if _df_hist_liga is not None and not _df_hist_liga.empty and "gp" in _df_hist_liga.columns:
-                    _n_gps_played = _df_hist_liga["gp"].nunique()
+            _n_rs = resumen_temporada()["n_gps"]
+            if _n_rs: _n_gps_played = _n_rs
         except Exception: pass
 
         _df_liga = df.sort_values("Puntos", ascending=False).reset_index(drop=True)
@@ -2986,6 +5272,7 @@ def pantalla_tabla_posiciones():
                 f'</div>', unsafe_allow_html=True)
 
 
+@perfilar("pantalla")
 def pantalla_muro():
     # Fotos de los campeones
     _checo_ph  = DRIVER_HEADSHOTS.get("Checo Perez",  DRIVER_PHOTOS.get("Checo Perez",""))
@@ -2993,11 +5280,7 @@ def pantalla_muro():
     _lauda_ph  = DRIVER_HEADSHOTS.get("Nicki Lauda",  DRIVER_PHOTOS.get("Nicki Lauda",""))
     # Fefe Wolf — usa IMAGENFEFE.jfif del repo si existe
     _fefe_ph = ""
-    try:
-        import base64 as _b64, os as _os2
-        _fefe_path = "IMAGENFEFE.jfif"
-        if _os2.path.exists(_fefe_path):
-            with open(_fefe_path,"rb") as _ff: _fefe_ph = "data:image/jpeg;base64,"+_b64.b64encode(_ff.read()).decode()
+    try: _fefe_ph = asset_url("IMAGENFEFE.jfif", 160)
     except: pass
 
     def _champ_av(ph, ini, clr, sz=70):
@@ -3103,23 +5386,86 @@ def pantalla_muro():
         '— TORNEO FEFE WOLF · DESDE 2021</div>'
         '</div>', unsafe_allow_html=True)
 
+def colapinto_filas(gps_list):
+    """Filas de la pestaña Colapinto: predicción de cada formulero en Qualy y Carrera por GP,
+    comparada contra el oficial (oculta si el GP todavía no cerró)."""
+    _mdb_col = _mod_db()
+    if "_error" in _mdb_col: return []
+    _of_col_map = oficial_get_many(gps_list)  # gp -> {col_q: pos, col_r: pos, ...}
+    # Saber si cada GP ya cerró (para no revelar predicciones de GPs abiertos)
+    def _gp_cerrado_col(_gp_full):
+        try:
+            from datetime import datetime as _dtcc
+            _h = HORARIOS_CARRERA.get(_gp_full, "")
+            if not _h: return True  # sin horario => asumir cerrado (histórico)
+            _dt = _dtcc.fromisoformat(_h)
+            _dt = TZ.localize(_dt) if _dt.tzinfo is None else _dt
+            return _dtcc.now(TZ) > _dt
+        except Exception: return True
+    _rows = []
+    # ── BULK LOAD: sheet1 se lee UNA sola vez (recuperar_predicciones_gp) ──
+    # Evita 6×N llamadas lentas que podían timeoutear y mostrar "—" falso
+    _col_pred_map = {}  # (gp, piloto_lower) -> {"q":..., "r":...}
+    for _gp_cp in gps_list:
+        for _pil_cp, (_dq_cp, _ds_cp, (_dr_cp, _dc_cp)) in recuperar_predicciones_gp(_gp_cp).items():
+            _col_pred_map[(_gp_cp, _pil_cp.strip().lower())] = {
+                "q": (_dq_cp or {}).get("colapinto_q",""), "r": (_dr_cp or {}).get("colapinto_r","")}
+
+    for _gp_c2 in gps_list:
+        _gp_l_c = gp_titulo(_gp_c2)
+        _of_gp = _of_col_map[_gp_c2]
+        _cerrado_c = _gp_cerrado_col(_gp_c2)
+        _gpk_c = _gp_c2
+        for _pil_c2 in PILOTOS_TORNEO:
+            try:
+                _pred = _col_pred_map.get((_gpk_c, _pil_c2.strip().lower()), {})
+                _col_q = str(_pred.get("q","")).strip()
+                _col_r = str(_pred.get("r","")).strip()
+                _of_q = _of_gp.get("col_q",""); _of_r = _of_gp.get("col_r","")
+                def _norm_pos(x):
+                    return str(x or "").strip().upper().lstrip("P").strip()
+                # ok=None si no hay predicción O no hay resultado oficial (gris, sin ❌)
+                if not _col_q:
+                    _q_ok = None
+                elif not _of_q:
+                    _q_ok = None
+                else:
+                    _q_ok = (_norm_pos(_col_q) == _norm_pos(_of_q))
+                if not _col_r:
+                    _r_ok = None
+                elif not _of_r:
+                    _r_ok = None
+                else:
+                    _r_ok = (_norm_pos(_col_r) == _norm_pos(_of_r))
+                if _cerrado_c:
+                    _q_disp = f"P{_col_q}" if _col_q else "—"
+                    _r_disp = f"P{_col_r}" if _col_r else "—"
+                else:
+                    # GP abierto: ocultar para mantener secreto
+                    _q_disp = "🔒" if _col_q else "—"
+                    _r_disp = "🔒" if _col_r else "—"
+                    _q_ok = None; _r_ok = None
+                _rows.append({
+                    "GP": _gp_l_c, "Formulero": _pil_c2,
+                    "Qualy": _q_disp, "Carrera": _r_disp,
+                    "Qualy_ok": _q_ok, "Carrera_ok": _r_ok,
+                    "Oculto": (not _cerrado_c),
+                })
+            except Exception: pass
+    return _rows
+
+@perfilar("pantalla")
 def pantalla_historial_gp():
     usuario = (st.session_state.get("perfil") or {}).get("usuario","")  # FIX: define usuario
     st.markdown('<div class="section-title">📈 HISTORIAL POR GRAN PREMIO</div>', unsafe_allow_html=True)
     st.markdown('<div id="top"></div>', unsafe_allow_html=True)
     if st.button("🔄 Actualizar historial", key="btn_ref_historial"):
-        st.cache_data.clear(); st.rerun()
+        invalidar("historial"); st.rerun()
 
-    @st.cache_data(ttl=60, show_spinner="Cargando historial…")
-    def _get():
-        m = _mod_db()
-        if "_error" in m: return pd.DataFrame(), pd.DataFrame()
-        h = _safe_call(m["leer_historial_df"], timeout_sec=8, default=pd.DataFrame())
-        d = _safe_call(m["leer_historial_detalle_df"], timeout_sec=8, default=pd.DataFrame())
-        return h, d
-
-    df_hist, df_det = _get()
-    if df_hist is None or (hasattr(df_hist,"empty") and df_hist.empty):
+    with st.spinner("Cargando historial…"):
+        _rs_h = resumen_temporada()
+    df_hist, df_det = _rs_h["hist"], _rs_h["det"]
+    if df_hist.empty:
         st.markdown("""<div class="card fade-up" style="text-align:center;padding:40px;">
           <div style="font-size:56px;">🏎️</div>
           <div style="font-weight:900;font-size:20px;color:#ffdd7a;">La temporada 2026 está por comenzar</div>
@@ -3128,23 +5474,14 @@ def pantalla_historial_gp():
             unsafe_allow_html=True)
         return
 
-    df_hist=df_hist.copy(); df_hist.columns=[c.lower().strip() for c in df_hist.columns]
-    df_hist["puntos"]=pd.to_numeric(df_hist["puntos"],errors="coerce").fillna(0).astype(int)
-    df_hist["gp"]=df_hist["gp"].astype(str).str.strip()
-    df_hist["piloto"]=df_hist["piloto"].astype(str).str.strip()
-    df_hist=df_hist.groupby(["gp","piloto"],as_index=False)["puntos"].sum()
-    # ── Filtrar GPs donde TODOS tienen 0 pts (son entradas vacías/erróneas) ──
-    # OJO: antes se comparaba la SUMA del GP > 0, lo cual descartaba GPs enteros
-    # y válidos cuando las sanciones DNS (negativas) hacían que el total diera
-    # 0 o negativo. Ahora solo se descarta si TODAS las filas del GP son 0.
-    _gp_tiene_datos = df_hist.groupby("gp")["puntos"].apply(lambda s: (s != 0).any())
-    _gps_validos = _gp_tiene_datos[_gp_tiene_datos].index.tolist()
-    if _gps_validos:
-        df_hist = df_hist[df_hist["gp"].isin(_gps_validos)]
+    # df_hist ya viene sumado por (gp, piloto), sin GPs donde TODAS las filas son 0
+    # (OJO: no se filtra por SUMA > 0 — las sanciones DNS negativas pueden dejar un
+    # GP válido en 0 o negativo) y ordenado por calendario; ver resumen_temporada().
+    df_hist = df_hist.copy()
 
     # ── Sección DNS — resumen de sanciones (base histórica + automático desde GB) ──
     with st.expander("⛔ DNS — Sanciones del campeonato", expanded=False):
-        _dns_map_hist = _dns_counts_todos()
+        _dns_map_hist = _dns_counts_todos(cache_version("standings"))
         _df_dns_hist = pd.DataFrame({
             "Piloto": PILOTOS_TORNEO,
             "DNS": [_dns_map_hist.get(p, 0) for p in PILOTOS_TORNEO],
@@ -3173,7 +5510,7 @@ def pantalla_historial_gp():
     _hcol1, _hcol2, _hcol3, _hcol4 = st.columns([2,1,1,1])
     with _hcol2:
         if st.button("🔄 Actualizar", key="hist_refresh", use_container_width=True):
-            _get.clear(); st.rerun()
+            invalidar("historial"); st.rerun()
     with _hcol3:
         # Export to Excel
         try:
@@ -3198,13 +5535,11 @@ def pantalla_historial_gp():
                                       format_func=lambda x: x.split(". ",1)[-1] if ". " in x else x,
                                       key="wa_hist_gp_sel")
             if _wa_gp_sel and st.button("📲 Generar link WA", key="wa_hist_gen", use_container_width=True):
-                import urllib.parse as _up_h2, re as _re_h2
-                _gp_lbl_wa = _re_h2.sub(r'^\d+\.\s*','',_wa_gp_sel).strip()
+                import urllib.parse as _up_h2
+                _gp_lbl_wa = gp_titulo(_wa_gp_sel)
                 _dgp = df_hist[df_hist["gp"]==_wa_gp_sel].sort_values("puntos",ascending=False).reset_index(drop=True)
                 _MED3={0:"🥇",1:"🥈",2:"🥉",3:"4°",4:"5°"}
-                _FLAGS3={"Australia":"🇦🇺","China":"🇨🇳","Japón":"🇯🇵","Miami":"🇺🇸","Canadá":"🇨🇦",
-                         "Mónaco":"🇲🇨","España":"🇪🇸","Austria":"🇦🇹","Gran Bretaña":"🇬🇧","Italia":"🇮🇹"}
-                _fl3=next((v for k,v in _FLAGS3.items() if k.lower() in _gp_lbl_wa.lower()),"🏁")
+                _fl3=gp_bandera(_wa_gp_sel)
                 _ddet_h = pd.DataFrame()
                 if df_det is not None and not (hasattr(df_det,"empty") and df_det.empty):
                     try:
@@ -3233,15 +5568,13 @@ def pantalla_historial_gp():
                             f'font-size:13px;padding:10px;border-radius:12px;text-decoration:none;">'
                             f'📲 Abrir WhatsApp</a>', unsafe_allow_html=True)
 
-    tab_evo,tab_gp,tab_pers,tab_stats,tab_tl,tab_analisis,tab_records,tab_col=st.tabs([
+    tab_evo,tab_gp,tab_pers,tab_stats,tab_tl,tab_analisis,tab_records,tab_col=lazy_tabs([
         "📉 Evolución","🏁 Por GP","👤 Personal","🏅 Stats","📅 Timeline","📊 Análisis",
         "🏅 Récords","🇦🇷 Colapinto"
-    ])
+    ], key="hist_tab")
 
-    with tab_evo:
-        pivot=df_hist.pivot_table(index="gp",columns="piloto",values="puntos",fill_value=0)
-        pivot=pivot.reindex([g for g in GPS_OFICIALES if g in pivot.index])
-        cumdf = pivot.cumsum()
+    if tab_evo:
+        cumdf = _rs_h["acum"]
         short_idx = [short.get(g,g) for g in cumdf.index]
 
         # ── SIMULACIÓN DE CARRERA ANIMADA ─────────────────────
@@ -3325,10 +5658,10 @@ def pantalla_historial_gp():
                 st.info("Gráfico no disponible.")
 
 
-            cd=pivot.cumsum().copy(); cd.index=cd.index.map(short); cd.index.name="GP"
+            cd=cumdf.copy(); cd.index=cd.index.map(short); cd.index.name="GP"
             st.markdown(cd.to_html(classes="tabla_historial_dark", border=0), unsafe_allow_html=True)
 
-    with tab_gp:
+    if tab_gp:
         _short_cap = short.copy()  # capture for lambda
         # Mostrar todos los GPs que tienen datos, incluso si no matchean exacto con GPS_OFICIALES
         _all_gps_hist = sorted(df_hist["gp"].unique().tolist(),
@@ -3416,7 +5749,7 @@ def pantalla_historial_gp():
                 except Exception:
                     pass
 
-    with tab_pers:
+    if tab_pers:
         usr_d=(st.session_state.get("perfil") or {}).get("usuario","")
         opc=[p for p in PILOTOS_TORNEO if p in df_hist["piloto"].values] or PILOTOS_TORNEO
         idx=opc.index(usr_d) if usr_d in opc else 0
@@ -3463,7 +5796,7 @@ def pantalla_historial_gp():
             except Exception:
                 pass
 
-    with tab_stats:
+    if tab_stats:
         mn=df_hist.groupby("piloto")["puntos"].mean().reset_index().sort_values("puntos",ascending=False)
         mx=df_hist.groupby("piloto")["puntos"].max().reset_index().sort_values("puntos",ascending=False)
         wr_l=[grp.loc[grp["puntos"].idxmax(),"piloto"] for _,grp in df_hist.groupby("gp")]
@@ -3527,7 +5860,7 @@ def pantalla_historial_gp():
 
         st.markdown('<a href="#top" class="flecha_subir_dorada">↑</a>', unsafe_allow_html=True)
 
-    with tab_tl:
+    if tab_tl:
         st.markdown("""<style>
         .tl-wrap{position:relative;padding-left:24px;margin-top:8px;}
         .tl-line{position:absolute;left:10px;top:0;bottom:0;width:2px;
@@ -3604,7 +5937,7 @@ def pantalla_historial_gp():
             tl_html += '</div>'
             st.markdown(tl_html, unsafe_allow_html=True)
 
-    with tab_analisis:
+    if tab_analisis:
         st.markdown("""<style>
         .ana-hero{background:linear-gradient(145deg,rgba(7,9,22,.99),rgba(20,14,50,.99));
           border:1.5px solid rgba(99,102,241,.4);border-radius:18px;padding:18px 20px 14px;
@@ -3687,7 +6020,7 @@ def pantalla_historial_gp():
         st.markdown('<div style="height:8px"></div>', unsafe_allow_html=True)
 
     # ═══════════════ TAB RÉCORDS ════════════════════════════════
-    with tab_records:
+    if tab_records:
         st.markdown('<div style="font-size:18px;font-weight:900;color:#ffdd7a;margin-bottom:16px;">🏅 RÉCORDS DE LA TEMPORADA 2026</div>', unsafe_allow_html=True)
         if df_hist is not None and not (hasattr(df_hist,"empty") and df_hist.empty):
             try:
@@ -3747,146 +6080,21 @@ def pantalla_historial_gp():
             st.info("Los récords aparecen una vez generado el historial.")
 
     # ═══════════════ TAB COLAPINTO ══════════════════════════════
-    with tab_col:
+    if tab_col:
         st.markdown('<div style="font-size:18px;font-weight:900;color:#74b9ff;margin-bottom:8px;">🇦🇷 Franco Colapinto — Predicciones por GP</div>', unsafe_allow_html=True)
         st.caption("Posición predicha por cada formulero para Colapinto en Qualy y Carrera.")
 
         @st.cache_data(ttl=60, show_spinner="Cargando predicciones Colapinto…")
-        def _load_col_preds(gps_list):
-            _mdb_col = _mod_db()
-            if "_error" in _mdb_col: return []
-            # Load official Colapinto results once
-            _of_col_map = {}  # gp_label -> {col_q: pos, col_r: pos}
-            try:
-                from core.database import conectar_google_sheets as _cgs_col
-                _ws_col = _cgs_col("Oficial")
-                if _ws_col:
-                    _col_recs = _ws_col.get_all_records()
-                    def _gp_key(_g):
-                        _s = str(_g or "").strip()
-                        if ". " in _s: _s = _s.split(". ",1)[-1]
-                        _s = _s.replace("Gran Premio de ","").replace("Gran Premio del ","").replace("GP ","").replace("GP de ","")
-                        return _s.strip().lower()
-                    for _rc in _col_recs:
-                        _et_c = str(_rc.get("etapa","")).upper()
-                        if "COLAPINTO" not in _et_c: continue
-                        _gp_c = str(_rc.get("gp","")).strip()
-                        _gp_bare = _gp_key(_gp_c)
-                        if _gp_bare not in _of_col_map:
-                            _of_col_map[_gp_bare] = {}
-                        _pos_c = str(_rc.get("pos","")).strip()
-                        # "COLAPINTO Q" / "COLAPINTO QUALY" => qualy; resto => carrera
-                        if "Q" in _et_c.replace("COLAPINTO","").strip() or "QUALY" in _et_c:
-                            _of_col_map[_gp_bare]["col_q"] = _pos_c
-                        else:
-                            _of_col_map[_gp_bare]["col_r"] = _pos_c
-            except Exception: pass
-            # Saber si cada GP ya cerró (para no revelar predicciones de GPs abiertos)
-            def _gp_cerrado_col(_gp_full):
-                try:
-                    from datetime import datetime as _dtcc
-                    _h = HORARIOS_CARRERA.get(_gp_full, "")
-                    if not _h: return True  # sin horario => asumir cerrado (histórico)
-                    _dt = _dtcc.fromisoformat(_h)
-                    _dt = TZ.localize(_dt) if _dt.tzinfo is None else _dt
-                    return _dtcc.now(TZ) > _dt
-                except Exception: return True
-            _rows = []
-            def _gp_key2(_g):
-                _s = str(_g or "").strip()
-                if ". " in _s: _s = _s.split(". ",1)[-1]
-                _s = _s.replace("Gran Premio de ","").replace("Gran Premio del ","").replace("GP ","").replace("GP de ","")
-                return _s.strip().lower()
-
-            # ── BULK LOAD: leer sheet1 UNA sola vez y armar lookup ──
-            # Evita 6×N llamadas lentas que podían timeoutear y mostrar "—" falso
-            _col_pred_map = {}  # (gp_key, piloto_lower) -> {"q":..., "r":...}
-            try:
-                import re as _re_col
-                from core.database import conectar_google_sheets as _cgs_pred
-                _ws_pred = _cgs_pred("sheet1")
-                if _ws_pred:
-                    _all_pred = _ws_pred.get_all_values()
-                    if _all_pred and len(_all_pred) > 1:
-                        _hdr_p = [h.strip().lower() for h in _all_pred[0]]
-                        def _fcol(names, dflt):
-                            for nm in names:
-                                for _ix,_h in enumerate(_hdr_p):
-                                    if _h == nm: return _ix
-                            return dflt
-                        _ix_usr = _fcol(["usuario","user","nombre"],1)
-                        _ix_gp  = _fcol(["gp","gran_premio","gran premio"],2)
-                        _ix_et  = _fcol(["etapa","tipo"],3)
-                        _ix_d   = _ix_et + 1
-                        def _sf(row, ix):
-                            return str(row[ix]).strip() if ix < len(row) else ""
-                        for _rp in _all_pred[1:]:
-                            if len(_rp) <= _ix_et: continue
-                            _usr_p = _sf(_rp,_ix_usr)
-                            _gp_p  = _sf(_rp,_ix_gp)
-                            _et_p  = _sf(_rp,_ix_et).upper()
-                            _gpk = _gp_key2(_gp_p)
-                            _key = (_gpk, _usr_p.strip().lower())
-                            if _key not in _col_pred_map:
-                                _col_pred_map[_key] = {"q":"", "r":""}
-                            if _et_p == "QUALY":
-                                # colapinto_q está en idx_data+5 (después de 5 posiciones)
-                                _col_pred_map[_key]["q"] = _sf(_rp, _ix_d + 5)
-                            elif _et_p == "CARRERA":
-                                # colapinto_r está en idx_data+10 (después de 10 posiciones)
-                                _col_pred_map[_key]["r"] = _sf(_rp, _ix_d + 10)
-            except Exception: pass
-
-            for _gp_c2 in gps_list:
-                _gp_l_c = _gp_c2.split(". ",1)[-1] if ". " in _gp_c2 else _gp_c2
-                _of_gp = _of_col_map.get(_gp_key2(_gp_c2), {})
-                _cerrado_c = _gp_cerrado_col(_gp_c2)
-                _gpk_c = _gp_key2(_gp_c2)
-                for _pil_c2 in PILOTOS_TORNEO:
-                    try:
-                        _pred = _col_pred_map.get((_gpk_c, _pil_c2.strip().lower()), {})
-                        _col_q = str(_pred.get("q","")).strip()
-                        _col_r = str(_pred.get("r","")).strip()
-                        _of_q = _of_gp.get("col_q",""); _of_r = _of_gp.get("col_r","")
-                        def _norm_pos(x):
-                            return str(x or "").strip().upper().lstrip("P").strip()
-                        # ok=None si no hay predicción O no hay resultado oficial (gris, sin ❌)
-                        if not _col_q:
-                            _q_ok = None
-                        elif not _of_q:
-                            _q_ok = None
-                        else:
-                            _q_ok = (_norm_pos(_col_q) == _norm_pos(_of_q))
-                        if not _col_r:
-                            _r_ok = None
-                        elif not _of_r:
-                            _r_ok = None
-                        else:
-                            _r_ok = (_norm_pos(_col_r) == _norm_pos(_of_r))
-                        if _cerrado_c:
-                            _q_disp = f"P{_col_q}" if _col_q else "—"
-                            _r_disp = f"P{_col_r}" if _col_r else "—"
-                        else:
-                            # GP abierto: ocultar para mantener secreto
-                            _q_disp = "🔒" if _col_q else "—"
-                            _r_disp = "🔒" if _col_r else "—"
-                            _q_ok = None; _r_ok = None
-                        _rows.append({
-                            "GP": _gp_l_c, "Formulero": _pil_c2,
-                            "Qualy": _q_disp, "Carrera": _r_disp,
-                            "Qualy_ok": _q_ok, "Carrera_ok": _r_ok,
-                            "Oculto": (not _cerrado_c),
-                        })
-                    except Exception: pass
-            return _rows
+        def _load_col_preds(gps_list, ver):
+            return colapinto_filas(gps_list)
 
         if gps_j:
             # Botón de actualizar para forzar recarga
             _cc_ref1, _cc_ref2 = st.columns([4,1])
             with _cc_ref2:
                 if st.button("🔄", key="col_refresh", help="Actualizar aciertos Colapinto"):
-                    _load_col_preds.clear(); st.rerun()
-            _col_rows = _load_col_preds(tuple(gps_j))
+                    invalidar("predicciones", "oficial"); st.rerun()
+            _col_rows = _load_col_preds(tuple(gps_j), cache_version("predicciones", "oficial"))
             if _col_rows:
                 # Styled display — más recientes primero, con Ver/Ocultar
                 _col_gps = sorted(set(r["GP"] for r in _col_rows))
@@ -4117,160 +6325,14 @@ def modal_constructor_selector(teams, count, kp):
 
 
 
+@perfilar("pantalla")
 def _pantalla_pilotos_grid():
     """Grid de pilotos F1 2026 — tab en Predicciones."""
-    all_drivers = []
-    for equipo, pilotos in GRILLA_2026.items():
-        color = TEAM_COLORS.get(equipo, "#A855F7")
-        abbr  = TEAM_LOGOS_SVG.get(equipo, equipo[:3])
-        for num_idx, pil in enumerate(pilotos):
-            all_drivers.append((pil, equipo, color, abbr, num_idx + 1))
-
-    # Inject improved grid CSS
-    st.markdown("""
-    <style>
-    .f1-drivers-grid {
-      display: grid;
-      grid-template-columns: repeat(auto-fill, minmax(150px, 1fr));
-      gap: 14px;
-      padding: 8px 0 16px;
-    }
-    .f1d-card {
-      background: linear-gradient(145deg, rgba(7,10,25,.97) 0%, rgba(14,18,42,.95) 100%);
-      border: 1.5px solid var(--tc, #a855f7);
-      border-radius: 16px;
-      overflow: hidden;
-      position: relative;
-      transition: transform .25s ease, box-shadow .25s ease;
-      box-shadow: 0 4px 18px rgba(0,0,0,.5);
-    }
-    .f1d-card:hover {
-      transform: translateY(-6px) scale(1.02);
-      box-shadow: 0 10px 32px rgba(0,0,0,.7), 0 0 20px var(--tc, #a855f7)33;
-    }
-    .f1d-top-stripe {
-      height: 3px;
-      background: var(--tc, #a855f7);
-      width: 100%;
-    }
-    .f1d-logo {
-      position:absolute;top:10px;left:8px;
-      height:18px;max-width:54px;object-fit:contain;
-      opacity:.85;filter:brightness(1.2);z-index:3;
-    }
-    .f1d-team-badge {
-      position: absolute;
-      top: 10px;
-      right: 10px;
-      font-size: 8px;
-      font-weight: 900;
-      color: var(--tc, #a855f7);
-      background: rgba(0,0,0,.6);
-      border: 1px solid var(--tc, #a855f7)55;
-      border-radius: 6px;
-      padding: 2px 6px;
-      letter-spacing: .1em;
-      z-index: 2;
-    }
-    .f1d-photo-wrap {
-      width: 100%;
-      aspect-ratio: 1 / 1.05;
-      overflow: hidden;
-      background: linear-gradient(180deg, rgba(0,0,0,.1), rgba(0,0,0,.5));
-      position: relative;
-    }
-    .f1d-photo {
-      width: 100%;
-      height: 100%;
-      object-fit: cover;
-      object-position: center 18%;
-      display: block;
-      transition: transform .3s ease;
-    }
-    @media (max-width:768px){
-      .f1d-photo-wrap { aspect-ratio: 1 / 1.05 !important; background:#08091e !important; }
-      .f1d-photo { object-fit: cover !important; object-position: center 18% !important; }
-    }
-    .f1d-card:hover .f1d-photo { transform: scale(1.04); }
-    .f1d-fallback {
-      width: 100%;
-      height: 100%;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      font-size: 36px;
-      font-weight: 900;
-      background: rgba(0,0,0,.4);
-    }
-    .f1d-info {
-      padding: 10px 10px 12px;
-      background: linear-gradient(0deg, rgba(0,0,0,.85), rgba(0,0,0,.4));
-    }
-    .f1d-flag { font-size: 14px; margin-bottom: 3px; }
-    .f1d-firstname {
-      font-size: 9px;
-      font-weight: 500;
-      color: rgba(232,236,255,.6);
-      text-transform: uppercase;
-      letter-spacing: .08em;
-      line-height: 1.2;
-    }
-    .f1d-lastname {
-      font-size: 13px;
-      font-weight: 900;
-      color: var(--tc, #e8ecff);
-      letter-spacing: .04em;
-      line-height: 1.2;
-      margin-bottom: 4px;
-    }
-    .f1d-team-name {
-      font-size: 8px;
-      color: var(--tc, #a855f7);
-      font-weight: 700;
-      letter-spacing: .12em;
-      text-transform: uppercase;
-      opacity: .8;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    cards_html = '<div class="f1-drivers-grid">'  
-    for pil, equipo, color, abbr, num in all_drivers:
-        photo = DRIVER_PHOTOS.get(pil, "")
-        initials = "".join(p[0] for p in pil.split()[:2]).upper()
-        nacionalidades = {
-            "Lando Norris": "🇬🇧", "Oscar Piastri": "🇦🇺", "Max Verstappen": "🇳🇱",
-            "Isack Hadjar": "🇫🇷", "Kimi Antonelli": "🇮🇹", "George Russell": "🇬🇧",
-            "Charles Leclerc": "🇲🇨", "Lewis Hamilton": "🇬🇧", "Alex Albon": "🇹🇭",
-            "Carlos Sainz": "🇪🇸", "Lance Stroll": "🇨🇦", "Fernando Alonso": "🇪🇸",
-            "Liam Lawson": "🇳🇿", "Arvid Lindblad": "🇸🇪", "Oliver Bearman": "🇬🇧",
-            "Esteban Ocon": "🇫🇷", "Nico Hulkenberg": "🇩🇪", "Gabriel Bortoleto": "🇧🇷",
-            "Pierre Gasly": "🇫🇷", "Franco Colapinto": "🇦🇷",
-            "Checo Perez": "🇲🇽", "Valteri Bottas": "🇫🇮",
-        }
-        logo_url = TEAM_LOGOS_CDN.get(equipo, "")
-        flag = nacionalidades.get(pil, "🌍")
-        last_name = pil.split()[-1].upper()
-        first_name = " ".join(pil.split()[:-1])
-        img_html = f'<img src="{photo}" class="f1d-photo" onerror="this.style.display=\'none\';this.nextElementSibling.style.display=\'flex\';" loading="lazy">'
-        fallback = f'<div class="f1d-fallback" style="display:none;color:{color};">{initials}</div>'
-        cards_html += f"""
-        <div class="f1d-card fade-up" style="--tc:{color}">
-          <div class="f1d-top-stripe"></div>
-          <div class="f1d-team-badge" style="display:flex;align-items:center;gap:4px;"><span>{abbr}</span></div>
-          <img src="{logo_url}" class="f1d-logo" onerror="this.style.display='none';" loading="lazy">
-          <div class="f1d-photo-wrap">{img_html}{fallback}</div>
-          <div class="f1d-info">
-            <div class="f1d-flag">{flag}</div>
-            <div class="f1d-firstname">{first_name}</div>
-            <div class="f1d-lastname">{last_name}</div>
-            <div class="f1d-team-name">{equipo}</div>
-          </div>
-        </div>"""
-    cards_html += "</div>"
-    st.markdown(cards_html, unsafe_allow_html=True)
+    st.markdown(html_grilla_pilotos(), unsafe_allow_html=True)
 
 
 
+@perfilar("pantalla")
 def _pantalla_escuderias_grid():
     """Grid de escuderías F1 2026 — tab en Predicciones."""
     TEAM_DESCRIPTIONS = {
@@ -4323,11 +6385,12 @@ def _pantalla_escuderias_grid():
 
 
 
+@perfilar("pantalla")
 def _pantalla_calendario_tab():
     """Calendario 2026 embebido en tab de Predicciones."""
     _,c2,_ = st.columns([1,2,1])
     with c2:
-        try: st.image("IMAGENCALENDARIO.jfif", use_container_width=True, caption="")
+        try: st.image(asset_path("IMAGENCALENDARIO.jfif", 1600), use_container_width=True, caption="")
         except: pass
     # Build calendar table rows
     _rows_cal = ""
@@ -4367,6 +6430,7 @@ def _pantalla_calendario_tab():
         unsafe_allow_html=True
     )
 
+@perfilar("pantalla")
 def _pantalla_tabla_f1(tipo="pilotos"):
     """Tabla de posiciones F1 2026 oficial — scraping de formula1.com."""
     import requests as _rq_f1
@@ -4381,7 +6445,7 @@ def _pantalla_tabla_f1(tipo="pilotos"):
     st.caption(f"Fuente: formula1.com · [Ver en F1]({_url})")
 
     @st.cache_data(ttl=1800, show_spinner="Cargando standings F1...")
-    def _fetch_f1_standings(url, kind):
+    def _fetch_f1_standings(url, kind, ver):
         try:
             import requests as _rq, re as _re_f1
             headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
@@ -4413,7 +6477,7 @@ def _pantalla_tabla_f1(tipo="pilotos"):
         except Exception:
             return None
 
-    _data = _fetch_f1_standings(_url, tipo)
+    _data = _fetch_f1_standings(_url, tipo, cache_version("f1"))
 
     if _data:
         if tipo == "pilotos":
@@ -4519,7 +6583,7 @@ def _pantalla_tabla_f1(tipo="pilotos"):
             f'<tbody style="font-size:12px;">{_rows_html}</tbody></table></div>',
             unsafe_allow_html=True)
         if st.button("🔄 Actualizar standings F1", key=f"ref_f1_{tipo}", use_container_width=False):
-            _fetch_f1_standings.clear()
+            invalidar("f1")
             st.rerun()
     else:
         st.markdown(
@@ -4534,10 +6598,11 @@ def _pantalla_tabla_f1(tipo="pilotos"):
             f'🔗 Ver en Formula1.com</a></div>',
             unsafe_allow_html=True)
         if st.button("🔄 Reintentar", key=f"retry_f1_{tipo}"):
-            _fetch_f1_standings.clear()
+            invalidar("f1")
             st.rerun()
 
 
+@perfilar("pantalla")
 def pantalla_cargar_predicciones():
     # ── Tabs de sección Predicciones ──────────────────────────────
     _tab_pred, _tab_pil_full, _tab_eq_full, _tab_cal = st.tabs([
@@ -4563,6 +6628,7 @@ def pantalla_cargar_predicciones():
     with _tab_pred:
         _pantalla_pred_form()
 
+@perfilar("pantalla")
 def _pantalla_pred_form():
     # ── WhatsApp share banner (persiste después del rerun) ──
     _wa_p = st.session_state.pop("_wa_pending", None)
@@ -4681,12 +6747,10 @@ def _pantalla_pred_form():
         _cnt_q = 0; _cnt_s = 0; _cnt_r = 0
         _cnt_preds = 0
         _es_sprint_cnt = gp_actual in GPS_SPRINT
+        _preds_cnt = recuperar_predicciones_gp(gp_actual)
         for _pil_cnt in PILOTOS_TORNEO:
             try:
-                _r_cnt = _safe_call(mdb["recuperar_predicciones_piloto"], _pil_cnt,
-                                    gp_actual, timeout_sec=6,
-                                    default=(None,None,(None,None)))
-                _dq_c, _ds_c, (_dr_c, _dc_c) = _r_cnt
+                _dq_c, _ds_c, (_dr_c, _dc_c) = _preds_cnt.get(_pil_cnt, _PRED_VACIA)
                 _sent_q = isinstance(_dq_c, dict) and any(str(v).strip() for v in _dq_c.values())
                 _sent_s = isinstance(_ds_c, dict) and any(str(v).strip() for v in _ds_c.values())
                 _sent_r = (isinstance(_dr_c, dict) and any(str(v).strip() for v in _dr_c.values())) or \
@@ -4796,27 +6860,9 @@ def _pantalla_pred_form():
         _ci_clr = _ci.get("color","#3b82f6")
         _ci_img = _ci.get("img","")
 
-        @st.cache_data(ttl=86400, show_spinner=False)
-        def _fetch_circuit_img(url):
-            try:
-                import requests as _rq_ci, base64 as _b64_ci
-                _headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                    "Accept": "image/png,image/svg+xml,image/*,*/*",
-                    "Referer": "https://en.wikipedia.org/"
-                }
-                _r = _rq_ci.get(url, timeout=12, headers=_headers)
-                if _r.status_code == 200 and len(_r.content) > 1000:
-                    # Force image/png since Wikimedia thumbnail URLs end in .svg.png
-                    _ct = "image/png" if url.endswith(".png") else _r.headers.get("Content-Type","image/png")
-                    # Strip charset if present: "image/png; charset=utf-8" -> "image/png"
-                    _ct = _ct.split(";")[0].strip()
-                    _b64 = _b64_ci.b64encode(_r.content).decode()
-                    return f"data:{_ct};base64,{_b64}"
-            except Exception: pass
-            return ""
-
-        _ci_data = _fetch_circuit_img(_ci_img) if _ci_img else ""
+        # Wikimedia no admite hotlink: sin static serving va inline (ya normalizado)
+        _ci_data = img_url(_ci_img, ancho=300, inline=True, esperar=True) if _ci_img else ""
+        if _ci_data.startswith("data:image/svg"): _ci_data = ""
         _img_html = (
             f'<div style="flex:0 0 auto;width:155px;display:flex;align-items:center;' +
             f'justify-content:center;background:rgba(255,255,255,.02);' +
@@ -4919,9 +6965,7 @@ def _pantalla_pred_form():
 
     def ya_envio(u, gp, etapa):
         try:
-            res = _safe_call(mdb["recuperar_predicciones_piloto"], u, gp,
-                             timeout_sec=6, default=(None, None, (None, None)))
-            dq, ds, (dr, dc) = res
+            dq, ds, (dr, dc) = recuperar_predicciones_gp(gp, [u])[u]
             e = (etapa or "").upper()
             if e == "QUALY":   return _has(dq)
             if e == "SPRINT":  return _has(ds)
@@ -4951,8 +6995,7 @@ def _pantalla_pred_form():
     _preload_key = f"_pred_preloaded_{gp_actual}_{usuario}"
     if not st.session_state.get(_preload_key) and "_error" not in mdb:
         try:
-            _existing = _safe_call(mdb["recuperar_predicciones_piloto"], usuario, gp_actual,
-                                   timeout_sec=12, default=(None,None,(None,None)))
+            _existing = recuperar_predicciones_gp(gp_actual, [usuario])[usuario]
             _dq_ex, _ds_ex, (_dr_ex, _dc_ex) = _existing
             # Pre-populate session state if empty
             if _dq_ex and kp_q not in st.session_state:
@@ -5062,6 +7105,7 @@ def _pantalla_pred_form():
                     ok, msg = mdb["guardar_etapa"](*args)
                 except Exception as _ge: ok, msg = False, f"Error al guardar: {_ge}"
                 if ok:
+                    invalidar(f"predicciones:{gp_actual}")  # que ya_envio vea el envío recién guardado
                     _q_res = " · ".join([f"P{i} {q_data[i]}" for i in range(1,6)])
                     _q_res += f"\n🇦🇷 Colapinto: P{q_data.get('colapinto_q','?')}"
                     st.success(msg); st.balloons()
@@ -5111,6 +7155,7 @@ def _pantalla_pred_form():
                         ok, msg = mdb["guardar_etapa"](usuario, gp_actual, "SPRINT", s_data)
                     except Exception as _ge: ok, msg = False, f"Error al guardar: {_ge}"
                     if ok:
+                        invalidar(f"predicciones:{gp_actual}")
                         _s_res = " · ".join([f"P{i} {s_data[i]}" for i in range(1,9)])
                         st.success(msg); st.balloons()
                         _send_prediccion_email(usuario, gp_actual, "SPRINT", _s_res)
@@ -5206,6 +7251,7 @@ def _pantalla_pred_form():
                     ok, msg = mdb["guardar_etapa"](usuario, gp_actual, "CARRERA", r_data)
                 except Exception as _ge: ok, msg = False, f"Error al guardar: {_ge}"
                 if ok:
+                    invalidar(f"predicciones:{gp_actual}")
                     _r_res  = " · ".join([f"P{i} {r_data[i]}" for i in range(1,11)])
                     _r_res += f"\n🏗️ Constructores: {r_data.get('c1','?')} / {r_data.get('c2','?')} / {r_data.get('c3','?')}"
                     _col_r  = r_data.get("colapinto_r","")
@@ -5220,76 +7266,40 @@ def _pantalla_pred_form():
 
 def _do_wa_email(df_h, oficial, gp_calc, mdb):
     """Genera botones WA con aciertos por piloto y envío de emails."""
-    import re as _re_w, urllib.parse as _up_w
-    try:
-        from core.utils import normalizar_nombre as _nn_w
-    except Exception:
-        _nn_w = lambda x: str(x or "").strip().lower()
-
-    of_r = {i: oficial.get(f"r{i}","") for i in range(1,11)}
-    of_q = {i: oficial.get(f"q{i}","") for i in range(1,6)}
-    of_c = {i: oficial.get(f"c{i}","") for i in range(1,4)}
-    of_s = {i: oficial.get(f"s{i}","") for i in range(1,9)}
-    col_q_r = str(oficial.get("col_q","")).strip()
-    col_r_r = str(oficial.get("col_r","")).strip()
-    gp_lbl = _re_w.sub(r'^\d+\.\s*','', gp_calc).strip()
-    FLAGS = {"Australia":"🇦🇺","China":"🇨🇳","Japón":"🇯🇵","Miami":"🇺🇸","Canadá":"🇨🇦",
-             "Mónaco":"🇲🇨","España":"🇪🇸","Austria":"🇦🇹","Gran Bretaña":"🇬🇧","Bélgica":"🇧🇪",
-             "Hungría":"🇭🇺","Países Bajos":"🇳🇱","Italia":"🇮🇹","Madrid":"🇪🇸","Azerbaiyán":"🇦🇿",
-             "Singapur":"🇸🇬","México":"🇲🇽","Brasil":"🇧🇷","Las Vegas":"🇺🇸","Qatar":"🇶🇦","Abu Dabi":"🇦🇪"}
-    fl = next((v for k,v in FLAGS.items() if k.lower() in gp_lbl.lower()),"🏁")
+    import urllib.parse as _up_w
+
+    gp_lbl = gp_titulo(gp_calc)
+    fl = gp_bandera(gp_calc)
     MED = {0:"🥇",1:"🥈",2:"🥉",3:"4°",4:"5°"}
-    ESCALA_Q = {1:15,2:10,3:7,4:5,5:3}
-    ESCALA_R = {1:25,2:18,3:15,4:12,5:10,6:8,7:6,8:4,9:2,10:1}
-    ESCALA_S = {1:8,2:7,3:6,4:5,5:4,6:3,7:2,8:1}
-    ESCALA_C = {1:10,2:5,3:2}
-
-    # Leer predicciones
-    preds = {}
-    for pil in PILOTOS_TORNEO:
-        try:
-            r = _safe_call(mdb["recuperar_predicciones_piloto"], pil, gp_calc,
-                           timeout_sec=15, default=(None,None,(None,None)))
-            dq,ds,(dr,dc) = r
-            flat = {}
-            for src_d, key_pfx in [(dq,"q"),(dr,"p"),(dc,"c"),(ds,"spr")]:
-                if isinstance(src_d,dict):
-                    for k,v in src_d.items():
-                        flat[f"{key_pfx}{k}" if str(k).isdigit() else k] = v
-            if flat: preds[pil] = flat
-        except Exception: pass
+
+    # Aciertos de todos los formuleros en una sola pasada del motor de puntaje
+    _preds_gp = recuperar_predicciones_gp(gp_calc, PILOTOS_TORNEO)
+    _, _det_w = puntuar_gp(_preds_gp, oficial, es_sprint=gp_calc in GPS_SPRINT)
+    _det_por = {p: d for p, d in _det_w.groupby("piloto", sort=False)}
+    _SEC_W = [("QUALY", "⏱️ *CLASIFICACIÓN:*", "COLAPINTO Q"), ("SPRINT", "⚡ *SPRINT:*", None),
+              ("CARRERA", "🏁 *CARRERA:*", "COLAPINTO R"), ("CONSTRUCTORES", "🏗️ *CONSTRUCTORES:*", None)]
 
     def _msg(pil, total_pts):
-        flat = preds.get(pil, {})
+        d = _det_por.get(pil, _det_w.iloc[0:0])
         L = [f"🏎️ *TORNEO FEFE WOLF 2026*",
              f"{fl} *{gp_lbl.upper()}* — Predicciones de *{pil}*",
              f"🏆 *TOTAL: {total_pts} pts*",
              f"━━━━━━━━━━━━━━━━━━━━━━"]
-        def _sec(titulo, rng, pfx, of_d, esc, pleno_pts=0):
-            rows = [(i, str(flat.get(f"{pfx}{i}","")).strip()) for i in rng if flat.get(f"{pfx}{i}","")]
-            if not rows: return
-            L.append(f"\n{titulo}")
-            sub = 0; aciertos = 0
-            for i, pv in rows:
-                rv = str(of_d.get(i,"")).strip()
-                ok = "✅" if (pv and rv and _nn_w(pv)==_nn_w(rv)) else "❌"
-                pts = esc.get(i,0) if ok=="✅" else 0; sub += pts
-                if ok == "✅": aciertos += 1
-                L.append(f"  P{i} {pv} {ok}{(' (+'+str(pts)+')') if pts else ''}")
-            # Pleno bonus
-            if pleno_pts and aciertos == len(list(rng)):
-                sub += pleno_pts
-                L.append(f"  🎯 *PLENO PERFECTO! +{pleno_pts} bonus*")
-            if sub: L.append(f"  💰 *Subtotal: +{sub} pts*")
-        _sec("⏱️ *CLASIFICACIÓN:*", range(1,6), "q", of_q, ESCALA_Q, pleno_pts=5)
-        cqp = str(flat.get("colapinto_q","")).strip()
-        if cqp: L.append(f"  🇦🇷 Colapinto P{cqp} {'✅ (+10)' if col_q_r and cqp==col_q_r else '❌'}")
-        if gp_calc in GPS_SPRINT:
-            _sec("⚡ *SPRINT:*", range(1,9), "spr", of_s, ESCALA_S, pleno_pts=3)
-        _sec("🏁 *CARRERA:*", range(1,11), "p", of_r, ESCALA_R, pleno_pts=5)
-        crp = str(flat.get("colapinto_r","")).strip()
-        if crp: L.append(f"  🇦🇷 Colapinto P{crp} {'✅ (+20)' if col_r_r and crp==col_r_r else '❌'}")
-        _sec("🏗️ *CONSTRUCTORES:*", range(1,4), "c", of_c, ESCALA_C, pleno_pts=3)
+        for et, titulo, col_lbl in _SEC_W:
+            rows = d[d["etapa"]==et]
+            if not rows.empty:
+                L.append(f"\n{titulo}")
+                for r in rows.itertuples(index=False):
+                    L.append(f"  P{r.pos} {r.pred} {'✅' if r.ok else '❌'}{(' (+'+str(r.pts)+')') if r.pts else ''}")
+                sub = int(rows["pts"].sum())
+                # Pleno bonus
+                if (d["etapa"]==f"PLENO {et}").any():
+                    sub += BONUS_PLENO[et]
+                    L.append(f"  🎯 *PLENO PERFECTO! +{BONUS_PLENO[et]} bonus*")
+                if sub: L.append(f"  💰 *Subtotal: +{sub} pts*")
+            if col_lbl:
+                for r in d[d["etapa"]==col_lbl].itertuples(index=False):
+                    L.append(f"  🇦🇷 Colapinto P{r.pred} {('✅ (+'+str(r.pts)+')') if r.ok else '❌'}")
         L += ["","━━━━━━━━━━━━━━━━━━━━━━",
               f"🏆 *TOTAL: {total_pts} pts*", "🏁 _torneofefewolf2026.streamlit.app_"]
         return "\n".join(L)
@@ -5324,30 +7334,22 @@ def _do_wa_email(df_h, oficial, gp_calc, mdb):
                     f'font-size:13px;padding:11px;border-radius:12px;text-decoration:none;">'
                     f'📲 Resumen general</a>', unsafe_allow_html=True)
     with c2:
-        gm_u = st.secrets.get("GMAIL_USER",""); gm_p = st.secrets.get("GMAIL_APP_PASSWORD","")
+        gm_u = st.secrets.get("GMAIL_USER","")
         emails = st.secrets.get("emails",{})
         if st.button("📧 Enviar aciertos por email a todos", key=f"btn_email_{gp_calc}",
                      use_container_width=True):
             if not gm_u or not emails:
                 st.warning("Configurá GMAIL_USER y emails en secrets.")
             else:
-                import smtplib; from email.mime.text import MIMEText
                 sent = 0
                 for pil_e, em_e in emails.items():
                     if not em_e: continue
                     row_e = sorted_h[sorted_h["Piloto"]==pil_e]
                     pts_e = int(row_e["Total"].iloc[0]) if not row_e.empty else 0
                     body = _msg(pil_e, pts_e).replace("*","").replace("_","")
-                    try:
-                        msg = MIMEText(body,"plain","utf-8")
-                        msg["Subject"] = f"🏎️ Torneo Fefe Wolf — {gp_lbl} — Tus aciertos"
-                        msg["From"] = f"Torneo Fefe Wolf <{gm_u}>"
-                        msg["To"] = em_e
-                        with smtplib.SMTP_SSL("smtp.gmail.com",465) as sv:
-                            sv.login(gm_u,gm_p); sv.sendmail(gm_u,em_e,msg.as_string())
-                        sent += 1
-                    except Exception as ee: st.warning(f"Error {pil_e}: {ee}")
-                st.success(f"✅ {sent} emails enviados con aciertos individuales.")
+                    sent += encolar_email(em_e, f"🏎️ Torneo Fefe Wolf — {gp_lbl} — Tus aciertos", body,
+                                          clave=outbox_clave("aciertos", gp_calc, em_e, body))
+                st.success(f"✅ {sent} emails con aciertos individuales en cola de envío.")
                 # ── Send pleno notifications — solo cuando hubo pleno real ─
                 pleno_pils = []
                 for _pil_ep in PILOTOS_TORNEO:
@@ -5371,19 +7373,13 @@ def _do_wa_email(df_h, oficial, gp_calc, mdb):
                     for _pp, _pp_pts in pleno_pils:
                         _pp_email = emails.get(_pp,"")
                         if not _pp_email: continue
-                        try:
-                            _pp_body = (f"🎯 TORNEO FEFE WOLF 2026\n\n"
-                                        f"¡¡{_pp.upper()}, TUVISTE PLENO!!\n\n"
-                                        f"🏁 {gp_lbl}\n"
-                                        f"💰 Sumaste {_pp_pts} pts esta fecha\n\n"
-                                        f"torneofefewolf2026.streamlit.app")
-                            _pp_msg = MIMEText(_pp_body,"plain","utf-8")
-                            _pp_msg["Subject"] = f"🎯 ¡Pleno! {gp_lbl} — Torneo Fefe Wolf"
-                            _pp_msg["From"] = f"Torneo Fefe Wolf <{gm_u}>"
-                            _pp_msg["To"] = _pp_email
-                            with smtplib.SMTP_SSL("smtp.gmail.com",465) as _sv_pp:
-                                _sv_pp.login(gm_u,gm_p); _sv_pp.sendmail(gm_u,_pp_email,_pp_msg.as_string())
-                        except Exception: pass
+                        _pp_body = (f"🎯 TORNEO FEFE WOLF 2026\n\n"
+                                    f"¡¡{_pp.upper()}, TUVISTE PLENO!!\n\n"
+                                    f"🏁 {gp_lbl}\n"
+                                    f"💰 Sumaste {_pp_pts} pts esta fecha\n\n"
+                                    f"torneofefewolf2026.streamlit.app")
+                        encolar_email(_pp_email, f"🎯 ¡Pleno! {gp_lbl} — Torneo Fefe Wolf", _pp_body,
+                                      clave=outbox_clave("pleno", gp_calc, _pp_email, _pp_body))
 
                 # ── Notificación "rival te superó" ──────────────────────
                 if gm_u and emails:
@@ -5417,14 +7413,8 @@ def _do_wa_email(df_h, oficial, gp_calc, mdb):
                                                   f"📊 TABLA GENERAL:\n{_ranking_str}\n\n"
                                                   f"torneofefewolf2026.streamlit.app")
                                     _s_r = f"⚡ {_rival_delante} te superó — {gp_lbl}"
-                                try:
-                                    _rm = MIMEText(_lider_msg,"plain","utf-8")
-                                    _rm["Subject"] = _s_r + " — Torneo Fefe Wolf"
-                                    _rm["From"] = f"Torneo Fefe Wolf <{gm_u}>"
-                                    _rm["To"] = _em_r
-                                    with smtplib.SMTP_SSL("smtp.gmail.com",465) as _sv_r:
-                                        _sv_r.login(gm_u,gm_p); _sv_r.sendmail(gm_u,_em_r,_rm.as_string())
-                                except Exception: pass
+                                encolar_email(_em_r, _s_r + " — Torneo Fefe Wolf", _lider_msg,
+                                              clave=outbox_clave("tabla", gp_calc, _em_r, _lider_msg))
                     except Exception: pass
 
     st.markdown("**📲 Aciertos individuales por piloto**")
@@ -5444,6 +7434,7 @@ def _do_wa_email(df_h, oficial, gp_calc, mdb):
     st.markdown("---")
 
 
+@perfilar("pantalla")
 def pantalla_formuleros():
     """Sección de comunidad: Pilotos en parrilla, DMs, salón de la fama."""
     import html as _hf, sqlite3 as _sqf, datetime as _dtf
@@ -5470,34 +7461,13 @@ def pantalla_formuleros():
         _tab_target = "Parrilla"
     elif st.session_state.get("formuleros_tab_target"):
         _tab_target = st.session_state.pop("formuleros_tab_target")
-    if _tab_target:
-        import json as _json_tt
-        _tt_js = _json_tt.dumps(_tab_target)
-        components.html(f"""
-        <script>
-        (function(){{
-            var target = {_tt_js};
-            var tries = 0;
-            function clickTab(){{
-                tries++;
-                var doc = window.parent.document;
-                var tabs = doc.querySelectorAll('button[data-baseweb="tab"]');
-                for (var i=0;i<tabs.length;i++){{
-                    if (tabs[i].innerText && tabs[i].innerText.indexOf(target)>=0){{
-                        tabs[i].click(); return;
-                    }}
-                }}
-                if (tries < 20) setTimeout(clickTab, 150);
-            }}
-            setTimeout(clickTab, 200);
-        }})();
-        </script>""", height=0)
 
     # ═══ TAB STRUCTURE ══════════════════════════════════════
-    _ft2, _ft1, _ft4, _ft3, _ft5 = st.tabs(["💬 Mesa de Formuleros", "🏎️ Parrilla", "🎯 Desafíos", "⚔️ Head to Head", "🏆 Muro de Campeones"])
+    _ft2, _ft1, _ft4, _ft3, _ft5 = lazy_tabs(["💬 Mesa de Formuleros", "🏎️ Parrilla", "🎯 Desafíos", "⚔️ Head to Head", "🏆 Muro de Campeones"],
+                                             key="form_tab", target=_tab_target)
 
     # ════ TAB 1: PARRILLA ════════════════════════════════════
-    with _ft1:
+    if _ft1:
         st.markdown('<div style="font-size:11px;font-weight:700;letter-spacing:.14em;'
                     'color:rgba(246,195,73,.6);text-transform:uppercase;margin-bottom:12px;">'
                     '🏆 CLASIFICACIÓN DEL TORNEO 2026</div>', unsafe_allow_html=True)
@@ -5564,14 +7534,10 @@ def pantalla_formuleros():
                 if "_error" in _mdb_fp2:
                     st.error("Error cargando datos.")
                 else:
-                    # Load full historial (all pilots — needed for logros comparison)
-                    _h_fp2 = _safe_call(_mdb_fp2["leer_historial_df"], timeout_sec=12, default=pd.DataFrame())
-                    # Load detalle for deeper logros
-                    _det_fp2 = _safe_call(_mdb_fp2.get("leer_historial_detalle_df", lambda: pd.DataFrame()), timeout_sec=10, default=pd.DataFrame())
-                    if _h_fp2 is not None and not (hasattr(_h_fp2,"empty") and _h_fp2.empty):
-                        _hp2_all = _h_fp2.copy()
-                        _hp2_all.columns = [c.lower().strip() for c in _hp2_all.columns]
-                        _hp2_all["puntos"] = pd.to_numeric(_hp2_all["puntos"],errors="coerce").fillna(0).astype(int)
+                    # Historial completo del resumen de temporada (logros: lookup en el motor)
+                    _rs_fp2 = resumen_temporada()
+                    if not _rs_fp2["hist"].empty:
+                        _hp2_all = _rs_fp2["hist"]
                         _hp2_pil = _hp2_all[_hp2_all.get("piloto",pd.Series(dtype=str)).astype(str)==pil]
                         if not _hp2_pil.empty:
                             _clr_fp = PILOTO_COLORS.get(pil,"#a855f7")
@@ -5583,12 +7549,7 @@ def pantalla_formuleros():
                             _best_gp_row = _hp2_pil.loc[_hp2_pil["puntos"].idxmax()]
                             _best_gp_lbl = str(_best_gp_row.get("gp","")).split(". ",1)[-1] if ". " in str(_best_gp_row.get("gp","")) else str(_best_gp_row.get("gp",""))
                             # GPs ganados
-                            _gps_won = 0
-                            try:
-                                _agg_fp = _hp2_all.groupby(["gp","piloto"],as_index=False)["puntos"].sum()
-                                for _gpf, _grpf in _agg_fp.groupby("gp"):
-                                    if _grpf.sort_values("puntos",ascending=False).iloc[0]["piloto"]==pil: _gps_won+=1
-                            except Exception: pass
+                            _gps_won = _rs_fp2["ganados"].get(pil, 0)
 
                             # ── Stats cards ─────────────────────────────────────────
                             _sc1,_sc2,_sc3,_sc4 = st.columns(4)
@@ -5653,13 +7614,7 @@ def pantalla_formuleros():
 
                             # ── Logros — load detalle for accurate calculation ────────
                             try:
-                                _det_for_logros = None
-                                if _det_fp2 is not None and not (hasattr(_det_fp2,"empty") and _det_fp2.empty):
-                                    _det_c = _det_fp2.copy()
-                                    _det_c.columns = [c.lower().strip() for c in _det_c.columns]
-                                    _det_c["puntos"] = pd.to_numeric(_det_c["puntos"],errors="coerce").fillna(0).astype(int)
-                                    _det_for_logros = _det_c
-                                _lgr2 = _calc_logros(pil, _hp2_all, _det_for_logros, _n_gps)
+                                _lgr2 = _calc_logros(pil)
                                 _ulg2 = [(ld,u2,gp2) for ld,u2,gp2 in _lgr2 if u2]
                                 st.markdown('<div style="font-size:9px;font-weight:700;color:rgba(246,195,73,.6);text-transform:uppercase;letter-spacing:.1em;margin:10px 0 5px;">🏅 Logros & Medallas</div>', unsafe_allow_html=True)
                                 if _ulg2:
@@ -5689,7 +7644,7 @@ def pantalla_formuleros():
 
 
     # ════ TAB 2: MESA DE FORMULEROS (chat) ══════════════════════════
-    with _ft2:
+    if _ft2:
         st.markdown('<div style="font-size:11px;color:rgba(169,178,214,.45);margin-bottom:8px;">'
                     '💬 Mesa exclusiva para debatir F1 entre formuleros. Los mensajes persisten.</div>',
                     unsafe_allow_html=True)
@@ -5698,43 +7653,13 @@ def pantalla_formuleros():
             st.error(f"Chat no disponible: {m_chat['_error']}")
         else:
             # ── Load messages ─────────────────────────────────────────────
-            _mc_limit_f = st.session_state.get("mc_show_limit_f", 40)
-            _all_rows_f = m_chat["mc_list_messages"](limit=999) or []
-            # ── Si SQLite está vacío, cargar desde GSheets (sobrevive reinicios) ──
-            if not _all_rows_f:
-                try:
-                    from core.database import conectar_google_sheets as _cgs_mc2
-                    _ws_mc2 = _cgs_mc2("MesaChica")
-                    if _ws_mc2:
-                        _vals_mc2 = _ws_mc2.get_all_values()
-                        if _vals_mc2 and len(_vals_mc2) > 1:
-                            _hdr_mc2 = [h.lower().strip() for h in _vals_mc2[0]]
-                            def _col_idx(name, default=None):
-                                return _hdr_mc2.index(name) if name in _hdr_mc2 else default
-                            _i_id  = _col_idx("id", 0)
-                            _i_usr = _col_idx("usuario", 1)
-                            _i_txt = _col_idx("texto", 2)
-                            _i_ts  = _col_idx("ts", 3)
-                            _i_del = _col_idx("deleted", 4)
-                            _tmp_rows = []
-                            for _r in _vals_mc2[1:]:
-                                try:
-                                    _del_v = str(_r[_i_del]) if (_i_del is not None and _i_del < len(_r)) else "0"
-                                    if _del_v in ("1","True","true"): continue
-                                    _txt_v = str(_r[_i_txt]) if _i_txt < len(_r) else ""
-                                    if not _txt_v.strip(): continue
-                                    _id_v = 0
-                                    try: _id_v = int(_r[_i_id]) if _i_id < len(_r) else 0
-                                    except Exception: _id_v = 0
-                                    _tmp_rows.append((
-                                        _id_v,
-                                        str(_r[_i_usr]) if _i_usr < len(_r) else "",
-                                        _txt_v,
-                                        str(_r[_i_ts]) if _i_ts < len(_r) else ""))
-                                except Exception: continue
-                            _all_rows_f = list(reversed(_tmp_rows))
-                except Exception: pass
-            rows_f = _all_rows_f[:_mc_limit_f]
+            # Feed por cursor: la primera vez los 40 más nuevos; después solo lo
+            # posterior al último que ya se mostró, y "ver más" pide la página anterior.
+            _feed_f = st.session_state.get("mc_feed_f") or []
+            _feed_f = (mc_feed(since_id=_feed_f[0][0], limit=None) + mc_feed_vigentes(_feed_f)
+                       if _feed_f else mc_feed(limit=40))
+            st.session_state["mc_feed_f"] = _feed_f
+            rows_f = _feed_f
 
             # Input
             _in_col1, _in_col2 = st.columns([9,1])
@@ -5753,89 +7678,66 @@ def pantalla_formuleros():
                             if _ws_mc:
                                 import datetime as _dt_mc, pytz as _ptz_mc
                                 _ts_mc = _dt_mc.datetime.now(_ptz_mc.timezone("America/Argentina/Buenos_Aires")).strftime("%Y-%m-%d %H:%M:%S")
-                                _mc_recs = _ws_mc.get_all_values()
-                                # Asegurar fila de encabezados
-                                if not _mc_recs:
-                                    _ws_mc.append_row(["id","usuario","texto","ts","deleted","extra"])
-                                    _mc_recs = [["id","usuario","texto","ts","deleted","extra"]]
-                                _mc_nid = len(_mc_recs)  # header + rows = siguiente id
-                                _ws_mc.append_row([_mc_nid, usuario, _mc_txt_f.strip(), _ts_mc, 0, ""])
+                                hoja_append_con_id("MesaChica", ["id","usuario","texto","ts","deleted","extra"],
+                                                   [usuario, _mc_txt_f.strip(), _ts_mc, 0, ""], ws=_ws_mc)
                         except Exception: pass
+                        mc_feed_sync(forzar=True)
                         st.rerun()
 
             _ref_c1, _ref_c2 = st.columns([1, 4])
             with _ref_c1:
                 if st.button("🔄 Actualizar", key="mc_ref_f", use_container_width=True):
-                    st.rerun()
+                    mc_feed_sync(forzar=True); st.rerun()
 
             st.markdown('<div style="height:6px"></div>', unsafe_allow_html=True)
 
-            # Messages
+            # Messages — los que no llevan botón de borrar se agrupan en un solo bloque
+            _is_fipf_f = usuario in {"Checo Perez","Lando Norris","Fernando Alonso","Valteri Bottas"}
+            _lote_f = []
+            def _flush_f():
+                if _lote_f:
+                    st.markdown('<div class="tp-mc-lote">' + "".join(_lote_f) + '</div>', unsafe_allow_html=True)
+                    _lote_f.clear()
             for _row_f in rows_f:
                 _mid_f, _u_f, _txt_f, _ts_f = _row_f[:4]
-                _clr_f = PILOTO_COLORS.get(_u_f,"#a855f7")
-                _ph_f  = DRIVER_HEADSHOTS.get(_u_f, DRIVER_PHOTOS.get(_u_f,""))
                 _is_own_f = (_u_f == usuario)
-                _is_fipf_f = usuario in {"Checo Perez","Lando Norris","Fernando Alonso","Valteri Bottas"}
-                _av_f = (f'<img src="{_ph_f}" style="width:30px;height:30px;border-radius:50%;'
-                         f'object-fit:cover;object-position:top;border:2px solid {_clr_f};flex-shrink:0;">'
-                         if _ph_f else
-                         f'<div style="width:30px;height:30px;border-radius:50%;background:{_clr_f}22;'
-                         f'border:1.5px solid {_clr_f};display:flex;align-items:center;justify-content:center;'
-                         f'font-weight:900;font-size:9px;color:{_clr_f};flex-shrink:0;">'
-                         f'{"".join(w[0] for w in _u_f.split()[:2]).upper()}</div>')
                 try: _ts_f2 = __import__("datetime").datetime.fromisoformat(_ts_f.replace("T"," ").split(".")[0]).strftime("%d/%m %H:%M")
                 except Exception: _ts_f2 = str(_ts_f)[:16]
-                _bg_f = (f"linear-gradient(135deg,{_clr_f}1a,rgba(8,12,30,.97))"
-                         if _is_own_f else "rgba(255,255,255,.03)")
-                _br_f = "14px 14px 3px 14px" if _is_own_f else "14px 14px 14px 3px"
-                _bub_f = (
-                    f'<div style="background:{_bg_f};border:1px solid {_clr_f}33;'
-                    f'border-radius:{_br_f};padding:8px 12px 5px;max-width:100%;word-break:break-word;">'
-                    f'<div style="display:flex;align-items:center;gap:5px;margin-bottom:2px;">'
-                    f'<span style="font-size:10px;font-weight:900;color:{_clr_f};">{_u_f.split()[0]}</span>'
-                    f'<span style="background:{_clr_f}22;color:{_clr_f};border-radius:20px;padding:1px 6px;'
-                    f'font-size:8px;font-weight:800;">{_mc_badge(_u_f)[1]}</span>'
-                    f'<span style="font-size:8px;color:rgba(169,178,214,.3);margin-left:auto;">{_ts_f2}</span>'
-                    f'</div>'
-                    f'<div style="font-size:13px;color:rgba(232,236,255,.9);">{_mc_safe(_txt_f)}</div>'
-                    f'</div>'
-                )
+                _lote_f.append(html_mc_mensaje(_u_f, _mc_safe(_txt_f), _ts_f2, _is_own_f))
                 if _is_own_f:
-                    st.markdown(f'<div style="display:flex;align-items:flex-end;justify-content:flex-end;gap:6px;margin-bottom:2px;">'
-                                f'<div style="max-width:70%;">{_bub_f}</div>{_av_f}</div>', unsafe_allow_html=True)
-                    if (_is_own_f or _is_fipf_f):
-                        _dc1, _dc2, _del_col = st.columns([6,3,1])
-                        with _del_col:
-                            if st.button("✕", key=f"mcdel_f_{_mid_f}",
-                                         help="Borrar"):
-                                m_chat["mc_soft_delete_message"](_mid_f, deleted_by=usuario); st.rerun()
-                else:
-                    st.markdown(f'<div style="display:flex;align-items:flex-end;gap:6px;margin-bottom:2px;">'
-                                f'{_av_f}<div style="max-width:70%;">{_bub_f}</div></div>', unsafe_allow_html=True)
-                    if _is_fipf_f:
-                        _del_col2, _dc3, _dc4 = st.columns([1,3,6])
-                        with _del_col2:
-                            if st.button("✕", key=f"mcdel_fa_{_mid_f}",
-                                         help="Borrar (admin)"):
-                                m_chat["mc_soft_delete_message"](_mid_f, deleted_by=usuario); st.rerun()
-
-            if len(_all_rows_f) > _mc_limit_f:
+                    _flush_f()
+                    _dc1, _dc2, _del_col = st.columns([6,3,1])
+                    with _del_col:
+                        if st.button("✕", key=f"mcdel_f_{_mid_f}",
+                                     help="Borrar"):
+                            m_chat["mc_soft_delete_message"](_mid_f, deleted_by=usuario)
+                            mc_feed_quitar(_mid_f); st.rerun()
+                elif _is_fipf_f:
+                    _flush_f()
+                    _del_col2, _dc3, _dc4 = st.columns([1,3,6])
+                    with _del_col2:
+                        if st.button("✕", key=f"mcdel_fa_{_mid_f}",
+                                     help="Borrar (admin)"):
+                            m_chat["mc_soft_delete_message"](_mid_f, deleted_by=usuario)
+                            mc_feed_quitar(_mid_f); st.rerun()
+            _flush_f()
+
+            if rows_f and mc_feed(before_id=rows_f[-1][0], limit=1):
                 if st.button(f"📜 Ver más mensajes", key="mc_more_f", use_container_width=True):
-                    st.session_state["mc_show_limit_f"] = _mc_limit_f + 30; st.rerun()
+                    st.session_state["mc_feed_f"] = rows_f + mc_feed(before_id=rows_f[-1][0], limit=30); st.rerun()
 
     # ════ TAB 3: HEAD TO HEAD ════════════════════════════════
-    with _ft3:
+    if _ft3:
         st.markdown('<div style="font-size:12px;color:rgba(169,178,214,.5);margin-bottom:8px;">'
                     '⚔️ Comparación directa entre 2 formuleros del torneo</div>', unsafe_allow_html=True)
         pantalla_head_to_head()
 
     # ════ TAB 4: DESAFÍOS ═════════════════════════════════════
-    with _ft4:
+    if _ft4:
         pantalla_desafios()
 
     # ════ TAB 5: MURO DE CAMPEONES ════════════════════════════
-    with _ft5:
+    if _ft5:
         st.markdown(
             '<div style="background:linear-gradient(145deg,rgba(212,175,55,.08),rgba(7,9,22,.97));' +
             'border:1.5px solid rgba(212,175,55,.35);border-radius:20px;padding:20px;text-align:center;">' +
@@ -5851,6 +7753,7 @@ def pantalla_formuleros():
 
 
 
+@perfilar("pantalla")
 def pantalla_desafios():
     """Sistema de desafíos entre formuleros — EN REDISEÑO, vuelve después de Bélgica."""
     usuario = (st.session_state.get("perfil") or {}).get("usuario","")
@@ -5871,6 +7774,7 @@ def pantalla_desafios():
 
 
 
+@perfilar("pantalla")
 def pantalla_admin():
     """Panel centralizado de administración — solo Checo Perez."""
     usuario = (st.session_state.get("perfil") or {}).get("usuario","")
@@ -5916,17 +7820,17 @@ def pantalla_admin():
         st.error(f"⚠️ Error cargando módulos: {mdb.get('_error','')} {madm.get('_error','')}"); return
 
     # ── Tabs del panel ─────────────────────────────────────────────────
-    _at1,_at2,_at3,_at4,_at5,_at6 = st.tabs([
+    _at1,_at2,_at3,_at4,_at5,_at6 = lazy_tabs([
         "⚡ Resultados & Historial",
         "⛔ Sanciones DNS",
         "👥 Usuarios",
         "🎟️ Invitaciones",
         "📧 Comunicados",
         "📋 Log"
-    ])
+    ], key="adm_tab")
 
     # ════ TAB 1: RESULTADOS & HISTORIAL ════════════════════════════════
-    with _at1:
+    if _at1:
         st.markdown('<div class="admin-title">📌 GP a calcular</div>', unsafe_allow_html=True)
         gp_adm = st.selectbox("Gran Premio:", GPS_ACTIVOS, key="adm_gp",
                               format_func=lambda x: x.split(". ",1)[-1] if ". " in x else x)
@@ -5976,83 +7880,28 @@ def pantalla_admin():
         if st.session_state.get("_adm_show_preview"):
             with st.spinner("Cargando preview de aciertos…"):
                 try:
-                    import re as _re_prev
-                    _nn_prev = lambda x: str(x or "").strip().lower()
-                    _ESCALA_PR = {"QUALY":{1:15,2:10,3:7,4:5,5:3},
-                                  "SPRINT":{1:8,2:7,3:6,4:5,5:4,6:3,7:2,8:1},
-                                  "CARRERA":{1:25,2:18,3:15,4:12,5:10,6:8,7:6,8:4,9:2,10:1},
-                                  "CONSTRUCTORES":{1:10,2:5,3:2}}
+                    # Todos los formuleros en una pasada del motor de puntaje
+                    _res_prev, _det_prev = puntuar_gp(recuperar_predicciones_gp(gp_adm, PILOTOS_TORNEO),
+                                                      oficial_adm, es_sprint=gp_adm in GPS_SPRINT)
+                    _det_prev_por = {p: d for p, d in _det_prev.groupby("piloto", sort=False)}
+
+                    def _fila_prev(r):
+                        if r.etapa.startswith("PLENO"):
+                            return {"Piloto":r.piloto,"Etapa":f"🎯 {r.etapa}","Pos":"—","Predicción":"",
+                                    "Real":"","Acierto":"🎯","Pts":int(r.pts)}
+                        if r.etapa.startswith("COLAPINTO"):
+                            return {"Piloto":r.piloto,"Etapa":r.etapa,"Pos":"—","Predicción":f"P{r.pred}",
+                                    "Real":f"P{r.real}" if r.real else "—",
+                                    "Acierto":f"✅(+{int(r.pts)})" if r.ok else "❌","Pts":int(r.pts)}
+                        return {"Piloto":r.piloto,"Etapa":r.etapa,"Pos":f"P{r.pos}","Predicción":r.pred,
+                                "Real":r.real or "—","Acierto":"✅" if r.ok else "❌","Pts":int(r.pts)}
 
                     # Totales por formulero para vista rápida
                     _totales_prev = {}
-
                     for _pp in PILOTOS_TORNEO:
-                        _r_prev = _safe_call(mdb["recuperar_predicciones_piloto"], _pp, gp_adm,
-                                             timeout_sec=10, default=(None,None,(None,None)))
-                        _dq_pr, _ds_pr, (_dr_pr, _dc_pr) = _r_prev
-                        # dq=Qualy, ds=Sprint, dr=Carrera (con colapinto_r,c1,c2,c3), dc también constructores
-                        _pts_total_pr = 0
-                        _secciones = []
-
-                        def _check_sec(pred_d, etapa, pfx, n_pos):
-                            if not isinstance(pred_d, dict): return [], 0
-                            rows_s = []; pts_s = 0; aciertos_s = 0
-                            for _pos in range(1, n_pos+1):
-                                _pv = str(pred_d.get(_pos, pred_d.get(str(_pos), ""))).strip()
-                                if not _pv: continue
-                                _rv = str(oficial_adm.get(f"{pfx}{_pos}","")).strip()
-                                _ok = bool(_rv and _nn_prev(_pv) == _nn_prev(_rv))
-                                _esc = _ESCALA_PR.get(etapa,{}).get(_pos,0)
-                                _pts_k = _esc if _ok else 0; pts_s += _pts_k
-                                if _ok: aciertos_s += 1
-                                rows_s.append({"Piloto":_pp,"Etapa":etapa,"Pos":f"P{_pos}",
-                                               "Predicción":_pv,"Real":_rv if _rv else "—",
-                                               "Acierto":"✅" if _ok else "❌","Pts":_pts_k})
-                            # Pleno bonus
-                            _pleno_pts = {5:"QUALY",3:"SPRINT",5:"CARRERA",3:"CONSTRUCTORES"}.get(n_pos,0)
-                            if aciertos_s == n_pos and aciertos_s > 0:
-                                _pb = {"QUALY":5,"SPRINT":3,"CARRERA":5,"CONSTRUCTORES":3}.get(etapa,0)
-                                pts_s += _pb
-                                if _pb: rows_s.append({"Piloto":_pp,"Etapa":f"🎯 PLENO {etapa}","Pos":"—",
-                                                        "Predicción":"","Real":"","Acierto":"🎯",
-                                                        "Pts":_pb})
-                            return rows_s, pts_s
-
-                        all_rows_pr = []
-                        _rq, _pq = _check_sec(_dq_pr, "QUALY", "q", 5)
-                        all_rows_pr += _rq; _pts_total_pr += _pq
-                        if gp_adm in GPS_SPRINT:
-                            _rs, _ps = _check_sec(_ds_pr, "SPRINT", "s", 8)
-                            all_rows_pr += _rs; _pts_total_pr += _ps
-                        _rr, _pr = _check_sec(_dr_pr, "CARRERA", "r", 10)
-                        all_rows_pr += _rr; _pts_total_pr += _pr
-                        # Constructores — puede estar en dr o dc
-                        _cons_src = _dc_pr if isinstance(_dc_pr, dict) and _dc_pr else (
-                                    {1: _dr_pr.get("c1"), 2: _dr_pr.get("c2"), 3: _dr_pr.get("c3")}
-                                    if isinstance(_dr_pr, dict) else {})
-                        _rc, _pc = _check_sec(_cons_src, "CONSTRUCTORES", "c", 3)
-                        all_rows_pr += _rc; _pts_total_pr += _pc
-                        # Colapinto
-                        if isinstance(_dq_pr, dict):
-                            _cq_pr = str(_dq_pr.get("colapinto_q","")).strip()
-                            if _cq_pr:
-                                _cq_real = str(oficial_adm.get("col_q","")).strip()
-                                _cq_ok = bool(_cq_real and str(_cq_pr)==str(_cq_real))
-                                _cq_pts = 10 if _cq_ok else 0; _pts_total_pr += _cq_pts
-                                all_rows_pr.append({"Piloto":_pp,"Etapa":"COLAPINTO Q","Pos":"—",
-                                                    "Predicción":f"P{_cq_pr}","Real":f"P{_cq_real}" if _cq_real else "—",
-                                                    "Acierto":"✅(+10)" if _cq_ok else "❌","Pts":_cq_pts})
-                        if isinstance(_dr_pr, dict):
-                            _cr_pr = str(_dr_pr.get("colapinto_r","")).strip()
-                            if _cr_pr:
-                                _cr_real = str(oficial_adm.get("col_r","")).strip()
-                                _cr_ok = bool(_cr_real and str(_cr_pr)==str(_cr_real))
-                                _cr_pts = 20 if _cr_ok else 0; _pts_total_pr += _cr_pts
-                                all_rows_pr.append({"Piloto":_pp,"Etapa":"COLAPINTO R","Pos":"—",
-                                                    "Predicción":f"P{_cr_pr}","Real":f"P{_cr_real}" if _cr_real else "—",
-                                                    "Acierto":"✅(+20)" if _cr_ok else "❌","Pts":_cr_pts})
-
-                        _totales_prev[_pp] = (_pts_total_pr, all_rows_pr)
+                        _d_pp = _det_prev_por.get(_pp)
+                        _rows_pp = [_fila_prev(r) for r in _d_pp.itertuples(index=False)] if _d_pp is not None else []
+                        _totales_prev[_pp] = (int(_res_prev.at[_pp, "Total"]), _rows_pp)
 
                     # ── Mostrar resumen de totales ────────────────────────
                     import pandas as _pd_prev
@@ -6085,11 +7934,13 @@ def pantalla_admin():
                     df_h_adm = madm["historial"](
                         gp_calc=gp_adm, oficial=oficial_adm,
                         pilotos_torneo=PILOTOS_TORNEO, gps_sprint=GPS_SPRINT)
+                    invalidar("standings", "historial")
                     if df_h_adm is not None and not (hasattr(df_h_adm,"empty") and df_h_adm.empty):
                         st.success("✅ Historial generado correctamente")
                         # Save oficial results for exact aciertos in Mi Perfil
                         _saved = _safe_call(mdb.get("guardar_resultados_oficiales",lambda *a:False),
                                            gp_adm, oficial_adm, timeout_sec=15, default=False)
+                        invalidar("oficial")
                         if _saved: st.success("📋 Resultados oficiales guardados para aciertos exactos")
                         st.dataframe(df_h_adm, use_container_width=True)
                         _do_wa_email(df_h_adm, oficial_adm, gp_adm, mdb)
@@ -6156,14 +8007,13 @@ def pantalla_admin():
                             f'📧 <b>Se enviarán desde:</b> {_gm_u_prev} &nbsp;·&nbsp; <b>Destinatarios:</b> {", ".join(k for k,v in _emails_prev.items() if v)}</div>',
                             unsafe_allow_html=True)
             # Build and show preview for each pilot
-            _nn_em = lambda x: str(x or "").strip().lower()
-            _ESCALA_EM = {"q":{1:15,2:10,3:7,4:5,5:3},"s":{1:8,2:7,3:6,4:5,5:4,6:3,7:2,8:1},
-                          "r":{1:25,2:18,3:15,4:12,5:10,6:8,7:6,8:4,9:2,10:1},"c":{1:10,2:5,3:2}}
+            # Aciertos de todos en una sola pasada del motor de puntaje
+            _, _det_em_all = puntuar_gp(recuperar_predicciones_gp(gp_adm, PILOTOS_TORNEO),
+                                        oficial_adm, es_sprint=gp_adm in GPS_SPRINT)
+            _det_em_por = {p: d for p, d in _det_em_all.groupby("piloto", sort=False)}
 
             def _build_email_html_adm(usuario_em):
-                _re_em = _safe_call(mdb["recuperar_predicciones_piloto"], usuario_em, gp_adm,
-                                    timeout_sec=8, default=(None,None,(None,None)))
-                _dq_em, _ds_em, (_dr_em, _dc_em) = _re_em
+                _d_em = _det_em_por.get(usuario_em, _det_em_all.iloc[0:0])
                 _gp_short_em = gp_adm.split(". ",1)[-1] if ". " in gp_adm else gp_adm
                 _img_email = st.session_state.get("_adm_email_img","")
                 _img_html_email = (f"<img src='{_img_email}' style='width:100%;max-width:560px;"
@@ -6192,53 +8042,32 @@ def pantalla_admin():
                                 _dns_pts_em = int(_dns_rows["puntos"].sum())
                 except Exception: pass
 
-                def _sec_html(pred_d, pfx, etapa_lbl, n_pos, pts_dict):
-                    if not isinstance(pred_d, dict): return "", 0
+                def _sec_html(etapa, etapa_lbl):
+                    _rows_s = _d_em[_d_em["etapa"]==etapa]
+                    if _rows_s.empty: return "", 0
                     _sec = [f"<h4 style='color:#93c5fd;margin:12px 0 6px;'>{etapa_lbl}</h4>",
                             "<table style='border-collapse:collapse;width:100%;font-size:13px;'>",
                             "<tr style='background:#1a2040;'><th style='padding:6px 10px;text-align:left;'>Pos</th><th style='padding:6px 10px;'>Tu predicción</th><th style='padding:6px 10px;'>Resultado real</th><th style='padding:6px 10px;'>Acierto</th><th style='padding:6px 10px;'>Pts</th></tr>"]
-                    _pts_s = 0; _aciertos_s = 0
-                    for _p in range(1, n_pos+1):
-                        _pv = str(pred_d.get(_p, pred_d.get(str(_p), ""))).strip()
-                        if not _pv: continue
-                        _rv = str(oficial_adm.get(f"{pfx}{_p}","")).strip()
-                        _ok = bool(_rv and _nn_em(_pv) == _nn_em(_rv))
-                        _ep = pts_dict.get(_p,0) if _ok else 0; _pts_s += _ep
-                        if _ok: _aciertos_s += 1
-                        _bg = "#1a3a1a" if _ok else "#3a1a1a"
-                        _ico = "✅" if _ok else "❌"
-                        _sec.append(f"<tr style='background:{_bg};'><td style='padding:5px 10px;'>P{_p}</td><td style='padding:5px 10px;'>{_pv}</td><td style='padding:5px 10px;'>{_rv if _rv else '⏳'}</td><td style='padding:5px 10px;text-align:center;'>{_ico}</td><td style='padding:5px 10px;text-align:center;color:#ffdd7a;font-weight:bold;'>{_ep if _ep else ''}</td></tr>")
-                    _pleno = {"q":5,"s":3,"r":5,"c":3}.get(pfx,0)
-                    if _aciertos_s == n_pos and _aciertos_s > 0 and _pleno:
-                        _pts_s += _pleno
+                    for _r in _rows_s.itertuples(index=False):
+                        _bg = "#1a3a1a" if _r.ok else "#3a1a1a"
+                        _ico = "✅" if _r.ok else "❌"
+                        _sec.append(f"<tr style='background:{_bg};'><td style='padding:5px 10px;'>P{_r.pos}</td><td style='padding:5px 10px;'>{_r.pred}</td><td style='padding:5px 10px;'>{_r.real if _r.real else '⏳'}</td><td style='padding:5px 10px;text-align:center;'>{_ico}</td><td style='padding:5px 10px;text-align:center;color:#ffdd7a;font-weight:bold;'>{_r.pts if _r.pts else ''}</td></tr>")
+                    _pts_s = int(_rows_s["pts"].sum())
+                    if (_d_em["etapa"]==f"PLENO {etapa}").any():
+                        _pleno = BONUS_PLENO[etapa]; _pts_s += _pleno
                         _sec.append(f"<tr style='background:#2a2a00;'><td colspan=4 style='padding:5px 10px;color:#ffdd7a;font-weight:bold;'>🎯 PLENO PERFECTO!</td><td style='padding:5px 10px;color:#ffdd7a;font-weight:bold;'>+{_pleno}</td></tr>")
                     _sec.append(f"</table><p style='color:#4ade80;font-weight:bold;margin:4px 0;'>Subtotal: +{_pts_s} pts</p>")
                     return "".join(_sec), _pts_s
 
-                _sq, _pq = _sec_html(_dq_em, "q", "⏱️ CLASIFICACIÓN", 5, _ESCALA_EM["q"])
-                _lines.append(_sq); _total_em += _pq
-                if gp_adm in GPS_SPRINT:
-                    _ss, _ps = _sec_html(_ds_em, "s", "⚡ SPRINT", 8, _ESCALA_EM["s"])
-                    _lines.append(_ss); _total_em += _ps
-                _sr, _pr = _sec_html(_dr_em, "r", "🏁 CARRERA", 10, _ESCALA_EM["r"])
-                _lines.append(_sr); _total_em += _pr
-                _cons_em = _dc_em if isinstance(_dc_em,dict) and _dc_em else (
-                           {1:_dr_em.get("c1"),2:_dr_em.get("c2"),3:_dr_em.get("c3")} if isinstance(_dr_em,dict) else {})
-                _sc, _pc = _sec_html(_cons_em, "c", "🏗️ CONSTRUCTORES", 3, _ESCALA_EM["c"])
-                _lines.append(_sc); _total_em += _pc
+                for _et_em, _lbl_em in (("QUALY","⏱️ CLASIFICACIÓN"), ("SPRINT","⚡ SPRINT"),
+                                        ("CARRERA","🏁 CARRERA"), ("CONSTRUCTORES","🏗️ CONSTRUCTORES")):
+                    _s_em, _p_em = _sec_html(_et_em, _lbl_em)
+                    _lines.append(_s_em); _total_em += _p_em
                 # Colapinto
-                if isinstance(_dq_em,dict):
-                    _cq = str(_dq_em.get("colapinto_q","")).strip()
-                    if _cq:
-                        _cqr = str(oficial_adm.get("col_q","")).strip()
-                        _cok = bool(_cqr and str(_cq)==str(_cqr)); _cpts = 10 if _cok else 0; _total_em += _cpts
-                        _lines.append(f"<p>🇦🇷 Colapinto Qualy: P{_cq} → {'✅ +10pts' if _cok else '❌'}</p>")
-                if isinstance(_dr_em,dict):
-                    _cr = str(_dr_em.get("colapinto_r","")).strip()
-                    if _cr:
-                        _crr = str(oficial_adm.get("col_r","")).strip()
-                        _crok = bool(_crr and str(_cr)==str(_crr)); _crpts = 20 if _crok else 0; _total_em += _crpts
-                        _lines.append(f"<p>🇦🇷 Colapinto Carrera: P{_cr} → {'✅ +20pts' if _crok else '❌'}</p>")
+                for _r in _d_em[_d_em["etapa"].str.startswith("COLAPINTO")].itertuples(index=False):
+                    _total_em += int(_r.pts)
+                    _lines.append(f"<p>🇦🇷 Colapinto {'Qualy' if _r.etapa.endswith('Q') else 'Carrera'}: "
+                                  f"P{_r.pred} → {('✅ +'+str(int(_r.pts))+'pts') if _r.ok else '❌'}</p>")
                 # DNS penalty
                 if _dns_pts_em != 0:
                     _lines.append(
@@ -6268,54 +8097,45 @@ def pantalla_admin():
             st.markdown("**¿Todo OK? Confirmá el envío:**")
             if st.button("✅ CONFIRMAR Y ENVIAR EMAILS A TODOS", key="adm_email_confirm_btn",
                          use_container_width=True, type="primary"):
-                with st.spinner("Enviando emails…"):
-                    try:
-                        import smtplib
-                        from email.mime.multipart import MIMEMultipart as _MMul2
-                        from email.mime.text import MIMEText as _MTr2
-                        _gm_u = st.secrets.get("GMAIL_USER","")
-                        _gm_p = st.secrets.get("GMAIL_APP_PASSWORD","")
-                        _emails_map = st.secrets.get("emails",{})
-                        _sent_r = 0
-                        for _u_s in PILOTOS_TORNEO:
-                            _em_s = str(_emails_map.get(_u_s,""))
-                            if not _em_s or not _gm_u: continue
-                            try:
-                                _html_s, _pts_s = _build_email_html_adm(_u_s)
-                                _gp_short_s = gp_adm.split(". ",1)[-1] if ". " in gp_adm else gp_adm
-                                _msg_s = _MMul2()
-                                _msg_s["From"] = f"Torneo Fefe Wolf <{_gm_u}>"
-                                _msg_s["To"] = _em_s
-                                _msg_s["Subject"] = f"🏆 Tus aciertos — {_gp_short_s} | Torneo Fefe Wolf 2026"
-                                _msg_s.attach(_MTr2(_html_s,"html","utf-8"))
-                                try:
-                                    with smtplib.SMTP_SSL("smtp.gmail.com",465) as _sv_s:
-                                        _sv_s.login(_gm_u,_gm_p); _sv_s.send_message(_msg_s); _sent_r+=1
-                                except Exception:
-                                    with smtplib.SMTP("smtp.gmail.com",587) as _sv_s2:
-                                        _sv_s2.starttls(); _sv_s2.login(_gm_u,_gm_p)
-                                        _sv_s2.send_message(_msg_s); _sent_r+=1
-                            except Exception as _se: st.warning(f"Error enviando a {_u_s}: {_se}")
-                        if _sent_r > 0:
-                            st.success(f"✅ {_sent_r}/{len(PILOTOS_TORNEO)} emails enviados correctamente")
-                            st.session_state["_adm_show_email_preview"] = False
-                        else:
-                            st.error("❌ No se pudo enviar ningún email. Verificá GMAIL_USER y GMAIL_APP_PASSWORD en secrets.toml")
-                    except Exception as _ee: st.error(f"Error: {_ee}")
+                try:
+                    _gm_u = st.secrets.get("GMAIL_USER","")
+                    _emails_map = st.secrets.get("emails",{})
+                    _sent_r = 0
+                    for _u_s in PILOTOS_TORNEO:
+                        _em_s = str(_emails_map.get(_u_s,""))
+                        if not _em_s or not _gm_u: continue
+                        try:
+                            _html_s, _pts_s = _build_email_html_adm(_u_s)
+                            _gp_short_s = gp_adm.split(". ",1)[-1] if ". " in gp_adm else gp_adm
+                            _sent_r += encolar_email(_em_s, f"🏆 Tus aciertos — {_gp_short_s} | Torneo Fefe Wolf 2026",
+                                                     "", html=_html_s,
+                                                     clave=outbox_clave("aciertos", gp_adm, _em_s, _html_s))
+                        except Exception as _se: st.warning(f"Error encolando a {_u_s}: {_se}")
+                    if _sent_r > 0:
+                        st.success(f"✅ {_sent_r}/{len(PILOTOS_TORNEO)} emails en cola — el estado de entrega está en 📋 Log")
+                        st.session_state["_adm_show_email_preview"] = False
+                    elif _gm_u:
+                        st.info("Nada nuevo para enviar: estos emails ya estaban en la cola.")
+                    else:
+                        st.error("❌ Falta GMAIL_USER en secrets.toml")
+                except Exception as _ee: st.error(f"Error: {_ee}")
 
             if st.button("✖ Cancelar", key="adm_email_cancel_btn"):
                 st.session_state["_adm_show_email_preview"] = False; st.rerun()
 
         # Calcular y sumar a Posiciones
+        if len(LIGAS) > 1:
+            st.caption(f"🏆 Se calcula para la liga {LIGA['nombre']} (cambiala desde el selector del sidebar).")
         if st.button("⚡ CALCULAR + SUMAR A TABLA", key="adm_calc_all_btn",
                      use_container_width=True):
             with st.spinner("Calculando y actualizando tabla… (puede tardar 1-2 min, cada guardado reintenta solo si falla)"):
                 try:
-                    _res_calc = _safe_call(
+                    _res_calc = _lock_liga_core(mdb, f"GP_DONE::{gp_adm}", lambda: _safe_call(
                         madm["calcular"],
                         gp_calc=gp_adm, oficial=oficial_adm,
                         pilotos_torneo=PILOTOS_TORNEO, gps_sprint=GPS_SPRINT,
-                        timeout_sec=240, default=None)
+                        timeout_sec=240, default=None))
+                    invalidar("standings", "historial")
                     # calcular_y_actualizar_todos puede retornar (ok, msg) o DataFrame
                     if _res_calc is None:
                         st.error("❌ Timeout de la app (240s) esperando la respuesta. Antes de volver a "
@@ -6347,8 +8167,47 @@ def pantalla_admin():
                         st.info(f"Resultado: {_res_calc}")
                 except Exception as _e2: st.error(f"Error: {_e2}")
 
+        # ── Replay de temporada (solo lectura) ───────────────────────────
+        with st.expander("🔁 Replay de temporada — recalcular todo y comparar", expanded=False):
+            st.caption("Recalcula los GPs activos desde sheet1 + Oficial con el motor de puntaje y compara "
+                       "contra historial_detalle y tabla_posiciones. No escribe nada ni toca los locks.")
+            if st.button("▶️ Correr replay", key="adm_replay_btn", use_container_width=True):
+                with st.spinner("Recalculando temporada…"):
+                    st.session_state["_adm_replay"] = replay_temporada()
+            _rep = st.session_state.get("_adm_replay")
+            if _rep:
+                if _rep.get("error"):
+                    st.error(f"Error: {_rep['error']}")
+                else:
+                    _tm = _rep["timing"]
+                    _rc1, _rc2, _rc3, _rc4 = st.columns(4)
+                    _rc1.metric("GPs recalculados", len(_rep["gps_recalculados"]))
+                    _rc2.metric("Cómputo", f"{_tm['computo_ms']} ms")
+                    _rc3.metric("Total", f"{_tm['total_ms']} ms")
+                    _rc4.metric("Diferencias", len(_rep["diff_detalle"]))
+                    if _rep["gps_sin_oficial"]:
+                        st.caption("Sin oficial guardado: " + ", ".join(
+                            g.split(". ",1)[-1] for g in _rep["gps_sin_oficial"]))
+                    st.markdown("**Tabla: replay vs guardado**")
+                    st.dataframe(_rep["diff_tabla"], use_container_width=True, hide_index=True)
+                    if _rep["diff_detalle"].empty:
+                        st.success("✅ El replay coincide con historial_detalle en todas las etapas.")
+                    else:
+                        st.markdown("**Etapas con diferencia**")
+                        st.dataframe(_rep["diff_detalle"], use_container_width=True, hide_index=True)
+                    _dc = _rep.get("diff_core")
+                    if _dc is None:
+                        st.caption("Paridad con core.scoring: no disponible (core no cargó).")
+                    elif _dc.empty:
+                        st.success("✅ puntuar_gp coincide con calcular_puntos de core en todos los GPs.")
+                    else:
+                        st.error(f"❌ puntuar_gp difiere de calcular_puntos de core en {len(_dc)} etapa(s).")
+                        st.dataframe(_dc, use_container_width=True, hide_index=True)
+                    st.download_button("⬇️ Reporte JSON", replay_json(_rep), file_name="replay_temporada.json",
+                                       mime="application/json", key="adm_replay_dl")
+
     # ════ TAB 2: SANCIONES DNS ═════════════════════════════════════════
-    with _at2:
+    if _at2:
         st.markdown('<div class="admin-title">⛔ Aplicar / Revertir DNS</div>', unsafe_allow_html=True)
         st.caption("⚠️ Solo aplicar UNA vez por piloto/GP. El sistema bloquea duplicados.")
         _ds1,_ds2 = st.columns([2,2])
@@ -6381,6 +8240,7 @@ def pantalla_admin():
                                 break
                             import time as _time_dns; _time_dns.sleep(2 + _retry_dns * 2)
                     if ok_d:
+                        invalidar("standings")
                         st.session_state[_dns_key] = True
                         st.success(f"✅ {msg_d} — DNS aplicado a {pil_dns} ({pts_dns} pts)")
                     else:
@@ -6394,6 +8254,7 @@ def pantalla_admin():
                     try:
                         rev_ok, rev_msg = _safe_call(mdb["revertir_dns_gp"], gp_dns,
                                                       timeout_sec=30, default=(False,"Timeout"))
+                        invalidar("standings", "historial")
                         if rev_ok:
                             # Clear all DNS keys for this GP
                             for _k in list(st.session_state.keys()):
@@ -6409,7 +8270,7 @@ def pantalla_admin():
     # _at6 = Log
 
     # ════ TAB 3: USUARIOS ══════════════════════════════════════════════
-    with _at3:
+    if _at3:
         st.markdown('<div class="admin-title">👥 Gestión de Usuarios</div>', unsafe_allow_html=True)
         mauth_adm = _mod_auth()
         if "_error" not in mauth_adm:
@@ -6424,11 +8285,8 @@ def pantalla_admin():
                     elif len((_np or "").strip()) < 4:
                         st.error("❌ La contraseña debe tener al menos 4 caracteres.")
                     else:
-                        # Limpiar caché para leer la hoja actualizada antes de chequear duplicados
-                        try: st.cache_data.clear()
-                        except Exception: pass
-                        try: st.cache_resource.clear()
-                        except Exception: pass
+                        # Limpiar caché de usuarios para leer la hoja actualizada antes de chequear duplicados
+                        invalidar("usuarios")
                         # CLAVE: limpiar caché interno de core.auth
                         try:
                             import core.auth as _ca_cr
@@ -6456,10 +8314,7 @@ def pantalla_admin():
                                                      timeout_sec=30, default=(False,"Timeout"))
                             if ok_u:
                                 st.success(f"✅ Usuario '{_nu_clean}' creado. Ahora seteale el PIN abajo.")
-                                try: st.cache_data.clear()
-                                except Exception: pass
-                                try: st.cache_resource.clear()
-                                except Exception: pass
+                                invalidar("usuarios")
                                 try:
                                     import core.auth as _ca_cr2
                                     if hasattr(_ca_cr2,"_AUTH_CACHE"): _ca_cr2._AUTH_CACHE.clear()
@@ -6511,10 +8366,7 @@ def pantalla_admin():
                     if not (_piv or "").strip().isdigit() or len((_piv or "").strip()) != 4:
                         st.error("❌ El PIN debe ser exactamente 4 dígitos numéricos.")
                     else:
-                        try: st.cache_data.clear()
-                        except Exception: pass
-                        try: st.cache_resource.clear()
-                        except Exception: pass
+                        invalidar("usuarios")
                         # CLAVE: limpiar el caché interno de core.auth (_AUTH_CACHE)
                         # que es lo que hacía que set_pin no encontrara al usuario recién creado
                         try:
@@ -6536,35 +8388,37 @@ def pantalla_admin():
                                 from core.database import conectar_google_sheets as _cgs_pin
                                 _ws_pin = _cgs_pin("Usuarios")
                                 if _ws_pin:
-                                    _vals_pin = _ws_pin.get_all_values()
-                                    _hdr_pin = [h.strip() for h in _vals_pin[0]]
-                                    if "pin_hash" not in _hdr_pin:
-                                        _ws_pin.update_cell(1, len(_vals_pin[0])+1, "pin_hash")
-                                        _vals_pin = _ws_pin.get_all_values()
-                                        _hdr_pin = [h.strip() for h in _vals_pin[0]]
-                                    _col_pin = _hdr_pin.index("pin_hash") + 1
-                                    _row_idx = None
-                                    for _ri, _rr in enumerate(_vals_pin[1:], start=2):
-                                        if _rr and _rr[0].strip().lower() == _usr_pin.lower():
-                                            _row_idx = _ri; break
-                                    if _row_idx:
-                                        # MISMO formato que auth.py: pbkdf2$iters$salt_b64$hash_b64
-                                        _salt = _os_pin.urandom(16)
-                                        _it = 210000
-                                        _dk = _hl_pin.pbkdf2_hmac("sha256", _pin_clean.encode("utf-8"),
-                                                                  _salt, _it, dklen=32)
-                                        _hash_pin = (f"pbkdf2${_it}$"
-                                                     f"{_b64_pin.b64encode(_salt).decode('utf-8')}$"
-                                                     f"{_b64_pin.b64encode(_dk).decode('utf-8')}")
-                                        _ws_pin.update_cell(_row_idx, _col_pin, _hash_pin)
-                                        ok_p = True; msg_p = "PIN escrito directo en la hoja"
-                                        # limpiar caché auth para que verify_pin lo lea
-                                        try:
-                                            import core.auth as _ca2
-                                            if hasattr(_ca2,"_AUTH_CACHE"): _ca2._AUTH_CACHE.clear()
-                                        except Exception: pass
+                                    # encabezado y fila salen de una lectura fresca (acá se
+                                    # escribe, no se sirve una copia de hasta 60s); el alta de
+                                    # la columna es write-through, no hace falta releer
+                                    _vals_pin = hoja_valores("Usuarios", max_age=0)
+                                    if not _vals_pin:
+                                        msg_p = "No pude leer la hoja Usuarios (sin conexión o vacía)"
                                     else:
-                                        msg_p = f"No encontré la fila de '{_usr_pin}' en la hoja"
+                                        _hdr_pin = [h.strip() for h in _vals_pin[0]]
+                                        if "pin_hash" not in _hdr_pin:
+                                            hoja_update_cell("Usuarios", 1, len(_hdr_pin)+1, "pin_hash", ws=_ws_pin)
+                                            _hdr_pin.append("pin_hash")
+                                        _col_pin = _hdr_pin.index("pin_hash") + 1
+                                        _row_idx = hoja_fila("Usuarios", _usr_pin, col=0)
+                                        if _row_idx:
+                                            # MISMO formato que auth.py: pbkdf2$iters$salt_b64$hash_b64
+                                            _salt = _os_pin.urandom(16)
+                                            _it = 210000
+                                            _dk = _hl_pin.pbkdf2_hmac("sha256", _pin_clean.encode("utf-8"),
+                                                                      _salt, _it, dklen=32)
+                                            _hash_pin = (f"pbkdf2${_it}$"
+                                                         f"{_b64_pin.b64encode(_salt).decode('utf-8')}$"
+                                                         f"{_b64_pin.b64encode(_dk).decode('utf-8')}")
+                                            hoja_update_cell("Usuarios", _row_idx, _col_pin, _hash_pin, ws=_ws_pin)
+                                            ok_p = True; msg_p = "PIN escrito directo en la hoja"
+                                            # limpiar caché auth para que verify_pin lo lea
+                                            try:
+                                                import core.auth as _ca2
+                                                if hasattr(_ca2,"_AUTH_CACHE"): _ca2._AUTH_CACHE.clear()
+                                            except Exception: pass
+                                        else:
+                                            msg_p = f"No encontré la fila de '{_usr_pin}' en la hoja"
                             except Exception as _pe:
                                 msg_p = f"Fallback falló: {_pe}"
                         if ok_p:
@@ -6576,7 +8430,7 @@ def pantalla_admin():
             st.error("Auth module unavailable.")
 
     # ════ TAB 4: INVITACIONES ══════════════════════════════════════════
-    with _at4:
+    if _at4:
         st.markdown('<div class="admin-title">🎟️ Códigos de Invitación</div>', unsafe_allow_html=True)
         st.caption("Generá un código único y enviáselo al nuevo formulero. Se registra en secrets.toml → INVITE_CODES.")
         try:
@@ -6598,7 +8452,7 @@ def pantalla_admin():
             st.caption("Copiá este código y agregalo a secrets.toml")
 
     # ════ TAB 5: COMUNICADOS ════════════════════════════════════════════
-    with _at5:
+    if _at5:
         st.markdown('<div class="admin-title">📧 Enviar comunicado a todos</div>', unsafe_allow_html=True)
         _asunto = st.text_input("Asunto", key="adm_com_asunto",
                                 placeholder="Ej: Cambio de horario GP Canadá")
@@ -6639,9 +8493,6 @@ def pantalla_admin():
             elif not _gm_u or not _gm_p:
                 st.warning("Configurá GMAIL_USER y GMAIL_APP_PASSWORD en secrets.")
             else:
-                import smtplib
-                from email.mime.multipart import MIMEMultipart as _MMc
-                from email.mime.text import MIMEText as _MTc
                 _img_html_com = (f"<img src='{_com_img}' style='width:100%;max-width:560px;"
                                  f"border-radius:10px;margin:12px 0;display:block;'>" if _com_img else "")
                 _body_html = (
@@ -6654,29 +8505,18 @@ def pantalla_admin():
                     f"🏁 torneofefewolf2026.streamlit.app</div></div>")
                 _sent = 0
                 for _pn, _em in _emails.items():
-                    if not _em: continue
-                    try:
-                        _mm = _MMc()
-                        _mm["Subject"] = f"📢 {_asunto.strip()} — Torneo Fefe Wolf"
-                        _mm["From"] = f"Torneo Fefe Wolf <{_gm_u}>"
-                        _mm["To"] = _em
-                        _mm.attach(_MTc(_body_html,"html","utf-8"))
-                        with smtplib.SMTP_SSL("smtp.gmail.com",465) as _sv:
-                            _sv.login(_gm_u,_gm_p); _sv.send_message(_mm)
-                        _sent += 1
-                    except Exception as _ec: st.warning(f"Error {_pn}: {_ec}")
-                if _sent: st.success(f"✅ Comunicado enviado a {_sent} formuleros.")
-                else: st.error("❌ No se pudo enviar. Verificá GMAIL_APP_PASSWORD.")
+                    if _em: _sent += encolar_email(_em, f"📢 {_asunto.strip()} — Torneo Fefe Wolf", "", html=_body_html,
+                                                   clave=outbox_clave("comunicado", _em, _asunto.strip(), _body_html))
+                if _sent: st.success(f"✅ Comunicado en cola para {_sent} formuleros (estado en 📋 Log).")
+                else: st.info("Este comunicado ya estaba en la cola — no se reenvía.")
 
     # ════ TAB 6: LOG ════════════════════════════════════════════════════
-    with _at6:
+    if _at6:
         st.markdown('<div class="admin-title">📋 Log de cambios (hoja Audit)</div>', unsafe_allow_html=True)
         if st.button("🔄 Cargar log", key="adm_log_btn", use_container_width=True):
             try:
-                from core.database import conectar_google_sheets as _cgs_log
-                _ws_log = _cgs_log("Audit")
-                if _ws_log:
-                    _log_rows = _ws_log.get_all_values()
+                _log_rows = hoja_valores("Audit", max_age=0)
+                if _log_rows is not None:
                     if _log_rows:
                         st.dataframe(pd.DataFrame(_log_rows[1:], columns=_log_rows[0]),
                                      use_container_width=True)
@@ -6684,7 +8524,63 @@ def pantalla_admin():
                 else: st.warning("Hoja Audit no encontrada.")
             except Exception as _le: st.error(f"Error: {_le}")
 
-
+        st.markdown('<div class="admin-title" style="margin-top:14px;">📈 Latencia de backends</div>',
+                    unsafe_allow_html=True)
+        _bk_stats = safe_call_stats()
+        if _bk_stats:
+            st.dataframe(pd.DataFrame.from_dict(_bk_stats, orient="index"), use_container_width=True)
+        else:
+            st.caption("Sin llamadas registradas todavía en este proceso.")
+        _hs = hoja_stats()
+        st.caption(f"📦 Snapshot local de Sheets — {_hs['api_reads']} lecturas a la API · "
+                   f"{_hs['hits']} lecturas servidas desde memoria · {_hs['altas']} altas con id "
+                f"({_hs['siembras']} re-siembras del contador) · índice de filas: "
+                f"{_hs['filas_aciertos']} aciertos, {_hs['filas_reparaciones']} rearmados")
+        if _hs["tabs"]:
+            st.dataframe(pd.DataFrame.from_dict(_hs["tabs"], orient="index"), use_container_width=True)
+        _rst = resumen_stats()
+        st.caption(f"🧮 Resumen de temporada — versión {_rst['version']} · {_rst['rebuilds']} reconstrucciones · "
+                   f"{_rst['gps_recalculados']} GPs re-agregados · {_rst['gps_en_memoria']} en memoria")
+        _ofs = oficial_stats()
+        st.caption(f"🏁 Oficial — {_ofs['gps']} GPs indexados · {_ofs['parseos']} parseos de la hoja · "
+                   f"{_ofs['respaldos']} GPs pedidos al respaldo")
+        _ses = sesiones_stats()
+        st.caption(f"🔐 Sesiones — {_ses['activas']} activas en memoria · {_ses['restauradas']} restauradas sin Sheets · "
+                   f"{_ses['lecturas_perfil']} lecturas de perfil · {_ses['revocadas']} revocadas")
+        _ids = identidades_stats()
+        st.caption(f"🪪 Identidades — {_ids['gps']} GPs ({_ids['alias_gp']} alias) · "
+                   f"{_ids['pilotos']} pilotos ({_ids['alias_piloto']} nombres resueltos)")
+        _lst = logros_stats()
+        st.caption(f"🏅 Motor de logros — {_lst['gps']} GPs procesados · {_lst['eventos']} eventos · "
+                   f"{_lst['replays']} re-juegos · {_lst['desbloqueos']} desbloqueos · {_lst['pendientes']} sin anotar")
+        _ims = img_stats()
+        st.caption(f"🖼️ Proxy de imágenes — {_ims['cacheadas']} locales · {_ims['caidas']} con iniciales · "
+                   f"{_ims['pendientes']} pendientes · {_ims['kb_remotos']} KB remotos → {_ims['kb_locales']} KB servidos")
+        _mfs = mc_feed_stats()
+        st.caption(f"💬 Mesa de Formuleros — {_mfs['mensajes']} mensajes en el índice (origen {_mfs['origen']}) · "
+                   f"{_mfs['cargas']} cargas completas · {_mfs['syncs']} syncs de cabeza")
+        _lgs = ligas_stats()
+        st.caption(f"🏆 Ligas — viendo {LIGAS[_lgs['liga']]['nombre']} · {_lgs['ligas']} configuradas · "
+                   f"{_lgs['lecturas_historial']} lecturas de historial · filas por liga: "
+                   + (", ".join(f"{k} {v}" for k, v in _lgs["filas_por_liga"].items()) or "—"))
+
+        st.markdown('<div class="admin-title" style="margin-top:14px;">📬 Cola de notificaciones</div>',
+                    unsafe_allow_html=True)
+        try:
+            _obs = outbox_stats()
+            st.caption(f"{'🟢' if _obs['worker'] else '⚪'} Worker · {_obs['pendiente']} pendientes · "
+                       f"{_obs['enviado']} enviados · {_obs['fallido']} fallidos · {_obs['tandas']} tandas · "
+                       f"{_obs['sesiones_smtp']} sesiones SMTP")
+            _rcs = recordatorios_stats()
+            st.caption(f"{'🟢' if _rcs['activo'] else '⚪'} Recordatorios · {_rcs['eventos']} programados · "
+                       f"{_rcs['enviados']} ya enviados · próximo: {_rcs['proximo']}")
+            _ob_rows = outbox_estado(limite=30)
+            if _ob_rows:
+                st.dataframe(pd.DataFrame(_ob_rows).drop(columns=["clave"]), use_container_width=True)
+        except Exception as _obe: st.caption(f"Outbox no disponible: {_obe}")
+
+
+@perfilar("pantalla")
 def pantalla_calculadora_puntos():
     mdb=_mod_db(); madm=_mod_admin(); mcore=_mod_core(); mauth=_mod_auth()
     if any("_error" in x for x in [mdb,madm,mcore,mauth]):
@@ -6743,13 +8639,15 @@ def pantalla_calculadora_puntos():
             for i in range(1,5): oficial[f"s{i}"]=st.text_input(f"Sprint {i}°",key=f"of_s{i}-{gp_calc}")
         with cs2:
             for i in range(5,9): oficial[f"s{i}"]=st.text_input(f"Sprint {i}°",key=f"of_s{i}-{gp_calc}")
-    gp_done_key=f"GP_DONE::{gp_calc}"
+    gp_done_key=_lock_liga(f"GP_DONE::{gp_calc}")
     gp_done=_safe_call(mdb["lock_exists"],gp_done_key,timeout_sec=4,default=False)
     st.divider(); st.subheader("⚡ Calcular y actualizar todo el GP")
     if gp_done: st.warning("🔒 Ya calculado.")
     if st.button("⚡ CALCULAR Y ACTUALIZAR TODOS",use_container_width=True,key=f"btn_auto_{gp_calc}",disabled=gp_done):
         try:
-            _res_auto = madm["calcular"](gp_calc=gp_calc,oficial=oficial,pilotos_torneo=PILOTOS_TORNEO,gps_sprint=GPS_SPRINT)
+            _res_auto = _lock_liga_core(mdb, f"GP_DONE::{gp_calc}", lambda: madm["calcular"](
+                gp_calc=gp_calc,oficial=oficial,pilotos_torneo=PILOTOS_TORNEO,gps_sprint=GPS_SPRINT))
+            invalidar("standings", "historial")
             if isinstance(_res_auto, tuple) and len(_res_auto) == 2:
                 _ok_a, _msg_a = _res_auto
                 if _ok_a: st.success(f"✅ {_msg_a}")
@@ -6767,7 +8665,7 @@ def pantalla_calculadora_puntos():
     st.caption("Úsalo para reconstruir el historial de Google Sheets sin volver a sumar a Posiciones. "
                "Requiere que ya hayas cargado los resultados oficiales arriba.")
 
-    hist_done_key = f"HIST_DONE::{gp_calc}"
+    hist_done_key = _lock_liga(f"HIST_DONE::{gp_calc}")
 
     # ── Botón de limpieza de historial con 0 pts (emergencia) ─────────
     with st.expander("🧹 Limpiar historial con 0 pts (GPs con entradas incorrectas)"):
@@ -6858,6 +8756,7 @@ def pantalla_calculadora_puntos():
                             gp_calc=gp_calc, oficial=oficial,
                             pilotos_torneo=PILOTOS_TORNEO, gps_sprint=GPS_SPRINT
                         )
+                        invalidar("historial")
                         if df_h is not None and not df_h.empty:
                             break
                     except Exception as _eh:
@@ -6879,7 +8778,7 @@ def pantalla_calculadora_puntos():
                     _do_wa_email(df_h, oficial, gp_calc, mdb)
 
                 # — Paso 2: DNS — SOLO si el GP no fue calculado previamente (evitar doble penalización)
-                dns_key_hist = f"DNS_DONE::{gp_calc}"
+                dns_key_hist = _lock_liga(f"DNS_DONE::{gp_calc}")
                 dns_ya_hecho = _safe_call(mdb["lock_exists"], dns_key_hist, timeout_sec=4, default=False)
 
                 if dns_ya_hecho:
@@ -6892,6 +8791,7 @@ def pantalla_calculadora_puntos():
                 else:
                     with st.spinner("Aplicando sanciones DNS..."):
                         df_dns = mdb["aplicar_sanciones_dns"](gp_calc, PILOTOS_TORNEO, GPS_SPRINT)
+                        invalidar("standings", "historial")
                     _safe_call(mdb["set_lock"], dns_key_hist, timeout_sec=4)
                     st.success("⛔ Sanciones D.N.S. aplicadas automáticamente.")
                     st.dataframe(df_dns, use_container_width=True)
@@ -6909,7 +8809,7 @@ def pantalla_calculadora_puntos():
                     _tg_lines.append(f"{_med} {_rr['Piloto']}: *{int(_rr.get('Total',0))} pts*")
                 _tg_lines += ["","🏁 torneofefewolf2026.streamlit.app"]
                 if _send_telegram("\n".join(_tg_lines)):
-                    st.success("📱 Notificación enviada al grupo de Telegram.")
+                    st.success("📱 Notificación en cola para el grupo de Telegram.")
 
             except Exception as e:
                 st.error(f"Error: {e}")
@@ -6928,15 +8828,17 @@ def pantalla_calculadora_puntos():
             with st.spinner("Aplicando..."):
                 ok_m, msg_m = _safe_call(mdb["actualizar_tabla_general"], _dns_pil, int(_dns_pts_m), gp_calc,
                                          timeout_sec=30, default=(False,"Timeout"))
+                invalidar("standings")
             (st.success if ok_m else st.error)(f"{'✅' if ok_m else '❌'} {msg_m}")
     st.info("**Regla**: −25 pts por cada etapa no enviada (QUALY · SPRINT si aplica · CARRERA+CONSTRUCTORES). El sistema detecta automáticamente quién no envió.")
-    dns_key=f"DNS_DONE::{gp_calc}"; dns_done=_safe_call(mdb["lock_exists"],dns_key,timeout_sec=4,default=False)
+    dns_key=_lock_liga(f"DNS_DONE::{gp_calc}"); dns_done=_safe_call(mdb["lock_exists"],dns_key,timeout_sec=4,default=False)
 
     # — Preview: show who sent what BEFORE applying
     if st.button("🔍 Ver quién envió predicciones", key=f"btn_dns_preview_{gp_calc}", use_container_width=True):
         try:
-            from core.database import detectar_faltantes_por_gp
-            falt_prev = detectar_faltantes_por_gp(gp_calc, PILOTOS_TORNEO, GPS_SPRINT)
+            _has_dns = lambda d: isinstance(d, dict) and any(str(v).strip() for v in d.values())
+            falt_prev = {p: {"QUALY": _has_dns(q), "SPRINT": _has_dns(s), "CARRERA": _has_dns(r) or _has_dns(c)}
+                         for p, (q, s, (r, c)) in recuperar_predicciones_gp(gp_calc).items()}
             want_sprint = gp_calc in GPS_SPRINT
             rows_prev = []
             for p in PILOTOS_TORNEO:
@@ -6968,6 +8870,7 @@ def pantalla_calculadora_puntos():
             with st.spinner("Revirtiendo DNS — leyendo HistorialDetalle y sumando puntos..."):
                 df_revert = _safe_call(mdb["revertir_dns_gp"], gp_calc, PILOTOS_TORNEO,
                                        timeout_sec=60, default=pd.DataFrame([{"Error":"Timeout"}]))
+                invalidar("standings", "historial")
             st.dataframe(df_revert, use_container_width=True)
             # Liberar el lock DNS para que se pueda volver a aplicar
             _safe_call(mdb["clear_lock"], dns_key, timeout_sec=10)
@@ -6977,14 +8880,14 @@ def pantalla_calculadora_puntos():
         st.warning("⚠️ Asegurate de haber revisado el preview antes de aplicar.")
         if st.button("⛔ APLICAR SANCIONES D.N.S. (−5 pts por etapa faltante)", use_container_width=True, key=f"btn_dns_{gp_calc}", type="primary"):
             df_d=mdb["aplicar_sanciones_dns"](gp_calc,PILOTOS_TORNEO,GPS_SPRINT)
+            invalidar("standings", "historial")
             _safe_call(mdb["set_lock"],dns_key,timeout_sec=4)
             st.success("✅ Sanciones D.N.S. aplicadas correctamente.")
             st.dataframe(df_d, use_container_width=True)
     st.divider(); st.subheader("2) Preview de puntos (piloto individual)")
     pil_calc=st.selectbox("Piloto:",PILOTOS_TORNEO,key=f"pil_calc_{gp_calc}")
     with st.spinner("Leyendo predicciones de Google Sheets..."):
-        res_pred=_safe_call(mdb["recuperar_predicciones_piloto"],pil_calc,gp_calc,
-                            timeout_sec=30,default=(None,None,(None,None)))
+        res_pred=recuperar_predicciones_gp(gp_calc,[pil_calc])[pil_calc]
     db_q,db_s,(db_r,db_c)=res_pred
     if db_q or db_r or db_s:
         st.success(f"✅ Predicciones de {pil_calc} encontradas.")
@@ -7007,33 +8910,28 @@ def pantalla_calculadora_puntos():
             else:
                 st.warning("Sin filas encontradas para este GP en sheet1.")
     if st.button("CALCULAR PREVIEW",use_container_width=True,key=f"btn_calc_{gp_calc}_{pil_calc}"):
-        vr=normalizar_keys_num(db_r or {}); vq=normalizar_keys_num(db_q or {})
-        vc=normalizar_keys_num(db_c or {}); vs=normalizar_keys_num(db_s or {})
-        of_r={i:oficial.get(f"r{i}","") for i in range(1,11)}
-        of_q={i:oficial.get(f"q{i}","") for i in range(1,6)}
-        of_c={i:oficial.get(f"c{i}","") for i in range(1,4)}
-        of_s={i:oficial.get(f"s{i}","") for i in range(1,9)}
-        cp=mcore["calcular_puntos"]
-        pts_r=cp("CARRERA",vr,of_r,vr.get("colapinto_r"),oficial.get("col_r"))
-        pts_q=cp("QUALY",  vq,of_q,vq.get("colapinto_q"),oficial.get("col_q"))
-        pts_c=cp("CONSTRUCTORES",vc,of_c)
-        pts_s=cp("SPRINT",vs,of_s) if (gp_calc in GPS_SPRINT and db_s) else 0
-        total=pts_r+pts_q+pts_c+pts_s
+        res_calc,_=puntuar_gp({pil_calc:res_pred},oficial,es_sprint=gp_calc in GPS_SPRINT)
+        rc=res_calc.loc[pil_calc]
+        pts_r,pts_q,pts_c,pts_s=int(rc["CARRERA"]),int(rc["QUALY"]),int(rc["CONSTRUCTORES"]),int(rc["SPRINT"])
+        total=int(rc["Total"])
         st.success(f"💰 PUNTOS TOTALES: **{total}**")
         st.info(f"Carrera({pts_r}) + Constructores({pts_c}) + Qualy({pts_q}) + Sprint({pts_s})")
         st.caption("⚠️ Solo preview — no guarda nada.")
     st.divider(); st.subheader("🏆 Bonus Campeones (Final temporada)")
     gp_final=next((g for g in GPS_OFICIALES if g.startswith("24.")),GPS_OFICIALES[-1])
     if gp_calc!=gp_final: st.info(f"Solo en: **{gp_final}**"); return
-    if _safe_call(mdb["lock_exists"],f"CHAMP_DONE::{gp_final}",timeout_sec=4,default=False):
+    if _safe_call(mdb["lock_exists"],_lock_liga(f"CHAMP_DONE::{gp_final}"),timeout_sec=4,default=False):
         st.warning("🔒 Bonus ya aplicado."); return
     pil_r=st.text_input("Piloto campeón:",key="rcp")
     con_r=st.text_input("Constructor campeón:",key="rcc")
     if st.button("✅ APLICAR BONUS (1 sola vez)",use_container_width=True,key="btn_champ"):
-        ok,out=mdb["aplicar_bonus_campeones_final"](gp_final,pil_r,con_r,"01. Gran Premio de Australia",PILOTOS_TORNEO)
+        ok,out=_lock_liga_core(mdb, f"CHAMP_DONE::{gp_final}", lambda: mdb["aplicar_bonus_campeones_final"](
+            gp_final,pil_r,con_r,"01. Gran Premio de Australia",PILOTOS_TORNEO))
+        invalidar("standings")
         (st.success("✅ Bonus aplicado.") or st.dataframe(out,use_container_width=True)) if ok else st.warning(out)
 
 
+@perfilar("pantalla")
 def pantalla_mesa_chica():
     m = _mod_mesa()
     if "_error" in m:
@@ -7268,6 +9166,13 @@ def pantalla_mesa_chica():
                 if url.startswith("http"): return url
                 return url
 
+            # Reacciones y comentarios de toda la página en 2-3 consultas
+            _pag_ids = [_n[0] for _n in _noticias]
+            try: _reac_pag, _mias_pag = m["news_reacciones_batch"](_pag_ids, usuario)
+            except Exception: _reac_pag, _mias_pag = {}, {}
+            try: _coms_pag = m["news_comentarios_batch"](_pag_ids)
+            except Exception: _coms_pag = {}
+
             for _nid, _nautor, _ntit, _nimg, _ncuerpo, _nts in _noticias:
                 with st.container():
                     try: _nd_str = __import__("datetime").datetime.fromisoformat(_nts).strftime("%d/%m/%Y · %H:%M")
@@ -7303,8 +9208,8 @@ def pantalla_mesa_chica():
                         f'{_body_html}</div></div>', unsafe_allow_html=True)
 
                 # ── Reacciones ──────────────────────────────────────────
-                _reacs  = m.get("news_get_reacciones",    lambda x: {})(_nid) or {}
-                _myreac = m.get("news_user_reacciones", lambda x,y: set())(_nid, usuario) or set()
+                _reacs  = _reac_pag.get(_nid, {})
+                _myreac = _mias_pag.get(_nid, set())
                 _total_reac = sum(_reacs.values())
                 # Botones de reacción compactos — no ocupan toda la fila
                 st.markdown('<style>.fw-reac-row [data-testid="stHorizontalBlock"]{gap:6px;}</style>', unsafe_allow_html=True)
@@ -7362,7 +9267,7 @@ def pantalla_mesa_chica():
                             st.session_state[_ekey] = False; st.rerun()
 
                 # ── Comentarios ─────────────────────────────────────────
-                _coms = m.get("news_get_comentarios", lambda x: [])(_nid) or []
+                _coms = _coms_pag.get(_nid, [])
                 with st.expander(f"💬 {len(_coms)} comentario{'s' if len(_coms)!=1 else ''}"):
                     for _cid, _caut, _ctxt, _cts in _coms:
                         try: _cdstr = __import__("datetime").datetime.fromisoformat(_cts).strftime("%d/%m %H:%M")
@@ -7397,27 +9302,14 @@ def pantalla_mesa_chica():
 
                 st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
 
+@perfilar("pantalla")
 def pantalla_head_to_head():
     for k in ["h2h_a","h2h_b"]:
         if k not in st.session_state: st.session_state[k]=None
     pa=st.session_state["h2h_a"]; pb=st.session_state["h2h_b"]
 
-    import time as _time_h2h
-
-    # ── Historial — cache en session_state (TTL 600s) ────────────────
-    _H2H_HIST_KEY = "_h2h_hist_data"
-    _H2H_HIST_TS  = "_h2h_hist_ts"
-    if (_H2H_HIST_KEY not in st.session_state or
-            _time_h2h.time() - st.session_state.get(_H2H_HIST_TS, 0) > 600):
-        _m_h2h = _mod_db()
-        if "_error" not in _m_h2h:
-            _h2h_raw = _safe_call(_m_h2h["leer_historial_df"], timeout_sec=15, default=pd.DataFrame())
-        else:
-            _h2h_raw = pd.DataFrame()
-        st.session_state[_H2H_HIST_KEY] = _h2h_raw
-        st.session_state[_H2H_HIST_TS]  = _time_h2h.time()
-    _h2h_df_h = st.session_state.get(_H2H_HIST_KEY, pd.DataFrame())
-    _h2h_df_d = pd.DataFrame()  # detalle no se usa en H2H
+    # ── Historial — resumen de temporada materializado (compartido con Tabla/Perfil) ──
+    _h2h_rs = resumen_temporada()
 
     st.markdown("""<style>
     @keyframes h2hG{0%,100%{box-shadow:0 0 24px rgba(212,175,55,.13);}
@@ -7514,21 +9406,8 @@ def pantalla_head_to_head():
     qua_a=_rv(pa,"Qualys"); qua_b=_rv(pb,"Qualys")
     spr_a=_rv(pa,"Sprints"); spr_b=_rv(pb,"Sprints")
     car_a=_rv(pa,"Carreras"); car_b=_rv(pb,"Carreras")
-    # ── GPs ganados: usar el historial ya cargado arriba (evita segunda lectura de Sheets) ──
-    _df_h2 = _h2h_df_h  # ya cargado con cache TTL=600 en _h2h_load_hist()
-    gps_a = 0; gps_b = 0
-    if _df_h2 is not None and not (hasattr(_df_h2,"empty") and _df_h2.empty):
-        try:
-            _dh2c = _df_h2.copy(); _dh2c.columns=[c.lower().strip() for c in _dh2c.columns]
-            _dh2c["puntos"]=pd.to_numeric(_dh2c["puntos"],errors="coerce").fillna(0).astype(int)
-            _dh2c=_dh2c.groupby(["gp","piloto"],as_index=False)["puntos"].sum()
-            for _gp2,_grp2 in _dh2c.groupby("gp"):
-                _gs2=_grp2.sort_values("puntos",ascending=False)
-                if _gs2.empty: continue
-                _w2=_gs2.iloc[0]["piloto"]
-                if _w2==pa: gps_a+=1
-                elif _w2==pb: gps_b+=1
-        except Exception: pass
+    # ── GPs ganados: del resumen de temporada ya cargado arriba ──
+    gps_a = _h2h_rs["ganados"].get(pa, 0); gps_b = _h2h_rs["ganados"].get(pb, 0)
     win=(pa if pts_a>pts_b else(pb if pts_b>pts_a else None))
 
     def _av(ph,ini,clr,sz=76):
@@ -7639,45 +9518,9 @@ def pantalla_head_to_head():
         except Exception: pass
     # ── Desafíos Directos entre estos 2 pilotos ──────────────────────
     try:
-        # Cache desafíos en session_state (TTL 120s) — evita redefinir @st.cache_data en cada render
-        _H2H_DES_KEY = "_h2h_desafios_data"
-        _H2H_DES_TS  = "_h2h_desafios_ts"
-        if (_H2H_DES_KEY not in st.session_state or
-                _time_h2h.time() - st.session_state.get(_H2H_DES_TS, 0) > 120):
-            try:
-                from core.database import conectar_google_sheets as _cgs_h2d
-                _ws_h2 = _cgs_h2d("Desafios")
-                if not _ws_h2:
-                    _des_raw = []
-                else:
-                    try:
-                        _des_raw = _ws_h2.get_all_records(expected_headers=["id","retador","rival","gp","estado","pts_retador","pts_rival","ganador","ts_creado","ts_resuelto"])
-                    except Exception:
-                        _v = _ws_h2.get_all_values()
-                        if not _v or len(_v)<2:
-                            _des_raw = []
-                        else:
-                            _h2=[h.strip().lower() for h in _v[0]]
-                            def _fi2(n):
-                                for _i,_hh in enumerate(_h2):
-                                    if _hh==n: return _i
-                                return None
-                            _map2 = {n:_fi2(n) for n in ["id","retador","rival","gp","estado","pts_retador","pts_rival","ganador","ts_creado","ts_resuelto"]}
-                            _des_raw=[]
-                            for _rr in _v[1:]:
-                                if not any(c.strip() for c in _rr): continue
-                                _des_raw.append({k: (_rr[i].strip() if i is not None and i<len(_rr) else "") for k,i in _map2.items()})
-            except Exception:
-                _des_raw = []
-            st.session_state[_H2H_DES_KEY] = _des_raw
-            st.session_state[_H2H_DES_TS]  = _time_h2h.time()
-        _desafios_h2 = st.session_state.get(_H2H_DES_KEY, [])
-        _d_ab   = [d for d in _desafios_h2 if d.get("estado")=="RESUELTO" and
-                   ((d.get("retador")==pa and d.get("rival")==pb) or
-                    (d.get("retador")==pb and d.get("rival")==pa))]
-        _d_pend = [d for d in _desafios_h2 if d.get("estado")=="PENDIENTE" and
-                   ((d.get("retador")==pa and d.get("rival")==pb) or
-                    (d.get("retador")==pb and d.get("rival")==pa))]
+        # Índice por pareja del repositorio de desafíos (sin releer la hoja)
+        _d_ab   = desafios_entre(pa, pb, "RESUELTO")
+        _d_pend = desafios_entre(pa, pb, "PENDIENTE")
         _d_a_wins = sum(1 for d in _d_ab if d.get("ganador")==pa)
         _d_b_wins = sum(1 for d in _d_ab if d.get("ganador")==pb)
         _d_draws  = sum(1 for d in _d_ab if d.get("ganador")=="EMPATE")
@@ -7713,16 +9556,10 @@ def pantalla_head_to_head():
     except Exception: pass
 # ─────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────────
 def _send_telegram(mensaje: str):
-    """Envía mensaje al grupo Telegram. Requiere TELEGRAM_BOT_TOKEN y TELEGRAM_CHAT_ID en secrets."""
+    """Encola un mensaje al grupo Telegram. Requiere TELEGRAM_BOT_TOKEN y TELEGRAM_CHAT_ID en secrets."""
     try:
-        import urllib.request as _ur, json as _js
-        token = st.secrets.get("TELEGRAM_BOT_TOKEN","")
-        chat  = st.secrets.get("TELEGRAM_CHAT_ID","")
-        if not token or not chat: return False
-        payload = _js.dumps({"chat_id":str(chat),"text":mensaje,"parse_mode":"Markdown"}).encode()
-        req = _ur.Request(f"https://api.telegram.org/bot{token}/sendMessage",
-                         data=payload, headers={"Content-Type":"application/json"})
-        _ur.urlopen(req, timeout=8); return True
+        if not st.secrets.get("TELEGRAM_BOT_TOKEN","") or not st.secrets.get("TELEGRAM_CHAT_ID",""): return False
+        encolar_telegram(mensaje); return True
     except Exception as _te: print(f"Telegram error: {_te}"); return False
 
 
@@ -7734,7 +9571,7 @@ def _get_user_email(usuario: str) -> str:
     except: return ""
 
 def _build_email_body(usuario, gp, tipo, resumen):
-    gp_short = gp.replace("Gran Premio de ","GP ").replace("Gran Premio del ","GP ")
+    gp_short = gp_corto(gp)
     return (
         f"🏆 TORNEO FEFE WOLF 2026\n\n"
         f"✅ PREDICCIÓN CONFIRMADA\n"
@@ -7745,61 +9582,15 @@ def _build_email_body(usuario, gp, tipo, resumen):
     ), gp_short
 
 def _send_prediccion_email(usuario: str, gp: str, tipo: str, resumen: str):
-    """Envía email vía Gmail SMTP (recomendado) o SendGrid como fallback. Nunca rompe la app."""
+    """Encola el email de confirmación (Gmail SMTP o SendGrid, en segundo plano). Nunca rompe la app."""
     try:
         dest_email = _get_user_email(usuario)
         if not dest_email: return
         body_txt, gp_short = _build_email_body(usuario, gp, tipo, resumen)
         subject = f"🏎️ {tipo} enviado — {gp_short} | Torneo Fefe Wolf 2026"
 
-        # ── Intento 1: Gmail SMTP (recomendado, sin registro externo) ──
-        gmail_user = st.secrets.get("GMAIL_USER", "")
-        gmail_pass = st.secrets.get("GMAIL_APP_PASSWORD", "")
-        if gmail_user and gmail_pass:
-            import smtplib
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = subject
-            msg["From"] = f"Torneo Fefe Wolf <{gmail_user}>"
-            msg["To"] = dest_email
-            msg.attach(MIMEText(body_txt, "plain", "utf-8"))
-            _email_sent = False
-            # Try SSL port 465 first
-            try:
-                with smtplib.SMTP_SSL("smtp.gmail.com", 465) as srv:
-                    srv.login(gmail_user, gmail_pass)
-                    srv.sendmail(gmail_user, dest_email, msg.as_string())
-                    _email_sent = True
-            except Exception:
-                pass
-            # Fallback: TLS port 587
-            if not _email_sent:
-                try:
-                    with smtplib.SMTP("smtp.gmail.com", 587) as srv:
-                        srv.ehlo(); srv.starttls(); srv.ehlo()
-                        srv.login(gmail_user, gmail_pass)
-                        srv.sendmail(gmail_user, dest_email, msg.as_string())
-                        _email_sent = True
-                except Exception as _em:
-                    import sys; print(f"Email TLS error: {_em}", file=sys.stderr)
-            return
-
-        # ── Intento 2: SendGrid fallback ──
-        api_key = st.secrets.get("SENDGRID_API_KEY", "")
-        from_email = st.secrets.get("SENDGRID_FROM", "")
-        if api_key and from_email:
-            import requests as _req
-            payload = {
-                "personalizations": [{"to": [{"email": dest_email}]}],
-                "from": {"email": from_email, "name": "Torneo Fefe Wolf"},
-                "subject": subject,
-                "content": [{"type": "text/plain", "value": body_txt}]
-            }
-            _req.post("https://api.sendgrid.com/v3/mail/send",
-                      json=payload, timeout=8,
-                      headers={"Authorization": f"Bearer {api_key}",
-                               "Content-Type": "application/json"})
+        # Gmail SMTP (o SendGrid si no hay Gmail) — lo despacha el worker del outbox
+        encolar_email(dest_email, subject, body_txt)
     except Exception: pass  # Never crash the app over email
 
 def _wa_share_button(gp: str, tipo: str, resumen: str, usuario: str = "", oficial: dict = None, preds_all: dict = None):
@@ -7810,27 +9601,18 @@ def _wa_share_button(gp: str, tipo: str, resumen: str, usuario: str = "", oficia
     """
     import urllib.parse as _up, re as _rew
 
-    _FLAG_MAP = {
-        "Australia":"🇦🇺","China":"🇨🇳","Japón":"🇯🇵","Bahrein":"🇧🇭","Bahréin":"🇧🇭",
-        "Arabia":"🇸🇦","Miami":"🇺🇸","Emilia":"🇮🇹","Mónaco":"🇲🇨","España":"🇪🇸",
-        "Canadá":"🇨🇦","Austria":"🇦🇹","Gran Bretaña":"🇬🇧","Bélgica":"🇧🇪",
-        "Hungría":"🇭🇺","Países Bajos":"🇳🇱","Italia":"🇮🇹","Azerbaiyán":"🇦🇿",
-        "Singapur":"🇸🇬","México":"🇲🇽","Brasil":"🇧🇷","Las Vegas":"🇺🇸",
-        "Qatar":"🇶🇦","Abu Dabi":"🇦🇪","Abu Dhabi":"🇦🇪",
-    }
-    gp_clean = _rew.sub(r'^\d+\.\s*','', gp.replace("Gran Premio de ","").replace("Gran Premio del ","").strip())
-    bandera = next((v for k,v in _FLAG_MAP.items() if k.lower() in gp_clean.lower()), "🏁")
-    gp_short = _rew.sub(r'^\d+\.\s*','', gp.replace("Gran Premio de ","GP ").replace("Gran Premio del ","GP ").strip())
+    bandera = gp_bandera(gp)
+    gp_short = gp_corto(gp)
     _MED = {1:"🥇",2:"🥈",3:"🥉",4:"4️⃣",5:"5️⃣",6:"6️⃣",7:"7️⃣",8:"8️⃣",9:"9️⃣",10:"🔟"}
 
     def _eq(nombre):
-        return next((f"({t})" for t,ds in GRILLA_2026.items() if nombre in ds), "")
+        _pf = piloto_info(nombre)
+        return f"({_pf.equipo})" if _pf and _pf.equipo else ""
 
     def _check(pred_val, real_val):
         """✅ si coincide, ❌ si no"""
         if not pred_val or not real_val: return "❌"
-        from core.utils import normalizar_nombre
-        return "✅" if normalizar_nombre(pred_val) == normalizar_nombre(real_val) else "❌"
+        return "✅" if piloto_id(pred_val) == piloto_id(real_val) else "❌"
 
     lines = []
 
@@ -7967,26 +9749,8 @@ def _wa_share_button(gp: str, tipo: str, resumen: str, usuario: str = "", oficia
     import urllib.parse as _up
 
     # ── Bandera del GP ──────────────────────────────────────────────
-    _FLAG_MAP = {
-        "Australia":"🇦🇺","China":"🇨🇳","Japón":"🇯🇵","Bahrein":"🇧🇭","Bahréin":"🇧🇭",
-        "Arabia":"🇸🇦","Miami":"🇺🇸","Emilia":"🇮🇹","Mónaco":"🇲🇨","España":"🇪🇸",
-        "Canadá":"🇨🇦","Austria":"🇦🇹","Gran Bretaña":"🇬🇧","Bélgica":"🇧🇪",
-        "Hungría":"🇭🇺","Holanda":"🇳🇱","Países Bajos":"🇳🇱","Italia":"🇮🇹",
-        "Azerbaiyán":"🇦🇿","Singapur":"🇸🇬","Estados Unidos":"🇺🇸","México":"🇲🇽",
-        "Brasil":"🇧🇷","Las Vegas":"🇺🇸","Qatar":"🇶🇦","Abu Dabi":"🇦🇪","Abu Dhabi":"🇦🇪",
-    }
-    gp_clean = gp.replace("Gran Premio de ","").replace("Gran Premio del ","").replace("Gran Premio","").strip()
-    # Quitar numeración tipo "01. "
-    if len(gp_clean) > 3 and gp_clean[2] == ".":
-        gp_clean = gp_clean[4:].strip()
-    bandera = next((v for k, v in _FLAG_MAP.items() if k.lower() in gp_clean.lower()), "🏁")
-    gp_short = gp.replace("Gran Premio de ","GP ").replace("Gran Premio del ","GP ")\
-                  .replace("01. ","").replace("02. ","").replace("03. ","").replace("04. ","")\
-                  .replace("05. ","").replace("06. ","").replace("07. ","").replace("08. ","")\
-                  .replace("09. ","").replace("10. ","")
-    # Remove leading "NN. " pattern
-    import re as _re
-    gp_short = _re.sub(r"^\d+\.\s*", "", gp_short)
+    bandera = gp_bandera(gp)
+    gp_short = gp_corto(gp)
 
     # ── Medallas ────────────────────────────────────────────────────
     _MED = {1:"🥇",2:"🥈",3:"🥉"}
@@ -8086,6 +9850,7 @@ def _wa_share_button(gp: str, tipo: str, resumen: str, usuario: str = "", oficia
         unsafe_allow_html=True
     )
 
+@perfilar("pantalla")
 def pantalla_perfil():
     """Perfil personal del usuario logueado — stats completas."""
     perfil  = st.session_state.get("perfil") or {}
@@ -8166,12 +9931,11 @@ def pantalla_perfil():
         st.warning("⚠️ No se pudo cargar el historial."); return
 
     @st.cache_data(ttl=60, show_spinner=False)
-    def _prof_hist(): return _safe_call(m["leer_historial_df"], timeout_sec=20, default=pd.DataFrame())
-    @st.cache_data(ttl=60, show_spinner=False)
-    def _prof_tabla(): return _safe_call(m["leer_tabla_posiciones"], PILOTOS_TORNEO, timeout_sec=8, default=None)
+    def _prof_tabla(ver): return _safe_call(m["leer_tabla_posiciones"], PILOTOS_TORNEO, timeout_sec=8, default=None)
 
-    h   = _prof_hist()
-    dft = _prof_tabla()
+    _rs_prof = resumen_temporada()
+    h   = _rs_prof["raw"]
+    dft = _prof_tabla(cache_version("standings"))
 
     # Parsing historial
     df_p = None
@@ -8200,7 +9964,7 @@ def pantalla_perfil():
         if is_admin():
             st.info("📋 Sin historial en Google Sheets. Usá la 🧮 Calculadora → 'Generar Historial + DNS' para cada GP ya computado (Australia, China, Japón).", icon="ℹ️")
         if st.button("🔄 Recargar historial", key="prof_reload_hist"):
-            _prof_hist.clear(); st.rerun()
+            invalidar("historial"); st.rerun()
 
     # Stats
     total_pts, n_gps, prom, mejor_pts, peor_pts = 0, 0, 0.0, 0, 0
@@ -8289,8 +10053,7 @@ def pantalla_perfil():
                                 if st.session_state.get("perfil"):
                                     st.session_state["perfil"]["foto_url"] = _url_clean
                                 st.session_state[_photo_key] = _url_clean
-                                try: _get_perfil.clear()
-                                except: pass
+                                invalidar(f"perfil:{usuario}")
                                 st.success("✅ Foto guardada permanentemente"); st.rerun()
                             else:
                                 st.error("No se pudo guardar la URL")
@@ -8324,13 +10087,14 @@ def pantalla_perfil():
             _aciert_etapa = {}
             _total_etapa = {}
             if "_error" not in _m_stats:
-                _fn_of_s = _m_stats.get("leer_resultados_oficiales")
-                if callable(_fn_of_s) and df_p is not None and not df_p.empty:
-                    for _gp_s in df_p.get("gp", pd.Series(dtype=str)).values:
+                if df_p is not None and not df_p.empty:
+                    _gps_s = list(df_p.get("gp", pd.Series(dtype=str)).values)
+                    _of_many_s = oficial_get_many(_gps_s, respaldo=True)
+                    for _gp_s in _gps_s:
                         try:
-                            _of_s = _safe_call(_fn_of_s, _gp_s, timeout_sec=5, default={}) or {}
+                            _of_s = _of_many_s[_gp_s]
                             if not _of_s: continue
-                            _rp_s = _safe_call(_m_stats["recuperar_predicciones_piloto"], usuario, _gp_s, timeout_sec=8, default=(None,None,(None,None)))
+                            _rp_s = recuperar_predicciones_gp(_gp_s, [usuario])[usuario]
                             _dq_s,_ds_s,(_dr_s,_dc_s) = _rp_s
                             for _et, _pred, _pfx, _n in [("Qualy",_dq_s,"q",5),("Carrera",_dr_s,"r",10),("Sprint",_ds_s,"s",8)]:
                                 if not _pred: continue
@@ -8437,56 +10201,13 @@ def pantalla_perfil():
     .logro-lock{position:absolute;top:8px;right:8px;font-size:12px;opacity:.4;}
     </style>""", unsafe_allow_html=True)
 
-    # Load detalle for achievements — fully protected against any column issues
-    df_det_l  = pd.DataFrame(columns=["gp","piloto","etapa","puntos"])
+    # Detalle ya normalizado (gp, piloto, etapa, puntos) del resumen de temporada
+    df_det_l  = _rs_prof["det"] if not _rs_prof["det"].empty else pd.DataFrame(columns=["gp","piloto","etapa","puntos"])
     df_det    = df_det_l  # alias — always available
-    _df_logro = pd.DataFrame()
     logros_calc = [(_l, False, "") for _l in _LOGROS_DEF]
     try:
-        m2 = _mod_db()
-        if "_error" not in m2:
-            _fn_det = m2.get("leer_historial_detalle_df")
-            if callable(_fn_det):
-                try:
-                    _res_det = _safe_call(_fn_det, timeout_sec=15, default=None)
-                    if _res_det is not None and isinstance(_res_det, pd.DataFrame) and not _res_det.empty:
-                        _res_det = _res_det.copy()
-                        _res_det.columns = [c.lower().strip() for c in _res_det.columns]
-                        # Keep only expected columns, ignore anything else
-                        for _req_c in ["gp","piloto","etapa","puntos"]:
-                            if _req_c not in _res_det.columns:
-                                _res_det[_req_c] = "" if _req_c != "puntos" else 0
-                        _res_det["puntos"] = pd.to_numeric(_res_det["puntos"],errors="coerce").fillna(0).astype(int)
-                        # ONLY keep the 4 required cols to avoid any KeyError
-                        df_det_l = _res_det[["gp","piloto","etapa","puntos"]].copy()
-                    df_det = df_det_l  # update alias with loaded data
-                except Exception as _det_e:
-                    print(f"ERROR loading detalle for logros: {_det_e}")
-
-        if df_p is not None and not df_p.empty:
-            _df_logro = df_p.rename(columns={"pts":"puntos"}).copy()
-            _df_logro["piloto"] = usuario
-            for _req in ["gp","puntos","piloto"]:
-                if _req not in _df_logro.columns: _df_logro[_req] = 0 if _req == "puntos" else ""
-
-        # For Triple Corona we need ALL users' historial
-        _df_logro_all = None
-        try:
-            if h is not None and not (hasattr(h,"empty") and h.empty):
-                _h_copy = h.copy()
-                _h_copy.columns = [c.lower().strip() for c in _h_copy.columns]
-                _cn_gp  = next((c for c in _h_copy.columns if c in ["gp","gran_premio"]), None)
-                _cn_pil = next((c for c in _h_copy.columns if c in ["piloto","usuario"]), None)
-                _cn_pts = next((c for c in _h_copy.columns if c in ["puntos","pts","points"]), None)
-                if _cn_gp and _cn_pil and _cn_pts:
-                    _df_logro_all = _h_copy[[_cn_gp,_cn_pil,_cn_pts]].copy()
-                    _df_logro_all.columns = ["gp","piloto","puntos"]
-                    _df_logro_all["puntos"] = pd.to_numeric(_df_logro_all["puntos"],errors="coerce").fillna(0).astype(int)
-        except Exception: pass
-
-        n_gps_total = len(df_p) if (df_p is not None and not df_p.empty) else 0
-        logros_calc = _calc_logros(usuario, _df_logro_all if _df_logro_all is not None else _df_logro,
-                                   df_det_l, n_gps_total)
+        # Lookup en el motor de logros (cada GP ya se procesó una vez al entrar al resumen)
+        logros_calc = _calc_logros(usuario)
     except Exception as _le:
         print(f"ERROR loading logros: {_le}")
         logros_calc = [(_l, False, "") for _l in _LOGROS_DEF]
@@ -8585,10 +10306,8 @@ def pantalla_perfil():
             if not _gps_done_pa:
                 st.info("Sin GPs computados todavía.")
             else:
-                _ESCALA_Q2={1:15,2:10,3:7,4:5,5:3}
-                _ESCALA_R2={1:25,2:18,3:15,4:12,5:10,6:8,7:6,8:4,9:2,10:1}
-                _ESCALA_S2={1:8,2:7,3:6,4:5,5:4,6:3,7:2,8:1}
-                _ESCALA_C2={1:10,2:5,3:2}
+                _ESCALA_Q2, _ESCALA_R2 = ESCALAS["QUALY"], ESCALAS["CARRERA"]
+                _ESCALA_S2, _ESCALA_C2 = ESCALAS["SPRINT"], ESCALAS["CONSTRUCTORES"]
 
                 def _row_pa(pos, pv, esc, pts_remaining_ref, acerto_flag):
                     if not pv: return ""
@@ -8604,20 +10323,12 @@ def pantalla_perfil():
                             f'<span style="font-size:11px;font-weight:800;color:{nc};flex:1;">{pv}</span>'
                             f'{tick}</div>')
 
-                def _guess_aciertos(pred_d, esc, pts_total, oficial_d=None, pfx="r"):
-                    """Compare each prediction against official result. Falls back to greedy if no official."""
+                def _guess_aciertos(pred_d, esc, pts_total, det=None, etapa="CARRERA"):
+                    """Aciertos por posición desde el detalle del motor de puntaje. Sin oficial, reparto greedy."""
                     res = {}
-                    if oficial_d:
-                        # Real comparison against official results
-                        try:
-                            from core.utils import normalizar_nombre as _nn_ag
-                        except Exception:
-                            _nn_ag = lambda x: str(x or "").strip().lower()
-                        for p in sorted(esc.keys()):
-                            v = pred_d.get(p, pred_d.get(str(p), ""))
-                            if not v: res[p]=None; continue
-                            rv = str(oficial_d.get(f"{pfx}{p}","")).strip()
-                            res[p] = bool(rv and _nn_ag(str(v)) == _nn_ag(rv))
+                    if det is not None:
+                        for _r in det[det["etapa"]==etapa].itertuples(index=False):
+                            res[int(_r.pos)] = bool(_r.ok)
                         return res
                     # Fallback greedy
                     rem = pts_total
@@ -8628,10 +10339,10 @@ def pantalla_perfil():
                         else: res[p]=False
                     return res
 
+                _of_pa_all = oficial_get_many(_gps_done_pa)
                 for _gp_pa in _gps_done_pa:
                     _gp_lpa = _gp_pa.split(". ",1)[-1] if ". " in _gp_pa else _gp_pa
-                    _rpa = _safe_call(_m_pa["recuperar_predicciones_piloto"], usuario, _gp_pa,
-                                      timeout_sec=12, default=(None,None,(None,None)))
+                    _rpa = recuperar_predicciones_gp(_gp_pa, [usuario])[usuario]
                     _dqpa,_dspa,(_drpa,_dcpa) = _rpa
                     if not any([_dqpa, _dspa, _drpa]): continue
 
@@ -8654,34 +10365,10 @@ def pantalla_perfil():
 
                     _clr_pa = PILOTO_COLORS.get(usuario,"#a855f7")
 
-                    # Load oficial for exact aciertos — read from Oficial sheet directly
-                    _oficial_pa = {}
-                    try:
-                        from core.database import conectar_google_sheets as _cgs_pa
-                        _ws_of_pa = _cgs_pa("Oficial")
-                        if _ws_of_pa:
-                            _of_recs_pa = _ws_of_pa.get_all_records()
-                            _gp_pa_bare = (_gp_pa.split(". ",1)[-1] if ". " in _gp_pa else _gp_pa).lower()
-                            _gp_pa_bare = _gp_pa_bare.replace("gran premio de ","").replace("gran premio del ","").replace("gran premio ","")
-                            for _r_of in _of_recs_pa:
-                                _r_gp = str(_r_of.get("gp","")).strip()
-                                _r_gp_b = (_r_gp.split(". ",1)[-1] if ". " in _r_gp else _r_gp).lower()
-                                _r_gp_b = _r_gp_b.replace("gran premio de ","").replace("gran premio del ","").replace("gran premio ","")
-                                if _gp_pa_bare[:6] in _r_gp_b or _r_gp_b[:6] in _gp_pa_bare:
-                                    _et_of = str(_r_of.get("etapa","")).upper()
-                                    _pos_of = _r_of.get("pos", _r_of.get("posicion",""))
-                                    _pil_of = str(_r_of.get("piloto","")).strip()
-                                    try:
-                                        _p_int = int(_pos_of)
-                                        if _et_of == "CARRERA": _oficial_pa[f"r{_p_int}"] = _pil_of
-                                        elif _et_of == "QUALY": _oficial_pa[f"q{_p_int}"] = _pil_of
-                                        elif _et_of == "CONSTRUCTORES": _oficial_pa[f"c{_p_int}"] = _pil_of
-                                        elif _et_of == "SPRINT": _oficial_pa[f"s{_p_int}"] = _pil_of
-                                    except: pass
-                                    if "COLAPINTO" in _et_of:
-                                        if "Q" in _et_of: _oficial_pa["col_q"] = str(_pos_of)
-                                        else: _oficial_pa["col_r"] = str(_pos_of)
-                    except Exception: pass
+                    # Oficial del GP (índice de la hoja Oficial, una sola lectura para todos)
+                    _oficial_pa = _of_pa_all[_gp_pa]
+                    _det_pa = (puntuar_gp({usuario: _rpa}, _oficial_pa, es_sprint=_gp_pa in GPS_SPRINT)[1]
+                               if _oficial_pa else None)
 
                     with st.expander(
                         f"🏁 {_gp_lpa}{'  ⚡' if _gp_pa in GPS_SPRINT else ''}  —  {_total_pa} pts",
@@ -8691,7 +10378,7 @@ def pantalla_perfil():
                         with _pc1:
                             if _dqpa:
                                 _ac_qpa = _guess_aciertos(_dqpa, _ESCALA_Q2, _pa_etapa["QUALY"],
-                                                              oficial_d=_oficial_pa, pfx="q")
+                                                              det=_det_pa, etapa="QUALY")
                                 st.markdown(f'<div style="font-size:10px;font-weight:800;color:rgba(246,195,73,.7);margin-bottom:4px;">⏱️ QUALY <span style="color:#4ade80;">+{int(_pa_etapa["QUALY"])}pts</span></div>', unsafe_allow_html=True)
                                 _h = "".join(_row_pa(i,_dqpa.get(i,""),_ESCALA_Q2.get(i,0),None,_ac_qpa.get(i,False)) for i in range(1,6))
                                 if _h: st.markdown(_h, unsafe_allow_html=True)
@@ -8700,7 +10387,7 @@ def pantalla_perfil():
                                 if _cq_pa:
                                     _cqr = str(_oficial_pa.get("col_q","")).strip()
                                     _cq_ok = bool(_cqr and str(_cq_pa)==str(_cqr))
-                                    _cq_pts_disp = " (+10pts)" if _cq_ok else ""
+                                    _cq_pts_disp = f" (+{BONUS_COLAPINTO['QUALY']}pts)" if _cq_ok else ""
                                     _cq_col = "#4ade80" if _cq_ok else "rgba(169,178,214,.5)"
                                     _cq_bg = "background:rgba(74,222,128,.1);border:1px solid rgba(74,222,128,.3);" if _cq_ok else ""
                                     st.markdown(f'<div style="font-size:11px;color:{_cq_col};padding:4px 8px;border-radius:8px;{_cq_bg}margin-top:4px;">' +
@@ -8708,14 +10395,14 @@ def pantalla_perfil():
                                                 unsafe_allow_html=True)
                             if _dspa and _gp_pa in GPS_SPRINT:
                                 _ac_spa = _guess_aciertos(_dspa, _ESCALA_S2, _pa_etapa["SPRINT"],
-                                                              oficial_d=_oficial_pa, pfx="s")
+                                                              det=_det_pa, etapa="SPRINT")
                                 st.markdown(f'<div style="font-size:10px;font-weight:800;color:rgba(246,195,73,.7);margin:6px 0 4px;">⚡ SPRINT <span style="color:#4ade80;">+{int(_pa_etapa["SPRINT"])}pts</span></div>', unsafe_allow_html=True)
                                 _h = "".join(_row_pa(i,_dspa.get(i,""),_ESCALA_S2.get(i,0),None,_ac_spa.get(i,False)) for i in range(1,9))
                                 if _h: st.markdown(_h, unsafe_allow_html=True)
                         with _pc2:
                             if _drpa:
                                 _ac_rpa = _guess_aciertos(_drpa, _ESCALA_R2, _pa_etapa["CARRERA"],
-                                                              oficial_d=_oficial_pa, pfx="r")
+                                                              det=_det_pa, etapa="CARRERA")
                                 st.markdown(f'<div style="font-size:10px;font-weight:800;color:rgba(246,195,73,.7);margin-bottom:4px;">🏁 CARRERA <span style="color:#4ade80;">+{int(_pa_etapa["CARRERA"])}pts</span></div>', unsafe_allow_html=True)
                                 _h = "".join(_row_pa(i,_drpa.get(i,""),_ESCALA_R2.get(i,0),None,_ac_rpa.get(i,False)) for i in range(1,11))
                                 if _h: st.markdown(_h, unsafe_allow_html=True)
@@ -8724,7 +10411,7 @@ def pantalla_perfil():
                                 if _cr_pa:
                                     _crr = str(_oficial_pa.get("col_r","")).strip()
                                     _cr_ok = bool(_crr and str(_cr_pa)==str(_crr))
-                                    _cr_pts_disp = " (+20pts)" if _cr_ok else ""
+                                    _cr_pts_disp = f" (+{BONUS_COLAPINTO['CARRERA']}pts)" if _cr_ok else ""
                                     _cr_col = "#4ade80" if _cr_ok else "rgba(169,178,214,.5)"
                                     _cr_bg = "background:rgba(74,222,128,.1);border:1px solid rgba(74,222,128,.3);" if _cr_ok else ""
                                     st.markdown(f'<div style="font-size:11px;color:{_cr_col};padding:4px 8px;border-radius:8px;{_cr_bg}margin-top:4px;">' +
@@ -8732,7 +10419,7 @@ def pantalla_perfil():
                                                 unsafe_allow_html=True)
                             if _dcpa:
                                 _ac_cpa = _guess_aciertos(_dcpa, _ESCALA_C2, _pa_etapa["CONSTRUCTORES"],
-                                                              oficial_d=_oficial_pa, pfx="c")
+                                                              det=_det_pa, etapa="CONSTRUCTORES")
                                 st.markdown(f'<div style="font-size:10px;font-weight:800;color:rgba(246,195,73,.7);margin:6px 0 4px;">🏗️ CONSTRUCTORES <span style="color:#4ade80;">+{int(_pa_etapa["CONSTRUCTORES"])}pts</span></div>', unsafe_allow_html=True)
                                 _h = "".join(_row_pa(i,_dcpa.get(i,""),_ESCALA_C2.get(i,0),None,_ac_cpa.get(i,False)) for i in range(1,4))
                                 if _h: st.markdown(_h, unsafe_allow_html=True)
@@ -8751,8 +10438,8 @@ def pantalla_perfil():
                 if "_error" not in _m_exp:
                     with st.spinner("Generando Excel..."):
                         _buf_exp = _io_exp.BytesIO()
-                        _EQ={1:15,2:10,3:7,4:5,5:3}; _ER={1:25,2:18,3:15,4:12,5:10,6:8,7:6,8:4,9:2,10:1}
-                        _ES={1:8,2:7,3:6,4:5,5:4,6:3,7:2,8:1}; _EC={1:10,2:5,3:2}
+                        _EQ, _ER = ESCALAS["QUALY"], ESCALAS["CARRERA"]
+                        _ES, _EC = ESCALAS["SPRINT"], ESCALAS["CONSTRUCTORES"]
                         _sheets = 0
                         with pd.ExcelWriter(_buf_exp, engine="openpyxl") as _xw:
                             if df_p is not None and not df_p.empty:
@@ -8760,52 +10447,16 @@ def pantalla_perfil():
                                 _res_df["GP"] = _res_df["GP"].apply(lambda x: str(x).split(". ",1)[-1] if ". " in str(x) else str(x))
                                 _res_df.insert(0,"Formulero",usuario)
                                 _res_df.to_excel(_xw, sheet_name="Resumen", index=False)
-                            # Load ALL official results from Oficial sheet ONCE (much faster)
-                            _of_all_xl = {}  # dict: gp_bare -> {r1:piloto, q1:piloto, ...}
-                            try:
-                                from core.database import conectar_google_sheets as _cgs_xl2
-                                _ws_xl2 = _cgs_xl2("Oficial")
-                                if _ws_xl2:
-                                    for _rxl in _ws_xl2.get_all_records():
-                                        _gp_xl = str(_rxl.get("gp","")).strip()
-                                        _gp_xl_b = (_gp_xl.split(". ",1)[-1] if ". " in _gp_xl else _gp_xl).lower()
-                                        if _gp_xl_b not in _of_all_xl: _of_all_xl[_gp_xl_b] = {}
-                                        _et_xl2 = str(_rxl.get("etapa","")).upper()
-                                        _pos_xl2 = _rxl.get("pos",""); _pil_xl2 = str(_rxl.get("piloto","")).strip()
-                                        try:
-                                            _p2 = int(_pos_xl2)
-                                            if _et_xl2=="CARRERA": _of_all_xl[_gp_xl_b][f"r{_p2}"] = _pil_xl2
-                                            elif _et_xl2=="QUALY": _of_all_xl[_gp_xl_b][f"q{_p2}"] = _pil_xl2
-                                            elif _et_xl2=="CONSTRUCTORES": _of_all_xl[_gp_xl_b][f"c{_p2}"] = _pil_xl2
-                                            elif _et_xl2=="SPRINT": _of_all_xl[_gp_xl_b][f"s{_p2}"] = _pil_xl2
-                                        except: pass
-                                        if "COLAPINTO" in _et_xl2:
-                                            if "Q" in _et_xl2: _of_all_xl[_gp_xl_b]["col_q"] = str(_pos_xl2)
-                                            else: _of_all_xl[_gp_xl_b]["col_r"] = str(_pos_xl2)
-                            except Exception: pass
                             # Use ALL GPS_ACTIVOS that have predictions (not just those in df_p)
                             _gps_x = [g for g in GPS_ACTIVOS if g not in GPS_SUSPENDIDOS]
                             for _gp_x in _gps_x:
                                 _gp_lx = _gp_x.split(". ",1)[-1] if ". " in _gp_x else _gp_x
                                 _sn = _gp_lx[:25].replace("/","-").replace("?","")
                                 try:
-                                    _rp = _safe_call(_m_exp["recuperar_predicciones_piloto"], usuario, _gp_x, timeout_sec=8, default=(None,None,(None,None)))
+                                    _rp = recuperar_predicciones_gp(_gp_x, [usuario])[usuario]
                                     _dq,_ds,(_dr,_dc) = _rp
                                     if not any([_dq, _ds, _dr, _dc]): continue  # skip empty GPs
-                                    # Get oficial from pre-loaded dict — flexible matching
-                                    _gp_lx_low = _gp_lx.lower()
-                                    # Strip common prefixes for matching
-                                    _gp_bare_xl = (_gp_lx_low
-                                        .replace("gran premio de ","").replace("gran premio del ","")
-                                        .replace("gran premio ","").replace("grand prix ","").strip())
-                                    _of = {}
-                                    for _k_of, _v_of in _of_all_xl.items():
-                                        _k_bare = (_k_of
-                                            .replace("gran premio de ","").replace("gran premio del ","")
-                                            .replace("gran premio ","").replace("grand prix ","").strip())
-                                        if (_gp_bare_xl[:6] in _k_bare or _k_bare[:6] in _gp_bare_xl
-                                                or _gp_lx_low[:8] in _k_of or _k_of[:8] in _gp_lx_low):
-                                            _of = _v_of; break
+                                    _of = oficial_get(_gp_x)
                                     _rows = []
                                     def _axr(pd2, esc, lab, pfx, n, od):
                                         if not pd2: return
@@ -8834,7 +10485,7 @@ def pantalla_perfil():
                                             _axr(_ds_norm, _ES, "SPRINT", "s", 8, _of)
                                     _axr(_dr,_ER,"CARRERA","r",10,_of)
                                     _axr(_dc,_EC,"CONSTRUCTORES","c",3,_of)
-                                    for _cetapa,_cfield,_crkey,_cpts in [("COLAPINTO Q","colapinto_q","col_q",10),("COLAPINTO R","colapinto_r","col_r",20)]:
+                                    for _cetapa,_cfield,_crkey,_cpts in [("COLAPINTO Q","colapinto_q","col_q",BONUS_COLAPINTO["QUALY"]),("COLAPINTO R","colapinto_r","col_r",BONUS_COLAPINTO["CARRERA"])]:
                                         _psrc2 = _dq if "Q" in _cetapa else _dr
                                         if _psrc2:
                                             _cv2 = str(_psrc2.get(_cfield,"") or _psrc2.get(_crkey,"")).strip()
@@ -8869,13 +10520,12 @@ def pantalla_perfil():
     except Exception as _exp_e:
         st.caption(f"Export no disponible: {_exp_e}")
 
-def _check_and_send_reminders():
+def _eventos_recordatorio():
     """
-    Recordatorios automáticos por email — 4 ventanas:
-      · Apertura  : predicciones ABIERTAS (72h antes del cierre = open_str)
+    Recordatorios automáticos por email — 3 ventanas:
+      · Apertura  : predicciones ABIERTAS (hasta 1.5h después de open_str)
       · 12h antes : quedan 12 horas
       · 1h antes  : cierre inminente (1h)
-      · cierre exacto: último aviso (0.25h)
     Requiere en secrets.toml:
       next_gp_name       = "GP Japón"
       next_gp_close_utc  = "2026-03-28 01:00"   # cierre UTC (1h antes de la carrera)
@@ -8885,288 +10535,435 @@ def _check_and_send_reminders():
       o SENDGRID_API_KEY / SENDGRID_FROM
     """
     try:
-        from datetime import datetime, timezone
-        import smtplib
-        from email.mime.text import MIMEText
-
-        emails    = st.secrets.get("emails", {})
+        from datetime import timezone
         gp_name   = st.secrets.get("next_gp_name", "GP siguiente")
         close_str = st.secrets.get("next_gp_close_utc", "")
         open_str  = st.secrets.get("next_gp_open_utc", "")
-        gm_u  = st.secrets.get("GMAIL_USER", "")
-        gm_p  = st.secrets.get("GMAIL_APP_PASSWORD", "")
-        api_k = st.secrets.get("SENDGRID_API_KEY", "")
-        from_em = st.secrets.get("SENDGRID_FROM", "")
-
-        if not close_str or not emails: return
-        if not gm_u and not api_k: return
-
-        now = datetime.now(timezone.utc)
-        t_close = datetime.strptime(close_str, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc)
-        diff_h  = (t_close - now).total_seconds() / 3600
+        if not close_str: return []
+        if not st.secrets.get("GMAIL_USER", "") and not st.secrets.get("SENDGRID_API_KEY", ""): return []
+        t_close = datetime.strptime(close_str, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc).timestamp()
+    except Exception: return []
+
+    ventanas = [("12h", t_close - 12.5*3600, t_close - 11.5*3600, "⏰ Quedan 12 horas",
+                 "Faltan solo 12 horas para que cierren las predicciones.",
+                 "⏰", "rgba(251,191,36,.4)", "#fbbf24"),
+                ("1h", t_close - 1.25*3600, t_close - 0.75*3600, "🔴 ¡ÚLTIMO AVISO! Queda 1 hora",
+                 "Las predicciones cierran en <b>1 HORA</b>. ¡Es ahora o nunca!",
+                 "🔴", "rgba(255,64,64,.4)", "#fca5a5")]
+    if open_str:
+        try:
+            t_open = datetime.strptime(open_str, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc).timestamp()
+            ventanas.insert(0, ("open", t_open, t_open + 1.5*3600, "🟢 ¡YA ABRIERON las predicciones",
+                                "Las predicciones están ABIERTAS. ¡Entrá y cargá tu pronóstico!",
+                                "🟢", "rgba(34,197,94,.4)", "#4ade80"))
+        except Exception: pass
 
-        # ── Detectar qué ventana aplica ──────────────────────────────────
-        send_open = False
-        if open_str:
-            try:
-                t_open = datetime.strptime(open_str, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc)
-                diff_open_h = (now - t_open).total_seconds() / 3600
-                # Ventana: hasta 1.5h después de la apertura
-                send_open = 0 <= diff_open_h <= 1.5
-            except Exception: pass
+    evs = []
+    for tag, desde, hasta, asunto_lbl, cuerpo_lbl, icon, color_border, color_title in ventanas:
+        body_html = f"""<div style="background:#07091a;padding:24px;font-family:Inter,sans-serif;
+          border-radius:14px;max-width:500px;margin:auto;">
+          <div style="text-align:center;margin-bottom:16px;">
+            <span style="font-size:32px;">{icon}</span>
+            <div style="font-size:20px;font-weight:900;color:#ffdd7a;margin-top:6px;">TORNEO FEFE WOLF 2026</div>
+          </div>
+          <div style="background:rgba(255,255,255,.04);border:1px solid {color_border};
+            border-radius:12px;padding:16px;margin-bottom:14px;">
+            <div style="font-size:17px;font-weight:900;color:{color_title};">{asunto_lbl}</div>
+            <div style="font-size:13px;color:rgba(232,236,255,.85);margin-top:8px;">
+              Hola <b style="color:#ffdd7a;">{{piloto}}</b>,<br>{cuerpo_lbl}<br><br>
+              Gran Premio: <b style="color:#ffdd7a;">{gp_name}</b><br>
+              Cierre: <b>{close_str} UTC</b>
+            </div>
+          </div>
+          <div style="text-align:center;margin-top:16px;">
+            <a href="https://torneofefewolf2026.streamlit.app" target="_blank"
+              style="background:linear-gradient(90deg,#8a6c0a,#d4af37);color:#1a1000;
+              font-weight:900;padding:10px 28px;border-radius:10px;text-decoration:none;
+              font-size:14px;display:inline-block;">🏎️ Cargar predicción</a>
+          </div>
+          <div style="text-align:center;margin-top:14px;font-size:10px;color:rgba(169,178,214,.35);">
+            🏁 Torneo Fefe Wolf 2026 · torneofefewolf2026.streamlit.app
+          </div></div>"""
+        evs.append({"clave": f"recordatorio_{tag}_{close_str}", "desde": desde, "hasta": hasta,
+                    "asunto": f"{asunto_lbl} — {gp_name} | Torneo Fefe Wolf 2026", "html": body_html,
+                    "cuerpo": f"{asunto_lbl}\n\nHola {{piloto}},\n{cuerpo_lbl}\n\nGP: {gp_name}\nCierre: {close_str} UTC\n\nhttps://torneofefewolf2026.streamlit.app"})
+    return evs
 
-        send_12 = 11.5 <= diff_h <= 12.5
-        send_1  = 0.75 <= diff_h <= 1.25
 
-        if not send_open and not send_12 and not send_1: return
+# ─────────────────────────────────────────────────────────
+# RECORDATORIOS — scheduler (un hilo por proceso)
+# ─────────────────────────────────────────────────────────
+# El hilo arranca siempre y en cada vuelta re-lee secrets (emails, next_gp_*) y
+# rearma los eventos (calendario + ventanas), así editar secrets para el próximo GP
+# no pide reinicio. Duerme hasta el próximo vencimiento (como mucho
+# _RECORDATORIOS_RELEER), dispara cada aviso una sola vez (log persistente NOTIF::
+# en Sessions + clave de idempotencia del outbox) y lo encola; los reruns de los
+# usuarios no hacen ningún trabajo de notificaciones.
+_RECORDATORIOS_RELEER = 900   # seg. máximos entre relecturas de secrets
+
+def _disparar_evento(ev, emails):
+    for _pn, _em in emails.items():
+        if not _em: continue
+        encolar_email(str(_em), ev["asunto"], ev["cuerpo"].replace("{piloto}", _pn),
+                      html=ev["html"].replace("{piloto}", _pn) if ev["html"] else None,
+                      clave=f"{ev['clave']}::{_pn}")
+
+def _recordatorios_config():
+    """(emails, eventos) según secrets en este momento; sin emails no hay eventos."""
+    try: emails = {str(k): str(v) for k, v in dict(st.secrets.get("emails", {}) or {}).items()}
+    except Exception: emails = {}
+    eventos = sorted(_eventos_calendario() + _eventos_recordatorio(), key=lambda e: e["desde"]) if emails else []
+    return emails, eventos
 
-        if send_open:
-            tag = "open"; asunto_lbl = "🟢 ¡YA ABRIERON las predicciones"
-            cuerpo_lbl = "Las predicciones están ABIERTAS. ¡Entrá y cargá tu pronóstico!"
-            icon = "🟢"; color_border = "rgba(34,197,94,.4)"; color_title = "#4ade80"
-        elif send_12:
-            tag = "12h"; asunto_lbl = "⏰ Quedan 12 horas"
-            cuerpo_lbl = "Faltan solo 12 horas para que cierren las predicciones."
-            icon = "⏰"; color_border = "rgba(251,191,36,.4)"; color_title = "#fbbf24"
-        else:
-            tag = "1h"; asunto_lbl = "🔴 ¡ÚLTIMO AVISO! Queda 1 hora"
-            cuerpo_lbl = "Las predicciones cierran en <b>1 HORA</b>. ¡Es ahora o nunca!"
-            icon = "🔴"; color_border = "rgba(255,64,64,.4)"; color_title = "#fca5a5"
-
-        flag_key = f"_rem_sent_{tag}_{close_str[:10]}"
-        if st.session_state.get(flag_key): return
-        st.session_state[flag_key] = True
-
-        def _send_one(dest_email, usr):
-            subject = f"{asunto_lbl} — {gp_name} | Torneo Fefe Wolf 2026"
-            body_html = f"""<div style="background:#07091a;padding:24px;font-family:Inter,sans-serif;
-              border-radius:14px;max-width:500px;margin:auto;">
-              <div style="text-align:center;margin-bottom:16px;">
-                <span style="font-size:32px;">{icon}</span>
-                <div style="font-size:20px;font-weight:900;color:#ffdd7a;margin-top:6px;">TORNEO FEFE WOLF 2026</div>
-              </div>
-              <div style="background:rgba(255,255,255,.04);border:1px solid {color_border};
-                border-radius:12px;padding:16px;margin-bottom:14px;">
-                <div style="font-size:17px;font-weight:900;color:{color_title};">{asunto_lbl}</div>
-                <div style="font-size:13px;color:rgba(232,236,255,.85);margin-top:8px;">
-                  Hola <b style="color:#ffdd7a;">{usr}</b>,<br>{cuerpo_lbl}<br><br>
-                  Gran Premio: <b style="color:#ffdd7a;">{gp_name}</b><br>
-                  Cierre: <b>{close_str} UTC</b>
-                </div>
-              </div>
-              <div style="text-align:center;margin-top:16px;">
-                <a href="https://torneofefewolf2026.streamlit.app" target="_blank"
-                  style="background:linear-gradient(90deg,#8a6c0a,#d4af37);color:#1a1000;
-                  font-weight:900;padding:10px 28px;border-radius:10px;text-decoration:none;
-                  font-size:14px;display:inline-block;">🏎️ Cargar predicción</a>
-              </div>
-              <div style="text-align:center;margin-top:14px;font-size:10px;color:rgba(169,178,214,.35);">
-                🏁 Torneo Fefe Wolf 2026 · torneofefewolf2026.streamlit.app
-              </div></div>"""
-            body_txt = f"{asunto_lbl}\n\nHola {usr},\n{cuerpo_lbl}\n\nGP: {gp_name}\nCierre: {close_str} UTC\n\nhttps://torneofefewolf2026.streamlit.app"
-            try:
-                if gm_u and gm_p:
-                    _m = MIMEText(body_txt, "plain", "utf-8")
-                    _m["Subject"] = subject
-                    _m["From"]    = f"Torneo Fefe Wolf <{gm_u}>"
-                    _m["To"]      = dest_email
-                    _sent = False
+@st.cache_resource(show_spinner=False)
+def _recordatorios_scheduler():
+    import threading, time as _t_rc
+    store = {"eventos": [], "enviadas": None, "disparados": [], "proximo": None,
+             "despertar": threading.Event(), "hilo": None}
+
+    def _loop():
+        while True:
+            try: emails, eventos = _recordatorios_config()
+            except Exception as e:
+                print(f"Recordatorios: {e}"); emails, eventos = {}, []
+            store["eventos"] = eventos
+            ahora = _t_rc.time(); prox = None
+            if store["enviadas"] is None and eventos: store["enviadas"] = _notif_enviadas()
+            if store["enviadas"] is not None:
+                for ev in eventos:
+                    if ev["clave"] in store["enviadas"] or ahora >= ev["hasta"]: continue
+                    if ahora < ev["desde"]:
+                        prox = ev["desde"] if prox is None else min(prox, ev["desde"]); continue
                     try:
-                        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as _srv:
-                            _srv.login(gm_u, gm_p); _srv.sendmail(gm_u, dest_email, _m.as_string())
-                        _sent = True
-                    except Exception: pass
-                    if not _sent:
-                        with smtplib.SMTP("smtp.gmail.com", 587) as _srv2:
-                            _srv2.ehlo(); _srv2.starttls(); _srv2.ehlo()
-                            _srv2.login(gm_u, gm_p); _srv2.sendmail(gm_u, dest_email, _m.as_string())
-                elif api_k and from_em:
-                    import requests as _rq
-                    _rq.post("https://api.sendgrid.com/v3/mail/send",
-                        json={"personalizations":[{"to":[{"email":dest_email}]}],
-                              "from":{"email":from_em,"name":"Torneo Fefe Wolf"},
-                              "subject":subject,
-                              "content":[{"type":"text/html","value":body_html}]},
-                        timeout=5,
-                        headers={"Authorization":f"Bearer {api_k}","Content-Type":"application/json"})
-            except Exception: pass
-
-        for usr, em in emails.items():
-            if em: _send_one(str(em), str(usr))
-    except Exception: pass  # Never crash the app
-
-
+                        _disparar_evento(ev, emails)
+                        store["enviadas"].add(ev["clave"]); _marcar_notif_enviada(ev["clave"])
+                        store["disparados"].append((ev["clave"], datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")))
+                    except Exception as e: print(f"Recordatorio {ev['clave']}: {e}")
+            store["proximo"] = prox
+            if store["enviadas"] is None and eventos: espera = 300   # Sessions no respondió: reintentar
+            elif prox is None: espera = _RECORDATORIOS_RELEER
+            else: espera = min(max(prox - ahora, 1.0), _RECORDATORIOS_RELEER)
+            store["despertar"].wait(espera); store["despertar"].clear()
+
+    th = threading.Thread(target=_loop, name="recordatorios", daemon=True); th.start()
+    store["hilo"] = th
+    return store
+
+def recordatorios_stats():
+    """Eventos programados, próximo vencimiento y últimos disparos (para el Log del admin)."""
+    sch = _recordatorios_scheduler()
+    _prox = sch["proximo"]
+    return {"eventos": len(sch["eventos"]), "enviados": len(sch["enviadas"] or ()),
+            "proximo": datetime.fromtimestamp(_prox, TZ).strftime("%Y-%m-%d %H:%M") if _prox else "—",
+            "disparados": list(sch["disparados"][-10:]),
+            "activo": bool(sch["hilo"] and sch["hilo"].is_alive())}
 
 
 # ─────────────────────────────────────────────────────────
 # LOGROS / ACHIEVEMENTS
 # ─────────────────────────────────────────────────────────
+# Cada condición recibe el estado corrido `s` de un piloto (ver motor más abajo):
+# n, total, max, min, racha_max, run60, run50, ult8, ganados, all_round y
+# cnt[(ETAPA, umbral)] = GPs con ≥ umbral pts en esa etapa.
 _LOGROS_DEF = [
     # Umbrales calibrados: ~80-95pts por GP es un buen resultado
     # ── QUALY ────────────────────────────────────────────────────────────
     ("maestro_pole",  "⏱️", "Maestro de la Pole",
      "20+ pts en Qualy en un solo GP (top 5 perfecto + bonus + Colapinto)",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and any(d[d["etapa"].str.upper()=="QUALY"]["puntos"] >= 20))),
+     lambda s: s["cnt"]["QUALY", 20] >= 1),
     ("qualy_flawless","🎯", "Francotirador",
      "25+ pts en Qualy en 3 GPs distintos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="QUALY") & (d["puntos"] >= 25)]) >= 3)),
+     lambda s: s["cnt"]["QUALY", 25] >= 3),
     ("qualy_pro",     "📐", "Especialista de Clasificación",
      "15+ pts de Qualy en 6 GPs distintos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="QUALY") & (d["puntos"] >= 15)]) >= 6)),
+     lambda s: s["cnt"]["QUALY", 15] >= 6),
     # ── CARRERA ──────────────────────────────────────────────────────────
     ("visionario",    "🔮", "Visionario",
      "55+ pts en Carrera en un solo GP (predijo casi todo el top 10)",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and any(d[d["etapa"].str.upper()=="CARRERA"]["puntos"] >= 55))),
+     lambda s: s["cnt"]["CARRERA", 55] >= 1),
     ("race_pro",      "🏎️", "El Estratega",
      "40+ pts de Carrera en 5 GPs distintos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="CARRERA") & (d["puntos"] >= 40)]) >= 5)),
+     lambda s: s["cnt"]["CARRERA", 40] >= 5),
     ("podio_hunter",  "🎪", "Cazador de Podios",
      "30+ pts de Carrera en 10 GPs distintos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="CARRERA") & (d["puntos"] >= 30)]) >= 10)),
+     lambda s: s["cnt"]["CARRERA", 30] >= 10),
     # ── SPRINT ───────────────────────────────────────────────────────────
     ("rey_sprint",    "⚡", "Rey del Sprint",
      "18+ pts de Sprint en un GP (casi top 8 exacto)",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and any(d[d["etapa"].str.upper()=="SPRINT"]["puntos"] >= 18))),
+     lambda s: s["cnt"]["SPRINT", 18] >= 1),
     ("sprint_master", "⚡🏆","Maestro del Sprint",
      "14+ pts de Sprint en 4 GPs de Sprint distintos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="SPRINT") & (d["puntos"] >= 14)]) >= 4)),
+     lambda s: s["cnt"]["SPRINT", 14] >= 4),
     # ── CONSTRUCTORES ────────────────────────────────────────────────────
     ("guru_const",    "🛠️", "Gurú de Constructores",
      "15+ pts de Constructores en un GP (pleno + bonus)",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and any(d[d["etapa"].str.upper()=="CONSTRUCTORES"]["puntos"] >= 15))),
+     lambda s: s["cnt"]["CONSTRUCTORES", 15] >= 1),
     ("const_elite",   "🏗️", "Arquitecto de Equipos",
      "12+ pts de Constructores en 7 GPs distintos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="CONSTRUCTORES") & (d["puntos"] >= 12)]) >= 7)),
+     lambda s: s["cnt"]["CONSTRUCTORES", 12] >= 7),
     # ── RACHAS ───────────────────────────────────────────────────────────
     ("hat_trick",     "🎩", "Tres en Raya",
      "5+ GPs consecutivos con 60+ pts cada uno",
-     lambda h,d,n: bool(h is not None and len(h) >= 5 and
-                   any(all(h.sort_values("gp")["puntos"].iloc[i:i+5] >= 60)
-                       for i in range(max(1,len(h)-4))))),
+     lambda s: s["run60"] >= 5),
     ("racha5",        "🔥", "Fuego Sagrado",
      "Racha histórica de 8+ GPs consecutivos",
-     lambda h,d,n: bool(h is not None and not h.empty and _racha_calc(h) >= 8)),
+     lambda s: s["racha_max"] >= 8),
     ("racha10",       "🌋", "Volcán Inagotable",
      "Racha histórica de 15+ GPs consecutivos",
-     lambda h,d,n: bool(h is not None and not h.empty and _racha_calc(h) >= 15)),
+     lambda s: s["racha_max"] >= 15),
     ("en_llamas",     "🔥🔥","En Llamas",
      "Racha ACTIVA de 5+ GPs seguidos con 50+ pts c/u",
-     lambda h,d,n: bool(h is not None and len(h) >= 5 and
-                   _racha_actual(h) >= 5 and
-                   all(h.sort_values("gp")["puntos"].tail(5) >= 50))),
+     lambda s: s["run50"] >= 5),
     # ── PUNTOS TOTALES ────────────────────────────────────────────────────
     ("century",       "💯", "El Centenario",
      "Superó los 200 puntos acumulados en la temporada",
-     lambda h,d,n: bool(h is not None and not h.empty and h["puntos"].sum() >= 200)),
+     lambda s: s["total"] >= 200),
     ("double_c",      "🏅", "Doble Centuria",
      "Superó los 400 puntos acumulados",
-     lambda h,d,n: bool(h is not None and not h.empty and h["puntos"].sum() >= 400)),
+     lambda s: s["total"] >= 400),
     ("triple_c",      "💎", "Triple Centuria",
      "Superó los 600 puntos — dominio absoluto",
-     lambda h,d,n: bool(h is not None and not h.empty and h["puntos"].sum() >= 600)),
+     lambda s: s["total"] >= 600),
     ("top1",          "👑", "Líder Indiscutible",
      "300+ puntos acumulados — territorio del campeón",
-     lambda h,d,n: bool(h is not None and not h.empty and h["puntos"].sum() >= 300)),
+     lambda s: s["total"] >= 300),
     # ── GP INDIVIDUAL ────────────────────────────────────────────────────
     ("comeback",      "🚀", "GP Perfecto",
      "95+ pts en un solo GP (actuación casi sin fallas)",
-     lambda h,d,n: bool(h is not None and not h.empty and h["puntos"].max() >= 95)),
+     lambda s: s["max"] >= 95),
     ("cazador",       "🎲", "El Supremo",
      "115+ pts en un solo GP (prácticamente imposible)",
-     lambda h,d,n: bool(h is not None and not h.empty and h["puntos"].max() >= 115)),
+     lambda s: s["max"] >= 115),
     # ── CONSISTENCIA ─────────────────────────────────────────────────────
     ("sin_cero",      "✨", "Sin Piedad",
      "Nunca menos de 40 pts en ningún GP — 10+ GPs",
-     lambda h,d,n: bool(h is not None and not h.empty and len(h) >= 10 and all(h["puntos"] >= 40))),
+     lambda s: s["n"] >= 10 and s["min"] >= 40),
     ("mejora",        "📈", "En Ascenso",
      "Sus últimos 4 GPs superan en promedio a los 4 anteriores",
-     lambda h,d,n: bool(h is not None and len(h) >= 8
-                   and h.sort_values("gp")["puntos"].iloc[-4:].mean()
-                   > h.sort_values("gp")["puntos"].iloc[-8:-4].mean())),
+     lambda s: len(s["ult8"]) >= 8 and sum(list(s["ult8"])[4:]) > sum(list(s["ult8"])[:4])),
     ("constante",     "📊", "El Más Constante",
      "No faltó a ningún GP Y promedio 65+ pts por GP",
-     lambda h,d,n: bool(n > 0 and h is not None and not h.empty and
-                   len(h) >= n and h["puntos"].mean() >= 65)),
+     lambda s: s["n"] > 0 and s["total"] >= 65 * s["n"]),
     # ── PARTICIPACIÓN ────────────────────────────────────────────────────
     ("maratonista",   "🏃", "Maratonista",
      "Participó en 14+ GPs de la temporada",
-     lambda h,d,n: bool(h is not None and not h.empty and len(h) >= 14)),
+     lambda s: s["n"] >= 14),
     ("veterano",      "🎖️", "Veterano de Pista",
      "Completó los 22 GPs de la temporada completa",
-     lambda h,d,n: bool(h is not None and not h.empty and len(h) >= 22)),
+     lambda s: s["n"] >= 22),
     # ── DOMINIO TOTAL ────────────────────────────────────────────────────
     ("all_rounder",   "⭐", "Todo Terreno",
      "Sumó pts en Qualy+Carrera+Const en 4 GPs distintos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns and "gp" in d.columns
-                   and len([_gp for _gp in d["gp"].unique()
-                       if len(set(d[d["gp"]==_gp]["etapa"].str.upper().tolist()) & {"QUALY","CARRERA","CONSTRUCTORES"}) >= 3]) >= 4)),
+     lambda s: s["all_round"] >= 4),
     ("dominator",     "👑", "Dominador Total",
      "500+ pts acumulados Y 90+ pts en el mejor GP",
-     lambda h,d,n: bool(h is not None and not h.empty
-                   and h["puntos"].sum() >= 500 and h["puntos"].max() >= 90)),
+     lambda s: s["total"] >= 500 and s["max"] >= 90),
     # ── 4 LOGROS NUEVOS ──────────────────────────────────────────────────
     ("hat_trick_gps", "🎖️🎖️","Triple Corona",
      "Fue el máximo anotador en 3+ GPs de la temporada",
-     lambda h,d,n: False),  # Calculado en _calc_logros con gps_ganados >= 3
+     lambda s: s["ganados"] >= 3),
     ("perfecto_qualy","🔮⏱️","Qualy Infalible",
      "30+ pts en Qualy en un mismo GP (top 5 + bonus + Colapinto exacto)",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and any(d[d["etapa"].str.upper()=="QUALY"]["puntos"] >= 30))),
+     lambda s: s["cnt"]["QUALY", 30] >= 1),
     ("sprint_streak", "⚡⚡","Sprint Devastador",
      "Puntos de Sprint en 5 GPs de Sprint consecutivos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="SPRINT") & (d["puntos"] > 0)]) >= 5)),
+     lambda s: s["cnt"]["SPRINT", 1] >= 5),
     ("perfecto",      "💎🏁","Ronda Perfecta",
      "Pleno exacto en Qualy+Carrera en el mismo GP — asignado por el Comisario",
-     lambda h,d,n: False),
+     lambda s: False),
     # ── STICKERS ESPECIALES ───────────────────────────────────────────
     ("sniper",        "🎯🔫","Sniper",
      "Acertó exactamente 3+ posiciones en un mismo GP — precisión brutal",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and any(d[d["etapa"].str.upper()=="QUALY"]["puntos"] >= 21))),
+     lambda s: s["cnt"]["QUALY", 21] >= 1),
     ("vidente",       "🔮✨","El Vidente",
      "Predijo correctamente el ganador de Carrera en 3 GPs distintos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="CARRERA") & (d["puntos"] >= 25)]) >= 3)),
+     lambda s: s["cnt"]["CARRERA", 25] >= 3),
     ("sprint_king",   "⚡👑","Sprint King",
      "Mejor puntuación en Sprint en 4 GPs de Sprint distintos",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="SPRINT") & (d["puntos"] >= 12)]) >= 4)),
+     lambda s: s["cnt"]["SPRINT", 12] >= 4),
     ("constructor",   "🏗️🏆","Arquitecto Supremo",
      "Acertó el top 3 de Constructores completo en 3 GPs",
-     lambda h,d,n: bool(d is not None and not d.empty and "etapa" in d.columns
-                   and len(d[(d["etapa"].str.upper()=="CONSTRUCTORES") & (d["puntos"] >= 15)]) >= 3)),
+     lambda s: s["cnt"]["CONSTRUCTORES", 15] >= 3),
     ("colap_fan",     "🇦🇷⭐","Fan de Colapinto",
      "Predijo la posición exacta de Colapinto en 5+ predicciones",
-     lambda h,d,n: False),  # Requiere datos de aciertos Colapinto
+     lambda s: False),  # Requiere datos de aciertos Colapinto
     # ── DESAFÍOS ──────────────────────────────────────────────────────
     ("desafio_win5",  "⚔️", "Duelista",
      "Ganó 5 desafíos contra otros formuleros",
-     lambda h,d,n: False),  # Calculado con datos de Desafios
+     lambda s: False),  # Calculado con datos de Desafios
     ("desafio_win10", "⚔️👑","Gladiador Invicto",
      "Ganó 10 desafíos sin perder ninguno, o 10 victorias seguidas",
-     lambda h,d,n: False),  # Calculado con datos de Desafios
+     lambda s: False),  # Calculado con datos de Desafios
     ("desafio_play5", "🤝", "Retador Nato",
      "Participó en 5 desafíos (ganados o perdidos)",
-     lambda h,d,n: False),  # Calculado con datos de Desafios
+     lambda s: False),  # Calculado con datos de Desafios
     ("desafio_play10","🔥⚔️","Guerrero de Pista",
      "Participó en 10 desafíos — nunca le esquiva a un duelo",
-     lambda h,d,n: False),  # Calculado con datos de Desafios
+     lambda s: False),  # Calculado con datos de Desafios
     ("desafio_reject","🐔", "El Gallina",
      "Rechazó un desafío — la marca de los que no aceptan el duelo",
-     lambda h,d,n: False),  # Calculado con datos de Desafios (medalla negativa)
+     lambda s: False),  # Calculado con datos de Desafios (medalla negativa)
 ]
 
+# Umbrales por etapa que usan las condiciones de arriba (cnt[(ETAPA, umbral)])
+_LOGRO_UMBRALES = {"QUALY": (15, 20, 21, 25, 30), "CARRERA": (25, 30, 40, 55),
+                   "SPRINT": (1, 12, 14, 18), "CONSTRUCTORES": (12, 15)}
+_LOGROS_DESAFIO = {"desafio_win5", "desafio_win10", "desafio_play5", "desafio_play10", "desafio_reject"}
+
+
+# ─────────────────────────────────────────────────────────
+# LOGROS — motor incremental
+# ─────────────────────────────────────────────────────────
+# Cada GP del resumen de temporada se procesa UNA vez, en orden de calendario, para
+# todos los pilotos: se actualiza el estado corrido y se evalúan solo los logros aún
+# bloqueados. El primer desbloqueo queda en memoria y en la hoja Sessions
+# (LOGRO::usuario::id | gp | ts; LOGRO@<liga>:: fuera de la liga por defecto), así que
+# un perfil es una consulta, no un recálculo. Hay un motor por liga.
+# Si cambia un GP ya procesado (corrección de resultados) se re-juega desde cero.
+# Qué logros tiene cada uno lo decide siempre el recálculo: la fila anotada solo
+# aporta el GP del primer desbloqueo, así una corrección que quita un logro lo quita
+# también del perfil aunque la fila siga en Sessions.
+@st.cache_resource(show_spinner=False)
+def _logros_stores():
+    return {}
+
+def _logros_store(liga):
+    """Store del motor de logros de una liga."""
+    reg = _logros_stores()
+    if liga not in reg:
+        import threading
+        reg.setdefault(liga, {"lock": threading.RLock(), "rs": None, "seq": [], "estado": {}, "desbloqueos": {},
+                              "persistidos": None, "releer": False, "pendientes": [], "eventos": 0,
+                              "replays": 0})
+    return reg[liga]
+
+def _logro_estado():
+    from collections import deque
+    return {"n": 0, "total": 0, "max": 0, "min": None, "racha": 0, "racha_max": 0,
+            "run60": 0, "run50": 0, "ult8": deque(maxlen=8), "cnt": defaultdict(int),
+            "all_round": 0, "ganados": 0}
+
+def _logro_evento(s, pts, etapas, gano):
+    """Aplica UN GP (pts totales, [(etapa, pts)], ¿ganó?) al estado corrido de un piloto."""
+    s["n"] += 1; s["total"] += pts
+    s["max"] = pts if s["n"] == 1 else max(s["max"], pts)
+    s["min"] = pts if s["min"] is None else min(s["min"], pts)
+    s["racha"] = s["racha"] + 1 if pts > 0 else 0
+    s["racha_max"] = max(s["racha_max"], s["racha"])
+    s["run60"] = s["run60"] + 1 if pts >= 60 else 0
+    s["run50"] = s["run50"] + 1 if pts >= 50 else 0
+    s["ult8"].append(pts)
+    for et, p in etapas:
+        for u in _LOGRO_UMBRALES.get(et, ()):
+            if p >= u: s["cnt"][et, u] += 1
+    if len({et for et, _ in etapas} & {"QUALY", "CARRERA", "CONSTRUCTORES"}) >= 3: s["all_round"] += 1
+    if gano: s["ganados"] += 1
+
+def _logro_gp_label(gp_str):
+    return gp_titulo(gp_str)
+
+def _logros_pfx():
+    return "LOGRO::" if LIGA["id"] == LIGA_DEFAULT else f"LOGRO@{LIGA['id']}::"
+
+def _logros_anotados(fresco=False):
+    """{usuario: {logro_id: gp}} anotados en Sessions para la liga del rerun; None sin backend."""
+    _vals = hoja_valores("Sessions", max_age=0 if fresco else None)
+    if _vals is None: return None
+    _pfx = _logros_pfx(); per = {}
+    for r in _vals:
+        if r and r[0].startswith(_pfx):
+            _, u, lid = (r[0].split("::", 2) + ["", ""])[:3]
+            per.setdefault(u, {}).setdefault(lid, r[1].strip() if len(r) > 1 else "")
+    return per
+
+def _logros_persistir(store):
+    """Marca como anotados los pendientes que Sessions todavía no tiene y devuelve los que hay que
+    escribir (bajo store["lock"] y con persistidos ya cargado; escribe _logros_anotar, sin lock)."""
+    anotar = []
+    for u, lid, gp in store["pendientes"]:
+        if lid in store["persistidos"].get(u, {}): continue
+        store["persistidos"].setdefault(u, {})[lid] = gp
+        anotar.append((u, lid, gp))
+    store["pendientes"] = []
+    return anotar
+
+def _logros_anotar(store, anotar):
+    """Escribe en Sessions los desbloqueos de _logros_persistir. Si falla vuelven a pendientes y
+    Sessions se relee fresca antes de reintentar: tras un timeout el append pudo entrar igual."""
+    if not anotar: return
+    _pfx = _logros_pfx()
+    _ts = datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
+    filas = [[f"{_pfx}{u}::{lid}", gp, _ts] for u, lid, gp in anotar]
+    if _safe_call(hoja_append_rows, "Sessions", filas, timeout_sec=8, default=False,
+                  value_input_option="USER_ENTERED"):
+        return
+    with store["lock"]:
+        store.update(persistidos=None, releer=True)
+        store["pendientes"].extend(anotar)
+
+@perfilar("calc")
+def _logros_sync():
+    """Pone el motor al día con el resumen de temporada vigente."""
+    rs = resumen_temporada()
+    store = _logros_store(LIGA["id"])
+    with store["lock"]:
+        if store["rs"] is rs: return store
+        _rsp = _resumen_store(LIGA["id"])["por_gp"]
+        seq = [(g, (_rsp.get(g) or {}).get("firma")) for g in rs["gps"]]
+        if seq[:len(store["seq"])] != store["seq"]:
+            store.update(seq=[], estado={}, desbloqueos={}, replays=store["replays"] + 1)
+        pend = seq[len(store["seq"]):]
+        nuevos = []
+        if pend:
+            h_por = {g: f for g, f in rs["hist"].groupby("gp", sort=False)}
+            d = rs["det"]
+            d_por = ({k: list(zip(f["etapa"], f["puntos"])) for k, f in d.groupby(["gp", "piloto"], sort=False)}
+                     if not d.empty else {})
+            for g, _ in pend:
+                h_g = h_por.get(g)
+                if h_g is None: continue
+                for pil, pts in zip(h_g["piloto"], h_g["puntos"]):
+                    s = store["estado"].setdefault(pil, _logro_estado())
+                    _logro_evento(s, int(pts), d_por.get((g, pil), ()), rs["ganadores"].get(g) == pil)
+                    unl = store["desbloqueos"].setdefault(pil, {})
+                    for lg in _LOGROS_DEF:
+                        if lg[0] in unl or lg[0] in _LOGROS_DESAFIO: continue
+                        try: ok = bool(lg[4](s))
+                        except Exception: ok = False
+                        if ok:
+                            unl[lg[0]] = g; nuevos.append((pil, lg[0], g))
+                    store["eventos"] += 1
+        store.update(rs=rs, seq=seq)
+        store["pendientes"].extend(nuevos)
+        leer, fresco = store["persistidos"] is None, store["releer"]
+    if leer:                                    # lectura de Sessions fuera del lock
+        try: per = _logros_anotados(fresco)
+        except Exception: per = None
+        with store["lock"]:
+            if per is not None and store["persistidos"] is None:
+                store.update(persistidos=per, releer=False)
+    with store["lock"]:                         # sin backend: quedan pendientes
+        anotar = _logros_persistir(store) if store["persistidos"] is not None else []
+    _logros_anotar(store, anotar)
+    return store
+
+def logros_desbloqueados(usuario):
+    """{logro_id: gp} de los logros de GP desbloqueados por `usuario` (el GP anotado en
+    Sessions manda solo para los logros que el recálculo sigue dando)."""
+    store = _logros_sync()
+    u = str(usuario).strip()
+    with store["lock"]:
+        per = (store["persistidos"] or {}).get(u, {})
+        return {k: per.get(k) or g for k, g in store["desbloqueos"].get(u, {}).items()}
+
+def logros_stats():
+    """Contadores del motor de logros (para el Log del admin)."""
+    store = _logros_store(LIGA["id"])
+    with store["lock"]:
+        return {"gps": len(store["seq"]), "eventos": store["eventos"], "replays": store["replays"],
+                "desbloqueos": sum(len(v) for v in store["desbloqueos"].values()),
+                "pendientes": len(store["pendientes"])}
+
 
 def _racha_calc(df_user):
     """Calcula racha máxima de GPs consecutivos con puntos > 0."""
@@ -9190,50 +10987,10 @@ def _racha_actual(df_user):
 
 def _calc_desafio_stats(usuario):
     """Cuenta victorias, participaciones, rechazos, derrotas y mejor racha de victorias."""
-    _wins = 0; _played = 0; _rejected = 0; _losses = 0
-    _resueltos = []
-    try:
-        from core.database import conectar_google_sheets as _cgs_des
-        _ws_des = _cgs_des("Desafios")
-        if _ws_des:
-            # Usar get_all_values para evitar error de headers duplicados
-            _vals_des = _ws_des.get_all_values()
-            if _vals_des and len(_vals_des) > 1:
-                _hdr_des = [h.strip().lower() for h in _vals_des[0]]
-                def _fi(name):
-                    for _i,_h in enumerate(_hdr_des):
-                        if _h == name: return _i
-                    return None
-                _i_ret = _fi("retador"); _i_riv = _fi("rival")
-                _i_est = _fi("estado"); _i_gan = _fi("ganador")
-                _i_ts  = _fi("ts_resuelto") or _fi("ts_creado")
-                if _i_ret is None or _i_riv is None: raise ValueError("headers not found")
-                for _rp in _vals_des[1:]:
-                    if not any(c.strip() for c in _rp): continue
-                    def _sv(ix): return _rp[ix].strip() if ix is not None and ix < len(_rp) else ""
-                    _ret = _sv(_i_ret); _riv = _sv(_i_riv)
-                    _est = _sv(_i_est).upper(); _gan = _sv(_i_gan)
-                    _ts  = _sv(_i_ts)
-                    if _ret != str(usuario).strip() and _riv != str(usuario).strip(): continue
-                    if _est == "RESUELTO":
-                        _played += 1
-                        _es_gano = (_gan == str(usuario).strip())
-                        _es_empate = (_gan in ("EMPATE",""))
-                        if _es_gano: _wins += 1
-                        elif not _es_empate: _losses += 1
-                        if not _es_empate: _resueltos.append((_ts, _es_gano))
-                    if _est == "RECHAZADO" and _riv == str(usuario).strip():
-                        _rejected += 1
-    except Exception: pass
-    _best_streak = 0; _cur_streak = 0
-    try:
-        for _ts, _gano in sorted(_resueltos, key=lambda x: x[0]):
-            if _gano: _cur_streak += 1; _best_streak = max(_best_streak, _cur_streak)
-            else: _cur_streak = 0
-    except Exception: pass
-    return _wins, _played, _rejected, _losses, _best_streak
+    try: return desafio_stats(usuario)
+    except Exception: return 0, 0, 0, 0, 0
 
-def _calc_logros(usuario, df_hist_all, df_det_all, n_gps_total):
+def _calc_logros(usuario):
     """Devuelve lista de (logro_def, desbloqueado:bool, gp_ganado:str)."""
     # Stats de desafíos (independientes del historial de GPs)
     _des_wins, _des_played, _des_rejected, _des_losses, _des_streak = _calc_desafio_stats(usuario)
@@ -9246,82 +11003,25 @@ def _calc_logros(usuario, df_hist_all, df_det_all, n_gps_total):
         if key == "desafio_reject":return _des_rejected >= 1
         return None
 
-    if df_hist_all is None or df_hist_all.empty:
-        # Sin historial de GPs, pero igual evaluamos los logros de desafíos
-        _out = []
-        for _l in _LOGROS_DEF:
-            _du = _desafio_unlock(_l[0])
-            _out.append((_l, bool(_du) if _du is not None else False, ""))
-        return _out
-    h = df_hist_all[df_hist_all["piloto"]==usuario].copy() if "piloto" in df_hist_all.columns else pd.DataFrame()
-    d = df_det_all[df_det_all["piloto"]==usuario].copy() if (df_det_all is not None and not df_det_all.empty and "piloto" in df_det_all.columns) else None
-
-    # Sort by GP to find when logros were first unlocked
-    h_sorted = h.sort_values("gp") if not h.empty else h
-
-    # GPs ganados para Triple Corona
-    gps_ganados = 0
-    gps_ganados_list = []
-    try:
-        if ("piloto" in df_hist_all.columns and "gp" in df_hist_all.columns
-                and "puntos" in df_hist_all.columns):
-            _df_all_pts = df_hist_all.copy()
-            _df_all_pts["puntos"] = pd.to_numeric(_df_all_pts["puntos"],errors="coerce").fillna(0)
-            _agg_all = _df_all_pts.groupby(["gp","piloto"],as_index=False)["puntos"].sum()
-            for _gp_all, _grp_all in _agg_all.groupby("gp"):
-                if len(_grp_all) < 2: continue
-                _gs = _grp_all.sort_values("puntos",ascending=False)
-                if float(_gs.iloc[0]["puntos"]) <= 0: continue
-                if str(_gs.iloc[0]["piloto"]).strip() == str(usuario).strip():
-                    gps_ganados += 1
-                    gps_ganados_list.append(str(_gp_all))
-    except Exception: pass
-
-    def _gp_label(gp_str):
-        s = str(gp_str)
-        return s.split(". ",1)[-1] if ". " in s else s
+    # Logros de GP: consulta al motor incremental
+    try: _unl = logros_desbloqueados(usuario)
+    except Exception: _unl = {}
 
     result = []
     for logro in _LOGROS_DEF:
-        desbloqueado = False; gp_ganado = ""
-        try:
-            if logro[0] == "hat_trick_gps":
-                desbloqueado = gps_ganados >= 3
-                if desbloqueado and len(gps_ganados_list) >= 3:
-                    gp_ganado = _gp_label(gps_ganados_list[2])
-            elif logro[0] == "desafio_win5":
-                desbloqueado = _des_wins >= 5
-            elif logro[0] == "desafio_win10":
-                desbloqueado = (_des_wins >= 10 and _des_losses == 0) or _des_streak >= 10
-            elif logro[0] == "desafio_play5":
-                desbloqueado = _des_played >= 5
-            elif logro[0] == "desafio_play10":
-                desbloqueado = _des_played >= 10
-            elif logro[0] == "desafio_reject":
-                desbloqueado = _des_rejected >= 1
-            else:
-                # Check each GP cumulatively to find first unlock
-                for _i_gp in range(1, len(h_sorted)+1):
-                    _h_partial = h_sorted.iloc[:_i_gp]
-                    _d_partial = None
-                    if d is not None and not d.empty and "gp" in d.columns:
-                        _gps_so_far = set(_h_partial["gp"].astype(str).values)
-                        _d_partial = d[d["gp"].astype(str).isin(_gps_so_far)]
-                    try:
-                        _unlocked = logro[4](_h_partial, _d_partial, _i_gp)
-                    except Exception: _unlocked = False
-                    if _unlocked:
-                        desbloqueado = True
-                        gp_ganado = _gp_label(_h_partial.iloc[-1]["gp"])
-                        break
-        except Exception: desbloqueado = False
-        result.append((logro, desbloqueado, gp_ganado))
+        _du = _desafio_unlock(logro[0])
+        if _du is not None:
+            result.append((logro, bool(_du), ""))
+        else:
+            _gp = _unl.get(logro[0])
+            result.append((logro, _gp is not None, _logro_gp_label(_gp) if _gp else ""))
     return result
 
 
 # ─────────────────────────────────────────────────────────
 # ENCUESTA PRE-CARRERA
 # ─────────────────────────────────────────────────────────
+@perfilar("pantalla")
 def pantalla_encuesta():
     usuario = (st.session_state.get("perfil") or {}).get("usuario","")
     m = _mod_db()
@@ -9446,11 +11146,9 @@ def pantalla_encuesta():
 # ─────────────────────────────────────────────────────────
 # SIMULADOR DE GP
 # ─────────────────────────────────────────────────────────
+@perfilar("pantalla")
 def pantalla_simulador():
-    PTS_CARRERA = {1:25,2:18,3:15,4:12,5:10,6:8,7:6,8:4,9:2,10:1}
-    PTS_QUALY   = {1:15,2:10,3:7,4:5,5:3}
-    PTS_SPRINT  = {1:8,2:7,3:6,4:5,5:4,6:3,7:2,8:1}
-    PTS_CONST   = {1:10,2:5,3:2}
+    PTS_CARRERA = ESCALAS["CARRERA"]
 
     st.markdown("""<style>
     @keyframes simG{0%,100%{box-shadow:0 0 24px rgba(59,130,246,.15);}50%{box-shadow:0 0 44px rgba(59,130,246,.3);}}
@@ -9494,39 +11192,14 @@ def pantalla_simulador():
         st.warning("⚠️ Las predicciones están **ABIERTAS** — el simulador es modo *previsualización* y no muestra las predicciones de los demás para no spoilear.")
         # Still allow simulation in preview mode (only shows own predictions)
 
-    # ── Leer predicciones reales del GP usando recuperar_predicciones_piloto ──
+    # ── Leer predicciones reales del GP (una sola lectura de sheet1) ──
     preds_all = {}
     try:
-        if "_error" not in m and "recuperar_predicciones_piloto" in m:
-            for _pil in PILOTOS_TORNEO:
-                try:
-                    _res = _safe_call(m["recuperar_predicciones_piloto"], _pil, gp_sim,
-                                      timeout_sec=20, default=(None,None,(None,None)))
-                    _dq, _ds, (_dr, _dc) = _res
-                    _pred_flat = {}
-                    # Qualy
-                    if isinstance(_dq, dict):
-                        for _ki,_vi in _dq.items():
-                            try: _pred_flat[f"q{int(_ki)}"] = _vi
-                            except Exception: _pred_flat[str(_ki)] = _vi
-                    # Carrera
-                    if isinstance(_dr, dict):
-                        for _ki,_vi in _dr.items():
-                            try: _pred_flat[f"p{int(_ki)}"] = _vi
-                            except Exception: _pred_flat[str(_ki)] = _vi
-                    # Constructores
-                    if isinstance(_dc, dict):
-                        for _ki,_vi in _dc.items():
-                            try: _pred_flat[f"c{int(_ki)}"] = _vi
-                            except Exception: _pred_flat[str(_ki)] = _vi
-                    # Sprint
-                    if isinstance(_ds, dict):
-                        for _ki,_vi in _ds.items():
-                            try: _pred_flat[f"spr{int(_ki)}"] = _vi
-                            except Exception: _pred_flat[str(_ki)] = _vi
-                    if _pred_flat:
-                        preds_all[_pil] = _pred_flat
-                except Exception: pass
+        if "_error" not in m:
+            for _pil, _res in recuperar_predicciones_gp(gp_sim, PILOTOS_TORNEO).items():
+                _dq, _ds, (_dr, _dc) = _res
+                if any([_dq, _ds, _dr, _dc]):
+                    preds_all[_pil] = _res
     except Exception: pass
 
     if not preds_all:
@@ -9535,10 +11208,10 @@ def pantalla_simulador():
 
     # ── Tabla actual ──────────────────────────────────────
     @st.cache_data(ttl=60, show_spinner=False)
-    def _sim_tabla():
+    def _sim_tabla(ver):
         if "_error" in m: return None
         return _safe_call(m["leer_tabla_posiciones"], PILOTOS_TORNEO, timeout_sec=8, default=None)
-    df_actual = _sim_tabla()
+    df_actual = _sim_tabla(cache_version("standings"))
     if df_actual is None or (hasattr(df_actual,"empty") and df_actual.empty):
         df_actual = pd.DataFrame({"Piloto":PILOTOS_TORNEO,"Puntos":[0]*len(PILOTOS_TORNEO)})
     df_actual = df_actual.copy()
@@ -9700,63 +11373,22 @@ def pantalla_simulador():
                                 key=f"sim_col_r_{gp_sim}", label_visibility="collapsed")
     _col_r_real = str(_col_sim_pos).replace("P","").strip() if _col_sim_pos != "(Sin resultado)" else ""
 
-    # Sin Qualy/Sprint/Constructores en el simulador (solo carrera)
-    sel_q = {}; sel_c = {}; sel_s = {}
-
     st.markdown("---")
     if not any(sel_r.get(i) for i in PTS_CARRERA):
         st.info("👆 Ingresá al menos los 10 primeros de Carrera para calcular la proyección.")
         return
 
-    def _pts_for(pred, rcar, rqua, rspr, rcon, col_r_real=""):
-        """Calcula pts de una predicción vs resultado simulado. Usa normalización de nombres."""
-        try:
-            from core.utils import normalizar_nombre as _nn
-        except Exception:
-            _nn = lambda x: str(x or "").strip().lower()
-
-        def _match(a, b):
-            return bool(a and b and _nn(str(a)) == _nn(str(b)))
-
-        pts = 0
-        # QUALY (vacío en simulador)
-        aq = 0
-        for p in PTS_QUALY:
-            pq = (pred.get(f"q{p}") or "")
-            if _match(pq, rqua.get(p,"")): pts += PTS_QUALY[p]; aq += 1
-        if aq == len(PTS_QUALY) and aq > 0: pts += 5
-        # CARRERA
-        ar = 0
-        for p in PTS_CARRERA:
-            pr = (pred.get(f"p{p}") or "")
-            if _match(pr, rcar.get(p,"")): pts += PTS_CARRERA[p]; ar += 1
-        if ar == len(PTS_CARRERA): pts += 5
-        # Colapinto Carrera (+20pts si acertó la posición exacta)
-        if col_r_real:
-            try:
-                _col_pred = str(pred.get("colapinto_r","")).strip()
-                if _col_pred and _col_pred == str(col_r_real).strip():
-                    pts += 20
-            except Exception: pass
-        # SPRINT (vacío en simulador)
-        if rspr:
-            asc = 0
-            for p in PTS_SPRINT:
-                ps = (pred.get(f"spr{p}") or "")
-                if _match(ps, rspr.get(p,"")): pts += PTS_SPRINT[p]; asc += 1
-            if asc == len(PTS_SPRINT): pts += 3
-        # CONSTRUCTORES (vacío en simulador)
-        ac = 0
-        for p in PTS_CONST:
-            pc = (pred.get(f"c{p}") or "")
-            if _match(pc, rcon.get(p,"")): pts += PTS_CONST[p]; ac += 1
-        if ac == len(PTS_CONST) and ac > 0: pts += 3
-        return pts
+    # Sin Qualy/Sprint/Constructores en el simulador (solo carrera): el oficial simulado
+    # lleva r1..r10 + Colapinto y el motor de puntaje proyecta a todos en una pasada.
+    _of_sim = {f"r{i}": v for i, v in sel_r.items()}
+    _of_sim["col_r"] = _col_r_real
+    _res_sim, _ = puntuar_gp({f: preds_all.get(f, _PRED_VACIA) for f in PILOTOS_TORNEO},
+                             _of_sim, es_sprint=False)
 
     rows = []; medals_t = {1:"🥇",2:"🥈",3:"🥉"}
     for f in PILOTOS_TORNEO:
         base = int(df_actual[df_actual["Piloto"]==f]["Puntos"].values[0]) if f in df_actual["Piloto"].values else 0
-        sim  = _pts_for(preds_all.get(f,{}), sel_r, sel_q, sel_s, sel_c, col_r_real=_col_r_real)
+        sim  = int(_res_sim.at[f, "Total"])
         rows.append({"Piloto":f,"Actual":base,"Sim":sim,"Total":base+sim,
                      "_clr":PILOTO_COLORS.get(f,"#a855f7"),"_ok":f in preds_all})
     df_p = pd.DataFrame(rows).sort_values("Total",ascending=False).reset_index(drop=True)
@@ -9781,9 +11413,9 @@ def pantalla_simulador():
         # Show live alerts if there are predictions loaded
         if preds_all:
             _alert_html = ""
-            for _pil_v, _pred_v in preds_all.items():
+            for _pil_v in preds_all:
                 _clr_v = PILOTO_COLORS.get(_pil_v,"#a855f7")
-                _pts_v = _pts_for(_pred_v, sel_r if 'sel_r' in dir() else {}, sel_q if 'sel_q' in dir() else {}, sel_s if 'sel_s' in dir() else {}, sel_c if 'sel_c' in dir() else {})
+                _pts_v = int(_res_sim.at[_pil_v, "Total"])
                 if _pts_v > 0:
                     _alert_html += (f'<div style="display:flex;align-items:center;gap:8px;'
                                     f'background:{_clr_v}11;border:1px solid {_clr_v}33;'
@@ -9841,6 +11473,7 @@ def pantalla_simulador():
                 '⚠️ Plenos exactos y Regla Colapinto calculados manualmente.</div>', unsafe_allow_html=True)
 
 
+@perfilar("pantalla")
 def pantalla_api_test():
     st.title("🧪 Test API F1")
     year=st.number_input("Año",2000,2100,2026,step=1)
@@ -9854,6 +11487,7 @@ def pantalla_api_test():
 # ─────────────────────────────────────────────────────────
 # 11. MAIN
 # ─────────────────────────────────────────────────────────
+@perfilar("pantalla")
 def _pantalla_espectador():
     """Vista pública de solo lectura — acceso via ?modo=espectador"""
     st.markdown("""
@@ -9900,10 +11534,8 @@ def _pantalla_espectador():
 
     with _tab_b:
         if "_error" not in _mdb_e:
-            _df_h_e = _safe_call(_mdb_e["leer_historial_df"], timeout_sec=12, default=pd.DataFrame())
-            if _df_h_e is not None and not (hasattr(_df_h_e,"empty") and _df_h_e.empty):
-                _dfhe2 = _df_h_e.copy(); _dfhe2.columns=[c.lower().strip() for c in _dfhe2.columns]
-                _dfhe2["puntos"]=pd.to_numeric(_dfhe2["puntos"],errors="coerce").fillna(0).astype(int)
+            _dfhe2 = resumen_temporada()["hist"]
+            if not _dfhe2.empty:
                 for _gp_e in GPS_OFICIALES:
                     if _gp_e not in _dfhe2.get("gp",pd.Series()).values: continue
                     _grp_e = _dfhe2[_dfhe2["gp"]==_gp_e].sort_values("puntos",ascending=False)
@@ -9924,7 +11556,11 @@ def _pantalla_espectador():
 
 
 def main():
-    _check_apertura_notificacion()  # envía notif si acaba de abrir el período
+    perf_inicio()               # ?perf=1 (admins): perfil de este rerun
+    _recordatorios_scheduler()  # arranca (una vez por proceso) el hilo de avisos
+    _outbox_worker()            # y el que despacha la cola (incluso lo que quedó de antes de un reinicio)
+    img_precargar()             # baja fotos/logos al proxy local en segundo plano
+    inyectar_css_plantillas()   # clases compartidas de tablas/podio/grilla/chat
 
     # ── URL Navigation via query_params ──────────────────────────────
     # Supports: /?s=perfil, /?s=predicciones, /?s=formuleros, /?s=tabla, etc.
@@ -9952,6 +11588,8 @@ def main():
     except Exception: pass
 
     sidebar_login_block()
+    _liga_atar()                # con el perfil ya restaurado: la liga del formulero, no la default
+    liga_selector()             # solo aparece si el formulero juega en más de una liga
 
     st.sidebar.markdown("""
     <style>
@@ -10033,14 +11671,11 @@ def main():
     _usr_nav = (st.session_state.get("perfil") or {}).get("usuario","")
     _unread_badge = ""
     try:
-        _m_chat_nav = _mod_mesa()
-        if "_error" not in _m_chat_nav:
-            _last_seen = st.session_state.get("formuleros_last_seen_id", 0)
-            _all_msgs = _m_chat_nav["mc_list_messages"](limit=5) or []
-            if _all_msgs and _all_msgs[0][0] > _last_seen:
-                _unread_count = sum(1 for r in _all_msgs if r[0] > _last_seen and r[1] != _usr_nav)
-                if _unread_count > 0:
-                    _unread_badge = " ✉️"
+        _last_seen = st.session_state.get("formuleros_last_seen_id", 0)
+        if mc_max_id() > _last_seen:
+            _unread_count = sum(1 for r in mc_feed(since_id=_last_seen, limit=5) if r[1] != _usr_nav)
+            if _unread_count > 0:
+                _unread_badge = " ✉️"
     except Exception: pass
 
     # ── Nav opciones (categorizadas via CSS ::before) ─────────
@@ -10058,8 +11693,6 @@ def main():
     if (st.session_state.get("perfil") or {}).get("usuario","") == "Checo Perez":
         opciones.append("🔐  Panel Admin")
 
-    _check_and_send_reminders()  # Recordatorio automático silencioso
-
     # ── Sidebar nav sync with fw_force_nav ──
     if "fw_sidebar_idx" not in st.session_state:
         st.session_state["fw_sidebar_idx"] = 0
@@ -10154,10 +11787,8 @@ def main():
     elif "Formuleros"   in opcion:
         # Mark as seen
         try:
-            _m_seen = _mod_mesa()
-            if "_error" not in _m_seen:
-                _msgs_seen = _m_seen["mc_list_messages"](limit=1) or []
-                if _msgs_seen: st.session_state["formuleros_last_seen_id"] = _msgs_seen[0][0]
+            _max_seen = mc_max_id()
+            if _max_seen: st.session_state["formuleros_last_seen_id"] = _max_seen
         except Exception: pass
         pantalla_formuleros()
     elif "Paddock"      in opcion: pantalla_mesa_chica()
@@ -10165,6 +11796,8 @@ def main():
     elif "Perfil"       in opcion: pantalla_perfil()
     elif "Test"         in opcion: pantalla_api_test()
 
+    perf_hud(perf_fin(opcion.split("  ", 1)[-1].strip()))
+
     # ── Elementos flotantes globales ──────────────────────
     mini_bar()      # Botón ☰ para ocultar/mostrar el menú lateral
     flecha_arriba() # Flecha dorada ↑ para volver al inicio
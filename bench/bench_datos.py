@@ -0,0 +1,222 @@
+"""Benchmark offline de los caminos de datos y puntaje de app.py.
+
+Corre contra fixtures (copias de sheet1, Oficial, Desafios, historial y
+detalle; ver bench/fixtures.py) sin tocar Sheets ni Supabase: la copia local
+de las hojas se precarga con la fixture, _mod_db() devuelve lectores sobre la
+misma fixture y las escrituras son no-ops. Mide:
+
+  sheet1_parse            _parse_sheet1 sobre toda la hoja
+  predicciones_gp         recuperar_predicciones_gp + etapas de cada formulero, todos los GPs
+  puntuar_gp              puntuar_gp de todos los GPs (motor de puntaje)
+  replay_temporada        replay completo (lecturas + puntaje + diff)
+  constructores_auto      calcular_constructores_auto de todos los GPs
+  colapinto               colapinto_filas (carga en bloque de la pestaña Colapinto)
+  resumen_frio / _tibio   resumen_temporada (agregado de Historial) reconstruido / revalidado
+  desafios_indice         _des_parse + _des_indexar
+  logros_frio / _tibio    _calc_logros de todos los formuleros, motor vacío / al día
+  tabla_general           render_dark_table con la tabla de posiciones
+
+Requiere el entorno de la app (streamlit, pandas, pytz). Uso:
+
+  python bench/bench_datos.py                       # fixture sintética 6×24
+  python bench/bench_datos.py --escala 50x24        # escala sintética
+  python bench/bench_datos.py --fixture bench/fixtures/grabado.json
+  python bench/bench_datos.py --grabar bench/fixtures/grabado.json   # con backend
+  python bench/bench_datos.py --base bench/resultados/<base>.json    # comparar
+
+Cada corrida escribe bench/resultados/<origen>-<PxG>-<fecha>.json (o --salida);
+con --base se imprime la razón contra la base y sale con código 1 si algún caso
+quedó más lento que --umbral.
+"""
+import os, sys, json, time, argparse, platform, logging, statistics
+from datetime import datetime
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(AQUI)
+APP = os.path.join(RAIZ, "app.py")
+sys.path.insert(0, AQUI)
+import fixtures  # noqa: E402
+
+
+def cargar_app():
+    """Namespace de app.py ejecutado sin la llamada final a main() (Streamlit en modo bare)."""
+    logging.disable(logging.WARNING)   # avisos de "missing ScriptRunContext"
+    os.chdir(RAIZ)
+    with open(APP, encoding="utf-8") as f: src = f.read()
+    src = src[:src.rindex("\nmain()")]
+    ns = {"__name__": "fw_app", "__file__": APP}
+    exec(compile(src, APP, "exec"), ns)
+    return ns
+
+
+def instalar(ns, fx):
+    """Conecta la app a la fixture: snapshot de hojas, _mod_db, formuleros y escrituras."""
+    import pandas as pd
+    store = ns["_snapshot_store"]()
+    with store["lock"]:
+        store["tabs"].clear()
+        for h in fixtures.HOJAS + ("Sessions",):
+            store["tabs"][h] = {"values": fx.get(h) or [["token", "usuario", "ts"]],
+                                "hash": h, "ts": time.monotonic(), "version": 1}
+    ns["_SNAP_TTL"] = {}; ns["_SNAP_TTL_DEFAULT"] = float("inf")
+    for f in ("hoja_append", "hoja_append_rows", "hoja_update_cell", "hoja_update"):
+        ns[f] = lambda *a, **k: None
+    ns["PILOTOS_TORNEO"] = list(fx["meta"]["participantes"])
+
+    hist = pd.DataFrame(fx["historial"], columns=["gp", "piloto", "puntos"])
+    det = pd.DataFrame(fx["detalle"], columns=["gp", "piloto", "etapa", "puntos"])
+    _d = det[det["etapa"] != "DNS"].pivot_table(index="piloto", columns="etapa", values="puntos",
+                                               aggfunc="sum", fill_value=0)
+    tabla = pd.DataFrame({"Piloto": _d.index, "Puntos": hist.groupby("piloto")["puntos"].sum().reindex(_d.index).values,
+                          "Qualys": _d.get("QUALY", 0), "Sprints": _d.get("SPRINT", 0),
+                          "Carreras": _d.get("CARRERA", 0)}).reset_index(drop=True)
+    hdr = fx["Oficial"][0] if fx.get("Oficial") else []
+    oficial = ns["_oficial_desde_registros"]([dict(zip(hdr, r)) for r in fx.get("Oficial", [])[1:]])
+    preds = ns["_parse_sheet1"](fx.get("sheet1"))
+    k = ns["_gp_bare_key"]; vacia = ns["_PRED_VACIA"]
+    m = {"leer_historial_df": lambda: hist.copy(),
+         "leer_historial_detalle_df": lambda: det.copy(),
+         "leer_tabla_posiciones": lambda pilotos=None, *a, **kw: tabla.copy(),
+         "leer_resultados_oficiales": lambda gp, *a, **kw: dict(oficial.get(k(gp), {})),
+         "recuperar_predicciones_piloto": lambda p, gp, *a, **kw: preds.get(k(gp), {}).get(p.strip().lower(), vacia)}
+    ns["_mod_db"] = lambda: m
+    return {"oficial": oficial, "tabla": tabla}
+
+
+def _reset_resumen(ns):
+    ns["_resumen_store"](ns["LIGA"]["id"]).update(ver=None, ts=0.0, resumen=None, por_gp={})
+
+
+def _reset_logros(ns):
+    ns["_logros_store"](ns["LIGA"]["id"]).update(rs=None, seq=[], estado={}, desbloqueos={}, persistidos=None, pendientes=[])
+    ns["_desafios_store"]().update(ver=None, idx=None)
+
+
+def casos(ns, fx, ctx):
+    """[(nombre, preparar, medir)]; `preparar` corre antes de cada repetición y no se mide."""
+    gps = list(fx["meta"]["gps"]); pils = ns["PILOTOS_TORNEO"]
+    sprint = set(ns["GPS_SPRINT"]); k = ns["_gp_bare_key"]
+    nada = lambda: None
+
+    def predicciones_gp():
+        for g in gps:
+            pr = ns["recuperar_predicciones_gp"](g)
+            for p in pils: ns["_etapas_pred"](pr[p])
+
+    def puntuar():
+        for g in gps:
+            ns["puntuar_gp"](ns["recuperar_predicciones_gp"](g), ctx["oficial"].get(k(g), {}), es_sprint=g in sprint)
+
+    def constructores():
+        for g in gps:
+            of = ctx["oficial"].get(k(g), {})
+            ns["calcular_constructores_auto"]({i: of.get(f"r{i}", "") for i in range(1, 11)},
+                                              ns["GRILLA_2026"], ns["ESCALA_CARRERA_JUEGO"])
+
+    def logros():
+        for p in pils: ns["_calc_logros"](p)
+
+    return [
+        ("sheet1_parse", nada, lambda: ns["_parse_sheet1"](fx["sheet1"])),
+        ("predicciones_gp", nada, predicciones_gp),
+        ("puntuar_gp", nada, puntuar),
+        ("replay_temporada", nada, lambda: ns["replay_temporada"](gps)),
+        ("constructores_auto", nada, constructores),
+        ("colapinto", nada, lambda: ns["colapinto_filas"](tuple(gps))),
+        ("resumen_frio", lambda: _reset_resumen(ns), ns["resumen_temporada"]),
+        ("resumen_tibio", lambda: ns["invalidar"]("historial"), ns["resumen_temporada"]),
+        ("desafios_indice", nada, lambda: ns["_des_indexar"](ns["_des_parse"](fx["Desafios"]))),
+        ("logros_frio", lambda: _reset_logros(ns), logros),
+        ("logros_tibio", nada, logros),
+        ("tabla_general", nada, lambda: ns["render_dark_table"](ctx["tabla"])),
+    ]
+
+
+def medir(prep, fn, reps):
+    fn()  # calentar cachés de st y de la app
+    ms = []
+    for _ in range(reps):
+        prep()
+        t = time.perf_counter(); fn()
+        ms.append((time.perf_counter() - t) * 1000)
+    return {"ms_min": round(min(ms), 3), "ms_med": round(statistics.median(ms), 3),
+            "ms_max": round(max(ms), 3), "reps": reps}
+
+
+def comparar(res, base, umbral):
+    """Imprime la razón mediana/mediana_base por caso; devuelve los casos que empeoraron."""
+    peores = []
+    print(f"\n{'caso':<20}{'base ms':>10}{'ahora ms':>10}{'razón':>8}")
+    for nombre, r in res["casos"].items():
+        b = base.get("casos", {}).get(nombre)
+        if not b:
+            print(f"{nombre:<20}{'—':>10}{r['ms_med']:>10.2f}{'nuevo':>8}"); continue
+        raz = r["ms_med"] / b["ms_med"] if b["ms_med"] else float("inf")
+        marca = "  ← más lento" if raz > 1 + umbral else ""
+        if marca: peores.append(nombre)
+        print(f"{nombre:<20}{b['ms_med']:>10.2f}{r['ms_med']:>10.2f}{raz:>8.2f}{marca}")
+    bm, rm = base.get("meta", {}).get("fixture", {}), res["meta"]["fixture"]
+    if (bm.get("participantes"), bm.get("gps")) != (rm["participantes"], rm["gps"]):
+        print(f"(ojo: la base es {bm.get('participantes')}×{bm.get('gps')}, esta corrida {rm['participantes']}×{rm['gps']})")
+    return peores
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark offline de datos y puntaje")
+    ap.add_argument("--fixture", help="JSON grabado/sintético (default: sintético generado al vuelo)")
+    ap.add_argument("--escala", default="6x24", help="PARTICIPANTESxGPS para la fixture sintética (ej. 50x24)")
+    ap.add_argument("--semilla", type=int, default=2026)
+    ap.add_argument("--reps", type=int, default=5)
+    ap.add_argument("--solo", help="casos a correr, separados por coma")
+    ap.add_argument("--salida", help="JSON de resultados (default: bench/resultados/…)")
+    ap.add_argument("--base", help="JSON de una corrida anterior para comparar")
+    ap.add_argument("--umbral", type=float, default=0.15, help="tolerancia de regresión (0.15 = +15%%)")
+    ap.add_argument("--grabar", metavar="RUTA", help="grabar los datos vivos como fixture y salir")
+    ap.add_argument("--guardar-fixture", metavar="RUTA", help="además, guardar la fixture sintética usada")
+    a = ap.parse_args(argv)
+
+    ns = cargar_app()
+    if a.grabar:
+        fx = fixtures.grabar(ns, a.grabar)
+        print(f"fixture grabada en {a.grabar}: {len(fx['meta']['participantes'])} formuleros, {len(fx['meta']['gps'])} GPs")
+        return 0
+    if a.fixture:
+        fx = fixtures.cargar(a.fixture)
+    else:
+        n_p, n_g = (int(x) for x in a.escala.lower().split("x"))
+        fx = fixtures.sintetico(ns, n_p, n_g, a.semilla)
+        if a.guardar_fixture: fixtures.guardar(fx, a.guardar_fixture)
+    ctx = instalar(ns, fx)
+
+    meta = fx["meta"]
+    fxm = {"origen": meta.get("origen", "?"), "participantes": len(meta["participantes"]),
+           "gps": len(meta["gps"]), "filas_sheet1": len(fx.get("sheet1", [])),
+           "filas_detalle": len(fx.get("detalle", []))}
+    if "semilla" in meta: fxm["semilla"] = meta["semilla"]
+    print(f"fixture {fxm['origen']} {fxm['participantes']}×{fxm['gps']} "
+          f"({fxm['filas_sheet1']} filas sheet1, {fxm['filas_detalle']} de detalle), {a.reps} reps")
+
+    solo = set(a.solo.split(",")) if a.solo else None
+    res = {"meta": {"fecha": datetime.now().isoformat(timespec="seconds"), "host": platform.node(),
+                    "python": platform.python_version(), "app_mtime": int(os.path.getmtime(APP)),
+                    "fixture": fxm, "reps": a.reps},
+           "casos": {}}
+    for nombre, prep, fn in casos(ns, fx, ctx):
+        if solo and nombre not in solo: continue
+        r = res["casos"][nombre] = medir(prep, fn, a.reps)
+        print(f"  {nombre:<20}{r['ms_med']:>10.2f} ms  (min {r['ms_min']:.2f}, max {r['ms_max']:.2f})")
+
+    salida = a.salida or os.path.join(
+        AQUI, "resultados", f"{fxm['origen']}-{fxm['participantes']}x{fxm['gps']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f: json.dump(res, f, ensure_ascii=False, indent=1)
+    print(f"resultados → {os.path.relpath(salida)}")
+
+    if a.base:
+        with open(a.base, encoding="utf-8") as f: base = json.load(f)
+        if comparar(res, base, a.umbral): return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
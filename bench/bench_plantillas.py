@@ -0,0 +1,157 @@
+"""Micro-benchmark: plantillas compiladas (sección 7a de app.py) vs. el armado
+anterior con += de f-strings y estilo inline por fila.
+
+Carga de app.py solo las constantes (sección 4) y las plantillas (sección 7a),
+sin levantar Streamlit. Uso:  python bench/bench_plantillas.py [repeticiones]
+"""
+import os, sys, html, timeit
+import pandas as pd
+import pytz
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app.py")
+
+
+class _StNulo:
+    """Lo mínimo de `st` que usan las secciones cargadas (decoradores de caché)."""
+    def cache_data(self, f=None, **_):
+        return f if f else (lambda g: g)
+    cache_resource = cache_data
+
+
+def _seccion(src, desde, hasta):
+    cuerpo = src[src.index(desde):src.index(hasta)]
+    return cuerpo.split("\n", 2)[2].rsplit("# ───", 1)[0]
+
+
+def cargar():
+    with open(APP, encoding="utf-8") as f: src = f.read()
+    ns = {"pytz": pytz, "_html": html, "st": _StNulo(),
+          "_mc_badge": lambda u: ("formulero", "FORMULERO", "")}
+    exec(_seccion(src, "# 4. CONSTANTES", "# 4a. IMÁGENES"), ns)
+    exec(_seccion(src, "# 7a. PLANTILLAS HTML", "# 7b. NUEVOS HELPERS"), ns)
+    return ns
+
+
+# ── Armado anterior (copiado de render_dark_table / _pantalla_pilotos_grid) ──
+def tabla_legacy(ns, df2, prev_ranking=None):
+    PILOTO_COLORS = ns["PILOTO_COLORS"]
+    max_q   = int(df2["Qualys"].max())  if "Qualys"   in df2.columns else 0
+    max_s   = int(df2["Sprints"].max()) if "Sprints"  in df2.columns else 0
+    max_r   = int(df2["Carreras"].max())if "Carreras" in df2.columns else 0
+    rows_html = ""
+    for i, row in df2.iterrows():
+        pil  = str(row.get("Piloto",""))
+        pts  = int(row.get("Puntos",0))
+        q    = int(row.get("Qualys",0))  if "Qualys"   in df2.columns else 0
+        sp   = int(row.get("Sprints",0)) if "Sprints"  in df2.columns else 0
+        ca   = int(row.get("Carreras",0))if "Carreras" in df2.columns else 0
+        clr  = PILOTO_COLORS.get(pil,"#a855f7")
+        medals = {0:"🥇",1:"🥈",2:"🥉"}
+        pos_ico = medals.get(i, f"<b style='color:rgba(169,178,214,.5);'>{i+1}</b>")
+        if prev_ranking and pil in prev_ranking:
+            prev = prev_ranking[pil]
+            if i < prev:   arrow = f'<span style="color:#4ade80;font-size:11px;">▲</span>'
+            elif i > prev: arrow = f'<span style="color:#ef4444;font-size:11px;">▼</span>'
+            else:           arrow = f'<span style="color:rgba(169,178,214,.3);font-size:11px;">—</span>'
+        else: arrow = ""
+        is_leader = (i == 0)
+        row_bg = f"background:linear-gradient(90deg,{clr}18,{clr}08,transparent)" if is_leader else ("rgba(255,255,255,.025)" if i%2==0 else "transparent")
+        row_border = f"border-left:3px solid {clr};" if is_leader else f"border-left:3px solid {clr}55;"
+        q_badge  = f' <span style="background:#D4AF3788;color:#1a1000;border-radius:6px;padding:0 4px;font-size:8px;font-weight:900;">👑Q</span>' if q == max_q and max_q > 0 else ""
+        s_badge  = f' <span style="background:#a855f788;color:#fff;border-radius:6px;padding:0 4px;font-size:8px;font-weight:900;">⚡S</span>' if sp == max_s and max_s > 0 else ""
+        r_badge  = f' <span style="background:#4ade8088;color:#051a05;border-radius:6px;padding:0 4px;font-size:8px;font-weight:900;">🏁R</span>' if ca == max_r and max_r > 0 else ""
+        pts_style = f"color:#ffdd7a;font-weight:900;font-size:{'16' if is_leader else '14'}px;"
+        rows_html += (
+            f'<tr style="{row_bg};{row_border}">'
+            f'<td style="text-align:center;width:36px;">{pos_ico}</td>'
+            f'<td style="padding-left:4px;">{arrow}</td>'
+            f'<td><span style="color:{clr};font-weight:800;">{pil}</span>{q_badge}{s_badge}{r_badge}</td>'
+            f'<td style="text-align:center;{pts_style}">{pts}</td>'
+        )
+        if "Qualys"   in df2.columns: rows_html += f'<td style="text-align:center;color:{"#D4AF37" if q==max_q and max_q>0 else "rgba(169,178,214,.6)"};font-weight:{"900" if q==max_q and max_q>0 else "400"};">{q}</td>'
+        if "Sprints"  in df2.columns: rows_html += f'<td style="text-align:center;color:{"#a855f7" if sp==max_s and max_s>0 else "rgba(169,178,214,.6)"};font-weight:{"900" if sp==max_s and max_s>0 else "400"};">{sp}</td>'
+        if "Carreras" in df2.columns: rows_html += f'<td style="text-align:center;color:{"#4ade80" if ca==max_r and max_r>0 else "rgba(169,178,214,.6)"};font-weight:{"900" if ca==max_r and max_r>0 else "400"};">{ca}</td>'
+        rows_html += "</tr>"
+    headers = ["#","","Formulero","Pts"]
+    if "Qualys"   in df2.columns: headers.append("Qualys")
+    if "Sprints"  in df2.columns: headers.append("Sprints")
+    if "Carreras" in df2.columns: headers.append("Carreras")
+    head_html = "".join(f'<th style="font-size:9px;letter-spacing:.1em;color:rgba(212,175,55,.7);text-transform:uppercase;padding:8px 6px;">{h}</th>' for h in headers)
+    return (f'<div class="fw-table-wrap">'
+            f'<table class="fw-table" style="width:100%;border-collapse:collapse;">'
+            f'<thead><tr style="border-bottom:1px solid rgba(212,175,55,.2);">{head_html}</tr></thead>'
+            f'<tbody>{rows_html}</tbody>'
+            f'</table></div>'
+            '<div style="font-size:9px;color:rgba(169,178,214,.4);margin-top:4px;">'
+            '👑Q = más qualys ganadas &nbsp;·&nbsp; ⚡S = más sprints ganados &nbsp;·&nbsp; 🏁R = más carreras ganadas'
+            '</div>')
+
+
+_GRID_CSS_LEGACY = None   # el <style> que la grilla re-emitía en cada render
+
+def grilla_legacy(ns):
+    all_drivers = []
+    for equipo, pilotos in ns["GRILLA_2026"].items():
+        color = ns["TEAM_COLORS"].get(equipo, "#A855F7")
+        abbr  = ns["TEAM_LOGOS_SVG"].get(equipo, equipo[:3])
+        for num_idx, pil in enumerate(pilotos):
+            all_drivers.append((pil, equipo, color, abbr, num_idx + 1))
+    cards_html = _GRID_CSS_LEGACY + '<div class="f1-drivers-grid">'
+    for pil, equipo, color, abbr, num in all_drivers:
+        photo = ns["DRIVER_PHOTOS"].get(pil, "")
+        initials = "".join(p[0] for p in pil.split()[:2]).upper()
+        nacionalidades = dict(ns["_NACIONALIDADES"])   # se reconstruía por piloto
+        logo_url = ns["TEAM_LOGOS_CDN"].get(equipo, "")
+        flag = nacionalidades.get(pil, "🌍")
+        last_name = pil.split()[-1].upper()
+        first_name = " ".join(pil.split()[:-1])
+        img_html = f'<img src="{photo}" class="f1d-photo" onerror="this.style.display=\'none\';this.nextElementSibling.style.display=\'flex\';" loading="lazy">'
+        fallback = f'<div class="f1d-fallback" style="display:none;color:{color};">{initials}</div>'
+        cards_html += f"""
+        <div class="f1d-card fade-up" style="--tc:{color}">
+          <div class="f1d-top-stripe"></div>
+          <div class="f1d-team-badge" style="display:flex;align-items:center;gap:4px;"><span>{abbr}</span></div>
+          <img src="{logo_url}" class="f1d-logo" onerror="this.style.display='none';" loading="lazy">
+          <div class="f1d-photo-wrap">{img_html}{fallback}</div>
+          <div class="f1d-info">
+            <div class="f1d-flag">{flag}</div>
+            <div class="f1d-firstname">{first_name}</div>
+            <div class="f1d-lastname">{last_name}</div>
+            <div class="f1d-team-name">{equipo}</div>
+          </div>
+        </div>"""
+    return cards_html + "</div>"
+
+
+def medir(nombre, fn, n):
+    t = min(timeit.repeat(fn, number=n, repeat=5)) / n
+    out = fn()
+    return nombre, t * 1e6, len(out.encode("utf-8"))
+
+
+def main(n=2000):
+    global _GRID_CSS_LEGACY
+    ns = cargar()
+    css = ns["_TPL_CSS"]
+    _GRID_CSS_LEGACY = css[css.index(".f1-drivers-grid"):css.index(".tp-lu{")]
+    pil = ns["PILOTOS_TORNEO"]
+    df = pd.DataFrame({"Piloto": pil, "Puntos": [300 - 17 * i for i in range(len(pil))],
+                       "Qualys": [3, 5, 1, 0, 2, 1][:len(pil)], "Sprints": [1, 0, 2, 0, 0, 1][:len(pil)],
+                       "Carreras": [4, 2, 2, 1, 0, 0][:len(pil)]})
+    prev = {p: (i + 1) % len(pil) for i, p in enumerate(pil)}
+    casos = [
+        (f"tabla {len(pil)} filas", lambda: tabla_legacy(ns, df, prev),
+                                    lambda: ns["html_tabla_general"](df, prev)),
+        ("grilla 22 pilotos",       lambda: grilla_legacy(ns),
+                                    lambda: ns["html_grilla_pilotos"]()),
+    ]
+    print(f"{'caso':<22}{'antes µs':>10}{'después µs':>12}{'x':>6}{'antes B':>10}{'después B':>11}")
+    for caso, viejo, nuevo in casos:
+        _, t0, b0 = medir(caso, viejo, n)
+        _, t1, b1 = medir(caso, nuevo, n)
+        print(f"{caso:<22}{t0:>10.1f}{t1:>12.1f}{t0 / t1:>6.1f}{b0:>10}{b1:>11}")
+    print(f"CSS compartido (una vez por rerun): {len(css.encode('utf-8'))} B")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
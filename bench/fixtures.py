@@ -0,0 +1,125 @@
+"""Fixtures para bench/bench_datos.py: copias de sheet1, Oficial, Desafios,
+historial e historial_detalle en un solo JSON.
+
+- grabar(ns, ruta): baja los datos reales (correr donde están los secrets de
+  Sheets/Supabase). Ojo: incluye predicciones de los formuleros, no subir a
+  repos públicos.
+- sintetico(ns, participantes, gps, semilla): genera datos con la misma forma,
+  deterministas para una semilla dada; historial y detalle salen de puntuar_gp
+  sobre las predicciones y el oficial generados, así que son coherentes entre sí.
+
+`ns` es el namespace de app.py que arma bench_datos.cargar_app().
+"""
+import json, random
+from datetime import datetime, timedelta
+
+HOJAS = ("sheet1", "Oficial", "Desafios")
+
+
+def guardar(fx, ruta):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(fx, f, ensure_ascii=False, default=str)
+
+
+def cargar(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def grabar(ns, ruta):
+    """Copia los datos vivos a `ruta` (requiere backend)."""
+    m = ns["_mod_db"]()
+    if "_error" in m: raise RuntimeError(f"backend no disponible: {m['_error']}")
+    ns["hoja_sync"](list(HOJAS), force=True)
+    fx = {h: ns["hoja_valores"](h) or [] for h in HOJAS}
+    for clave, fn in (("historial", "leer_historial_df"), ("detalle", "leer_historial_detalle_df")):
+        df = m[fn]()
+        fx[clave] = [] if df is None else df.astype(object).where(df.notna(), "").to_dict("records")
+    gps = sorted({str(r.get("gp", "")) for r in fx["historial"]} - {""},
+                 key=lambda g: (ns["GPS_OFICIALES"].index(g) if g in ns["GPS_OFICIALES"] else 99, g))
+    fx["meta"] = {"origen": "grabado", "fecha": datetime.now().isoformat(timespec="seconds"),
+                  "participantes": list(ns["PILOTOS_TORNEO"]), "gps": gps}
+    guardar(fx, ruta)
+    return fx
+
+
+def _participantes(ns, n):
+    base = list(ns["PILOTOS_TORNEO"])
+    return base[:n] + [f"Formulero {i:02d}" for i in range(len(base) + 1, n + 1)]
+
+
+def sintetico(ns, participantes=6, gps=24, semilla=2026):
+    """Temporada sintética de `participantes` formuleros × `gps` GPs (máx. 24, el calendario)."""
+    rng = random.Random(semilla)
+    pils = _participantes(ns, participantes)
+    cal = ns["GPS_OFICIALES"][:gps]
+    sprint = set(ns["GPS_SPRINT"])
+    grilla = ns["GRILLA_2026"]
+    pilotos_f1 = [d for ds in grilla.values() for d in ds]
+    equipos = list(grilla)
+
+    of_vals = [["gp", "etapa", "pos", "piloto"]]
+    s1_vals = [["timestamp", "usuario", "gp", "etapa"] + [f"d{i}" for i in range(1, 15)]]
+    ts = datetime(2026, 3, 1, 12, 0)
+    for g in cal:
+        orden = rng.sample(pilotos_f1, len(pilotos_f1))
+        parrilla = sorted(orden, key=lambda d: orden.index(d) + rng.randint(-3, 3))
+        etapas = [("QUALY", parrilla[:5]), ("CARRERA", orden[:10])]
+        if g in sprint: etapas.insert(1, ("SPRINT", orden[:8]))
+        top3, _ = ns["calcular_constructores_auto"](dict(enumerate(orden[:10], 1)), grilla,
+                                                    ns["ESCALA_CARRERA_JUEGO"])
+        etapas.append(("CONSTRUCTORES", top3))
+        for et, lista in etapas:
+            of_vals += [[g, et, str(i), p] for i, p in enumerate(lista, 1)]
+        of_vals += [[g, "COLAPINTO Q", str(parrilla.index("Franco Colapinto") + 1), "Franco Colapinto"],
+                    [g, "COLAPINTO R", str(orden.index("Franco Colapinto") + 1), "Franco Colapinto"]]
+
+        # Cada formulero elige entre los ~14 de adelante (algunos aciertos, no todos)
+        for u in rng.sample(pils, len(pils)):
+            for _ in range(2 if rng.random() < 0.05 else 1):  # ~5% reenvía (gana la última fila)
+                ts += timedelta(minutes=rng.randint(1, 90))
+                t = ts.strftime("%Y-%m-%d %H:%M:%S")
+                s1_vals.append([t, u, g, "QUALY"] + rng.sample(parrilla[:12], 5) + [str(rng.randint(1, 20))])
+                if g in sprint:
+                    s1_vals.append([t, u, g, "SPRINT"] + rng.sample(orden[:12], 8))
+                s1_vals.append([t, u, g, "CARRERA"] + rng.sample(orden[:14], 10)
+                               + [str(rng.randint(1, 20))] + rng.sample(equipos[:6], 3))
+    w = len(s1_vals[0])
+    s1_vals = [r + [""] * (w - len(r)) for r in s1_vals]
+
+    # historial / detalle puntuando lo generado con el motor real
+    preds = ns["_parse_sheet1"](s1_vals)
+    hdr = of_vals[0]
+    oficial = ns["_oficial_desde_registros"]([dict(zip(hdr, r)) for r in of_vals[1:]])
+    historial, detalle = [], []
+    for g in cal:
+        k = ns["_gp_bare_key"](g)
+        pr = {p: preds.get(k, {}).get(p.lower(), ns["_PRED_VACIA"]) for p in pils}
+        res, _ = ns["puntuar_gp"](pr, oficial.get(k, {}), es_sprint=g in sprint)
+        for p in pils:
+            tot = 0
+            for et in ns["ESCALAS"]:
+                if et == "SPRINT" and g not in sprint: continue
+                pts = int(res.at[p, et]); tot += pts
+                detalle.append({"gp": g, "piloto": p, "etapa": et, "puntos": pts})
+            if rng.random() < 0.03:
+                detalle.append({"gp": g, "piloto": p, "etapa": "DNS", "puntos": -5}); tot -= 5
+            historial.append({"gp": g, "piloto": p, "puntos": tot})
+    tot_gp = {(h["gp"], h["piloto"]): h["puntos"] for h in historial}
+
+    des_vals = [list(ns["_DES_COLS"])]
+    for i in range(1, max(1, len(pils) * len(cal) // 4) + 1):
+        g = rng.choice(cal); a, b = rng.sample(pils, 2)
+        estado = rng.choices(("RESUELTO", "RECHAZADO", "PENDIENTE", "ACEPTADO"), (70, 10, 10, 10))[0]
+        pa = pb = ""; gan = ""; t_res = ""
+        t_cre = (datetime(2026, 3, 1) + timedelta(days=7 * cal.index(g), hours=rng.randint(0, 96)))
+        if estado == "RESUELTO":
+            pa, pb = tot_gp[g, a], tot_gp[g, b]
+            gan = a if pa > pb else b if pb > pa else "EMPATE"
+            t_res = (t_cre + timedelta(days=3)).strftime("%Y-%m-%d %H:%M:%S")
+        des_vals.append([str(i), a, b, g, estado, str(pa), str(pb), gan,
+                         t_cre.strftime("%Y-%m-%d %H:%M:%S"), t_res])
+
+    return {"meta": {"origen": "sintetico", "semilla": semilla, "participantes": pils, "gps": cal},
+            "sheet1": s1_vals, "Oficial": of_vals, "Desafios": des_vals,
+            "historial": historial, "detalle": detalle}